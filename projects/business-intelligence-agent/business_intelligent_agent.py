@@ -16,10 +16,16 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import google.generativeai as genai
+import hashlib
+import io
 import json
-from typing import Dict, Any, List
+import os
+import sys
+import time
+import traceback
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from IPython.display import display, HTML
+from IPython.display import display, HTML, Image
 
 print("✅ All libraries imported successfully")
 
@@ -251,6 +257,318 @@ def generate_llm_code(query: str, schema: str, num_rows: int, model_name: str =
 
 print("✅ Code generation function defined")
 
+"""### Sandboxed Executor
+
+Generated code used to run with `exec` inside the notebook process. That swapped `sys.stdout` for everyone, copied the whole DataFrame on every call, and had no limits: one runaway loop froze the notebook. `SandboxExecutor` runs it in a pool of worker processes instead:
+
+- **Shared, read-only data.** Numeric, date and categorical columns are copied once into shared memory and every worker reads the same pages. Text columns keep their dtype and are inherited by the forked workers. Each task gets a copy-on-write view, so it can add or overwrite columns without touching the shared data or the next task's view.
+- **Pre-warmed workers.** Workers are forked once, with pandas, numpy, matplotlib and the notebook's helpers already imported. Forking from the kernel, which runs threads of its own, can leave a worker stuck on a lock another thread held; the timeout catches it and the worker is replaced.
+- **Limits per task.** Each task has CPU seconds, a memory budget and a wall-clock timeout. A task that overruns its time has its worker killed and replaced.
+- **Own stdout per task.** Several questions can execute at once without mixing their logs. Charts come back as PNGs.
+"""
+
+# =========================
+# Sandboxed Executor: Worker Pool, Shared Memory, Limits
+# =========================
+
+import contextlib
+import multiprocessing as mp
+import pickle
+import queue
+import signal
+import threading
+import warnings
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "60"))  # wall-clock seconds per task
+SANDBOX_CPU_SECONDS = float(os.environ.get("SANDBOX_CPU_SECONDS", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "2048"))  # on top of what a worker starts with
+
+# Variables generated code may set, returned from every task
+ANSWER_NAMES = ("STATUS", "answer_text")
+
+
+class CpuLimitExceeded(BaseException):
+    """A BaseException, so `except Exception` in generated code cannot swallow it."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _publish_frame(df: pd.DataFrame, blocks: list) -> pd.DataFrame:
+    """
+    Copy df into shared memory, one block per column, and return a read-only
+    DataFrame over the blocks. Numeric, boolean and datetime columns share
+    their values and categorical columns their codes. Every other column
+    keeps its dtype and is left out of shared memory: turning text into
+    categoricals would change what generated code sees (`.str`, assigning
+    new labels), so workers inherit those columns when forked instead.
+    """
+    data = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufcmM":
+            values, categories = column.to_numpy(), None
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            values, categories = column.cat.codes.to_numpy(), column.dtype
+        else:
+            data[name] = column
+            continue
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        blocks.append(block)
+        shared = np.ndarray(values.shape, values.dtype, buffer=block.buf)
+        shared[:] = values
+        shared.flags.writeable = False
+        data[name] = shared if categories is None else pd.Categorical.from_codes(shared, dtype=categories, validate=False)
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def _fresh(value, deep: bool = False):
+    """A copy per task, so one task's new columns never leak into the next."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=deep)
+    return value
+
+
+def _release(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:  # a frame over it is still referenced somewhere
+            pass
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Cap this process's private memory at what it uses now plus memory_mb."""
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/status") as f:
+            used = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmData:"))
+    except (OSError, StopIteration):
+        return
+    limit = used + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def _drain_figures() -> list:
+    """PNG bytes of every open figure, then close them all."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    figures = []
+    for num in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+        figures.append(buffer.getvalue())
+    plt.close("all")
+    return figures
+
+
+def _picklable(values: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for name, value in values.items():
+        try:
+            pickle.dumps(value)
+            out[name] = value
+        except Exception:
+            out[name] = repr(value)
+    return out
+
+
+def _failure(message: str, limit: Optional[str] = None) -> Dict[str, Any]:
+    return {"stdout": "", "stderr": "", "error": message, "limit": limit, "outputs": {},
+            "figures": [], "cpu_seconds": None, "seconds": None}
+
+
+class SandboxExecutor:
+    """
+    Runs generated code in a pool of pre-warmed worker processes.
+
+    frames (name -> DataFrame) are published
+    to shared memory once. namespace holds the libraries, helpers and other
+    objects tasks may use. Workers are forked, so they inherit it, and every
+    module already imported, as it was when they started.
+
+    Without fork (Windows), tasks run inline, one at a time and unlimited.
+
+    Workers are forked from the kernel, which has threads of its own, and
+    replacements are forked from this pool's dispatch threads. Only the
+    forking thread exists in the child, so a lock another thread held at
+    that moment (logging, the allocator, a BLAS pool) stays held there.
+    A worker that deadlocks on one is caught by the wall-clock timeout and
+    replaced, at the cost of that task. forkserver or spawn would avoid
+    this, but workers could no longer inherit the namespace and data,
+    which is what makes them pre-warmed.
+    """
+
+    def __init__(
+        self,
+        frames: Optional[Dict[str, Any]] = None,
+        namespace: Optional[Dict[str, Any]] = None,
+        *,
+        workers: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT,
+        cpu_seconds: float = SANDBOX_CPU_SECONDS,
+        memory_mb: int = SANDBOX_MEMORY_MB,
+    ):
+        try:
+            self._context = mp.get_context("fork")
+        except ValueError:
+            self._context = None
+        self.workers = workers if self._context else 0
+        self._blocks = []
+        self._finalizer = weakref.finalize(self, _release, self._blocks)
+        self.frames = {}
+        for name, value in (frames or {}).items():
+            if not self.workers:  # inline tasks get deep copies instead
+                self.frames[name] = value
+            else:
+                self.frames[name] = _publish_frame(value, self._blocks)
+        self.namespace = dict(namespace or {})
+        self.timeout, self.cpu_seconds, self.memory_mb = timeout, cpu_seconds, memory_mb
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="sandbox")
+
+    # ---- worker side ----
+
+    def _spawn(self) -> tuple:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=self._serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _serve(self, conn) -> None:
+        # The notebook's stdout/stderr belong to the kernel; never write to them from here
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+        warnings.filterwarnings("ignore", message=".*non-interactive.*")
+        if int(pd.__version__.split(".")[0]) < 3:
+            # Writes to a task's shallow copy then copy the column instead of hitting read-only memory
+            pd.set_option("mode.copy_on_write", True)
+        import matplotlib
+        matplotlib.use("Agg", force=True)
+        _limit_memory(self.memory_mb)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            conn.send(self._run(task, limits=True))
+
+    def _run(self, task: tuple, limits: bool = False) -> Dict[str, Any]:
+        code, inputs = task
+        namespace = {name: _fresh(value) for name, value in self.namespace.items()}
+        namespace.update({name: _fresh(frame, deep=not self.workers) for name, frame in self.frames.items()})
+        namespace.update(inputs)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        error = limit = None
+        start_cpu, start = time.process_time(), time.perf_counter()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if limits:
+                signal.setitimer(signal.ITIMER_PROF, self.cpu_seconds)
+            try:
+                exec(code, namespace)
+            except CpuLimitExceeded:
+                limit, error = "cpu", f"CPU limit exceeded: the code used more than {self.cpu_seconds:g} CPU seconds"
+            except MemoryError:
+                limit, error = "memory", f"Memory limit exceeded: the code needed more than {self.memory_mb} MB"
+            except BaseException:  # SystemExit too: a task never ends its worker
+                error = traceback.format_exc()
+            finally:
+                if limits:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            outputs = {name: namespace[name] for name in ANSWER_NAMES if name in namespace}
+            figures = _drain_figures()
+        return {
+            "stdout": stdout.getvalue().strip(),
+            "stderr": stderr.getvalue().strip(),
+            "error": error,
+            "limit": limit,
+            "outputs": _picklable(outputs),
+            "figures": figures,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "seconds": time.perf_counter() - start,
+        }
+
+    # ---- notebook side ----
+
+    def submit(self, code: str, **inputs) -> Future:
+        """Queue code for the next free worker. inputs are added to its namespace."""
+        return self._dispatch.submit(self._execute, (code, inputs))
+
+    def run(self, code: str, **inputs) -> Dict[str, Any]:
+        """
+        Execute code and wait for it.
+
+        Returns:
+            dict: stdout, stderr, error (traceback or limit message), limit
+            ('cpu', 'memory', 'timeout' or None), outputs (answer variables
+            the code set), figures (PNG bytes), cpu_seconds and seconds
+        """
+        return self.submit(code, **inputs).result()
+
+    def _execute(self, task: tuple) -> Dict[str, Any]:
+        if not self.workers:
+            return self._run(task)
+        process, conn = self._idle.get()
+        try:
+            conn.send(task)
+        except BaseException:  # e.g. unpicklable inputs; nothing reached the worker
+            self._idle.put((process, conn))
+            raise
+        try:
+            if conn.poll(self.timeout):
+                result = conn.recv()
+                if result["limit"] != "memory":
+                    self._idle.put((process, conn))
+                    return result
+            else:
+                result = _failure(f"Timed out: the code ran for more than {self.timeout:g} seconds", "timeout")
+        except (EOFError, OSError):
+            process.join(1)
+            result = _failure(f"The worker exited unexpectedly (exit code {process.exitcode})")
+        # Stuck, dead or near its memory cap: replace the worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._idle.put(self._spawn())
+        return result
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._dispatch.shutdown(wait=True)
+        for _ in range(self.workers):
+            process, conn = self._idle.get()
+            process.kill()
+            process.join()
+            conn.close()
+        self.workers = 0
+        self.frames = {}
+        self._finalizer()
+
+print("✅ Sandboxed executor ready!")
+
+
 def _extract_execute_block(text: str) -> str:
     """
     Extract executable Python code from LLM response.
@@ -282,9 +600,46 @@ print("LOG: Empty LLM response received")
     # Otherwise, return as-is (assume it's raw code)
     return text
 
+def data_fingerprint(df: pd.DataFrame, sample_rows: int = 1024) -> str:
+    """
+    Fingerprint df from its shape, dtypes, numeric column sums and an evenly
+    spaced sample of rows, in milliseconds even for large datasets.
+    """
+    digest = hashlib.sha256(repr((df.shape, list(df.columns), df.dtypes.astype(str).tolist())).encode("utf-8"))
+    digest.update(repr(df.select_dtypes("number").sum().round(6).tolist()).encode("utf-8"))
+    step = max(1, len(df) // sample_rows)
+    digest.update(pd.util.hash_pandas_object(df.iloc[::step]).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# One live pool per notebook, rebuilt when df changes: each holds its own shared copy of the data
+_SANDBOXES: Dict[str, SandboxExecutor] = {}
+
+
+def sandbox_for(df: pd.DataFrame) -> SandboxExecutor:
+    """The executor with df published to shared memory, started on first use."""
+    key = data_fingerprint(df)
+    if key not in _SANDBOXES:
+        for executor in _SANDBOXES.values():
+            executor.close()
+        _SANDBOXES.clear()
+        _SANDBOXES[key] = SandboxExecutor(
+            {"df": df},
+            namespace={
+                "pd": pd,
+                "np": np,
+                "plt": plt,
+                "sns": sns,
+                "STATUS": "unknown",
+                "answer_text": "No answer generated"
+            },
+        )
+    return _SANDBOXES[key]
+
+
 def execute_generated_code(code_text: str, df: pd.DataFrame) -> Dict[str, Any]:
     """
-    Execute generated Python code in a safe namespace.
+    Execute generated Python code in the sandboxed worker pool.
 
     Args:
         code_text: Python code to execute
@@ -308,38 +663,27 @@ def execute_generated_code(code_text: str, df: pd.DataFrame) -> Dict[str, Any]:
     print(code)
     print("="*60 + "\n")
 
-    # Create safe execution namespace
-    namespace = {
-        "df": df.copy(),  # Work on a copy to avoid modifying original
-        "pd": pd,
-        "np": np,
-        "plt": plt,
-        "sns": sns,
-        "STATUS": "unknown",
-        "answer_text": "No answer generated"
-    }
-
-    try:
-        # Execute the code
-        exec(code, namespace)
-
-        # Extract results
-        status = namespace.get("STATUS", "unknown")
-        answer = namespace.get("answer_text", "No answer provided")
-
-        return {
-            "STATUS": status,
-            "answer_text": answer
-        }
+    # Execute the code; the worker captures its prints and charts
+    run = sandbox_for(df).run(code)
+    if run["stdout"]:
+        print(run["stdout"])
+    for png in run["figures"]:
+        display(Image(data=png))
 
-    except Exception as e:
-        error_msg = f"Execution error: {str(e)}"
+    if run["error"]:
+        error_msg = f"Execution error: {run['error'].strip().splitlines()[-1]}"
         print(f"❌ {error_msg}")
         return {
             "STATUS": "error",
             "answer_text": error_msg
         }
 
+    # Extract results
+    return {
+        "STATUS": run["outputs"].get("STATUS", "unknown"),
+        "answer_text": run["outputs"].get("answer_text", "No answer provided")
+    }
+
 print("✅ Code execution functions defined")
 
 def filter_agent(query: str, df: pd.DataFrame, schema: str, model_name: str = "gemini-2.0-flash-exp") -> str:
@@ -8,11 +8,21 @@ Produces tasty_kitchen.db with five tables:
   subscriptions   20 monthly cycles with holiday extensions computed
   orders          every delivered meal line, monthly and daily
 
+and the read-side structures the governed tools query instead of scanning:
+  delivery_counts     meals per date, service and dish, materialised from orders
+  dishes_by_protein   the rotation keyed by lower-cased protein
+  customer_names      FTS5 trigram index over customer names, for lookup by
+                      any fragment of a name without a LIKE '%..%' scan
+
 Deterministic: fixed seed, so the database rebuilds identically.
+
+    python build_database.py              # tasty_kitchen.db
+    python build_database.py --scale 100  # tasty_kitchen_x100.db, for benchmarks
 """
 
 import sqlite3
 import random
+import sys
 from datetime import date, timedelta
 from pathlib import Path
 
@@ -131,10 +141,10 @@ def holidays_between(start, end):
     return [h for h in HOLIDAYS if start <= h <= end and h.weekday() < 5]
 
 
-def build():
-    if OUT.exists():
-        OUT.unlink()
-    conn = sqlite3.connect(OUT)
+def build(out=OUT, scale=1):
+    if out.exists():
+        out.unlink()
+    conn = sqlite3.connect(out)
     cur = conn.cursor()
 
     cur.executescript("""
@@ -301,16 +311,75 @@ def build():
     cur.executemany(
         "INSERT INTO orders VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", orders)
 
+    if scale > 1:
+        replicate(cur, scale)
+
     cur.executescript("""
     CREATE INDEX idx_orders_date ON orders(order_date);
     CREATE INDEX idx_orders_cust ON orders(customer_id);
     CREATE INDEX idx_menu_lookup ON menu_rotation(rotation_week, weekday_num, service);
+    CREATE INDEX idx_subs_cust ON subscriptions(customer_id);
+    CREATE INDEX idx_cust_id_upper ON customers(UPPER(customer_id));
     """)
+    build_read_views(cur)
 
     conn.commit()
+    # WAL lets any number of read-only tool connections share the file.
+    conn.execute("PRAGMA journal_mode=WAL")
     return conn
 
 
+def build_read_views(cur):
+    """Materialise what the tools would otherwise aggregate per call.
+
+    The database is rebuilt, never updated in place, so these are computed once
+    here and need no triggers to stay in step with the base tables.
+    """
+    cur.executescript("""
+    CREATE TABLE delivery_counts AS
+        SELECT order_date, service, dish_en, dish_zh, COUNT(*) AS n
+        FROM orders GROUP BY order_date, service, dish_en;
+    CREATE INDEX idx_delivery_counts ON delivery_counts(order_date, service);
+
+    CREATE TABLE dishes_by_protein AS
+        SELECT LOWER(protein) AS protein_lc, rotation_week, weekday_num,
+               weekday_name, service, dish_zh, dish_en, price_daily
+        FROM menu_rotation ORDER BY rotation_week, weekday_num, service;
+    CREATE INDEX idx_dishes_protein ON dishes_by_protein(protein_lc);
+
+    CREATE VIRTUAL TABLE customer_names USING fts5(
+        name, customer_id UNINDEXED, tokenize='trigram');
+    INSERT INTO customer_names (rowid, name, customer_id)
+        SELECT rowid, name, customer_id FROM customers;
+    """)
+
+
+def replicate(cur, scale):
+    """Copy every customer, cycle and order scale-1 more times, for benchmarks.
+
+    Copies get suffixed IDs and names (CUST001-2, "Kok W.K. #2"), so lookups
+    stay unambiguous and the per-date aggregates grow by the same factor.
+    """
+    for k in range(2, scale + 1):
+        cur.execute(
+            "INSERT INTO customers SELECT customer_id || '-' || ?1, "
+            "name || ' #' || ?1, area, phone, plan_type, service, joined_date, "
+            "status FROM customers WHERE instr(customer_id, '-') = 0", (k,))
+        cur.execute(
+            "INSERT INTO subscriptions SELECT subscription_id || '-' || ?1, "
+            "customer_id || '-' || ?1, service, start_date, service_days, "
+            "meals_purchased, meals_delivered, meals_remaining, "
+            "holidays_in_cycle, cycle_end_date, amount_rm, payment_status, "
+            "status FROM subscriptions WHERE instr(subscription_id, '-') = 0",
+            (k,))
+        cur.execute(
+            "INSERT INTO orders SELECT order_id || '-' || ?1, "
+            "customer_id || '-' || ?1, order_date, weekday_name, service, "
+            "dish_zh, dish_en, protein, meal_price, addons, addons_rm, "
+            "total_rm, plan_type FROM orders WHERE instr(order_id, '-') = 0",
+            (k,))
+
+
 def report(conn):
     cur = conn.cursor()
     q = lambda s: cur.execute(s).fetchone()[0]
@@ -367,11 +436,18 @@ def report(conn):
 
 
 if __name__ == "__main__":
-    import sys
     try:
         sys.stdout.reconfigure(encoding="utf-8")
     except Exception:
         pass
-    c = build()
-    report(c)
+    if "--scale" in sys.argv:
+        n = int(sys.argv[sys.argv.index("--scale") + 1])
+        out = OUT.with_name(f"{OUT.stem}_x{n}{OUT.suffix}")
+        c = build(out, scale=n)
+        print(f"Scaled database: {out.name}, {n}x customers, cycles and orders")
+        print(f"orders          "
+              f"{c.execute('SELECT COUNT(*) FROM orders').fetchone()[0]} meal lines")
+    else:
+        c = build()
+        report(c)
     c.close()
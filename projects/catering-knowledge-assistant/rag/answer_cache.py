@@ -0,0 +1,261 @@
+"""
+Semantic answer cache for repeated customer questions.
+
+Customers ask the same handful of things in slightly different words ("can I
+pause my subscription", "is it possible to pause my plan"), and each one paid a
+generation call against a free tier of a few requests per minute. The cache
+sits after the router and retrieval and before generation, on the corpus route
+only: the router always runs, so a date or a name in the question is never
+answered from an entry that skipped it.
+
+  match      a new question reuses an earlier answer only when its dates and
+             entities are the same, its query embedding is within
+             ANSWER_CACHE_MIN_SIM cosine of the earlier question, AND retrieval
+             returns exactly the same chunks. "Do you deliver on 31 August" and
+             "... on 1 September" embed almost identically and may retrieve the
+             same holiday notice, so similar wording and grounding are not
+             enough on their own; the facets must match too.
+  freshness  the chunk set is stored with each chunk's content_hash, and a
+             lookup compares against the hashes retrieval just returned. Edit
+             any chunk an answer was grounded on and that answer stops
+             matching, with no explicit invalidation step.
+  scope      only corpus-route answers are stored, and only corpus-route
+             questions look here. Record questions are per customer and per
+             date, so they are never written here and never read from here.
+
+Facets are extracted by facets(): dates in any of the forms customers write
+them (31 August, 31/8, 2026-08-31, Thursday, tomorrow, next week), numbers,
+the protein, service and plan words the tools key on, and names. A known name
+(a delivery area, a customer or a dish from tasty_kitchen.db, or a nearby
+place the delivery policy turns away) counts in any case and in any position;
+any other capitalised word after the first of a sentence counts too.
+Entries also carry a fingerprint of the answer prompt and generation model, so
+changing either retires every earlier answer.
+
+    python -m rag.answer_cache            # size and counters
+    python -m rag.answer_cache clear
+    python -m rag.evaluate cache          # paraphrase and date-variant pairs
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .config import ANSWER_CACHE, ANSWER_CACHE_MIN_SIM, GEN_MODEL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    grounding  TEXT NOT NULL,
+    question   TEXT NOT NULL,
+    qvec       BLOB NOT NULL,
+    answer     TEXT NOT NULL,
+    created    REAL NOT NULL,
+    served     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (grounding, question)
+);
+"""
+
+
+_MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep",
+           "oct", "nov", "dec")
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(\d{4}))?"
+_DATES = re.compile(
+    r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"
+    r"|\b(\d{1,2})[/.](\d{1,2})(?:[/.](\d{2,4}))?\b"
+    rf"|\b{_DAY}\s+(?:of\s+)?{_MONTH}{_YEAR}"
+    rf"|\b{_MONTH}\s+{_DAY}\b{_YEAR}"
+    r"|\b((?:this|next|last)\s+(?:week|weekend|month)"
+    r"|today|tonight|tomorrow|yesterday|weekend"
+    r"|(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+    r"|january|february|march|april|june|july|august|september|october"
+    r"|november|december)\b",
+    re.IGNORECASE)
+# The slots the tools and the menu key on. A price or a dish list differs by
+# these and nothing else, so they count as entities even in lower case.
+_SLOTS = {"chicken", "pork", "fish", "beef", "tofu", "lamb", "mutton", "duck",
+          "prawn", "egg", "seafood", "vegetarian", "vegan", "lunch", "dinner",
+          "daily", "monthly", "weekly", "brown", "white"}
+_WORD = re.compile(r"[A-Za-z][\w.'-]*|\d+(?:\.\d+)?")
+# Places the delivery policy names as outside the two service areas. They are
+# not in the database, and "do you deliver to klang" is asked in lower case.
+_PLACES = ("Klang", "Subang", "Subang Jaya", "Puchong", "Petaling Jaya", "PJ",
+           "Bukit Jelutong", "Cyberjaya", "Kuala Lumpur", "KL")
+_names = None
+_names_lock = threading.Lock()
+
+
+def _known_names():
+    """A pattern matching every known name, longest first, in any case."""
+    global _names
+    with _names_lock:
+        if _names is None:
+            from .tools import entity_names
+            try:
+                names = set(entity_names())
+            except sqlite3.Error:           # no database built yet
+                names = set()
+            names.update(_PLACES)
+            alt = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+            _names = re.compile(rf"(?<!\w)(?:{alt})(?!\w)", re.IGNORECASE)
+        return _names
+
+
+def _date_facet(m):
+    g = m.groups()
+    if g[0]:
+        return f"date:{int(g[2])} {_MONTHS[int(g[1]) - 1]} {g[0]}"
+    if g[3]:
+        year = f" {g[5]}" if g[5] else ""
+        month = int(g[4])
+        return (f"date:{int(g[3])} {_MONTHS[month - 1]}{year}" if 1 <= month <= 12
+                else f"date:{g[3]}/{g[4]}{year}")
+    if g[6]:
+        return f"date:{int(g[6])} {g[7].lower()[:3]}" + (f" {g[8]}" if g[8] else "")
+    if g[9]:
+        return f"date:{int(g[10])} {g[9].lower()[:3]}" + (f" {g[11]}" if g[11] else "")
+    return "date:" + " ".join(g[12].lower().split())
+
+
+def facets(question):
+    """The dates and entities in a question, normalised, as a sorted tuple.
+
+    "1 September", "1st of Sep" and "01/09" give the same date facet, so
+    rephrasings still share an entry, while "31 August" does not.
+    """
+    out = set()
+    for m in _DATES.finditer(question):
+        out.add(_date_facet(m))
+    rest = _DATES.sub(" ", question)
+    known = _known_names()
+    for m in known.finditer(rest):
+        out.add(f"name:{' '.join(m.group(0).lower().split())}")
+    rest = known.sub(" ", rest)
+    for sentence in re.split(r"[.?!]\s+", rest):
+        for i, w in enumerate(_WORD.findall(sentence)):
+            if w[0].isdigit():
+                out.add(f"num:{w}")
+            elif w.lower() in _SLOTS:
+                out.add(f"slot:{w.lower()}")
+            elif i and w[0].isupper() and w != "I":
+                out.add(f"name:{w.lower().rstrip('.')}")
+    return tuple(sorted(out))
+
+
+def grounding_key(hits, version, question_facets=()):
+    """Identity of what an answer was grounded on: chunks, their hashes, the
+    prompt, and the question's dates and entities."""
+    parts = sorted(f"{h.chunk_id}:{h.content_hash}" for h in hits)
+    raw = (version + "|" + "|".join(parts)
+           + "|facets:" + "|".join(question_facets))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, path=ANSWER_CACHE, min_sim=ANSWER_CACHE_MIN_SIM):
+        self.path = path
+        self.min_sim = min_sim
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=30,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def lookup(self, question, qvec, hits, version):
+        """Return the stored answer dict for a matching question, or None."""
+        if not hits:
+            return None
+        key = grounding_key(hits, version, facets(question))
+        q = np.asarray(qvec, dtype=np.float32)
+        with self._lock:
+            # The grounding key narrows candidates to questions with the same
+            # facets that retrieved the same chunks, so the similarity scan is
+            # over a handful of rows.
+            rows = self._db.execute(
+                "SELECT question, qvec, answer FROM answers WHERE grounding=?",
+                (key,)).fetchall()
+            best, best_sim = None, self.min_sim
+            for prev_q, blob, answer in rows:
+                sim = float(np.frombuffer(blob, dtype=np.float32) @ q)
+                if sim >= best_sim:
+                    best, best_sim = (prev_q, answer), sim
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._db:
+                self._db.execute(
+                    "UPDATE answers SET served=served+1 "
+                    "WHERE grounding=? AND question=?", (key, best[0]))
+        return json.loads(best[1])
+
+    def store(self, question, qvec, hits, version, answer):
+        if not hits:
+            return
+        blob = np.asarray(qvec, dtype=np.float32).tobytes()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(grounding, question, qvec, answer, created) VALUES (?,?,?,?,?)",
+                (grounding_key(hits, version, facets(question)), question, blob,
+                 json.dumps(answer, ensure_ascii=False), time.time()))
+
+    def stats(self):
+        with self._lock:
+            rows, served = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(served), 0) FROM answers"
+            ).fetchone()
+        return {"rows": rows, "served_all_time": served,
+                "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM answers")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+    return _cache
+
+
+def prompt_version(prompt):
+    raw = f"{GEN_MODEL}|{prompt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def report():
+    s = cache().stats()
+    return (f"answer cache: {s['hits']} hits, {s['misses']} misses this run, "
+            f"{s['rows']} answers stored, {s['served_all_time']} served "
+            f"from cache all time")
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "stats":
+        print(report())
+    elif cmd == "clear":
+        cache().clear()
+        print(f"cleared {ANSWER_CACHE.name}")
+    else:
+        raise SystemExit(f"unknown command '{cmd}', use stats or clear")
+
+
+if __name__ == "__main__":
+    main()
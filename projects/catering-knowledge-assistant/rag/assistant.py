@@ -11,18 +11,26 @@ Generation is grounded: the model sees only the retrieved chunks or the tool
 result, is told to answer from them alone, and must cite the doc_id it used.
 When retrieval returns nothing above the relevance floor, the assistant
 refuses rather than guessing.
+
+ask() is the synchronous path. ask_async() serves the same answers for many
+questions at once: it starts corpus retrieval speculatively while the router
+call is in flight, so a corpus question pays for the slower of the two rather
+than their sum, and every Gemini call goes through the shared async limiter,
+so any number of questions can be in flight without exceeding LIMITS.
 """
 
+import asyncio
 import json
 import re
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 
 from google import genai
 from google.genai import types
 
 from .config import GEN_MODEL, ROUTER_MODEL, BUSINESS_NAME, load_api_key
-from .ratelimit import with_retry
-from .retriever import retrieve, build_filter
+from .ratelimit import with_retry, awith_retry
+from .trace import span, usage, request
+from .retriever import retrieve, build_filter, warm_up
 from .tools import TOOL_SPECS, call_tool, SIM_TODAY
 
 _client = None
@@ -112,25 +120,46 @@ class Answer:
     tool_result: dict = field(default_factory=dict)
     refused: bool = False
     router_reason: str = ""
+    cached: bool = False       # served from the answer cache, no generation call
 
 
-def route(question):
-    resp = with_retry(lambda: client().models.generate_content(
-        model=ROUTER_MODEL,
-        contents=f"Question: {question}",
-        config=types.GenerateContentConfig(
-            system_instruction=ROUTER_PROMPT,
-            response_mime_type="application/json",
-            response_schema=ROUTER_SCHEMA,
-            temperature=0,
-        ),
-    ), ROUTER_MODEL)
+def _route_config():
+    return types.GenerateContentConfig(
+        system_instruction=ROUTER_PROMPT,
+        response_mime_type="application/json",
+        response_schema=ROUTER_SCHEMA,
+        temperature=0,
+    )
+
+
+def _parse_route(resp):
     try:
         return json.loads(resp.text)
     except Exception:
         return {"route": "corpus", "reason": "router parse failure, defaulted"}
 
 
+def route(question):
+    with span("route", model=ROUTER_MODEL) as rec:
+        resp = usage(with_retry(lambda: client().models.generate_content(
+            model=ROUTER_MODEL,
+            contents=f"Question: {question}",
+            config=_route_config(),
+        ), ROUTER_MODEL), rec)
+    return _parse_route(resp)
+
+
+async def route_async(question):
+    with span("route", model=ROUTER_MODEL) as rec:
+        resp = usage(await awith_retry(
+            lambda: client().aio.models.generate_content(
+                model=ROUTER_MODEL,
+                contents=f"Question: {question}",
+                config=_route_config(),
+            ), ROUTER_MODEL), rec)
+    return _parse_route(resp)
+
+
 def _format_sources(hits):
     blocks = []
     for h in hits:
@@ -149,21 +178,22 @@ def _extract_citations(text):
     return body, cited
 
 
-def answer_from_corpus(question, k_final=4, qfilter=None):
-    hits = retrieve(question, k_final=k_final, qfilter=qfilter)
-    if not hits:
-        return Answer(
-            question=question, route="corpus",
-            text=("I do not have that information in our published documents. "
-                  "Please contact us on 012-345 6789, 9am to 5pm on weekdays."),
-            refused=True)
-
-    resp = with_retry(lambda: client().models.generate_content(
-        model=GEN_MODEL,
-        contents=f"SOURCES:\n\n{_format_sources(hits)}\n\nQUESTION: {question}",
-        config=types.GenerateContentConfig(
-            system_instruction=ANSWER_PROMPT, temperature=0.1),
-    ), GEN_MODEL)
+_ANSWER_CONFIG = dict(system_instruction=ANSWER_PROMPT, temperature=0.1)
+
+
+def _no_sources(question):
+    return Answer(
+        question=question, route="corpus",
+        text=("I do not have that information in our published documents. "
+              "Please contact us on 012-345 6789, 9am to 5pm on weekdays."),
+        refused=True)
+
+
+def _corpus_prompt(question, hits):
+    return f"SOURCES:\n\n{_format_sources(hits)}\n\nQUESTION: {question}"
+
+
+def _corpus_answer(question, hits, resp):
     body, cited = _extract_citations(resp.text or "")
     refused = bool(re.search(
         r"do not have that information|don't have that information", body, re.I))
@@ -174,21 +204,48 @@ def answer_from_corpus(question, k_final=4, qfilter=None):
                   refused=refused)
 
 
-def answer_from_tool(question, tool_name, tool_args):
-    try:
-        result = call_tool(tool_name, tool_args or {})
-    except (LookupError, ValueError, TypeError, KeyError) as e:
-        return Answer(question=question, route="tool", tool_name=tool_name,
-                      text=f"I could not look that up. {e}", refused=True)
-
-    resp = with_retry(lambda: client().models.generate_content(
-        model=GEN_MODEL,
-        contents=(f"TOOL RESULT from {tool_name}:\n"
-                  f"{json.dumps(result, ensure_ascii=False, indent=2)}\n\n"
-                  f"QUESTION: {question}"),
-        config=types.GenerateContentConfig(
-            system_instruction=ANSWER_PROMPT, temperature=0.1),
-    ), GEN_MODEL)
+def answer_from_corpus(question, k_final=4, qfilter=None, hits=None):
+    if hits is None:
+        hits = retrieve(question, k_final=k_final, qfilter=qfilter)
+    if not hits:
+        return _no_sources(question)
+
+    with span("generate", route="corpus", model=GEN_MODEL) as rec:
+        resp = usage(with_retry(lambda: client().models.generate_content(
+            model=GEN_MODEL,
+            contents=_corpus_prompt(question, hits),
+            config=types.GenerateContentConfig(**_ANSWER_CONFIG),
+        ), GEN_MODEL), rec)
+    return _corpus_answer(question, hits, resp)
+
+
+async def answer_from_corpus_async(question, k_final=4, qfilter=None,
+                                   hits=None):
+    if hits is None:
+        # Embedding lookup and cross-encoder are blocking CPU and disk work,
+        # so they run on a worker thread, off the event loop.
+        hits = await asyncio.to_thread(retrieve, question, k_final=k_final,
+                                       qfilter=qfilter)
+    if not hits:
+        return _no_sources(question)
+
+    with span("generate", route="corpus", model=GEN_MODEL) as rec:
+        resp = usage(await awith_retry(
+            lambda: client().aio.models.generate_content(
+                model=GEN_MODEL,
+                contents=_corpus_prompt(question, hits),
+                config=types.GenerateContentConfig(**_ANSWER_CONFIG),
+            ), GEN_MODEL), rec)
+    return _corpus_answer(question, hits, resp)
+
+
+def _tool_prompt(question, tool_name, result):
+    return (f"TOOL RESULT from {tool_name}:\n"
+            f"{json.dumps(result, ensure_ascii=False, indent=2)}\n\n"
+            f"QUESTION: {question}")
+
+
+def _tool_answer(question, tool_name, result, resp):
     body, _ = _extract_citations(resp.text or "")
     # The source on the tool route is known deterministically, so it is set
     # here rather than trusted from the model's SOURCES line.
@@ -198,21 +255,175 @@ def answer_from_tool(question, tool_name, tool_args):
                   doc_ids=[f"database:{tool_name}"])
 
 
-def ask(question, verbose=False):
+def _tool_failed(question, tool_name, e):
+    return Answer(question=question, route="tool", tool_name=tool_name,
+                  text=f"I could not look that up. {e}", refused=True)
+
+
+def answer_from_tool(question, tool_name, tool_args):
+    try:
+        with span("tool_call", tool=tool_name):
+            result = call_tool(tool_name, tool_args or {})
+    except (LookupError, ValueError, TypeError, KeyError) as e:
+        return _tool_failed(question, tool_name, e)
+
+    with span("generate", route="tool", model=GEN_MODEL) as rec:
+        resp = usage(with_retry(lambda: client().models.generate_content(
+            model=GEN_MODEL,
+            contents=_tool_prompt(question, tool_name, result),
+            config=types.GenerateContentConfig(**_ANSWER_CONFIG),
+        ), GEN_MODEL), rec)
+    return _tool_answer(question, tool_name, result, resp)
+
+
+async def answer_from_tool_async(question, tool_name, tool_args):
+    try:
+        with span("tool_call", tool=tool_name):
+            result = await asyncio.to_thread(call_tool, tool_name,
+                                             tool_args or {})
+    except (LookupError, ValueError, TypeError, KeyError) as e:
+        return _tool_failed(question, tool_name, e)
+
+    with span("generate", route="tool", model=GEN_MODEL) as rec:
+        resp = usage(await awith_retry(
+            lambda: client().aio.models.generate_content(
+                model=GEN_MODEL,
+                contents=_tool_prompt(question, tool_name, result),
+                config=types.GenerateContentConfig(**_ANSWER_CONFIG),
+            ), GEN_MODEL), rec)
+    return _tool_answer(question, tool_name, result, resp)
+
+
+def _log_route(a):
+    print(f"[route: {a.route}"
+          + (f" -> {a.tool_name}" if a.tool_name else "")
+          + f"] {a.router_reason}")
+
+
+def _cached(question, hits):
+    """A stored corpus answer for this question and this grounding, or None."""
+    from .answer_cache import cache, prompt_version
+    from .retriever import _query_vector
+
+    hit = cache().lookup(question, _query_vector(question), hits,
+                         prompt_version(ANSWER_PROMPT))
+    if hit is None:
+        return None
+    a = Answer(**hit)
+    a.question = question
+    a.cached = True
+    return a
+
+
+def _remember(question, hits, a):
+    # Corpus route only. A tool answer is one customer's record on one day and
+    # must never be replayed to anyone else.
+    if a.route != "corpus" or not hits:
+        return
+    from .answer_cache import cache, prompt_version
+    from .retriever import _query_vector
+
+    cache().store(question, _query_vector(question), hits,
+                  prompt_version(ANSWER_PROMPT), asdict(a))
+
+
+def ask(question, verbose=False, use_cache=True):
+    with request(question) as rec:
+        a = _ask(question, verbose, use_cache)
+        rec.update(route=a.route, cached=a.cached, refused=a.refused)
+    return a
+
+
+def _ask(question, verbose, use_cache):
+    # The router always runs first. A cached answer is only ever a corpus
+    # answer, so a record or date question must not be able to reach one
+    # before the router has sent it to the tools.
     decision = route(question)
     if decision.get("route") == "tool" and decision.get("tool_name"):
         a = answer_from_tool(question, decision["tool_name"],
                              decision.get("tool_args") or {})
     else:
-        a = answer_from_corpus(question)
+        hits = a = None
+        if use_cache:
+            hits = retrieve(question)
+            a = _cached(question, hits)
+        if a is None:
+            a = answer_from_corpus(question, hits=hits)
+            if use_cache:
+                _remember(question, hits, a)
     a.router_reason = decision.get("reason", "")
     if verbose:
-        print(f"[route: {a.route}"
-              + (f" -> {a.tool_name}" if a.tool_name else "")
-              + f"] {a.router_reason}")
+        _log_route(a)
+    return a
+
+
+async def ask_async(question, verbose=False, use_cache=True):
+    """ask() for the event loop, with routing and retrieval run concurrently.
+
+    Retrieval costs no generation quota (cached embeddings, local
+    cross-encoder), so it is started before the router has decided, with or
+    without the answer cache. On the tool route its result is simply
+    discarded; on the corpus route it is both the grounding and the cache key.
+    """
+    with request(question) as rec:
+        a = await _ask_async(question, verbose, use_cache)
+        rec.update(route=a.route, cached=a.cached, refused=a.refused)
     return a
 
 
+def _discard(task):
+    task.cancel()
+    # Retrieve (and drop) any error from the discarded retrieval, so it is
+    # not reported as an exception nobody awaited.
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _ask_async(question, verbose, use_cache):
+    speculative = asyncio.create_task(
+        asyncio.to_thread(retrieve, question))
+    try:
+        decision = await route_async(question)
+    except BaseException:
+        _discard(speculative)
+        raise
+    if decision.get("route") == "tool" and decision.get("tool_name"):
+        _discard(speculative)
+        a = await answer_from_tool_async(question, decision["tool_name"],
+                                         decision.get("tool_args") or {})
+    else:
+        hits = await speculative
+        a = None
+        if use_cache:
+            a = await asyncio.to_thread(_cached, question, hits)
+        if a is None:
+            a = await answer_from_corpus_async(question, hits=hits)
+            if use_cache:
+                await asyncio.to_thread(_remember, question, hits, a)
+    a.router_reason = decision.get("reason", "")
+    if verbose:
+        _log_route(a)
+    return a
+
+
+async def ask_many(questions, concurrency=4):
+    """Answer many questions with at most `concurrency` in flight.
+
+    Returns answers in question order. The shared limiter keeps the total call
+    rate inside LIMITS whatever `concurrency` is set to; concurrency only
+    decides how much waiting overlaps.
+    """
+    gate = asyncio.Semaphore(concurrency)
+    # Load the cross-encoder once up front. Otherwise the first `concurrency`
+    # questions all queue behind the same model load.
+    await asyncio.to_thread(warm_up)
+
+    async def one(q):
+        async with gate:
+            return await ask_async(q)
+
+    return await asyncio.gather(*(one(q) for q in questions))
+
+
 def main():
     import sys
     try:
@@ -233,16 +444,21 @@ def main():
         "How many meals do we need to cook on 27 August?",
         "What is your bank account number?",
     ]
+    warm_up()
     for q in questions:
         a = ask(q)
         print("=" * 74)
         print(f"Q: {q}")
         print(f"   route: {a.route}" + (f" -> {a.tool_name}" if a.tool_name else "")
-              + (f"   [REFUSED]" if a.refused else ""))
+              + (f"   [REFUSED]" if a.refused else "")
+              + ("   [cached]" if a.cached else ""))
         print(f"A: {a.text}")
         print(f"   cited: {', '.join(a.citations) if a.citations else '(none)'}")
         print()
 
+    from .answer_cache import report
+    print(report())
+
 
 if __name__ == "__main__":
     main()
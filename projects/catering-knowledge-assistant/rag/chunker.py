@@ -13,8 +13,13 @@ corpus:
 
 Every chunk keeps its frontmatter metadata so the retriever can filter on
 doc_type, category and authority at the vector store level.
+
+Every chunk also carries a content_hash over all of its fields. chunks.json is
+therefore a manifest as well as the chunk list: the indexer diffs it against
+the hashes already stored in Qdrant and touches only the chunks that changed.
 """
 
+import hashlib
 import json
 import re
 from dataclasses import dataclass, asdict, field
@@ -36,6 +41,19 @@ class Chunk:
     text: str
     restates: str = ""      # doc_id of the binding document this chunk restates
     meta: dict = field(default_factory=dict)
+    content_hash: str = ""  # hash of every field above, see content_hash()
+
+
+def content_hash(chunk):
+    """Stable hash of a chunk's content and metadata, as a dict or a Chunk.
+
+    Covers the payload as well as the text, so a changed authority or heading
+    is re-indexed too, not only changed prose.
+    """
+    d = dict(chunk) if isinstance(chunk, dict) else asdict(chunk)
+    d.pop("content_hash", None)
+    raw = json.dumps(d, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
 
 
 def _split_on(pattern, body):
@@ -163,6 +181,8 @@ def build_chunks():
                 restates=restates,
                 meta=carried,
             ))
+    for c in chunks:
+        c.content_hash = content_hash(c)
     return chunks
 
 
@@ -9,7 +9,9 @@ CORPUS_DIR = ROOT / "corpus"
 DB_PATH = ROOT / "tasty_kitchen.db"
 QDRANT_PATH = ROOT / "qdrant_store"
 CHUNKS_JSON = ROOT / "chunks.json"
-EMBED_CACHE = ROOT / ".embed_cache.json"
+EMBED_STORE = ROOT / ".embed_cache.sqlite"
+EMBED_CACHE = ROOT / ".embed_cache.json"   # legacy, migrated into EMBED_STORE
+TRACE_FILE = ROOT / "trace.jsonl"           # per-stage timings when RAG_TRACE=1
 
 COLLECTION = "tasty_kitchen_corpus"
 
@@ -18,6 +20,13 @@ COLLECTION = "tasty_kitchen_corpus"
 # server additionally makes payload indexes real rather than a no-op.
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
 
+# Which engine answers retriever.search: "qdrant" (server or embedded, above) or
+# "numpy", an in-process exact search over a memory-mapped matrix with
+# precomputed filter bitmaps. At this corpus size the NumPy engine starts and
+# answers faster; see rag/npstore.py and `python -m rag.npstore bench`.
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "qdrant")
+NPSTORE_PATH = ROOT / "np_store"
+
 
 def qdrant_client():
     """Return a Qdrant client, preferring the server when it is reachable."""
@@ -54,6 +63,20 @@ ROUTER_MODEL = os.environ.get("ROUTER_MODEL", "gemini-2.5-flash-lite")
 # Local cross-encoder. Runs on CPU, no API cost, genuine second-stage rerank.
 RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
+# How the cross-encoder runs: "torch" (sentence-transformers, fp32) or "onnx",
+# the same model exported to ONNX and int8 dynamically quantised, run by ONNX
+# Runtime. The int8 model loads and scores faster on CPU; `python -m
+# rag.evaluate rerank-backends` checks it still ranks like fp32. Exported once
+# into ONNX_MODEL_DIR. RERANK_THREADS caps intra-op threads, 0 = runtime default.
+RERANK_BACKEND = os.environ.get("RERANK_BACKEND", "torch")
+RERANK_THREADS = int(os.environ.get("RERANK_THREADS", "0"))
+ONNX_MODEL_DIR = ROOT / "onnx_model"
+
+# Cross-encoder scores are cached on disk, keyed by query, chunk_id and a hash
+# of the chunk text, and bounded least recently used. See rag/score_cache.py.
+RERANK_CACHE = ROOT / ".rerank_cache.sqlite"
+RERANK_CACHE_MAX = 200_000
+
 TOP_K_VECTOR = 12        # candidates pulled from the vector store
 TOP_K_RERANK = 4         # survivors passed to the generator
 MIN_RERANK_SCORE = -6.0  # below this, treat as "nothing relevant retrieved"
@@ -66,6 +89,13 @@ MIN_RERANK_SCORE = -6.0  # below this, treat as "nothing relevant retrieved"
 # Swept on the labelled set, see the table in retriever.py.
 RELEVANCE_FLOOR = 2.0
 
+# Semantic answer cache on the corpus route, see rag/answer_cache.py. A cached
+# answer is reused only above this query-embedding cosine AND with the same
+# dates and entities AND an identical retrieved chunk set, so this can sit
+# high: it only has to admit rephrasings.
+ANSWER_CACHE = ROOT / ".answer_cache.sqlite"
+ANSWER_CACHE_MIN_SIM = 0.93
+
 BUSINESS_NAME = "好吃厨房 Tasty Kitchen"
 
 
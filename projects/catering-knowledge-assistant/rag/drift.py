@@ -11,21 +11,21 @@ refund policy flips, a third delivery area appears), then asks the matching
 question and checks which document the retrieval follows.
 
 The drifted text is never written to corpus/. It is embedded and upserted into a
-SEPARATE Qdrant collection built for the run and dropped afterwards, so the
-shipped corpus and its hash stay clean.
+SEPARATE Qdrant collection, so the shipped corpus and its hash stay clean. That
+collection is kept between runs and synced incrementally like the main one, so
+after the first run only the drifted chunks (or chunks edited since) are
+written, rather than the whole corpus being cloned every time.
 
     python -m rag.drift              # run against the current ranking rule
     python -m rag.drift --baseline   # also run with authority disabled
+    python -m rag.drift --drop       # delete the drift collection afterwards
 """
 
 import json
 import sys
 
-from qdrant_client.models import Distance, VectorParams, PointStruct
-
 from .config import (
-    COLLECTION, CHUNKS_JSON, EMBED_DIM, TOP_K_VECTOR, TOP_K_RERANK,
-    load_api_key,
+    COLLECTION, CHUNKS_JSON, TOP_K_VECTOR, TOP_K_RERANK, load_api_key,
 )
 from . import retriever as R
 
@@ -39,9 +39,10 @@ def load_drift():
 
 
 def build_drift_collection(cases):
-    """Clone the corpus with the drifted FAQ chunks swapped in."""
+    """Sync the drift collection to the corpus with the drifted FAQ chunks swapped in."""
     from google import genai
-    from .index import embed
+    from .chunker import content_hash
+    from .index import sync
 
     chunks = json.loads(open(CHUNKS_JSON, encoding="utf-8").read())
     by_id = {c["chunk_id"]: c for c in chunks}
@@ -57,26 +58,36 @@ def build_drift_collection(cases):
                 "The corpus changed; update drift_set.json.")
         c = dict(c)
         c["text"] = c["text"].replace(case["find"], case["replace"])
+        c["content_hash"] = content_hash(c)
         by_id[case["chunk_id"]] = c
         changed.append(c)
 
     corpus = list(by_id.values())
     client = genai.Client(api_key=load_api_key())
-    # Only the drifted chunks are new; everything else is served from the cache.
-    vectors = embed(client, [c["text"] for c in corpus], "RETRIEVAL_DOCUMENT")
+
+    if R.VECTOR_BACKEND == "numpy":
+        # In-process engine, no client to share and no folder lock to respect.
+        from . import npstore
+        npstore.sync(DRIFT_COLLECTION, corpus, client)
+        return None, len(changed)
 
     # Reuse the retriever's client. Local Qdrant permits one client per storage
     # folder, so opening a second here deadlocks against the one search() uses.
     qc = R._store()
+    # Only chunks whose hash differs from what the drift collection holds are
+    # embedded and upserted; on a repeat run that is nothing at all.
+    sync(qc, DRIFT_COLLECTION, corpus, client, mode=R.store_mode())
+    return qc, len(changed)
+
+
+def drop_drift_collection():
+    if R.VECTOR_BACKEND == "numpy":
+        from . import npstore
+        npstore.drop(DRIFT_COLLECTION)
+        return
+    qc = R._store()
     if qc.collection_exists(DRIFT_COLLECTION):
         qc.delete_collection(DRIFT_COLLECTION)
-    qc.create_collection(
-        DRIFT_COLLECTION,
-        vectors_config=VectorParams(size=EMBED_DIM, distance=Distance.COSINE))
-    qc.upsert(DRIFT_COLLECTION, points=[
-        PointStruct(id=i, vector=vectors[i], payload=corpus[i])
-        for i in range(len(corpus))])
-    return qc, len(changed)
 
 
 def run(authority_aware=True):
@@ -88,10 +99,11 @@ def run(authority_aware=True):
     R.COLLECTION = DRIFT_COLLECTION
     rows = []
     try:
-        for case in cases:
-            hits = R.search(case["question"], k=TOP_K_VECTOR)
-            ranked = R.rerank(case["question"], hits, k=TOP_K_RERANK,
-                              authority_aware=authority_aware)
+        questions = [case["question"] for case in cases]
+        pools = R.search_many(questions, k=TOP_K_VECTOR)
+        rankeds = R.rerank_many(questions, pools, k=TOP_K_RERANK,
+                                authority_aware=authority_aware)
+        for case, ranked in zip(cases, rankeds):
             top = ranked[0] if ranked else None
             docs = [h.doc_id for h in ranked]
             rows.append({
@@ -107,7 +119,6 @@ def run(authority_aware=True):
             })
     finally:
         R.COLLECTION = original
-        qc.delete_collection(DRIFT_COLLECTION)
     return rows, n_changed
 
 
@@ -141,6 +152,12 @@ def main():
                 print(f"\n  {r['id']} would answer from the stale FAQ: "
                       f"\"{r['stale_fact']}\" instead of \"{r['binding_fact']}\"")
 
+    if "--drop" in sys.argv:
+        drop_drift_collection()
+
+    from .score_cache import report
+    print(f"\n{report()}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+"""
+Keyed on-disk embedding store.
+
+The first cache was one JSON dict, reloaded and rewritten whole on every
+embed() call, including every single-query embed_query. At 128 chunks plus
+every query ever asked it had reached 1.8 MB, so cold start and per-query cost
+grew with the number of vectors cached, and two builders running at once
+overwrote each other's additions.
+
+This replaces it with a SQLite table, one row per vector:
+
+  lookup    by primary key, so fetching n vectors costs n index probes no
+            matter how many are stored
+  writes    append-only, INSERT OR IGNORE of the new vectors only. A vector is
+            a pure function of its key (model, dimension, task type, text), so
+            two writers racing on the same key store the same bytes and the
+            loser is simply ignored
+  readers   WAL journal, so readers never block on a writer and never see a
+            half-written batch
+  vectors   raw float32 bytes, 3 KB per 768-dim vector rather than ~16 KB of
+            JSON text
+
+Append-only means keys nobody asks for any more (old chunk text, one-off
+queries) accumulate. `compact` drops them and rewrites the file.
+
+    python -m rag.embed_store stats
+    python -m rag.embed_store compact           # keep current chunks only
+    python -m rag.embed_store compact --queries # also keep cached queries
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+from .config import EMBED_STORE, EMBED_CACHE, EMBED_DIM
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key        TEXT PRIMARY KEY,
+    task_type  TEXT NOT NULL,
+    dim        INTEGER NOT NULL,
+    vector     BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite caps bound parameters per statement; stay well under the old 999.
+_IN_BATCH = 500
+
+
+class EmbedStore:
+    """Append-only key -> float32 vector store on a single SQLite file."""
+
+    def __init__(self, path=EMBED_STORE):
+        self.path = path
+        # One connection per store, shared across threads behind a lock. The
+        # async serving path calls embed() from worker threads.
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=30,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def get_many(self, keys):
+        """Return {key: vector} for whichever of `keys` are stored."""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(keys), _IN_BATCH):
+                part = keys[start:start + _IN_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT key, dim, vector FROM embeddings "
+                    f"WHERE key IN ({marks})", part).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+        return found
+
+    def put_many(self, items, task_type):
+        """Append (key, vector) pairs. Keys already present are left alone."""
+        rows = []
+        for key, vec in items:
+            arr = np.asarray(vec, dtype=np.float32)
+            rows.append((key, task_type, int(arr.shape[0]), arr.tobytes()))
+        if not rows:
+            return 0
+        with self._lock, self._db:
+            cur = self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings VALUES (?,?,?,?)", rows)
+        return cur.rowcount
+
+    def count(self, task_type=None):
+        with self._lock:
+            if task_type:
+                return self._db.execute(
+                    "SELECT COUNT(*) FROM embeddings WHERE task_type=?",
+                    (task_type,)).fetchone()[0]
+            return self._db.execute(
+                "SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def compact(self, keep):
+        """Delete every key not in `keep`, then rewrite the file. Returns rows dropped."""
+        keep = set(keep)
+        with self._lock:
+            stored = [k for (k,) in self._db.execute(
+                "SELECT key FROM embeddings")]
+            drop = [k for k in stored if k not in keep]
+            with self._db:
+                self._db.executemany("DELETE FROM embeddings WHERE key=?",
+                                     [(k,) for k in drop])
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._db.execute("VACUUM")
+        return len(drop)
+
+    def import_json(self, path=EMBED_CACHE):
+        """One-off migration from the legacy JSON cache. Returns rows added.
+
+        The JSON kept no task type, only the hashed key, so rows arrive tagged
+        "legacy". They still hit, because lookup is by key alone.
+        """
+        if not path.exists():
+            return 0
+        legacy = json.loads(path.read_text(encoding="utf-8"))
+        return self.put_many(legacy.items(), "legacy")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """Process-wide store, migrating the legacy JSON cache on first open."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            fresh = not EMBED_STORE.exists()
+            _store = EmbedStore()
+            if fresh and EMBED_CACHE.exists():
+                n = _store.import_json()
+                print(f"  migrated {n} vectors from {EMBED_CACHE.name} "
+                      f"to {EMBED_STORE.name}")
+    return _store
+
+
+def _live_keys(with_queries=False):
+    """Keys still referenced by chunks.json (and optionally the query cache)."""
+    from .config import CHUNKS_JSON
+    from .index import _key
+
+    chunks = json.loads(CHUNKS_JSON.read_text(encoding="utf-8"))
+    keep = {_key(c["text"], "RETRIEVAL_DOCUMENT") for c in chunks}
+    if with_queries:
+        with store()._lock:
+            keep |= {k for (k,) in store()._db.execute(
+                "SELECT key FROM embeddings WHERE task_type IN "
+                "('RETRIEVAL_QUERY', 'legacy')")}
+    return keep
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    s = store()
+    if cmd == "stats":
+        size = EMBED_STORE.stat().st_size if EMBED_STORE.exists() else 0
+        print(f"{EMBED_STORE.name}: {s.count()} vectors, "
+              f"{size / 1024:.0f} KB on disk")
+        for t in ("RETRIEVAL_DOCUMENT", "RETRIEVAL_QUERY", "legacy"):
+            print(f"  {t:<20} {s.count(t)}")
+        print(f"  expected dimension {EMBED_DIM}")
+    elif cmd == "compact":
+        before = s.count()
+        dropped = s.compact(_live_keys(with_queries="--queries" in sys.argv))
+        print(f"compacted {EMBED_STORE.name}: {before} -> {before - dropped} "
+              f"vectors ({dropped} dropped)")
+    else:
+        raise SystemExit(f"unknown command '{cmd}', use stats or compact")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,17 +12,27 @@ Two passes, because they answer different questions and cost different amounts.
              correctly, and refuse when it should? Costs one generation call
              per question.
 
+  cache      Does the answer cache serve rephrasings and only rephrasings?
+             end2end bypasses the cache, so this pass measures it on its own:
+             pairs asked back to back against a scratch cache.
+
 Run:  python -m rag.evaluate retrieval
       python -m rag.evaluate end2end
+      python -m rag.evaluate end2end --concurrency 4
+      python -m rag.evaluate cache      # answer cache hits and false hits
       python -m rag.evaluate all
+      python -m rag.evaluate rerank-backends   # int8 ONNX vs fp32 reranker
+      python -m rag.evaluate trace      # summarise a RAG_TRACE=1 run
 """
 
+import asyncio
 import json
 import sys
+import time
 from collections import defaultdict
 from pathlib import Path
 
-from .retriever import search, rerank
+from .retriever import search_many, score_many, rerank_many
 from .config import TOP_K_VECTOR, TOP_K_RERANK
 
 EVAL_SET = Path(__file__).parent / "eval_set.json"
@@ -44,15 +54,20 @@ def eval_retrieval():
              if c["route"] == "corpus" and c.get("gold_docs")]
     rows = []
 
-    for c in cases:
+    # Every question goes through each stage together: one embed request, one
+    # Qdrant batch query, one cross-encoder pass. Three configurations are then
+    # ordered from the same scored candidate pools, so the comparison isolates
+    # what each stage contributes and the cross-encoder runs once, not twice.
+    questions = [c["question"] for c in cases]
+    pools = search_many(questions, k=TOP_K_VECTOR)
+    score_many(questions, pools)
+    plains = rerank_many(questions, [list(p) for p in pools], k=TOP_K_RERANK,
+                         authority_aware=False, scored=True)
+    rankeds = rerank_many(questions, [list(p) for p in pools], k=TOP_K_RERANK,
+                          authority_aware=True, scored=True)
+
+    for c, cands, plain, ranked in zip(cases, pools, plains, rankeds):
         gold = set(c["gold_docs"])
-        cands = search(c["question"], k=TOP_K_VECTOR)
-        # Three configurations scored on the same candidate pool, so the
-        # comparison isolates what each stage contributes.
-        plain = rerank(c["question"], list(cands), k=TOP_K_RERANK,
-                       authority_aware=False)
-        ranked = rerank(c["question"], list(cands), k=TOP_K_RERANK,
-                        authority_aware=True)
 
         # Hit at k: did any gold document survive into the final context?
         vec_topk = cands[:TOP_K_RERANK]
@@ -201,12 +216,197 @@ def eval_retrieval():
     for tag, (h, t) in sorted(by_tag.items(), key=lambda kv: kv[1][0] / kv[1][1]):
         print(f"  {tag:<26} {h}/{t}  {_pct(h, t)}")
 
+    from .score_cache import report
+    print(f"\n{report()}")
+
     return rows
 
 
+# -------------------------------------------------------- rerank backends ----
+
+# How far the int8 ONNX reranker may fall below fp32 before it is rejected.
+# Authority@1 is over roughly twenty questions, so 0.05 allows one flip.
+RERANK_TOLERANCE = {"authority@1": 0.05, "precision@k": 0.02}
+
+
+def _rank_quality(cases, rankeds):
+    auth = [(c, r) for c, r in zip(cases, rankeds) if c.get("top_doc")]
+    prec = sum(sum(h.doc_id in set(c["gold_docs"]) for h in r) / max(1, len(r))
+               for c, r in zip(cases, rankeds)) / max(1, len(cases))
+    top1 = sum(bool(r) and r[0].doc_id in set(c["top_doc"])
+               for c, r in auth) / max(1, len(auth))
+    return {"authority@1": top1, "precision@k": prec}
+
+
+def compare_rerank_backends(repeats=3):
+    """Int8 ONNX cross-encoder against fp32: same ranking, and how much faster.
+
+    Both backends score the same candidate pools directly, bypassing the score
+    cache, so the timings are model time and the rankings are each model's own.
+    Cold start is the first load in this process, so the second backend's
+    figure excludes imports the first one already paid for (tokenizers,
+    transformers); read it as a lower bound on the gap.
+    """
+    from dataclasses import replace
+    from . import retriever as R
+
+    cases = [c for c in load_set()
+             if c["route"] == "corpus" and c.get("gold_docs")]
+    questions = [c["question"] for c in cases]
+    pools = search_many(questions, k=TOP_K_VECTOR)
+    pairs = [(q, h.text) for q, pool in zip(questions, pools) for h in pool]
+
+    original = R.RERANK_BACKEND
+    res = {}
+    try:
+        for backend in ("torch", "onnx"):
+            R.RERANK_BACKEND = backend
+            t0 = time.perf_counter()
+            R.warm_up()
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                scores = R._score(pairs)
+            per_pair = (time.perf_counter() - t0) / (repeats * len(pairs))
+
+            it = iter(scores)
+            mine = [[replace(h) for h in pool] for pool in pools]
+            for pool in mine:
+                for h in pool:
+                    h.rerank_score = h.final_score = next(it)
+            rankeds = rerank_many(questions, mine, k=TOP_K_RERANK,
+                                  authority_aware=True, scored=True)
+            res[backend] = {"cold_s": cold, "per_pair_ms": per_pair * 1e3,
+                            "scores": scores,
+                            "order": [[h.chunk_id for h in r] for r in rankeds],
+                            **_rank_quality(cases, rankeds)}
+    finally:
+        R.RERANK_BACKEND = original
+
+    fp, q8 = res["torch"], res["onnx"]
+    same = sum(a == b for a, b in zip(fp["order"], q8["order"]))
+    drift = max((abs(a - b) for a, b in zip(fp["scores"], q8["scores"])),
+                default=0.0)
+
+    print(f"RERANK BACKENDS, {len(cases)} questions, {len(pairs)} pairs, "
+          f"x{repeats}\n")
+    print(f"{'':<28}{'fp32 torch':>13}{'int8 ONNX':>13}{'change':>11}")
+    print("-" * 65)
+    print(f"{'cold start, s':<28}{fp['cold_s']:>13.2f}{q8['cold_s']:>13.2f}"
+          f"{fp['cold_s'] / max(q8['cold_s'], 1e-9):>10.1f}x")
+    print(f"{'per pair, ms':<28}{fp['per_pair_ms']:>13.3f}"
+          f"{q8['per_pair_ms']:>13.3f}"
+          f"{fp['per_pair_ms'] / max(q8['per_pair_ms'], 1e-9):>10.1f}x")
+    failed = []
+    for metric, tol in RERANK_TOLERANCE.items():
+        delta = q8[metric] - fp[metric]
+        ok = delta >= -tol
+        if not ok:
+            failed.append(metric)
+        print(f"{metric:<28}{fp[metric]:>12.1%}{q8[metric]:>13.1%}"
+              f"{delta * 100:>+10.1f}pt  {'ok' if ok else 'FAIL'}")
+    print(f"\nidentical top-{TOP_K_RERANK} order on {same} of {len(cases)} "
+          f"questions, largest score change {drift:.3f}")
+    print("tolerance: " + ", ".join(
+        f"{m} -{t:.0%}" for m, t in RERANK_TOLERANCE.items()))
+    if failed:
+        print(f"\nint8 ONNX reranker REJECTED on {', '.join(failed)}; "
+              "keep RERANK_BACKEND=torch")
+    else:
+        print("\nint8 ONNX reranker within tolerance of fp32")
+
+    summary = {b: {k: v for k, v in r.items() if k not in ("scores", "order")}
+               for b, r in res.items()}
+    summary.update(identical_order=same, max_score_change=drift,
+                   within_tolerance=not failed)
+    return summary
+
+
 # ---------------------------------------------------------------- end2end ----
 
-def eval_end2end():
+def _score_answer(c, a):
+    """Score one assistant answer against its labelled case. Returns the row."""
+    low = a.text.lower()
+
+    route_ok = a.route == c["route"]
+    tool_ok = (a.tool_name == c["tool"]) if c.get("tool") else None
+
+    # Scored in BOTH directions. Guarding this on expect_refusal made
+    # over-refusal invisible: an assistant that refused every question
+    # scored 100% here, because the cases it got wrong were the ones the
+    # check skipped. Refusing too much is as much a failure as refusing
+    # too little, so every question is scored.
+    expect_refusal = c.get("expect_refusal", False)
+    refusal_ok = (a.refused == expect_refusal)
+
+    want = [s.lower() for s in c.get("must_contain", [])]
+    contains_ok = all(w in low for w in want) if want else None
+    banned = [s.lower() for s in c.get("must_not_contain", [])]
+    clean_ok = (not any(b in low for b in banned)) if banned else None
+
+    gold = set(c.get("gold_docs", []))
+    if c["route"] == "tool":
+        cite_ok = a.citations == [f"database:{c['tool']}"] if c.get("tool") else None
+    elif gold:
+        cited_docs = {cc.split("#")[0].strip() for cc in a.citations}
+        cite_ok = bool(cited_docs & gold) if a.citations else False
+    else:
+        cite_ok = None
+
+    checks = [x for x in (route_ok, tool_ok, refusal_ok, contains_ok,
+                          clean_ok, cite_ok) if x is not None]
+    passed = all(checks)
+
+    return {
+        "id": c["id"], "tag": c["tag"], "question": c["question"],
+        "route_expected": c["route"], "route_actual": a.route,
+        "tool_expected": c.get("tool", ""), "tool_actual": a.tool_name,
+        "route_ok": route_ok, "tool_ok": tool_ok, "refusal_ok": refusal_ok,
+        "refusal_expected": expect_refusal, "refused_actual": a.refused,
+        "contains_ok": contains_ok, "clean_ok": clean_ok,
+        "cite_ok": cite_ok, "passed": passed,
+        "answer": a.text, "citations": a.citations,
+    }
+
+
+async def _run_concurrent(todo, concurrency):
+    """Score `todo` with at most `concurrency` questions in flight.
+
+    Same stop-cleanly rule as the sequential sweep: the first failure (usually
+    the daily quota) stops any question not yet started, and everything that
+    did finish is kept. Rows come back in eval-set order.
+    """
+    from .assistant import ask_async
+
+    gate = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    results, aborted, finished = {}, [], [0]
+
+    async def one(i, c):
+        async with gate:
+            if stop.is_set():
+                return
+            try:
+                a = await ask_async(c["question"], use_cache=False)
+            except Exception as e:
+                if not aborted:
+                    aborted.append(f"{type(e).__name__} at {c['id']} "
+                                   f"({i}/{len(todo)}): {e}")
+                    print(f"\n  stopped early: {aborted[0]}")
+                stop.set()
+                return
+            results[c["id"]] = row = _score_answer(c, a)
+            finished[0] += 1
+            flag = "pass" if row["passed"] else "FAIL"
+            print(f"  [{finished[0]:2}/{len(todo)}] {c['id']} {flag}  "
+                  f"{c['question'][:54]}")
+
+    await asyncio.gather(*(one(i, c) for i, c in enumerate(todo, 1)))
+    return ([results[c["id"]] for c in todo if c["id"] in results],
+            aborted[0] if aborted else None)
+
+
+def eval_end2end(concurrency=1):
     from .assistant import ask
 
     cases = load_set()
@@ -216,6 +416,8 @@ def eval_end2end():
     # in one day. Previously scored questions are carried forward and skipped,
     # so running this on consecutive days accumulates a complete set instead of
     # restarting at Q01 and burning the day's quota on the same first ten.
+    # The answer cache is bypassed: each question is scored on a fresh route
+    # and generation, so the figures measure the assistant, not its memory.
     rows, done = [], set()
     if RESULTS.exists():
         try:
@@ -235,60 +437,28 @@ def eval_end2end():
     print("(rate limited to the Gemini free tier, this takes a few minutes)\n")
 
     aborted = None
-    for i, c in enumerate(todo, 1):
-        # The free-tier daily cap can land mid-run. Losing 40 scored questions
-        # because the 41st was throttled is worse than reporting a partial run,
-        # so the sweep stops cleanly here and whatever was scored is kept and
-        # labelled. Re-running later tops it up.
-        try:
-            a = ask(c["question"])
-        except Exception as e:
-            aborted = f"{type(e).__name__} at {c['id']} ({i}/{len(todo)}): {e}"
-            print(f"\n  stopped early: {aborted}")
-            break
-        low = a.text.lower()
-
-        route_ok = a.route == c["route"]
-        tool_ok = (a.tool_name == c["tool"]) if c.get("tool") else None
-
-        # Scored in BOTH directions. Guarding this on expect_refusal made
-        # over-refusal invisible: an assistant that refused every question
-        # scored 100% here, because the cases it got wrong were the ones the
-        # check skipped. Refusing too much is as much a failure as refusing
-        # too little, so every question is scored.
-        expect_refusal = c.get("expect_refusal", False)
-        refusal_ok = (a.refused == expect_refusal)
-
-        want = [s.lower() for s in c.get("must_contain", [])]
-        contains_ok = all(w in low for w in want) if want else None
-        banned = [s.lower() for s in c.get("must_not_contain", [])]
-        clean_ok = (not any(b in low for b in banned)) if banned else None
-
-        gold = set(c.get("gold_docs", []))
-        if c["route"] == "tool":
-            cite_ok = a.citations == [f"database:{c['tool']}"] if c.get("tool") else None
-        elif gold:
-            cited_docs = {cc.split("#")[0].strip() for cc in a.citations}
-            cite_ok = bool(cited_docs & gold) if a.citations else False
-        else:
-            cite_ok = None
-
-        checks = [x for x in (route_ok, tool_ok, refusal_ok, contains_ok,
-                              clean_ok, cite_ok) if x is not None]
-        passed = all(checks)
-
-        rows.append({
-            "id": c["id"], "tag": c["tag"], "question": c["question"],
-            "route_expected": c["route"], "route_actual": a.route,
-            "tool_expected": c.get("tool", ""), "tool_actual": a.tool_name,
-            "route_ok": route_ok, "tool_ok": tool_ok, "refusal_ok": refusal_ok,
-            "refusal_expected": expect_refusal, "refused_actual": a.refused,
-            "contains_ok": contains_ok, "clean_ok": clean_ok,
-            "cite_ok": cite_ok, "passed": passed,
-            "answer": a.text, "citations": a.citations,
-        })
-        flag = "pass" if passed else "FAIL"
-        print(f"  [{i:2}/{len(todo)}] {c['id']} {flag}  {c['question'][:54]}")
+    if concurrency > 1:
+        print(f"running up to {concurrency} questions concurrently\n")
+        scored, aborted = asyncio.run(_run_concurrent(todo, concurrency))
+        rows.extend(scored)
+    else:
+        for i, c in enumerate(todo, 1):
+            # The free-tier daily cap can land mid-run. Losing 40 scored
+            # questions because the 41st was throttled is worse than reporting
+            # a partial run, so the sweep stops cleanly here and whatever was
+            # scored is kept and labelled. Re-running later tops it up.
+            try:
+                a = ask(c["question"], use_cache=False)
+            except Exception as e:
+                aborted = (f"{type(e).__name__} at {c['id']} "
+                           f"({i}/{len(todo)}): {e}")
+                print(f"\n  stopped early: {aborted}")
+                break
+            row = _score_answer(c, a)
+            rows.append(row)
+            flag = "pass" if row["passed"] else "FAIL"
+            print(f"  [{i:2}/{len(todo)}] {c['id']} {flag}  "
+                  f"{c['question'][:54]}")
 
     n = len(rows)
     if n < total:
@@ -346,12 +516,139 @@ def eval_end2end():
     return rows
 
 
+# ----------------------------------------------------------------- cache ----
+
+# (first, second, should the second be served from the first's answer).
+# Paraphrases should hit. Date and entity variants embed almost identically
+# and often retrieve the same chunks, and must never hit.
+CACHE_PAIRS = [
+    ("Can I pause my subscription?",
+     "Is it possible to pause my subscription?", True),
+    ("Do you deliver to Puchong?", "Do you do deliveries to Puchong?", True),
+    ("Do you have halal food?", "Is your food halal?", True),
+    ("How much is brown rice?", "What does brown rice cost?", True),
+    ("Do you deliver on 1 September?", "Do you deliver on the 1st of September?",
+     True),
+    ("Do you deliver on 1 September?", "Do you deliver on 31 August?", False),
+    ("Are you open on 31 August 2026?", "Are you open on 16 September 2026?",
+     False),
+    ("Do you deliver on Monday?", "Do you deliver on Saturday?", False),
+    ("Do you deliver to Puchong?", "Do you deliver to Klang?", False),
+    ("do you deliver to puchong", "do you deliver to klang", False),
+    ("How much is brown rice?", "How much is white rice?", False),
+    ("How much is the lunch set?", "How much is the dinner set?", False),
+]
+
+
+def eval_cache():
+    """Ask each pair through ask() with the cache on, against a scratch cache.
+
+    A false hit is a variant answered from its partner's entry, which is the
+    failure that matters: a customer told the 1 September answer for 31
+    August. A missed paraphrase only costs a generation call.
+    """
+    import tempfile
+
+    from . import answer_cache
+    from .assistant import ask
+
+    print(f"ANSWER CACHE EVALUATION, {len(CACHE_PAIRS)} pairs\n")
+    rows = []
+    previous = answer_cache._cache
+    with tempfile.TemporaryDirectory() as tmp:
+        answer_cache._cache = answer_cache.AnswerCache(
+            path=Path(tmp) / "answers.sqlite")
+        try:
+            for first, second, expect_hit in CACHE_PAIRS:
+                a1 = ask(first)
+                a2 = ask(second)
+                hit = a2.cached
+                ok = hit == expect_hit
+                rows.append({"first": first, "second": second,
+                             "route": a2.route, "expect_hit": expect_hit,
+                             "hit": hit, "passed": ok,
+                             "same_docs": a1.doc_ids == a2.doc_ids})
+                flag = "pass" if ok else "FAIL"
+                print(f"  {flag}  {'hit ' if hit else 'miss'}  "
+                      f"{first[:32]:<32} -> {second[:32]}")
+        finally:
+            answer_cache._cache._db.close()
+            answer_cache._cache = previous
+
+    para = [r for r in rows if r["expect_hit"]]
+    variants = [r for r in rows if not r["expect_hit"]]
+    hits = sum(r["hit"] for r in para)
+    false_hits = [r for r in variants if r["hit"]]
+    print(f"\n{'metric':<26}{'score':>12}{'rate':>10}")
+    print("-" * 48)
+    print(f"{'paraphrase hits':<26}{f'{hits}/{len(para)}':>12}"
+          f"{_pct(hits, len(para)):>10}")
+    print(f"{'variant false hits':<26}{f'{len(false_hits)}/{len(variants)}':>12}"
+          f"{_pct(len(false_hits), len(variants)):>10}")
+    for r in false_hits:
+        print(f"  [false hit] {r['second']} answered as {r['first']}")
+    return {"paraphrase_hits": hits, "paraphrases": len(para),
+            "false_hits": len(false_hits), "variants": len(variants),
+            "rows": rows}
+
+
+# Span fields that are identity or time, not counts to be summed.
+_TRACE_META = {"ts", "request", "stage", "ms"}
+
+
+def _quantile(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+
+def summarise_trace(path=None):
+    """p50 / p95 / total time per stage, and the counts each stage recorded."""
+    from .trace import load
+
+    recs = load(path)
+    by_stage = defaultdict(list)
+    for r in recs:
+        by_stage[r["stage"]].append(r)
+    n_requests = len(by_stage.get("request", []))
+    wall = sum(r["ms"] for r in by_stage.get("request", []))
+
+    print(f"TRACE, {len(recs)} spans over {n_requests} requests\n")
+    print(f"{'stage':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'total ms':>12}"
+          f"{'share':>8}")
+    print("-" * 70)
+    rows = sorted(by_stage.items(), key=lambda kv: -sum(r["ms"] for r in kv[1]))
+    for stage, rs in rows:
+        ms = sorted(r["ms"] for r in rs)
+        total = sum(ms)
+        share = _pct(total, wall) if stage != "request" else ""
+        print(f"{stage:<24}{len(ms):>6}{_quantile(ms, 0.5):>10.1f}"
+              f"{_quantile(ms, 0.95):>10.1f}{total:>12.0f}{share:>8}")
+
+    print("\ncounts")
+    print("-" * 70)
+    for stage, rs in rows:
+        sums = defaultdict(float)
+        for r in rs:
+            for k, v in r.items():
+                if k not in _TRACE_META and isinstance(v, (int, float)) \
+                        and not isinstance(v, bool):
+                    sums[k] += v
+        if sums:
+            print(f"{stage:<24}" + ", ".join(
+                f"{k} {v:g}" for k, v in sorted(sums.items())))
+    if n_requests:
+        print("\nshare is of summed request wall time; stages nest and overlap"
+              " on the async path, so shares need not add to 100%")
+
+
 def main():
     try:
         sys.stdout.reconfigure(encoding="utf-8")
     except Exception:
         pass
     mode = sys.argv[1] if len(sys.argv) > 1 else "retrieval"
+    if mode == "trace":
+        summarise_trace(sys.argv[2] if len(sys.argv) > 2 else None)
+        return
 
     # Merge into whatever is already on disk rather than rebuilding. The two
     # halves cost very different things: retrieval is free and repeatable
@@ -367,13 +664,29 @@ def main():
 
     if mode in ("retrieval", "all"):
         out["retrieval"] = eval_retrieval()
+    if mode == "rerank-backends":
+        out["rerank_backends"] = compare_rerank_backends()
+    if mode == "cache":
+        out["answer_cache"] = eval_cache()
     if mode in ("end2end", "all"):
         if mode == "all":
             print("\n" + "=" * 62 + "\n")
-        out["end2end"] = eval_end2end()
+        # --concurrency N runs up to N questions at once through ask_async.
+        # The shared limiter still holds every model to its LIMITS entry.
+        conc = 1
+        if "--concurrency" in sys.argv:
+            conc = int(sys.argv[sys.argv.index("--concurrency") + 1])
+        out["end2end"] = eval_end2end(concurrency=conc)
     RESULTS.write_text(json.dumps(out, ensure_ascii=False, indent=2),
                        encoding="utf-8")
     print(f"\nresults written to {RESULTS.name}")
+    # A rejected int8 model fails the run, so this can gate a deploy.
+    if mode == "rerank-backends" and \
+            not out["rerank_backends"]["within_tolerance"]:
+        raise SystemExit(1)
+    # So does a cached answer served for a different date or entity.
+    if mode == "cache" and out["answer_cache"]["false_hits"]:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
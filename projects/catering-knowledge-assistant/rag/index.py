@@ -10,11 +10,25 @@ Storage is a real Qdrant collection running in local (embedded) mode, so there
 is no server or container to manage. The collection carries payload indexes on
 doc_type, category, authority and doc_id, which is what makes the filtered
 searches in retriever.py run at the store level rather than in Python.
+
+Indexing is incremental. Point IDs are derived from chunk_id, so a chunk keeps
+the same point across builds, and every payload carries the chunk's
+content_hash. A build reads the stored hashes back, upserts only chunks whose
+hash changed and deletes points whose chunk no longer exists. Editing one menu
+week touches that week's chunks and leaves every other point alone.
+
+When a NumPy store exists, or VECTOR_BACKEND=numpy, it is brought in line
+from the same chunks in the same run, so the two backends never disagree.
+
+    python -m rag.index             # incremental sync
+    python -m rag.index --rebuild   # drop and rebuild the collection
 """
 
 import hashlib
 import json
+import sys
 import time
+import uuid
 
 import numpy as np
 from google import genai
@@ -22,13 +36,17 @@ from google.genai import types
 from google.genai import errors as genai_errors
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
-    Distance, VectorParams, PointStruct, PayloadSchemaType,
+    Distance, VectorParams, PointStruct, PayloadSchemaType, PointIdsList,
 )
 
+from . import npstore
 from .config import (
     CHUNKS_JSON, QDRANT_PATH, COLLECTION, EMBED_MODEL, EMBED_DIM,
-    EMBED_CACHE, load_api_key, qdrant_client,
+    VECTOR_BACKEND, load_api_key, qdrant_client,
 )
+from .embed_store import store
+from .trace import span
+from .chunker import content_hash
 
 # The free tier allows 100 embed requests per minute, and each content in a
 # batch counts as one request. Pace below that ceiling and retry on 429.
@@ -47,18 +65,15 @@ def normalise(vectors):
 def _throttle(n):
     """Block until n more requests fit inside the rolling one minute window."""
     global _request_times
-    while True:
-        now = time.monotonic()
-        _request_times = [t for t in _request_times if now - t < 60]
-        if len(_request_times) + n <= RPM_LIMIT:
-            return
-        time.sleep(max(0.5, 60 - (now - _request_times[0]) + 0.5))
-
-
-def _load_cache():
-    if EMBED_CACHE.exists():
-        return json.loads(EMBED_CACHE.read_text(encoding="utf-8"))
-    return {}
+    with span("ratelimit.wait", model=EMBED_MODEL, slept_s=0.0) as rec:
+        while True:
+            now = time.monotonic()
+            _request_times = [t for t in _request_times if now - t < 60]
+            if len(_request_times) + n <= RPM_LIMIT:
+                return
+            wait = max(0.5, 60 - (now - _request_times[0]) + 0.5)
+            rec["slept_s"] += wait
+            time.sleep(wait)
 
 
 def _key(text, task_type):
@@ -70,14 +85,16 @@ def _embed_batch(client, batch, task_type, attempt=0):
     try:
         _throttle(len(batch))
         _request_times.extend([time.monotonic()] * len(batch))
-        resp = client.models.embed_content(
-            model=EMBED_MODEL,
-            contents=batch,
-            config=types.EmbedContentConfig(
-                task_type=task_type,
-                output_dimensionality=EMBED_DIM,
-            ),
-        )
+        with span("embed.api", texts=len(batch),
+                  chars=sum(len(t) for t in batch)):
+            resp = client.models.embed_content(
+                model=EMBED_MODEL,
+                contents=batch,
+                config=types.EmbedContentConfig(
+                    task_type=task_type,
+                    output_dimensionality=EMBED_DIM,
+                ),
+            )
         return [e.values for e in resp.embeddings]
     except genai_errors.ClientError as e:
         if "RESOURCE_EXHAUSTED" not in str(e) or attempt >= 5:
@@ -89,9 +106,15 @@ def _embed_batch(client, batch, task_type, attempt=0):
 
 
 def embed(client, texts, task_type, use_cache=True):
-    """Embed texts with caching, batching, throttling and retry."""
-    cache = _load_cache() if use_cache else {}
+    """Embed texts with caching, batching, throttling and retry.
+
+    Only the keys asked for are read from the store and only new vectors are
+    written back, so the cost of a call is independent of how much is cached.
+    """
     keys = [_key(t, task_type) for t in texts]
+    with span("embed.cache_load", keys=len(keys)) as rec:
+        cache = store().get_many(keys) if use_cache else {}
+        rec["hits"] = len(cache)
     missing = [i for i, k in enumerate(keys) if k not in cache]
 
     if missing:
@@ -100,12 +123,14 @@ def embed(client, texts, task_type, use_cache=True):
         for start in range(0, len(missing), BATCH):
             idxs = missing[start:start + BATCH]
             vecs = _embed_batch(client, [texts[i] for i in idxs], task_type)
-            for i, v in zip(idxs, vecs):
-                cache[keys[i]] = v
+            fresh = [(keys[i], v) for i, v in zip(idxs, vecs)]
+            cache.update(fresh)
+            # Written per batch, so a rate-limit failure part way through a
+            # build keeps everything embedded before it.
+            if use_cache:
+                store().put_many(fresh, task_type)
             done = min(start + BATCH, len(missing))
             print(f"    {done}/{len(missing)}")
-        if use_cache:
-            EMBED_CACHE.write_text(json.dumps(cache), encoding="utf-8")
 
     return normalise([cache[k] for k in keys])
 
@@ -119,20 +144,56 @@ def embed_query(client, text):
     return embed(client, [text], "RETRIEVAL_QUERY")[0]
 
 
-def build():
-    chunks = json.loads(CHUNKS_JSON.read_text(encoding="utf-8"))
-    client = genai.Client(api_key=load_api_key())
+# Any fixed namespace works; it only has to stay the same between builds.
+POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "tasty-kitchen/chunk")
+UPSERT_BATCH = 64
 
-    print(f"Embedding {len(chunks)} chunks with {EMBED_MODEL} "
-          f"at {EMBED_DIM} dimensions ...")
-    vectors = embed(client, [c["text"] for c in chunks], "RETRIEVAL_DOCUMENT")
 
-    qc, mode = qdrant_client()
-    print(f"Qdrant mode: {mode}")
-    if qc.collection_exists(COLLECTION):
-        qc.delete_collection(COLLECTION)
+def point_id(chunk_id):
+    """Stable Qdrant point ID for a chunk, the same on every build."""
+    return str(uuid.uuid5(POINT_NAMESPACE, chunk_id))
+
+
+def _with_hashes(chunks):
+    """Fill content_hash on chunks from a chunks.json that predates it."""
+    for c in chunks:
+        if not c.get("content_hash"):
+            c["content_hash"] = content_hash(c)
+    return chunks
+
+
+def indexed_hashes(qc, collection):
+    """Map point ID -> content_hash for every point already in the collection."""
+    out, offset = {}, None
+    while True:
+        points, offset = qc.scroll(
+            collection_name=collection, limit=256, offset=offset,
+            with_payload=["content_hash"], with_vectors=False)
+        for p in points:
+            out[p.id] = (p.payload or {}).get("content_hash", "")
+        if offset is None:
+            return out
+
+
+def diff(chunks, indexed):
+    """Chunks to upsert and point IDs to delete, given what is indexed."""
+    want = {point_id(c["chunk_id"]): c for c in chunks}
+    changed = [c for pid, c in want.items()
+               if indexed.get(pid) != c["content_hash"]]
+    # Points from before stable IDs (plain integers) never match and go too.
+    removed = [pid for pid in indexed if str(pid) not in want]
+    return changed, removed
+
+
+def _ensure_collection(qc, collection, mode, rebuild=False):
+    """Create the collection if it is missing, wrong-sized, or a rebuild is asked for."""
+    if qc.collection_exists(collection):
+        size = qc.get_collection(collection).config.params.vectors.size
+        if not rebuild and size == EMBED_DIM:
+            return False
+        qc.delete_collection(collection)
     qc.create_collection(
-        collection_name=COLLECTION,
+        collection_name=collection,
         vectors_config=VectorParams(size=EMBED_DIM, distance=Distance.COSINE),
     )
 
@@ -141,23 +202,72 @@ def build():
     if mode == "server":
         for field in ("doc_id", "doc_type", "category", "authority"):
             qc.create_payload_index(
-                collection_name=COLLECTION,
+                collection_name=collection,
                 field_name=field,
                 field_schema=PayloadSchemaType.KEYWORD,
             )
+    return True
+
+
+def sync(qc, collection, chunks, client, mode="local", rebuild=False):
+    """Bring `collection` in line with `chunks`, touching only what differs.
 
-    points = [
-        PointStruct(id=i, vector=vectors[i], payload=chunks[i])
-        for i in range(len(chunks))
-    ]
-    qc.upsert(collection_name=COLLECTION, points=points)
+    Returns (created, upserted, deleted). Only changed chunks are embedded, and
+    the embedding cache means even those cost nothing unless the text is new.
+    """
+    chunks = _with_hashes(chunks)
+    created = _ensure_collection(qc, collection, mode, rebuild=rebuild)
+    changed, removed = diff(chunks, {} if created else
+                            indexed_hashes(qc, collection))
+
+    if changed:
+        vectors = embed(client, [c["text"] for c in changed],
+                        "RETRIEVAL_DOCUMENT")
+        for start in range(0, len(changed), UPSERT_BATCH):
+            qc.upsert(collection_name=collection, points=[
+                PointStruct(id=point_id(c["chunk_id"]), vector=v, payload=c)
+                for c, v in zip(changed[start:start + UPSERT_BATCH],
+                                vectors[start:start + UPSERT_BATCH])])
+    if removed:
+        qc.delete(collection_name=collection,
+                  points_selector=PointIdsList(points=removed))
+    return created, len(changed), len(removed)
+
+
+def build(rebuild=False):
+    chunks = json.loads(CHUNKS_JSON.read_text(encoding="utf-8"))
+    client = genai.Client(api_key=load_api_key())
+
+    qc, mode = qdrant_client()
+    print(f"Qdrant mode: {mode}")
+    print(f"Syncing {len(chunks)} chunks with {EMBED_MODEL} "
+          f"at {EMBED_DIM} dimensions ...")
+    t0 = time.perf_counter()
+    created, upserted, deleted = sync(qc, COLLECTION, chunks, client,
+                                      mode=mode, rebuild=rebuild)
+    took = time.perf_counter() - t0
+
+    # The NumPy engine is a second copy of the same points. Refresh it here
+    # too, or a reindex leaves VECTOR_BACKEND=numpy answering from old chunks.
+    # It is compared by content hash and swapped in whole, so --rebuild needs
+    # nothing extra and readers never see it half written.
+    np_refreshed = None
+    if VECTOR_BACKEND == "numpy" or npstore.exists(COLLECTION):
+        np_refreshed = npstore.sync(COLLECTION, chunks, client)
 
     info = qc.get_collection(COLLECTION)
-    print(f"\nCollection '{COLLECTION}' built at {QDRANT_PATH.name}/")
+    print(f"\nCollection '{COLLECTION}' "
+          f"{'built' if created else 'updated'} at {QDRANT_PATH.name}/")
     print(f"  points indexed   {info.points_count}")
+    print(f"  upserted         {upserted}")
+    print(f"  deleted          {deleted}")
+    print(f"  unchanged        {len(chunks) - upserted}")
+    print(f"  sync time        {took:.2f}s")
     print(f"  vector size      {EMBED_DIM}")
     print(f"  distance         cosine")
     print(f"  payload indexes  {'doc_id, doc_type, category, authority' if mode == 'server' else 'skipped (local mode)'}")
+    if np_refreshed is not None:
+        print(f"  NumPy store      {'rewritten' if np_refreshed else 'already current'}")
 
     # Sanity check: a semantic query with no lexical overlap with its target.
     qv = embed_query(client, "which meals have no pork")
@@ -170,4 +280,4 @@ def build():
 
 
 if __name__ == "__main__":
-    build()
+    build(rebuild="--rebuild" in sys.argv)
@@ -0,0 +1,324 @@
+"""
+In-process NumPy vector engine, an alternative to embedded Qdrant.
+
+At 128 chunks the whole corpus is a 128 x 768 float32 matrix, about 400 KB.
+Embedded Qdrant is a real engine with real costs at this size: noticeable
+startup, one client per storage folder (which is why drift.py has to borrow the
+retriever's client), and payload indexes that are ignored in local mode. This
+engine does exact search, which at this size is also the fastest search:
+
+  vectors    one .npy matrix of L2-normalised rows, memory-mapped read-only,
+             so opening a collection reads no vector data until the first
+             query and any number of processes share the page cache
+  filters    a precomputed bitmap per value of doc_type, category, authority
+             and doc_id. A filter is an AND of ORs of bitmaps, evaluated once
+             per query before scoring, so it is a real index, not a post-filter.
+             Only must clauses exist here; should and must_not raise
+  search     one matrix product per batch of queries, then argpartition for
+             the top k. Cosine is a dot product on normalised rows.
+
+Selected with VECTOR_BACKEND=numpy. The retriever builds the same Qdrant Filter
+objects for both backends and this module reads them, so nothing upstream
+changes. Each collection is a folder under NPSTORE_PATH holding vectors.npy,
+payloads.json and bitmaps.npz.
+
+    python -m rag.npstore build     # export chunks.json + cached embeddings
+    python -m rag.npstore bench     # startup and latency against local Qdrant
+"""
+
+import json
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .config import CHUNKS_JSON, COLLECTION, EMBED_DIM, NPSTORE_PATH, load_api_key
+
+FIELDS = ("doc_type", "category", "authority", "doc_id")
+
+# Same shape as a Qdrant ScoredPoint as far as the retriever reads it.
+Point = namedtuple("Point", "id score payload")
+
+
+class NumpyCollection:
+    """One collection: a memory-mapped matrix, payloads and field bitmaps."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.vectors = np.load(folder / "vectors.npy", mmap_mode="r")
+        meta = json.loads((folder / "payloads.json").read_text(encoding="utf-8"))
+        self.ids = meta["ids"]
+        self.payloads = meta["payloads"]
+        self.hashes = meta.get("hashes", [])
+        n = len(self.ids)
+        packed = np.load(folder / "bitmaps.npz")
+        self.bitmaps = {}
+        for name in packed.files:
+            field, _, value = name.partition("=")
+            self.bitmaps.setdefault(field, {})[value] = \
+                np.unpackbits(packed[name], count=n).astype(bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _mask(self, qfilter):
+        """Evaluate a Qdrant Filter of must FieldConditions against the bitmaps.
+
+        Only what build_filter produces is understood: a list of must
+        conditions, each a MatchValue or MatchAny on one of FIELDS. Anything
+        else raises, because ignoring a clause would widen the search without
+        saying so.
+        """
+        if qfilter is None:
+            return None
+        if qfilter.should or qfilter.must_not or getattr(qfilter, "min_should", None):
+            raise ValueError(
+                "the NumPy backend only evaluates 'must' filters; "
+                "should, min_should and must_not are not supported")
+        if not qfilter.must:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        none = np.zeros(len(self), dtype=bool)
+        for cond in qfilter.must:
+            if (getattr(cond, "key", None) not in FIELDS
+                    or getattr(cond, "match", None) is None):
+                raise ValueError(
+                    f"the NumPy backend cannot evaluate the filter condition "
+                    f"{cond!r}; only MatchValue and MatchAny on "
+                    f"{', '.join(FIELDS)} are supported")
+            by_value = self.bitmaps.get(cond.key, {})
+            values = getattr(cond.match, "any", None)
+            if values is None:
+                values = [cond.match.value]
+            either = none.copy()
+            for v in values:
+                either |= by_value.get(str(v), none)
+            mask &= either
+        return mask
+
+    def query_batch(self, vectors, k, qfilters=None):
+        """Top-k points per query vector. Returns one list of Point per query."""
+        if not len(self):
+            return [[] for _ in vectors]
+        q = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBED_DIM)
+        scores = q @ self.vectors.T
+        qfilters = qfilters or [None] * len(q)
+        out = []
+        for row, qf in zip(scores, qfilters):
+            mask = self._mask(qf)
+            if mask is not None:
+                row = np.where(mask, row, -np.inf)
+                limit = min(k, int(mask.sum()))
+            else:
+                limit = min(k, len(row))
+            if limit <= 0:
+                out.append([])
+                continue
+            top = np.argpartition(-row, limit - 1)[:limit]
+            top = top[np.argsort(-row[top], kind="stable")]
+            out.append([Point(self.ids[i], float(row[i]), self.payloads[i])
+                        for i in top])
+        return out
+
+
+def write_collection(name, chunks, vectors):
+    """Write a collection folder atomically enough for readers: build, then swap."""
+    from .index import point_id
+
+    folder = NPSTORE_PATH / name
+    tmp = NPSTORE_PATH / f".{name}.tmp"
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    np.save(tmp / "vectors.npy", np.asarray(vectors, dtype=np.float32)
+            .reshape(-1, EMBED_DIM))
+    (tmp / "payloads.json").write_text(json.dumps({
+        "ids": [point_id(c["chunk_id"]) for c in chunks],
+        "hashes": [c.get("content_hash", "") for c in chunks],
+        "payloads": chunks,
+    }, ensure_ascii=False), encoding="utf-8")
+
+    bitmaps = {}
+    for field in FIELDS:
+        values = [str(c.get(field, "")) for c in chunks]
+        for v in sorted(set(values)):
+            bitmaps[f"{field}={v}"] = np.packbits(
+                np.array([x == v for x in values], dtype=bool))
+    np.savez(tmp / "bitmaps.npz", **bitmaps)
+
+    if folder.exists():
+        shutil.rmtree(folder)
+    tmp.rename(folder)
+    with _lock:
+        _open.pop(name, None)
+
+
+def sync(name, chunks, client):
+    """Rewrite `name` only if its chunk hashes differ from `chunks`.
+
+    Returns True when the collection was rewritten. The whole matrix is
+    rewritten on any change, which at this corpus size is a few hundred KB, and
+    every vector comes from the embedding cache unless its text is new.
+    """
+    from .index import _with_hashes, embed
+
+    chunks = _with_hashes(chunks)
+    if exists(name):
+        current = collection(name)
+        if current.hashes == [c["content_hash"] for c in chunks]:
+            return False
+    vectors = embed(client, [c["text"] for c in chunks], "RETRIEVAL_DOCUMENT")
+    write_collection(name, chunks, vectors)
+    return True
+
+
+_open = {}
+_lock = threading.Lock()
+
+
+def exists(name):
+    return (NPSTORE_PATH / name / "vectors.npy").exists()
+
+
+def collection(name=COLLECTION):
+    """Open (once per process) and return a collection."""
+    with _lock:
+        if name not in _open:
+            if not exists(name):
+                raise LookupError(
+                    f"no NumPy collection '{name}' under {NPSTORE_PATH.name}/. "
+                    "Run: python -m rag.npstore build")
+            _open[name] = NumpyCollection(NPSTORE_PATH / name)
+        return _open[name]
+
+
+def drop(name):
+    with _lock:
+        _open.pop(name, None)
+    if (NPSTORE_PATH / name).exists():
+        shutil.rmtree(NPSTORE_PATH / name)
+
+
+def build():
+    from google import genai
+
+    chunks = json.loads(CHUNKS_JSON.read_text(encoding="utf-8"))
+    client = genai.Client(api_key=load_api_key())
+    t0 = time.perf_counter()
+    wrote = sync(COLLECTION, chunks, client)
+    c = collection(COLLECTION)
+    print(f"NumPy collection '{COLLECTION}' "
+          f"{'written' if wrote else 'already current'} at "
+          f"{NPSTORE_PATH.name}/{COLLECTION}/ in {time.perf_counter() - t0:.2f}s")
+    print(f"  points     {len(c)}")
+    print(f"  matrix     {c.vectors.shape[0]} x {c.vectors.shape[1]} float32, "
+          f"{c.vectors.nbytes / 1024:.0f} KB")
+    print(f"  bitmaps    {sum(len(v) for v in c.bitmaps.values())} over "
+          f"{', '.join(FIELDS)}")
+
+
+def bench(repeats=20):
+    """Startup and per-query latency, NumPy engine against local Qdrant.
+
+    Both answer the same eval questions with the same query vectors, once
+    unfiltered and once with a doc_id filter, so the comparison is the engine
+    alone. Qdrant is opened in local embedded mode, the mode this replaces.
+    """
+    from pathlib import Path
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import QueryRequest
+
+    from .config import QDRANT_PATH, TOP_K_VECTOR
+    from .retriever import _query_vectors, build_filter
+
+    eval_set = Path(__file__).parent / "eval_set.json"
+    cases = [c for c in json.loads(eval_set.read_text(encoding="utf-8"))
+             if c["route"] == "corpus"]
+    questions = [c["question"] for c in cases]
+    vecs = _query_vectors(questions)
+    filters = [build_filter(doc_ids=c["gold_docs"][0]) if c.get("gold_docs")
+               else None for c in cases]
+
+    def per_query(fn):
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            for v, f in zip(vecs, filters):
+                fn(v, f)
+        return (time.perf_counter() - t0) / (repeats * len(vecs)) * 1e3
+
+    # Startup: open the store and answer one query.
+    t0 = time.perf_counter()
+    qc = QdrantClient(path=str(QDRANT_PATH))
+    qc.query_points(COLLECTION, query=vecs[0], limit=TOP_K_VECTOR)
+    q_start = (time.perf_counter() - t0) * 1e3
+
+    with _lock:
+        _open.pop(COLLECTION, None)
+    t0 = time.perf_counter()
+    nc = collection(COLLECTION)
+    nc.query_batch([vecs[0]], TOP_K_VECTOR)
+    n_start = (time.perf_counter() - t0) * 1e3
+
+    rows = []
+    for label, use_filter in (("unfiltered", False), ("doc_id filter", True)):
+        q_ms = per_query(lambda v, f: qc.query_points(
+            COLLECTION, query=v, limit=TOP_K_VECTOR,
+            query_filter=f if use_filter else None))
+        n_ms = per_query(lambda v, f: nc.query_batch(
+            [v], TOP_K_VECTOR, [f if use_filter else None]))
+        rows.append((label, q_ms, n_ms))
+
+    # Whole set in one batch, the retrieve_many path.
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        qc.query_batch_points(COLLECTION, requests=[
+            QueryRequest(query=v, limit=TOP_K_VECTOR) for v in vecs])
+    q_batch = (time.perf_counter() - t0) / repeats * 1e3
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        nc.query_batch(vecs, TOP_K_VECTOR)
+    n_batch = (time.perf_counter() - t0) / repeats * 1e3
+
+    # Agreement: both engines should return the same chunks in the same order.
+    same = sum(
+        [p.payload["chunk_id"] for p in
+         qc.query_points(COLLECTION, query=v, limit=TOP_K_VECTOR).points] ==
+        [p.payload["chunk_id"] for p in np_pts]
+        for v, np_pts in zip(vecs, nc.query_batch(vecs, TOP_K_VECTOR)))
+    qc.close()
+
+    print(f"VECTOR BACKEND BENCHMARK, {len(vecs)} queries x {repeats}, "
+          f"{len(nc)} points, top {TOP_K_VECTOR}\n")
+    print(f"{'':<28}{'local Qdrant':>14}{'NumPy':>12}{'speed-up':>11}")
+    print("-" * 65)
+    print(f"{'startup + first query, ms':<28}{q_start:>14.1f}{n_start:>12.1f}"
+          f"{q_start / max(n_start, 1e-9):>10.0f}x")
+    for label, q_ms, n_ms in rows:
+        print(f"{f'per query, {label}, ms':<28}{q_ms:>14.3f}{n_ms:>12.3f}"
+              f"{q_ms / max(n_ms, 1e-9):>10.0f}x")
+    print(f"{f'batch of {len(vecs)}, ms':<28}{q_batch:>14.2f}{n_batch:>12.2f}"
+          f"{q_batch / max(n_batch, 1e-9):>10.0f}x")
+    print(f"\nidentical top-{TOP_K_VECTOR} ranking on {same} of {len(vecs)} "
+          f"queries")
+
+
+def main():
+    try:
+        sys.stdout.reconfigure(encoding="utf-8")
+    except Exception:
+        pass
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if cmd == "build":
+        build()
+    elif cmd == "bench":
+        bench()
+    else:
+        raise SystemExit(f"unknown command '{cmd}', use build or bench")
+
+
+if __name__ == "__main__":
+    main()
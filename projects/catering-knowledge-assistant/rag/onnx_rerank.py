@@ -0,0 +1,141 @@
+"""
+Int8 ONNX Runtime backend for the cross-encoder.
+
+The sentence-transformers CrossEncoder is the largest fixed cost in the
+pipeline: importing torch and loading the fp32 weights dominates cold start,
+and every uncached (query, chunk) pair is a full fp32 forward pass on CPU. The
+same model exported to ONNX and dynamically quantised to int8 weights is about
+a quarter of the size, loads without torch, and scores several times faster.
+
+  export     one-off. RERANK_MODEL is traced to ONNX with dynamic batch and
+             sequence axes, then quantize_dynamic rewrites its MatMul weights
+             as int8. Activations are quantised per call, so no calibration
+             set is needed. The tokenizer is saved alongside.
+  predict    same interface as CrossEncoder.predict: (query, text) pairs in,
+             one raw logit per pair out, so MIN_RERANK_SCORE and
+             RELEVANCE_FLOOR keep their meaning.
+  threads    RERANK_THREADS sets intra-op threads; 0 leaves ONNX Runtime to
+             pick. Worth capping when several processes share a machine.
+
+Quantisation moves scores slightly, so scores from this backend are cached
+under their own key and never mixed with fp32 ones. Whether the ranking still
+holds is measured, not assumed:
+
+    python -m rag.onnx_rerank export
+    python -m rag.evaluate rerank-backends   # quality and latency vs fp32
+    RERANK_BACKEND=onnx python -m rag.assistant
+"""
+
+import json
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from .config import ONNX_MODEL_DIR, RERANK_MODEL, RERANK_THREADS
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+META_FILE = "export.json"
+MAX_LENGTH = 512
+
+
+class OnnxCrossEncoder:
+    """Drop-in for CrossEncoder.predict over an int8 ONNX export."""
+
+    def __init__(self, folder=ONNX_MODEL_DIR, threads=RERANK_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        meta = _meta(folder)
+        if meta is None or meta.get("model") != RERANK_MODEL:
+            raise LookupError(
+                f"no int8 ONNX export of {RERANK_MODEL} under "
+                f"{folder.name}/. Run: python -m rag.onnx_rerank export")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(folder / INT8_FILE), opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(folder))
+
+    def predict(self, pairs, batch_size=32):
+        out = []
+        for start in range(0, len(pairs), batch_size):
+            part = pairs[start:start + batch_size]
+            # longest_first, as the fp32 CrossEncoder tokenises. only_second
+            # fails outright when a query alone exceeds MAX_LENGTH, and trims
+            # a long pair differently from the model it is checked against.
+            enc = self.tokenizer(
+                [q for q, _ in part], [t for _, t in part],
+                padding=True, truncation="longest_first",
+                max_length=MAX_LENGTH, return_tensors="np")
+            feed = {k: v.astype(np.int64) for k, v in enc.items()
+                    if k in self.inputs}
+            logits = self.session.run(None, feed)[0]
+            out.extend(logits.reshape(len(part), -1)[:, 0].tolist())
+        return np.asarray(out, dtype=np.float32)
+
+
+def _meta(folder):
+    path = folder / META_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def export(folder=ONNX_MODEL_DIR):
+    """Trace RERANK_MODEL to ONNX, quantise it to int8, save the tokenizer."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tmp = folder.parent / f".{folder.name}.tmp"
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    t0 = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(RERANK_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(RERANK_MODEL)
+    model.eval()
+    sample = tokenizer(["a question"], ["a passage of text"], return_tensors="pt")
+    names = list(sample.keys())
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["logits"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), str(tmp / FP32_FILE),
+            input_names=names, output_names=["logits"], dynamic_axes=axes,
+            opset_version=17)
+    quantize_dynamic(str(tmp / FP32_FILE), str(tmp / INT8_FILE),
+                     weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(str(tmp))
+    (tmp / META_FILE).write_text(json.dumps({
+        "model": RERANK_MODEL, "inputs": names, "quantisation": "dynamic int8",
+    }, indent=2), encoding="utf-8")
+
+    if folder.exists():
+        shutil.rmtree(folder)
+    tmp.rename(folder)
+    fp32 = (folder / FP32_FILE).stat().st_size / 1e6
+    int8 = (folder / INT8_FILE).stat().st_size / 1e6
+    print(f"exported {RERANK_MODEL} to {folder.name}/ in "
+          f"{time.perf_counter() - t0:.1f}s")
+    print(f"  fp32 {fp32:.1f} MB, int8 {int8:.1f} MB")
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if cmd == "export":
+        export()
+    else:
+        raise SystemExit(f"unknown command '{cmd}', use export")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,27 @@ Free tier ceilings are low and differ per model (5 requests per minute on
 gemini-2.5-flash, higher on flash-lite, 100 on the embedding model), so the
 limiter is keyed by model name rather than global. Without this the pipeline
 runs fine on a handful of questions and falls over on the eval set.
+
+Two front ends over one ledger. throttle() blocks the calling thread, for the
+synchronous pipeline. athrottle() is the asyncio version: a token bucket per
+model whose tokens come back sixty seconds after they are spent, so it can
+never admit more than LIMITS[model] calls in any rolling minute. Coroutines
+queue on a per-model lock (one per event loop) instead of sleeping a thread
+each, and both front ends record into the same history, so mixing them cannot
+exceed the limit.
 """
 
+import asyncio
+import random
+import threading
 import time
+import weakref
 from collections import defaultdict
 
 from google.genai import errors as genai_errors
 
+from .trace import span
+
 # Requests per minute to allow, per model. Set slightly under the published
 # ceiling to leave room for clock skew.
 LIMITS = {
@@ -22,19 +36,36 @@ LIMITS = {
 DEFAULT_LIMIT = 4
 
 _history = defaultdict(list)
+# asyncio.Lock belongs to the loop it is first awaited on, so the per-model
+# locks are kept per running loop and go away with it. A second asyncio.run()
+# then gets fresh locks instead of ones bound to a closed loop.
+_async_locks = weakref.WeakKeyDictionary()
+_ledger = threading.Lock()
 
 
-def throttle(model, n=1):
-    """Block until n more requests fit inside the rolling minute for `model`."""
+def _wait_needed(model, n):
+    """Seconds until n more requests fit for `model`, recording them if 0."""
     limit = LIMITS.get(model, DEFAULT_LIMIT)
-    while True:
+    with _ledger:
         now = time.monotonic()
         hist = [t for t in _history[model] if now - t < 60]
         _history[model] = hist
         if len(hist) + n <= limit:
             _history[model].extend([now] * n)
-            return
-        time.sleep(max(0.5, 60 - (now - hist[0]) + 0.5))
+            return 0.0
+        # The oldest token in the window is the next one to come back.
+        return max(0.5, 60 - (now - hist[0]) + 0.5)
+
+
+def throttle(model, n=1):
+    """Block until n more requests fit inside the rolling minute for `model`."""
+    with span("ratelimit.wait", model=model, slept_s=0.0) as rec:
+        while True:
+            wait = _wait_needed(model, n)
+            if not wait:
+                return
+            rec["slept_s"] += wait
+            time.sleep(wait)
 
 
 def with_retry(fn, model, attempts=6):
@@ -50,3 +81,42 @@ def with_retry(fn, model, attempts=6):
             wait = min(70, 8 * (2 ** attempt))
             time.sleep(wait)
     raise RuntimeError("unreachable")
+
+
+async def athrottle(model, n=1):
+    """Wait, without blocking the event loop, until n more requests fit."""
+    loop = asyncio.get_running_loop()
+    with _ledger:
+        locks = _async_locks.get(loop)
+        if locks is None:
+            locks = _async_locks[loop] = {}
+        lock = locks.setdefault(model, asyncio.Lock())
+    # One waiter at a time per model, so tokens are handed out in arrival order
+    # rather than to whichever coroutine happens to wake first.
+    with span("ratelimit.wait", model=model, slept_s=0.0) as rec:
+        async with lock:
+            while True:
+                wait = _wait_needed(model, n)
+                if not wait:
+                    return
+                rec["slept_s"] += wait
+                await asyncio.sleep(wait)
+
+
+async def awith_retry(fn, model, attempts=6):
+    """Await fn(), a coroutine factory, retrying on quota errors with backoff.
+
+    The backoff is jittered so coroutines throttled together do not retry in
+    lockstep and collide again.
+    """
+    for attempt in range(attempts):
+        try:
+            await athrottle(model)
+            return await fn()
+        except genai_errors.ClientError as e:
+            msg = str(e)
+            if "RESOURCE_EXHAUSTED" not in msg or attempt == attempts - 1:
+                raise
+            wait = min(70, 8 * (2 ** attempt))
+            await asyncio.sleep(wait * random.uniform(0.8, 1.2))
+    raise RuntimeError("unreachable")
@@ -12,49 +12,91 @@ comparing two independent embeddings, so it can tell which one actually answers
 the question. It runs locally on CPU at no API cost.
 """
 
+import threading
 from dataclasses import dataclass
 
-from qdrant_client.models import Filter, FieldCondition, MatchValue, MatchAny
+from qdrant_client.models import (
+    Filter, FieldCondition, MatchValue, MatchAny, QueryRequest,
+)
 
+from .trace import span
 from .config import (
     COLLECTION, RERANK_MODEL, TOP_K_VECTOR, TOP_K_RERANK, MIN_RERANK_SCORE,
-    RELEVANCE_FLOOR, qdrant_client, load_api_key,
+    RELEVANCE_FLOOR, VECTOR_BACKEND, RERANK_BACKEND, RERANK_THREADS,
+    qdrant_client, load_api_key,
 )
 
-_encoder = None
+_encoders = {}
 _gemini = None
 _qc = None
 _mode = None
+# The async assistant runs retrieval on worker threads, so the lazy singletons
+# below are created under a lock rather than possibly twice.
+_init_lock = threading.Lock()
 
 
 def _cross_encoder():
-    global _encoder
-    if _encoder is None:
-        from sentence_transformers import CrossEncoder
-        _encoder = CrossEncoder(RERANK_MODEL)
-    return _encoder
+    """The cross-encoder for the current RERANK_BACKEND, loaded once."""
+    with _init_lock:
+        if RERANK_BACKEND not in _encoders:
+            if RERANK_BACKEND == "onnx":
+                from .onnx_rerank import OnnxCrossEncoder
+                _encoders[RERANK_BACKEND] = OnnxCrossEncoder()
+            else:
+                from sentence_transformers import CrossEncoder
+                if RERANK_THREADS:
+                    import torch
+                    torch.set_num_threads(RERANK_THREADS)
+                _encoders[RERANK_BACKEND] = CrossEncoder(RERANK_MODEL)
+    return _encoders[RERANK_BACKEND]
+
+
+def scorer_id():
+    """Identity of the scores the current backend produces, for cache keys.
+
+    fp32 keeps the bare model name, so caches written before the ONNX backend
+    existed stay valid. Int8 scores differ slightly and are kept apart.
+    """
+    if RERANK_BACKEND == "onnx":
+        return f"{RERANK_MODEL}@onnx-int8"
+    return RERANK_MODEL
+
+
+def warm_up():
+    """Load the cross-encoder and run one pair, so the first query doesn't.
+
+    The first predict pays for weight loading and, on ONNX Runtime, graph
+    optimisation. A server calls this at start instead of charging it to
+    whichever customer asks first.
+    """
+    with span("cross_encoder.warm_up", backend=RERANK_BACKEND):
+        _cross_encoder().predict([("warm up", "warm up")])
 
 
 def _client():
     global _gemini
-    if _gemini is None:
-        from google import genai
-        _gemini = genai.Client(api_key=load_api_key())
+    with _init_lock:
+        if _gemini is None:
+            from google import genai
+            _gemini = genai.Client(api_key=load_api_key())
     return _gemini
 
 
 def _store():
     global _qc, _mode
-    if _qc is None:
-        import atexit
-        _qc, _mode = qdrant_client()
-        # Close explicitly, otherwise the client's __del__ runs during
-        # interpreter shutdown and raises a confusing ImportError.
-        atexit.register(lambda: _qc.close())
+    with _init_lock:
+        if _qc is None:
+            import atexit
+            _qc, _mode = qdrant_client()
+            # Close explicitly, otherwise the client's __del__ runs during
+            # interpreter shutdown and raises a confusing ImportError.
+            atexit.register(lambda: _qc.close())
     return _qc
 
 
 def store_mode():
+    if VECTOR_BACKEND == "numpy":
+        return "numpy"
     _store()
     return _mode
 
@@ -72,6 +114,7 @@ class Hit:
     final_score: float = 0.0    # cross-encoder score plus the authority prior
     restates: str = ""          # binding doc_id this chunk restates, if any
     promoted: bool = False      # pulled up as the binding parent of a hit
+    content_hash: str = ""      # chunk content hash, changes when it is edited
 
 
 def build_filter(doc_types=None, categories=None, authorities=None, doc_ids=None):
@@ -94,27 +137,27 @@ _qvec_memo = {}
 def _query_vector(query):
     """Embed a query once per process.
 
-    embed() is cached on disk, but that cache is a 1.8 MB JSON file reloaded on
-    every call. A parent fetch re-searches with the same query, so memoising in
-    process keeps that second lookup free.
+    embed() is cached on disk and a lookup there is a single keyed read, but a
+    parent fetch re-searches with the same query, so memoising in process keeps
+    that second lookup free altogether.
     """
-    if query not in _qvec_memo:
-        from .index import embed
-        _qvec_memo[query] = embed(_client(), [query], "RETRIEVAL_QUERY")[0]
-    return _qvec_memo[query]
+    return _query_vectors([query])[0]
 
 
-def search(query, k=TOP_K_VECTOR, qfilter=None):
-    """Stage 4: dense vector search with an optional payload filter."""
-    qv = _query_vector(query)
-    res = _store().query_points(
-        collection_name=COLLECTION,
-        query=qv,
-        limit=k,
-        query_filter=qfilter,
-        with_payload=True,
-    ).points
-    return [Hit(
+def _query_vectors(queries):
+    """Embed many queries, sending every one not yet memoised in one call."""
+    todo = list(dict.fromkeys(q for q in queries if q not in _qvec_memo))
+    with span("query_embed", queries=len(queries),
+              memo_hits=len(queries) - len(todo)):
+        if todo:
+            from .index import embed
+            for q, v in zip(todo, embed(_client(), todo, "RETRIEVAL_QUERY")):
+                _qvec_memo[q] = v
+    return [_qvec_memo[q] for q in queries]
+
+
+def _hit(p):
+    return Hit(
         chunk_id=p.payload["chunk_id"],
         doc_id=p.payload["doc_id"],
         doc_type=p.payload["doc_type"],
@@ -123,7 +166,52 @@ def search(query, k=TOP_K_VECTOR, qfilter=None):
         text=p.payload["text"],
         vector_score=p.score,
         restates=p.payload.get("restates", "") or "",
-    ) for p in res]
+        content_hash=p.payload.get("content_hash", "") or "",
+    )
+
+
+def search(query, k=TOP_K_VECTOR, qfilter=None):
+    """Stage 4: dense vector search with an optional payload filter."""
+    qv = _query_vector(query)
+    with span("vector_search", queries=1, backend=VECTOR_BACKEND,
+              filtered=qfilter is not None):
+        if VECTOR_BACKEND == "numpy":
+            from .npstore import collection
+            return [_hit(p) for p in
+                    collection(COLLECTION).query_batch([qv], k, [qfilter])[0]]
+        res = _store().query_points(
+            collection_name=COLLECTION,
+            query=qv,
+            limit=k,
+            query_filter=qfilter,
+            with_payload=True,
+        ).points
+    return [_hit(p) for p in res]
+
+
+def search_many(queries, k=TOP_K_VECTOR, qfilters=None):
+    """Stage 4 for a batch: one embed request and one Qdrant batch query.
+
+    `qfilters` is None or a list parallel to `queries`. Returns one hit list
+    per query, in order, identical to calling search() on each.
+    """
+    if not queries:
+        return []
+    qfilters = qfilters or [None] * len(queries)
+    vecs = _query_vectors(queries)
+    with span("vector_search", queries=len(queries), backend=VECTOR_BACKEND,
+              filtered=any(f is not None for f in qfilters)):
+        if VECTOR_BACKEND == "numpy":
+            from .npstore import collection
+            return [[_hit(p) for p in pts] for pts in
+                    collection(COLLECTION).query_batch(vecs, k, qfilters)]
+        res = _store().query_batch_points(
+            collection_name=COLLECTION,
+            requests=[QueryRequest(query=v, filter=f, limit=k,
+                                   with_payload=True)
+                      for v, f in zip(vecs, qfilters)],
+        )
+    return [[_hit(p) for p in r.points] for r in res]
 
 
 # Authority precedence.
@@ -185,6 +273,47 @@ def _rank_key(h, authority_aware):
     return (1, 0, -h.rerank_score)
 
 
+def _score(pairs):
+    """Cross-encoder scores for (query, text) pairs, in one predict call."""
+    if not pairs:
+        return []
+    model = _cross_encoder()
+    with span("cross_encoder.predict", pairs=len(pairs)):
+        return [float(s) for s in model.predict(pairs)]
+
+
+def score_many(queries, pools):
+    """Set rerank_score on every hit of every pool with a single predict call.
+
+    Scoring (query, chunk) pairs across all questions together lets the
+    cross-encoder run full batches instead of one short batch per question.
+    Pairs already in the score cache skip the cross-encoder entirely, so only
+    genuinely new (query, chunk text) pairs are predicted.
+    """
+    from .score_cache import cache, pair_key
+
+    flat = [(q, h) for q, pool in zip(queries, pools) for h in pool]
+    model = scorer_id()
+    keys = [pair_key(q, h.chunk_id, h.text, model) for q, h in flat]
+    with span("score_cache.load", pairs=len(keys)) as rec:
+        known = cache().get_many(keys)
+        rec["hits"] = len(known)
+
+    todo = list(dict.fromkeys(k for k in keys if k not in known))
+    if todo:
+        first = {}
+        for k, (q, h) in zip(keys, flat):
+            first.setdefault(k, (q, h.text))
+        fresh = dict(zip(todo, _score([first[k] for k in todo])))
+        cache().put_many(list(fresh.items()))
+        known.update(fresh)
+
+    for k, (_, h) in zip(keys, flat):
+        h.rerank_score = known[k]
+        h.final_score = known[k]
+    return pools
+
+
 def _fetch_parent(query, doc_id):
     """Pull the best chunk of a named binding document into the pool.
 
@@ -193,14 +322,28 @@ def _fetch_parent(query, doc_id):
     FAQ chunks and no subscription_guide). The pointer names the document, so
     fetch it directly rather than hoping similarity surfaces it.
     """
-    hits = search(query, k=3, qfilter=build_filter(doc_ids=doc_id))
-    if not hits:
-        return None
-    scores = _cross_encoder().predict([(query, h.text) for h in hits])
-    for h, s in zip(hits, scores):
-        h.rerank_score = float(s)
-        h.final_score = h.rerank_score
-    return max(hits, key=lambda h: h.rerank_score)
+    return _fetch_parents_many([(query, doc_id)])[(query, doc_id)]
+
+
+def _fetch_parents_many(wanted):
+    """_fetch_parent for many (query, doc_id) pairs: one search, one predict."""
+    wanted = list(dict.fromkeys(wanted))
+    if not wanted:
+        return {}
+    with span("parent_fetch", parents=len(wanted)):
+        pools = search_many([q for q, _ in wanted], k=3,
+                            qfilters=[build_filter(doc_ids=d)
+                                      for _, d in wanted])
+        score_many([q for q, _ in wanted], pools)
+    return {key: (max(hits, key=lambda h: h.rerank_score) if hits else None)
+            for key, hits in zip(wanted, pools)}
+
+
+def _missing_parents(hits):
+    """Binding parents named by a hit in the pool that the pool does not hold."""
+    have = {h.doc_id for h in hits}
+    return list(dict.fromkeys(h.restates for h in hits
+                              if h.restates and h.restates not in have))
 
 
 def _promote_binding_parents(query, ranked, pool, fetch_missing=True):
@@ -237,22 +380,52 @@ def _promote_binding_parents(query, ranked, pool, fetch_missing=True):
     return out
 
 
+def _order(query, hits, k, authority_aware, fetch_missing, parents=()):
+    """Apply authority precedence to already scored hits and cut to k."""
+    ranked = sorted(hits, key=lambda h: _rank_key(h, authority_aware))
+    if authority_aware:
+        ranked = _promote_binding_parents(query, ranked,
+                                          list(hits) + list(parents),
+                                          fetch_missing=fetch_missing)
+    return ranked[:k]
+
+
 def rerank(query, hits, k=TOP_K_RERANK, authority_aware=True,
            fetch_missing=True):
     """Stage 5: cross-encoder rerank, apply authority precedence, cut to k."""
     if not hits:
         return []
-    pairs = [(query, h.text) for h in hits]
-    scores = _cross_encoder().predict(pairs)
-    for h, s in zip(hits, scores):
-        h.rerank_score = float(s)
-        h.final_score = h.rerank_score
+    with span("rerank", queries=1, candidates=len(hits)):
+        score_many([query], [hits])
+        return _order(query, hits, k, authority_aware, fetch_missing)
 
-    ranked = sorted(hits, key=lambda h: _rank_key(h, authority_aware))
-    if authority_aware:
-        ranked = _promote_binding_parents(query, ranked, hits,
-                                          fetch_missing=fetch_missing)
-    return ranked[:k]
+
+def rerank_many(queries, pools, k=TOP_K_RERANK, authority_aware=True,
+                fetch_missing=True, scored=False):
+    """Stage 5 for a batch, returning what rerank() returns for each pool.
+
+    Every pool is scored in one predict call, then every binding parent that is
+    missing from any pool is fetched in one more search and predict, instead of
+    one of each per question. Pass scored=True when score_many() has already
+    run on these pools, for example to order the same pools twice with and
+    without authority.
+    """
+    if not scored:
+        with span("rerank", queries=len(queries),
+                  candidates=sum(len(p) for p in pools)):
+            score_many(queries, pools)
+    parents = {}
+    if authority_aware and fetch_missing:
+        parents = _fetch_parents_many(
+            [(q, d) for q, pool in zip(queries, pools)
+             for d in _missing_parents(pool)])
+    out = []
+    for q, pool in zip(queries, pools):
+        mine = [p for (pq, _), p in parents.items()
+                if pq == q and p is not None]
+        out.append(_order(q, pool, k, authority_aware, fetch_missing=False,
+                          parents=mine) if pool else [])
+    return out
 
 
 def retrieve(query, k_vector=TOP_K_VECTOR, k_final=TOP_K_RERANK, qfilter=None):
@@ -262,6 +435,21 @@ def retrieve(query, k_vector=TOP_K_VECTOR, k_final=TOP_K_RERANK, qfilter=None):
     return [h for h in ranked if h.rerank_score >= MIN_RERANK_SCORE]
 
 
+def retrieve_many(queries, k_vector=TOP_K_VECTOR, k_final=TOP_K_RERANK,
+                  qfilters=None, authority_aware=True):
+    """retrieve() for many questions at once, pipelined stage by stage.
+
+    One batched embed request for every query, one Qdrant batch query, one
+    cross-encoder pass over every (query, chunk) pair, one batched parent
+    fetch. Returns the same Hit lists retrieve() would, in query order.
+    """
+    pools = search_many(queries, k=k_vector, qfilters=qfilters)
+    ranked = rerank_many(queries, pools, k=k_final,
+                         authority_aware=authority_aware)
+    return [[h for h in r if h.rerank_score >= MIN_RERANK_SCORE]
+            for r in ranked]
+
+
 def demo():
     import sys
     try:
@@ -269,7 +457,7 @@ def demo():
     except Exception:
         pass
 
-    print(f"Qdrant mode: {store_mode()}\n")
+    print(f"Vector store: {store_mode()}\n")
 
     queries = [
         ("can I pause my subscription", None),
@@ -0,0 +1,163 @@
+"""
+Persistent cross-encoder score cache.
+
+The reranker scores the same (query, chunk) pairs over and over: the retrieval
+eval orders every pool with and without authority, the floor sweep rescores the
+whole set, and the drift test asks the same four questions each run. A
+cross-encoder score is a pure function of the model, the query and the chunk
+text, so it is computed once and kept.
+
+  key        model (and backend, when not fp32), query, chunk_id and a hash
+             of the chunk text. Editing a chunk changes its hash, so its old
+             scores are never served again; they simply stop being read and
+             age out.
+  bound      at most RERANK_CACHE_MAX rows, least recently used evicted first
+  counters   hits and misses for this process, from stats()
+
+Same storage choice as embed_store: one SQLite file in WAL mode, so concurrent
+eval runs can share it.
+
+    python -m rag.score_cache            # size and counters
+    python -m rag.score_cache clear
+"""
+
+import hashlib
+import sqlite3
+import sys
+import threading
+
+from .config import RERANK_CACHE, RERANK_CACHE_MAX, RERANK_MODEL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    key        TEXT PRIMARY KEY,
+    score      REAL NOT NULL,
+    last_used  INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_scores_lru ON scores(last_used);
+"""
+
+_IN_BATCH = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def pair_key(query, chunk_id, text, model=RERANK_MODEL):
+    raw = f"{model}|{query}|{chunk_id}|{text_hash(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """Size-bounded LRU of cross-encoder scores on a SQLite file."""
+
+    def __init__(self, path=RERANK_CACHE, max_rows=RERANK_CACHE_MAX):
+        self.path = path
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=30,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # A logical clock rather than wall time, so LRU order survives clock
+        # changes and ties between rows touched in the same call are harmless.
+        self._tick = self._db.execute(
+            "SELECT COALESCE(MAX(last_used), 0) FROM scores").fetchone()[0]
+
+    def get_many(self, keys):
+        """Return {key: score} for cached keys and count hits and misses."""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            self._tick += 1
+            for start in range(0, len(keys), _IN_BATCH):
+                part = keys[start:start + _IN_BATCH]
+                marks = ",".join("?" * len(part))
+                found.update(self._db.execute(
+                    f"SELECT key, score FROM scores WHERE key IN ({marks})",
+                    part).fetchall())
+            if found:
+                with self._db:
+                    self._db.executemany(
+                        "UPDATE scores SET last_used=? WHERE key=?",
+                        [(self._tick, k) for k in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, score) pairs, then evict down to max_rows."""
+        if not items:
+            return
+        with self._lock:
+            self._tick += 1
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO scores VALUES (?,?,?)",
+                    [(k, float(s), self._tick) for k, s in items])
+                n = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+                if n > self.max_rows:
+                    self._db.execute(
+                        "DELETE FROM scores WHERE key IN (SELECT key FROM "
+                        "scores ORDER BY last_used LIMIT ?)",
+                        (n - self.max_rows,))
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        looked = self.hits + self.misses
+        return {"rows": rows, "max_rows": self.max_rows, "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / looked if looked else 0.0}
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM scores")
+        with self._lock:
+            self._db.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScoreCache()
+    return _cache
+
+
+def stats():
+    """Process counters and size of the shared cache."""
+    return cache().stats()
+
+
+def report():
+    s = stats()
+    return (f"rerank score cache: {s['hits']} hits, {s['misses']} misses "
+            f"({s['hit_rate']:.0%}), {s['rows']}/{s['max_rows']} rows")
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "stats":
+        print(report())
+    elif cmd == "clear":
+        cache().clear()
+        print(f"cleared {RERANK_CACHE.name}")
+    else:
+        raise SystemExit(f"unknown command '{cmd}', use stats or clear")
+
+
+if __name__ == "__main__":
+    main()
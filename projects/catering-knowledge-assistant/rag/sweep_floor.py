@@ -13,24 +13,16 @@ cases = [c for c in json.load(open("rag/eval_set.json", encoding="utf-8"))
 auth = [c for c in cases if c.get("top_doc")]
 print(f"{len(cases)} corpus questions, {len(auth)} authority-tagged\n", flush=True)
 
-def scored(query, hits):
-    s = R._cross_encoder().predict([(query, h.text) for h in hits])
-    for h, v in zip(hits, s):
-        h.rerank_score = float(v); h.final_score = float(v)
-    return hits
-
-pools, parents = {}, {}
-for i, c in enumerate(cases, 1):
-    pools[c["id"]] = scored(c["question"], R.search(c["question"], k=TOP_K_VECTOR))
-    # Pre-resolve any binding parent that is missing from the pool.
-    have = {h.doc_id for h in pools[c["id"]]}
-    for h in pools[c["id"]]:
-        if h.restates and h.restates not in have:
-            key = (c["id"], h.restates)
-            if key not in parents:
-                parents[key] = R._fetch_parent(c["question"], h.restates)
-    print(f"  scored {i}/{len(cases)}", end="\r", flush=True)
-print(" " * 40, end="\r")
+# One embed request, one Qdrant batch query and one cross-encoder pass for the
+# whole set, then one more batched search and pass for the missing parents.
+questions = [c["question"] for c in cases]
+pools = dict(zip((c["id"] for c in cases),
+                 R.score_many(questions, R.search_many(questions, k=TOP_K_VECTOR))))
+# Pre-resolve any binding parent that is missing from the pool.
+wanted = [(c["id"], c["question"], d) for c in cases
+          for d in R._missing_parents(pools[c["id"]])]
+fetched = R._fetch_parents_many([(q, d) for _, q, d in wanted])
+parents = {(cid, d): fetched[(q, d)] for cid, q, d in wanted}
 
 def rank(c, floor):
     R.RELEVANCE_FLOOR = floor
@@ -62,6 +54,8 @@ for floor in [-12.0, -8.0, -6.0, -4.0, -2.0, 0.0, 2.0, 4.0, 6.0, 8.0]:
 
 best = max(rows, key=lambda r: (r[1], r[2]))
 print(f"\nbest: floor {best[0]}  precedence {best[1]:.1%}  precision {best[2]:.1%}")
+from rag.score_cache import report
+print(report())
 if best[4]:
     print("remaining failures:")
     for i, want, got, q in best[4]:
@@ -10,10 +10,21 @@ Every tool here is a fixed, parameterised query. The model chooses which tool
 to call and supplies arguments; it never writes SQL, never sees the schema and
 cannot list tables or dump records. That boundary is what makes the database
 safe to expose to a chat interface.
+
+The tools read through a small pool of read-only connections (opened with
+mode=ro and query_only, so a tool cannot write even by mistake). Reusing a
+connection also reuses its compiled statements, so a repeated tool call skips
+both the open and the SQL parse. Name lookup uses the customer_names trigram
+index and the delivery and protein tools read tables that build_database.py
+materialises, so no call scans or aggregates the base tables.
 """
 
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
+from pathlib import Path
 
 from .config import DB_PATH
 
@@ -22,12 +33,38 @@ SIM_TODAY = date(2026, 9, 1)
 ROTATION_ANCHOR = date(2026, 8, 3)
 
 
-def _conn():
-    c = sqlite3.connect(DB_PATH)
+POOL_SIZE = 4
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _open_readonly(path):
+    uri = Path(path).resolve().as_uri() + "?mode=ro"
+    c = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                        cached_statements=256)
     c.row_factory = sqlite3.Row
+    c.execute("PRAGMA query_only=1")
     return c
 
 
+@contextmanager
+def _conn():
+    """Borrow a pooled read-only connection to DB_PATH for one tool call."""
+    with _pools_lock:
+        pool = _pools.setdefault(str(DB_PATH), queue.LifoQueue())
+    try:
+        c = pool.get_nowait()
+    except queue.Empty:
+        c = _open_readonly(DB_PATH)
+    try:
+        yield c
+    finally:
+        if pool.qsize() < POOL_SIZE:
+            pool.put(c)
+        else:
+            c.close()
+
+
 def _parse_date(s):
     if isinstance(s, date):
         return s
@@ -46,6 +83,27 @@ def _parse_date(s):
     raise ValueError(f"Could not read the date '{s}'")
 
 
+def _name_matches(cur, who):
+    """Customers whose name contains `who`, case-insensitively.
+
+    The trigram index answers substring queries of three or more characters
+    from the index; anything shorter, or a database built before the index
+    existed, falls back to the LIKE scan, which has the same semantics.
+    """
+    if len(who) >= 3:
+        try:
+            return cur.execute(
+                "SELECT c.* FROM customer_names f JOIN customers c "
+                "ON c.customer_id = f.customer_id "
+                "WHERE customer_names MATCH ? ORDER BY f.rowid",
+                ('"' + who.replace('"', '""') + '"',)).fetchall()
+        except sqlite3.OperationalError:
+            pass
+    return cur.execute(
+        "SELECT * FROM customers WHERE name LIKE ?", (f"%{who}%",)
+    ).fetchall()
+
+
 def _find_customer(cur, who):
     who = (who or "").strip()
     row = cur.execute(
@@ -53,9 +111,7 @@ def _find_customer(cur, who):
     ).fetchone()
     if row:
         return row
-    rows = cur.execute(
-        "SELECT * FROM customers WHERE name LIKE ?", (f"%{who}%",)
-    ).fetchall()
+    rows = _name_matches(cur, who)
     if len(rows) == 1:
         return rows[0]
     if len(rows) > 1:
@@ -143,14 +199,17 @@ def get_delivery_list(order_date: str = "today", service: str = "all") -> dict:
             return {"tool": "get_delivery_list", "date": d.isoformat(),
                     "closed": True, "reason": "Weekend, no service",
                     "total_meals": 0}
-        sql = ("SELECT service, dish_en, dish_zh, COUNT(*) n FROM orders "
-               "WHERE order_date=?")
-        args = [d.isoformat()]
+        # Both forms are fixed strings, so each compiles once per connection.
         if service in ("lunch", "dinner"):
-            sql += " AND service=?"
-            args.append(service)
-        sql += " GROUP BY service, dish_en ORDER BY service"
-        rows = cur.execute(sql, args).fetchall()
+            rows = cur.execute(
+                "SELECT service, dish_en, dish_zh, n FROM delivery_counts "
+                "WHERE order_date=? AND service=? ORDER BY service, dish_en",
+                (d.isoformat(), service)).fetchall()
+        else:
+            rows = cur.execute(
+                "SELECT service, dish_en, dish_zh, n FROM delivery_counts "
+                "WHERE order_date=? ORDER BY service, dish_en",
+                (d.isoformat(),)).fetchall()
         return {"tool": "get_delivery_list", "date": d.isoformat(),
                 "weekday": d.strftime("%A"), "closed": False,
                 "breakdown": [dict(r) for r in rows],
@@ -192,11 +251,15 @@ def get_dishes_by_protein(protein: str) -> dict:
              "beef": "beef", "poultry": "chicken"}
     p = alias.get(p, p)
     with _conn() as c:
-        rows = c.execute(
-            "SELECT rotation_week, weekday_name, service, dish_zh, dish_en, "
-            "price_daily FROM menu_rotation WHERE LOWER(protein) LIKE ? "
-            "ORDER BY rotation_week, weekday_num, service", (f"%{p}%",)
-        ).fetchall()
+        cols = ("SELECT rotation_week, weekday_name, service, dish_zh, "
+                "dish_en, price_daily FROM dishes_by_protein ")
+        order = " ORDER BY rotation_week, weekday_num, service"
+        # Exact protein names hit the index; a fragment ("chick") still works
+        # through the substring match the tool has always accepted.
+        rows = c.execute(cols + "WHERE protein_lc=?" + order, (p,)).fetchall()
+        if not rows:
+            rows = c.execute(cols + "WHERE protein_lc LIKE ?" + order,
+                             (f"%{p}%",)).fetchall()
         return {"tool": "get_dishes_by_protein", "protein": p,
                 "count": len(rows), "dishes": [dict(r) for r in rows],
                 "note": "" if rows else
@@ -241,12 +304,60 @@ TOOL_SPECS = [
 ]
 
 
+def entity_names():
+    """Every delivery area, customer name and dish name in the database.
+
+    Not a tool: the answer cache reads these so a question naming any of them,
+    in whatever case, never shares an entry with one naming another.
+    """
+    with _conn() as c:
+        rows = c.execute(
+            "SELECT area FROM customers UNION SELECT name FROM customers "
+            "UNION SELECT dish_en FROM menu_rotation "
+            "UNION SELECT dish_zh FROM menu_rotation").fetchall()
+    return sorted({r[0].strip() for r in rows if r[0] and r[0].strip()})
+
+
 def call_tool(name, args):
     if name not in TOOLS:
         raise KeyError(f"Unknown tool '{name}'")
     return TOOLS[name](**args)
 
 
+def bench(path, repeats=2000):
+    """Median microseconds per tool call against the database at `path`."""
+    import statistics
+    import time
+
+    global DB_PATH
+    DB_PATH = Path(path)
+    with _conn() as c:
+        who = c.execute(
+            "SELECT name, customer_id FROM customers WHERE plan_type='monthly' "
+            "ORDER BY rowid DESC LIMIT 1").fetchone()
+        n_orders = c.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    calls = [
+        ("get_customer_summary, by id", get_customer_summary, (who["customer_id"],)),
+        ("get_meals_remaining, by name", get_meals_remaining, (who["name"],)),
+        ("get_cycle_end_date, by name", get_cycle_end_date, (who["name"],)),
+        ("get_delivery_list", get_delivery_list, ("2026-08-27",)),
+        ("get_menu_for_date", get_menu_for_date, ("2026-09-01",)),
+        ("get_dishes_by_protein", get_dishes_by_protein, ("chicken",)),
+    ]
+    print(f"{Path(path).name}: {n_orders} orders, {repeats} calls per tool\n")
+    print(f"{'tool':<32}{'median us':>12}{'p95 us':>10}")
+    print("-" * 54)
+    for label, fn, args in calls:
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn(*args)
+            times.append((time.perf_counter() - t0) * 1e6)
+        times.sort()
+        print(f"{label:<32}{statistics.median(times):>12.0f}"
+              f"{times[int(len(times) * 0.95)]:>10.0f}")
+
+
 if __name__ == "__main__":
     import json
     import sys
@@ -254,6 +365,10 @@ if __name__ == "__main__":
         sys.stdout.reconfigure(encoding="utf-8")
     except Exception:
         pass
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        # python -m rag.tools bench [path]   e.g. tasty_kitchen_x100.db
+        bench(sys.argv[2] if len(sys.argv) > 2 else DB_PATH)
+        sys.exit()
     with _conn() as c:
         who = c.execute(
             "SELECT name FROM customers WHERE plan_type='monthly' LIMIT 1"
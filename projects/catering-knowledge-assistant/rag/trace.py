@@ -0,0 +1,96 @@
+"""
+Per-stage latency and cost tracing for the RAG pipeline.
+
+A request passes through a dozen stages (query embedding, embedding-cache
+lookup, vector search, cross-encoder scoring, parent fetch, rate-limit waits,
+router and generation calls) and none of them was visible from outside. Each
+stage is now wrapped in span(), which records its wall time plus whatever it
+counted: texts embedded, pairs scored, cache hits, tokens, seconds slept.
+
+Records go one per line to a JSONL file, so a trace survives a crash and can be
+appended to by concurrent runs. Tracing is off unless RAG_TRACE is set, either
+to 1 (writes trace.jsonl) or to a path; when off, span() costs one branch.
+
+    RAG_TRACE=1 python -m rag.evaluate retrieval
+    python -m rag.evaluate trace        # p50 / p95 per stage
+
+Every record carries the id of the request it belongs to. The id lives in a
+context variable, so concurrent questions on the async path keep their spans
+apart.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .config import TRACE_FILE
+
+_setting = os.environ.get("RAG_TRACE", "")
+PATH = None if _setting in ("", "0") else (
+    TRACE_FILE if _setting == "1" else _setting)
+
+_request = contextvars.ContextVar("rag_request", default="-")
+_write_lock = threading.Lock()
+_out = None
+_seq = itertools.count()
+
+
+def enabled():
+    return PATH is not None
+
+
+def _emit(rec):
+    global _out
+    with _write_lock:
+        if _out is None:
+            _out = open(PATH, "a", encoding="utf-8", buffering=1)
+        _out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+@contextmanager
+def request(label=""):
+    """Group every span inside under one request id."""
+    token = _request.set(f"{uuid.uuid4().hex[:8]}-{next(_seq)}")
+    try:
+        with span("request", label=label[:80]) as rec:
+            yield rec
+    finally:
+        _request.reset(token)
+
+
+@contextmanager
+def span(stage, **counts):
+    """Time a stage. Yields a dict the stage can add counts to as it learns them."""
+    if PATH is None:
+        yield counts
+        return
+    rec = dict(counts)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec.update(ts=round(time.time(), 3), request=_request.get(),
+                   stage=stage,
+                   ms=round((time.perf_counter() - t0) * 1e3, 3))
+        _emit(rec)
+
+
+def usage(resp, rec):
+    """Copy Gemini token counts from a response onto a span record."""
+    meta = getattr(resp, "usage_metadata", None)
+    if meta is not None:
+        rec["prompt_tokens"] = getattr(meta, "prompt_token_count", 0) or 0
+        rec["output_tokens"] = getattr(meta, "candidates_token_count", 0) or 0
+    return resp
+
+
+def load(path=None):
+    """Read a trace file back as a list of records."""
+    path = path or PATH or TRACE_FILE
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -12,18 +12,23 @@ Original file is located at
 
 # ==== Imports ====
 from __future__ import annotations
+import hashlib
 import json
+import os
 import pandas as pd
 import re
 import io
 import sys
+import time
 import traceback
+from itertools import islice
 from typing import Any, Dict, Optional
 from tinydb import TinyDB, Query
 from tinydb.storages import MemoryStorage
+from tinydb.table import Document
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
-from IPython.display import HTML, display
+from IPython.display import HTML, Image, display
 import google.generativeai as genai
 
 # Visualization
@@ -149,9 +154,10 @@ def build_schema_block(orders_tbl, customers_tbl, campaigns_tbl) -> str:
     """
     Generate schema description with samples.
     """
-    orders_sample = orders_tbl.all()[:1]
-    customers_sample = customers_tbl.all()[:1] if customers_tbl.all() else []
-    campaigns_sample = campaigns_tbl.all()[:1] if campaigns_tbl.all() else []
+    # islice reads one record, where .all() would copy the whole table
+    orders_sample = list(islice(orders_tbl, 1))
+    customers_sample = list(islice(customers_tbl, 1))
+    campaigns_sample = list(islice(campaigns_tbl, 1))
 
     schema = f"""
 === TABLE 1: ORDERS (orders_tbl) === [READ-ONLY]
@@ -225,6 +231,9 @@ Execution Environment (already imported/provided):
   * calculate_days_since(date_str) -> int
 - Libraries: Query, datetime, Counter, defaultdict, plt, sns
 - Natural language: user_request: str
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['segment'], params['amount'], params['name'], ... instead of hard-coding them, so the
+  program can be reused with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings.
 
 PLANNING RULES (critical):
 - Derive ALL filters/parameters from user_request
@@ -306,13 +315,16 @@ def generate_llm_code(
     campaigns_tbl,
     model: str = "gemini-2.0-flash-exp",
     temperature: float = 0.3,
+    params: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
     Ask Gemini to produce a plan-with-code response.
     Returns the FULL response (including <execute_python> tags).
     """
-    schema_block = build_schema_block(orders_tbl, customers_tbl, campaigns_tbl)
-    full_prompt = MARKETING_AGENT_PROMPT.format(schema_block=schema_block, question=prompt)
+    schema_block = schema_context(orders_tbl, customers_tbl, campaigns_tbl)["schema_block"]
+    full_prompt = MARKETING_AGENT_PROMPT.format(
+        schema_block=schema_block, question=prompt, params=json.dumps(params or {})
+    )
 
     generation_config = {
         "temperature": temperature,
@@ -331,6 +343,265 @@ def generate_llm_code(
 
 print("✅ Code generation function loaded!")
 
+"""### Sandboxed Executor
+
+Generated code used to run with `exec` inside the notebook process. That swapped `sys.stdout` for everyone, copied the whole DataFrame on every call, and had no limits: one runaway loop froze the notebook. `SandboxExecutor` runs it in a pool of worker processes instead:
+
+- **Shared orders, private writes.** TinyDB tables are Python dicts that cannot live in shared memory, so workers inherit the read-only orders table when forked. The customers and campaigns tables travel with each task. A plan's writes come back only if it succeeds, and are applied under a lock. If another plan wrote to the tables in the meantime, the plan runs again on the new rows. Without fork (Windows), or with `SANDBOX_WORKERS=0`, plans run in the notebook on a scratch in-memory copy of the tables, and their writes are applied the same way.
+- **Pre-warmed workers.** Workers are forked once, with the libraries, the notebook's helpers and the orders table already loaded. Forking from the kernel, which runs threads of its own, can leave a worker stuck on a lock another thread held; the timeout catches it and the worker is replaced.
+- **Limits per task.** Each task has CPU seconds, a memory budget and a wall-clock timeout. A task that overruns its time has its worker killed and replaced.
+- **Own stdout per task.** Several questions can execute at once without mixing their logs. Charts come back as PNGs.
+"""
+
+# =========================
+# Sandboxed Executor: Worker Pool, Limits
+# =========================
+
+import contextlib
+import copy
+import multiprocessing as mp
+import pickle
+import queue
+import signal
+import threading
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "60"))  # wall-clock seconds per task
+SANDBOX_CPU_SECONDS = float(os.environ.get("SANDBOX_CPU_SECONDS", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "2048"))  # on top of what a worker starts with
+
+# Variables generated code may set, returned from every task
+ANSWER_NAMES = ("answer_text", "answer_json", "answer_rows")
+
+
+class CpuLimitExceeded(BaseException):
+    """A BaseException, so `except Exception` in generated code cannot swallow it."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Cap this process's private memory at what it uses now plus memory_mb."""
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/status") as f:
+            used = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmData:"))
+    except (OSError, StopIteration):
+        return
+    limit = used + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def _drain_figures() -> list:
+    """PNG bytes of every open figure, then close them all."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    figures = []
+    for num in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+        figures.append(buffer.getvalue())
+    plt.close("all")
+    return figures
+
+
+def _picklable(values: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for name, value in values.items():
+        try:
+            pickle.dumps(value)
+            out[name] = value
+        except Exception:
+            out[name] = repr(value)
+    return out
+
+
+def _failure(message: str, limit: Optional[str] = None) -> Dict[str, Any]:
+    return {"stdout": "", "stderr": "", "error": message, "limit": limit, "outputs": {},
+            "figures": [], "cpu_seconds": None, "seconds": None}
+
+
+class SandboxExecutor:
+    """
+    Runs generated code in a pool of pre-warmed worker processes.
+
+    namespace holds the libraries, helpers, TinyDB tables and other objects
+    tasks may use. Workers are forked, so they inherit it, and every module
+    already imported, as it was when they started. setup(namespace) runs
+    before each task and collect(namespace) returns extra outputs after it.
+    Both see the task's inputs.
+
+    Without fork (Windows), or with workers=0, tasks run inline in the
+    notebook, one at a time and unlimited. setup must then keep the task
+    off anything the notebook owns, since nothing is a private copy.
+
+    Workers are forked from the kernel, which has threads of its own, and
+    replacements are forked from this pool's dispatch threads. Only the
+    forking thread exists in the child, so a lock another thread held at
+    that moment (logging, the allocator, a BLAS pool) stays held there.
+    A worker that deadlocks on one is caught by the wall-clock timeout and
+    replaced, at the cost of that task. forkserver or spawn would avoid
+    this, but workers could no longer inherit the namespace and data,
+    which is what makes them pre-warmed.
+    """
+
+    def __init__(
+        self,
+        namespace: Optional[Dict[str, Any]] = None,
+        *,
+        setup=None,
+        collect=None,
+        workers: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT,
+        cpu_seconds: float = SANDBOX_CPU_SECONDS,
+        memory_mb: int = SANDBOX_MEMORY_MB,
+    ):
+        try:
+            self._context = mp.get_context("fork")
+        except ValueError:
+            self._context = None
+        self.workers = workers if self._context else 0
+        self.namespace = dict(namespace or {})
+        self.setup, self.collect = setup, collect
+        self.timeout, self.cpu_seconds, self.memory_mb = timeout, cpu_seconds, memory_mb
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="sandbox")
+
+    # ---- worker side ----
+
+    def _spawn(self) -> tuple:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=self._serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _serve(self, conn) -> None:
+        # The notebook's stdout/stderr belong to the kernel; never write to them from here
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+        warnings.filterwarnings("ignore", message=".*non-interactive.*")
+        import matplotlib
+        matplotlib.use("Agg", force=True)
+        _limit_memory(self.memory_mb)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            conn.send(self._run(task, limits=True))
+
+    def _run(self, task: tuple, limits: bool = False) -> Dict[str, Any]:
+        code, inputs = task
+        namespace = dict(self.namespace)
+        namespace.update(inputs)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        error = limit = None
+        start_cpu, start = time.process_time(), time.perf_counter()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if limits:
+                signal.setitimer(signal.ITIMER_PROF, self.cpu_seconds)
+            try:
+                if self.setup:
+                    self.setup(namespace)
+                exec(code, namespace)
+            except CpuLimitExceeded:
+                limit, error = "cpu", f"CPU limit exceeded: the code used more than {self.cpu_seconds:g} CPU seconds"
+            except MemoryError:
+                limit, error = "memory", f"Memory limit exceeded: the code needed more than {self.memory_mb} MB"
+            except BaseException:  # SystemExit too: a task never ends its worker
+                error = traceback.format_exc()
+            finally:
+                if limits:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            outputs = {name: namespace[name] for name in ANSWER_NAMES if name in namespace}
+            if self.collect and error is None:
+                outputs.update(self.collect(namespace))
+            figures = _drain_figures()
+        return {
+            "stdout": stdout.getvalue().strip(),
+            "stderr": stderr.getvalue().strip(),
+            "error": error,
+            "limit": limit,
+            "outputs": _picklable(outputs),
+            "figures": figures,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "seconds": time.perf_counter() - start,
+        }
+
+    # ---- notebook side ----
+
+    def submit(self, code: str, **inputs) -> Future:
+        """Queue code for the next free worker. inputs are added to its namespace."""
+        return self._dispatch.submit(self._execute, (code, inputs))
+
+    def run(self, code: str, **inputs) -> Dict[str, Any]:
+        """
+        Execute code and wait for it.
+
+        Returns:
+            dict: stdout, stderr, error (traceback or limit message), limit
+            ('cpu', 'memory', 'timeout' or None), outputs (answer variables
+            the code set), figures (PNG bytes), cpu_seconds and seconds
+        """
+        return self.submit(code, **inputs).result()
+
+    def _execute(self, task: tuple) -> Dict[str, Any]:
+        if not self.workers:
+            return self._run(task)
+        process, conn = self._idle.get()
+        try:
+            conn.send(task)
+        except BaseException:  # e.g. unpicklable inputs; nothing reached the worker
+            self._idle.put((process, conn))
+            raise
+        try:
+            if conn.poll(self.timeout):
+                result = conn.recv()
+                if result["limit"] != "memory":
+                    self._idle.put((process, conn))
+                    return result
+            else:
+                result = _failure(f"Timed out: the code ran for more than {self.timeout:g} seconds", "timeout")
+        except (EOFError, OSError):
+            process.join(1)
+            result = _failure(f"The worker exited unexpectedly (exit code {process.exitcode})")
+        # Stuck, dead or near its memory cap: replace the worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._idle.put(self._spawn())
+        return result
+
+    def close(self) -> None:
+        """Stop the workers."""
+        self._dispatch.shutdown(wait=True)
+        for _ in range(self.workers):
+            process, conn = self._idle.get()
+            process.kill()
+            process.join()
+            conn.close()
+        self.workers = 0
+
+print("✅ Sandboxed executor ready!")
+
+
 def _extract_execute_block(text: str) -> str:
     """
     Extract Python code from <execute_python>...</execute_python> tags.
@@ -348,6 +619,124 @@ def _extract_execute_block(text: str) -> str:
     return code.strip()
 
 
+# Tables generated plans may write to: sent with every task, applied from its result
+WRITABLE_TABLES = ("customers", "campaigns")
+
+# Runs of one plan before giving up on concurrent writes to the same tables
+SANDBOX_ATTEMPTS = 5
+
+# One live pool per notebook, rebuilt when the orders change
+_SANDBOXES: Dict[str, tuple] = {}
+_TABLES_LOCK = threading.Lock()
+
+# In a worker: the tables it was forked with, left untouched, and the copy in service
+_PRISTINE: Dict[tuple, tuple] = {}
+
+
+def _table_docs(db) -> Dict[str, Dict[int, dict]]:
+    return {name: {doc.doc_id: dict(doc) for doc in db.table(name)} for name in WRITABLE_TABLES}
+
+
+def _load_table_docs(db, tables: Dict[str, Dict[int, dict]]) -> None:
+    for name, docs in tables.items():
+        table = db.table(name)
+        table.truncate()
+        table.insert_multiple(Document(doc, doc_id=doc_id) for doc_id, doc in docs.items())
+
+
+def table_version(tbl) -> tuple:
+    """
+    A version of the table's data, cheap to compare. TinyDB swaps in a new
+    dict for a table on every insert, update or removal, so the dict's id
+    changes with the data; its contents may not, as an update edits the
+    records in place. The dict rides along so its id is not reused while
+    the version is held.
+    """
+    data = (tbl.storage.read() or {}).get(tbl.name)
+    return id(data), data
+
+
+def _restore_tables(db, names) -> None:
+    """
+    Put the named tables back as the worker was forked with them, if the last
+    task wrote to them. The forked data stays untouched and a copy serves the
+    tasks; a write replaces the copy's dict, and the next task gets a new one.
+    """
+    tables = db.storage.read() or {}
+    for name in names:
+        key = (id(db), name)
+        pristine, live = _PRISTINE.get(key) or (tables.get(name) or {}, None)
+        if live is None or tables.get(name) is not live:
+            live = copy.deepcopy(pristine)
+            _PRISTINE[key] = (pristine, live)
+            tables[name] = live
+            db.table(name).clear_cache()
+    db.storage.write(tables)
+
+
+def _plan_tables(db, namespace: Dict[str, Any]) -> None:
+    """
+    Load the customers and campaigns rows the plan was given, over orders held
+    read-only. A forked worker loads them into its own inherited copy of db,
+    after restoring the orders if a previous plan wrote to them. Inline, db is
+    the notebook's own, so the plan gets a scratch in-memory copy instead and
+    the notebook's tables change only when execute_generated_code applies the
+    result.
+    """
+    if mp.parent_process() is None:
+        scratch = TinyDB(storage=MemoryStorage)
+        scratch.storage.write({name: {doc_id: dict(doc) for doc_id, doc in docs.items()}
+                               for name, docs in (db.storage.read() or {}).items()})
+        namespace.update(db=scratch, orders_tbl=scratch.table(namespace["orders_tbl"].name),
+                         customers_tbl=scratch.table("customers"), campaigns_tbl=scratch.table("campaigns"))
+    else:
+        _restore_tables(db, (namespace["orders_tbl"].name,))
+    _load_table_docs(namespace["db"], namespace["_tables"])
+
+
+def marketing_sandbox(db, orders_tbl, refresh: bool = False) -> SandboxExecutor:
+    """
+    The executor for the marketing tables. Workers inherit db and orders_tbl
+    when forked, and the pool is rebuilt when the orders are written to. Pass
+    refresh=True after an edit TinyDB did not make, such as a record changed
+    in place in the storage.
+    """
+    key = (id(db), table_version(orders_tbl))
+    current = _SANDBOXES.get("tinydb")
+    if current and current[0] == key and not refresh:
+        return current[1]
+    if current:
+        current[1].close()
+    executor = SandboxExecutor(
+        namespace={
+            "Query": Query,
+            "datetime": datetime,
+            "timedelta": timedelta,
+            "Counter": Counter,
+            "defaultdict": defaultdict,
+            "re": re,
+            "sum": sum,
+            "len": len,
+            "max": max,
+            "min": min,
+            "sorted": sorted,
+            "get_next_customer_id": get_next_customer_id,
+            "get_next_campaign_id": get_next_campaign_id,
+            "calculate_days_since": calculate_days_since,
+            "plt": plt,
+            "sns": sns,
+            "db": db,
+            "orders_tbl": orders_tbl,
+            "customers_tbl": db.table("customers"),
+            "campaigns_tbl": db.table("campaigns"),
+        },
+        setup=lambda namespace: _plan_tables(db, namespace),
+        collect=lambda namespace: {"_tables": _table_docs(namespace["db"])},
+    )
+    _SANDBOXES["tinydb"] = (key, executor)
+    return executor
+
+
 def execute_generated_code(
     code_or_content: str,
     *,
@@ -356,73 +745,256 @@ def execute_generated_code(
     customers_tbl,
     campaigns_tbl,
     user_request: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
-    Execute code in a controlled namespace.
-    Following template pattern: safe globals + locals.
+    Execute code in the sandboxed worker pool.
+    The plan works on a copy of the customers and campaigns tables; its
+    writes are applied here only if it ran without an error. refresh=True
+    restarts the workers on the orders as they are now.
     """
     code = _extract_execute_block(code_or_content)
+    sandbox = marketing_sandbox(db, orders_tbl, refresh)
+
+    for _ in range(SANDBOX_ATTEMPTS):
+        before = _table_docs(db)
+        run = sandbox.run(code, _tables=before, user_request=user_request or "", params=dict(params or {}))
+        after = run["outputs"].pop("_tables", None)
+        with _TABLES_LOCK:
+            if after is None or after == before:
+                break
+            # Apply only on top of the rows the plan saw
+            if _table_docs(db) == before:
+                _load_table_docs(db, after)
+                break
+    else:
+        run["error"] = f"The tables changed under this plan {SANDBOX_ATTEMPTS} times; its writes were not applied"
 
-    # SAFE_GLOBALS: Functions and libraries
-    SAFE_GLOBALS = {
-        "Query": Query,
-        "datetime": datetime,
-        "timedelta": timedelta,
-        "Counter": Counter,
-        "defaultdict": defaultdict,
-        "user_request": user_request or "",
-        "re": re,
-        "sum": sum,
-        "len": len,
-        "max": max,
-        "min": min,
-        "sorted": sorted,
-        "get_next_customer_id": get_next_customer_id,
-        "get_next_campaign_id": get_next_campaign_id,
-        "calculate_days_since": calculate_days_since,
-        "plt": plt,
-        "sns": sns,
-    }
-
-    # SAFE_LOCALS: Database tables
-    SAFE_LOCALS = {
-        "db": db,
-        "orders_tbl": orders_tbl,
-        "customers_tbl": customers_tbl,
-        "campaigns_tbl": campaigns_tbl,
-    }
-
-    # Capture stdout
-    _stdout_buf, _old_stdout = io.StringIO(), sys.stdout
-    sys.stdout = _stdout_buf
-    err_text = None
-
-    try:
-        exec(code, SAFE_GLOBALS, SAFE_LOCALS)
-    except Exception:
-        err_text = traceback.format_exc()
-    finally:
-        sys.stdout = _old_stdout
-
-    printed = _stdout_buf.getvalue().strip()
+    for png in run["figures"]:
+        display(Image(data=png))
 
     # Extract answer
     answer = (
-        SAFE_LOCALS.get("answer_text")
-        or SAFE_LOCALS.get("answer_rows")
-        or SAFE_LOCALS.get("answer_json")
+        run["outputs"].get("answer_text")
+        or run["outputs"].get("answer_rows")
+        or run["outputs"].get("answer_json")
         or "No answer generated"
     )
 
     return {
         "code": code,
-        "stdout": printed,
-        "error": err_text,
+        "stdout": run["stdout"],
+        "error": run["error"],
         "answer": answer,
     }
 
 print("✅ Code execution function loaded!")
 
+"""### Generated-Code Cache
+
+Segment counts, top-customer lists and campaign requests come back again and again, often with only a segment, amount or name changed. A program that ran cleanly is kept on disk and reused instead of asking Gemini again:
+
+- **Memoised schema.** `schema_context` builds the schema block once per version of the three tables. It is fingerprinted by their sizes and sample records, so a new profile or campaign rebuilds it.
+- **Question shapes.** `normalize_question` turns *"Create a campaign targeting VIP customers who spent over $2000"* into the shape `create a campaign targeting <segment> customers who spent over <amount>` plus `params = {'amount': 2000, 'segment': 'VIP'}`.
+- **Validated programs.** Programs are stored under the exact question. Those that read every value from `params` are also stored under the shape alone. Programs are keyed on each table's fields, so a program written while customers_tbl was empty is not reused once it has profiles.
+"""
+
+CODE_CACHE_DIR = os.environ.get("CODE_CACHE_DIR", ".code_cache")
+
+SEGMENTS = ["VIP", "Regular", "At-Risk", "New", "Churned"]
+
+# Above this many versions of the data, the schema memo starts over
+SCHEMA_MEMO_SIZE = 8
+
+_SCHEMA_MEMO: Dict[str, Dict[str, Any]] = {}
+
+
+def table_fingerprint(*tables) -> str:
+    """
+    Fingerprint TinyDB tables from their sizes and the sample records the
+    schema block shows, read without copying the tables.
+    """
+    raw = json.dumps([[len(tbl), list(islice(tbl, 1))] for tbl in tables], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def schema_context(orders_tbl, customers_tbl, campaigns_tbl, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Schema block, filter vocabulary and table fields, rebuilt only when the
+    tables change. Pass refresh=True after an edit the fingerprint cannot see,
+    such as an update to a record other than the first.
+    """
+    key = table_fingerprint(orders_tbl, customers_tbl, campaigns_tbl)
+    context = None if refresh else _SCHEMA_MEMO.get(key)
+    if context is None:
+        if len(_SCHEMA_MEMO) >= SCHEMA_MEMO_SIZE:
+            _SCHEMA_MEMO.clear()
+        regions, categories = set(), set()
+        for order in orders_tbl:
+            regions.add(order.get("Region"))
+            categories.add(order.get("Category"))
+        context = {
+            "schema_block": build_schema_block(orders_tbl, customers_tbl, campaigns_tbl),
+            "vocab": {
+                "segment": SEGMENTS,
+                "region": sorted(str(v) for v in regions if v),
+                "category": sorted(str(v) for v in categories if v),
+            },
+            "fields": [sorted(next(iter(tbl), {})) for tbl in (orders_tbl, customers_tbl, campaigns_tbl)],
+        }
+        _SCHEMA_MEMO[key] = context
+    return context
+
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_QUOTED = re.compile(r"(?<!\w)['\"]([^'\"]+)['\"](?!\w)")
+_MONTH_YEAR = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?\s+((?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+_QUARTER = re.compile(r"\bq([1-4])\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+_AMOUNT = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)(k\b)?", re.IGNORECASE)
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+_NUMBER = re.compile(r"\b(\d+)\b")
+
+
+def _amount(match: re.Match) -> float:
+    value = float(match.group(1).replace(",", "")) * (1000 if match.group(2) else 1)
+    return int(value) if value.is_integer() else value
+
+
+def normalize_question(question: str, vocab: Optional[Dict[str, list]] = None) -> tuple:
+    """
+    Split a question into its shape and its parameters.
+
+    Quoted names, months, quarters, dollar amounts, years, known filter values
+    (vocab, e.g. {'region': ['East', ...]}) and other numbers become
+    placeholders, then case and punctuation are dropped:
+
+        "Top 5 products in the West in 2024?"
+        -> ("top <n> products in the <region> in <year>",
+            {'n': 5, 'region': 'West', 'year': 2024})
+
+    Returns:
+        tuple: (shape, params)
+    """
+    params: Dict[str, Any] = {}
+
+    def take(kind: str, value) -> str:
+        name, i = kind, 2
+        while name in params:
+            name, i = f"{kind}_{i}", i + 1
+        params[name] = value
+        return f" <{name}> "
+
+    text = _QUOTED.sub(lambda m: take("name", m.group(1)), question)
+    text = _MONTH_YEAR.sub(
+        lambda m: take("month", f"{m.group(2)}-{MONTHS.index(m.group(1)[:3].lower()) + 1:02d}"), text
+    )
+    text = _QUARTER.sub(lambda m: take("quarter", f"{m.group(2)}Q{m.group(1)}"), text)
+    text = _AMOUNT.sub(lambda m: take("amount", _amount(m)), text)
+    text = _YEAR.sub(lambda m: take("year", int(m.group(1))), text)
+    for kind, values in (vocab or {}).items():
+        # Longest first, so 'Home & Furniture' is not taken as 'Home'
+        for value in sorted(values, key=len, reverse=True):
+            pattern = re.compile(rf"(?<![\w<]){re.escape(value)}(?![\w>])", re.IGNORECASE)
+            text = pattern.sub(lambda m, k=kind, v=value: take(k, v), text)
+    text = _NUMBER.sub(lambda m: take("n", int(m.group(1))), text)
+
+    shape = " ".join(re.sub(r"[^\w<>]+", " ", text.lower()).split())
+    return shape, params
+
+
+def uses_params(code: str, params: Dict[str, Any]) -> bool:
+    """
+    True when code reads every parameter from params and writes none of their
+    values as a literal, so it answers any question of the same shape.
+    """
+    for name, value in params.items():
+        if not re.search(rf"params\s*(?:\[|\.get\()\s*['\"]{re.escape(name)}['\"]", code):
+            return False
+        if re.search(rf"(?<![\w.]){re.escape(str(value))}(?![\w.])", code, re.IGNORECASE):
+            return False
+    return True
+
+
+def program_scope(context: Dict[str, Any], model: str, prompt: str) -> str:
+    """Programs are reusable while the backend, fields, prompt and model stay the same."""
+    raw = json.dumps([context.get("backend"), context["fields"], prompt, model], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CodeCache:
+    """
+    Validated generated programs on disk, one JSON file per key.
+
+    Looked up by exact question (shape plus parameter values) first, then by
+    shape alone. Only parameterised programs are stored by shape, so a
+    variation never reuses a hard-coded answer.
+    """
+
+    def __init__(self, folder: str = CODE_CACHE_DIR):
+        self.folder = folder
+        self.counts = {"exact": 0, "template": 0, "miss": 0}
+
+    def _path(self, scope: str, shape: str, params: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps([scope, shape, params], sort_keys=True, default=str)
+        return os.path.join(self.folder, f"{hashlib.sha256(raw.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, scope: str, shape: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry plus 'match' ('exact' or 'template'), or None."""
+        for match, path in (("exact", self._path(scope, shape, params)), ("template", self._path(scope, shape))):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.counts[match] += 1
+            return {**entry, "match": match}
+        self.counts["miss"] += 1
+        return None
+
+    def put(self, scope: str, shape: str, params: Dict[str, Any], question: str, content: str, code: str) -> Dict[str, Any]:
+        entry = {
+            "created_at": time.time(),
+            "question": question,
+            "params": params,
+            "parameterised": uses_params(code, params),
+            "content": content,
+        }
+        paths = [self._path(scope, shape, params)]
+        if params and entry["parameterised"]:
+            paths.append(self._path(scope, shape))
+        os.makedirs(self.folder, exist_ok=True)
+        for path in paths:
+            # Write then rename, so a reader never sees half a file
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        return entry
+
+    def discard(self, scope: str, shape: str, params: Dict[str, Any]) -> None:
+        """Forget the programs stored for a question, e.g. after one failed on reuse."""
+        for path in (self._path(scope, shape, params), self._path(scope, shape)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def summary(self) -> str:
+        c = self.counts
+        saved = c["exact"] + c["template"]
+        return f"Code cache: {c['exact']} exact + {c['template']} template hits, {c['miss']} misses ({saved} LLM calls saved)"
+
+
+CODE_CACHE = CodeCache()
+
+print("✅ Generated-code cache loaded!")
+
 def marketing_agent(
     question: str,
     *,
@@ -432,11 +1004,12 @@ def marketing_agent(
     campaigns_tbl,
     model: str = "gemini-2.0-flash-exp",
     temperature: float = 0.3,
+    use_cache: bool = True,
 ) -> dict:
     """
     End-to-end marketing agent:
     1) Show question
-    2) Generate plan-as-code
+    2) Reuse a stored plan, or generate plan-as-code
     3) Show before snapshots
     4) Execute
     5) Show answer and after snapshots
@@ -444,20 +1017,30 @@ def marketing_agent(
     # 1) Show question
     print_html(question, "User Question")
 
-    # 2) Generate plan
-    full_content = generate_llm_code(
-        question,
-        orders_tbl=orders_tbl,
-        customers_tbl=customers_tbl,
-        campaigns_tbl=campaigns_tbl,
-        model=model,
-        temperature=temperature,
-    )
-    print_html(full_content, "Plan with Code (Full Response)")
+    context = schema_context(orders_tbl, customers_tbl, campaigns_tbl)
+    shape, params = normalize_question(question, context["vocab"])
+    scope = program_scope(context, model, MARKETING_AGENT_PROMPT)
+
+    # 2) Reuse a stored plan, or generate one
+    cached = CODE_CACHE.get(scope, shape, params) if use_cache else None
+    if cached:
+        full_content = cached["content"]
+        print_html(full_content, f"Stored Plan ({cached['match']} match, no LLM call)")
+    else:
+        full_content = generate_llm_code(
+            question,
+            orders_tbl=orders_tbl,
+            customers_tbl=customers_tbl,
+            campaigns_tbl=campaigns_tbl,
+            model=model,
+            temperature=temperature,
+            params=params,
+        )
+        print_html(full_content, "Plan with Code (Full Response)")
 
     # 3) Before snapshots
-    print_html(json.dumps(customers_tbl.all()[:3], indent=2), "Customers Table · Before")
-    print_html(json.dumps(campaigns_tbl.all()[:3], indent=2), "Campaigns Table · Before")
+    print_html(json.dumps(list(islice(customers_tbl, 3)), indent=2), "Customers Table · Before")
+    print_html(json.dumps(list(islice(campaigns_tbl, 3)), indent=2), "Campaigns Table · Before")
 
     # 4) Execute
     exec_res = execute_generated_code(
@@ -467,8 +1050,18 @@ def marketing_agent(
         customers_tbl=customers_tbl,
         campaigns_tbl=campaigns_tbl,
         user_request=question,
+        params=params,
     )
 
+    # Keep plans that ran cleanly for the next time this is asked. A stored plan
+    # that fails is dropped; its writes were never applied, so asking again
+    # regenerates it against unchanged tables.
+    ok = not exec_res["error"] and exec_res["answer"] != "No answer generated"
+    if use_cache and not cached and ok:
+        CODE_CACHE.put(scope, shape, params, question, full_content, exec_res["code"])
+    elif cached and not ok:
+        CODE_CACHE.discard(scope, shape, params)
+
     # 5) Show results
     if exec_res["error"]:
         print_html(exec_res["error"], "❌ Execution Error")
@@ -478,11 +1071,12 @@ def marketing_agent(
             print_html(exec_res["stdout"], "Debug Logs")
 
     # After snapshots
-    print_html(json.dumps(customers_tbl.all()[:3], indent=2), "Customers Table · After")
-    print_html(json.dumps(campaigns_tbl.all()[:3], indent=2), "Campaigns Table · After")
+    print_html(json.dumps(list(islice(customers_tbl, 3)), indent=2), "Customers Table · After")
+    print_html(json.dumps(list(islice(campaigns_tbl, 3)), indent=2), "Campaigns Table · After")
 
     return {
         "full_content": full_content,
+        "cached": cached["match"] if cached else None,
         "exec": exec_res,
     }
 
@@ -598,4 +1192,13 @@ result = marketing_agent(
     orders_tbl=orders_tbl,
     customers_tbl=customers_tbl,
     campaigns_tbl=campaigns_tbl,
-)
\ No newline at end of file
+)
+result = marketing_agent(
+    "Who are our top 5 customers by profit?",
+    db=db,
+    orders_tbl=orders_tbl,
+    customers_tbl=customers_tbl,
+    campaigns_tbl=campaigns_tbl,
+)
+
+print(CODE_CACHE.summary())
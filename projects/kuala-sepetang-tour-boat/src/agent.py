@@ -27,6 +27,7 @@ from __future__ import annotations
 
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from pathlib import Path
 
@@ -144,23 +145,43 @@ def system_prompt() -> str:
 # Tool execution, shared by both providers
 # ---------------------------------------------------------------------------
 
+# Tools that only read may run side by side: a turn that asks about three days
+# waits for the slowest fetch rather than the sum of them, and two asks for
+# the same dates still share one fetch in the forecast cache. The editor
+# writes the session's schedule, so its calls run one at a time, in the order
+# the model made them.
+PARALLEL_TOOLS = {"get_current_datetime", "get_boat_conditions"}
+TOOL_WORKERS = 4
+
+
 def run_tools(blocks: list[dict], session: str = "demo") -> list[dict]:
-    """One tool_result per tool_use block. Errors come back as results with
-    is_error set, never as exceptions, so the model can correct itself."""
-    out = []
-    for b in blocks:
-        try:
-            result = T.run_tool(b["name"], b["input"], session)
-            out.append({
-                "type": "tool_result", "tool_use_id": b["id"],
-                "content": json.dumps(result, default=str), "is_error": False,
-            })
-        except Exception as exc:                       # noqa: BLE001
-            out.append({
-                "type": "tool_result", "tool_use_id": b["id"],
-                "content": f"Error: {exc}", "is_error": True,
-            })
-    return out
+    """One tool_result per tool_use block, in the order asked. Errors come
+    back as results with is_error set, never as exceptions, so the model can
+    correct itself."""
+    reads = [b for b in blocks if b["name"] in PARALLEL_TOOLS]
+    if len(reads) < 2:
+        return [_run_tool(b, session) for b in blocks]
+
+    with ThreadPoolExecutor(max_workers=min(len(reads), TOOL_WORKERS),
+                            thread_name_prefix="tool") as pool:
+        pending = {id(b): pool.submit(_run_tool, b, session) for b in reads}
+        done = {id(b): _run_tool(b, session) for b in blocks if id(b) not in pending}
+        return [pending[id(b)].result() if id(b) in pending else done[id(b)]
+                for b in blocks]
+
+
+def _run_tool(b: dict, session: str) -> dict:
+    try:
+        result = T.run_tool(b["name"], b["input"], session)
+        return {
+            "type": "tool_result", "tool_use_id": b["id"],
+            "content": json.dumps(result, default=str), "is_error": False,
+        }
+    except Exception as exc:                           # noqa: BLE001
+        return {
+            "type": "tool_result", "tool_use_id": b["id"],
+            "content": f"Error: {exc}", "is_error": True,
+        }
 
 
 def _rebuild(message) -> list[dict]:
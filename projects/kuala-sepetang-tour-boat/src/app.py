@@ -16,13 +16,14 @@ gates were run against, so what the screen shows is what was proven.
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 import agent
@@ -41,11 +42,91 @@ app = FastAPI(title="Kuala Sepetang Tour Boat", version="1.0")
 
 # ---------------------------------------------------------------------------
 
+# A board is the same answer until the weather under it is refetched, the
+# bookings change, a departure closes to moves or the date rolls over. Until
+# then a reload is served from here. The key carries the forecast cache mtimes,
+# so a fetch by anyone, the chat included, retires every board built on the
+# weather it replaced.
+_BOARDS: dict[tuple, tuple[datetime, dict, bytes]] = {}
+
+# The forecast snapshot baked into the image, if there is one, so the first
+# board after a cold start reads the weather rather than fetching it.
+F.load_snapshot()
+
+
+def _board_key(start: date, ndays: int, version: tuple | None) -> tuple | None:
+    if version is None:
+        return None
+    return (start, ndays, version, R.bookings_version())
+
+
+def _board_expires(start: date, ndays: int, now: datetime) -> datetime:
+    """When the plan could first change without the weather changing: the next
+    departure to close to moves, or midnight."""
+    notice = timedelta(minutes=C.MIN_NOTICE_MINUTES)
+    closes = [R.departure_dt((start + timedelta(days=i)).isoformat(), s["id"]) - notice
+              for i in range(ndays) for s in C.SLOTS]
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return min([c for c in closes if c > now] + [midnight])
+
+
 def build_board(start: date, ndays: int) -> dict:
-    bookings = R.load_bookings(start)
-    raw = F.get_days(start, ndays)          # one request for the whole board
-    plan = R.plan(raw, bookings)
+    hit = _cached_board(start, ndays)
+    return (hit or _finish_board(start, ndays, *F.get_days_versioned(start, ndays)))[0]
+
+
+async def board_json(start: date, ndays: int) -> bytes:
+    """
+    build_board for the endpoint, already encoded. A cold board waits for
+    Open-Meteo on the event loop rather than in one of the server's threads,
+    so a slow fetch holds up nobody but the requests that need it; scoring
+    then runs on a worker thread so the loop stays free to answer cached
+    boards meanwhile.
+    """
+    hit = _cached_board(start, ndays)
+    if hit:
+        return hit[1]
+    raw, version = await F.get_days_async(start, ndays)   # one request for the whole board
+    return (await asyncio.to_thread(_finish_board, start, ndays, raw, version))[1]
+
+
+def _cached_board(start: date, ndays: int) -> tuple[dict, bytes] | None:
+    key = _board_key(start, ndays, F.cache_version(start, ndays))
+    hit = _BOARDS.get(key) if key else None
+    if hit and datetime.now() < hit[0]:
+        return hit[1], hit[2]
+    return None
+
+
+def _finish_board(start: date, ndays: int, raw: list[dict],
+                  version: tuple) -> tuple[dict, bytes]:
+    # Filed under the version raw was read under, not whatever the cache holds
+    # by now: a refetch landing meanwhile must not pass this board off as new.
+    key = _board_key(start, ndays, version)
+    out = render_board(raw, R.load_bookings(start))
+    # Encoded once, here, rather than by FastAPI per response: its encoder
+    # walks every value of the board again each time, about 7 ms for five
+    # days, which is most of what a cached board cost to serve. These are
+    # the bytes JSONResponse would have sent.
+    body = json.dumps(out, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+    if key:
+        if len(_BOARDS) > 64:
+            _BOARDS.clear()
+        _BOARDS[key] = (_board_expires(start, ndays, datetime.now()), out, body)
+    return out, body
+
+
+def render_board(raw: list[dict], bookings: dict) -> dict:
+    """
+    The page for a run of day payloads, every departure scored once.
+
+    The seat board scores each slot and each activity into the days' memos;
+    the plan reads that board, and the comparison and the cells below read the
+    same memos, so nothing is scored twice however many views want it.
+    """
     board = R.build_board(raw, bookings)
+    plan = R.plan(raw, bookings, board)
     by_party = {r["party"]["id"]: r for r in plan["results"]}
 
     days = []
@@ -90,8 +171,11 @@ def build_board(start: date, ndays: int) -> dict:
 
 
 # The board is free to serve but not free to fetch: Open-Meteo's open tier is
-# 10,000 calls a day and the cache does not survive an instance recycling. A
-# plain per-address cap keeps one impatient visitor from spending the quota.
+# 10,000 calls a day and the cache does not survive an instance recycling,
+# beyond what the baked-in snapshot carries. A plain per-address cap keeps one
+# impatient visitor from spending the quota. The count lives in the instance,
+# so across max-instances 3 the ceiling is three times this; a shared counter
+# would need a store this deploy does not have, and the quota has room for it.
 _HITS: dict[str, list[float]] = {}
 RATE_PER_MINUTE = 20
 
@@ -111,13 +195,14 @@ def _rate_limit(request: Request) -> None:
 
 
 @app.get("/api/board")
-def api_board(request: Request, start: str | None = None, days: int = 5):
+async def api_board(request: Request, start: str | None = None, days: int = 5):
     _rate_limit(request)
     try:
         d = F.parse_date(start) if start else date.today()
-        return build_board(d, max(1, min(days, 10)))
+        body = await board_json(d, max(1, min(days, 10)))
     except F.ForecastError as e:
         raise HTTPException(400, str(e))
+    return Response(body, media_type="application/json")
 
 
 @app.get("/api/replies")
@@ -0,0 +1,176 @@
+"""
+The forecast cache against a local Open-Meteo, offline.
+
+A stand-in serves synthetic weather over HTTP on this machine, forecast.py is
+pointed at it, and the cache goes through what a Cloud Run instance sees: a
+cold start, a warm one, a burst of boards opened together, weather going
+stale and going out of date, a refetch that fails, and a restart from the
+snapshot. Each step counts the calls that reached the stand-in, which is what
+the Open-Meteo quota pays for, and times the board's get_days.
+
+    cold        nothing cached                        one call, waits for it
+    memory      the same days again                   no call
+    disk        memory dropped, files kept            no call
+    burst       BURST boards at once, cold            one call between them
+    stale       past the TTL, inside the grace        served now, one call behind
+    failing     stale, and the refetch fails          still served, no error
+    expired     past twice the TTL                    one call, waits for it
+    snapshot    cache wiped, snapshot unpacked        no call
+
+The stand-in holds every reply back by DELAY, so the burst really overlaps
+and the cold and expired rows show what waiting on a fetch costs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import forecast as F
+import synthetic as S
+
+DAYS = 7
+BURST = 16
+DELAY = 0.3
+RESULTS = Path(__file__).resolve().parent.parent / "results"
+
+
+def _age(start: date, ndays: int, ttls: float) -> None:
+    """Backdate every cached day to `ttls` of its own TTL, and drop memory so
+    the new age is what gets read."""
+    for i in range(ndays):
+        t = start + timedelta(days=i)
+        when = time.time() - F._ttl_seconds(t) * ttls
+        os.utime(F._cache_path("forecast", t), (when, when))
+    F._MEMORY.clear()
+
+
+def _settle(stub: S.OpenMeteoStandIn, timeout: float = 10) -> None:
+    """Wait for background refetches to finish."""
+    end = time.time() + timeout
+    while time.time() < end:
+        live = [t for t in threading.enumerate() if t.name.startswith("revalidate-")]
+        if not live:
+            return
+        live[0].join(timeout=0.05)
+
+
+def run(ndays: int = DAYS) -> dict:
+    start = date.today()
+    rows = []
+    failed = False
+
+    with S.OpenMeteoStandIn(delay=DELAY) as stub:
+        F.FORECAST_URL = stub.url
+
+        def step(name: str, expect: int, fn, check=None, after=None):
+            nonlocal failed
+            before = len(stub.requests)
+            t0 = time.perf_counter()
+            fn()
+            ms = (time.perf_counter() - t0) * 1000
+            calls = len(stub.requests) - before
+            _settle(stub)
+            if after:
+                after()
+            behind = len(stub.requests) - before - calls
+            ok = calls + behind == expect and (check() if check else True)
+            failed |= not ok
+            rows.append({"step": name, "ms": round(ms, 2), "calls": calls,
+                         "background_calls": behind, "expected_calls": expect,
+                         "pass": ok})
+            print(f"  {name:<9} {ms:9.2f} ms  {calls:>2} call{'s' if calls != 1 else ' '}"
+                  f"  {behind:>2} behind  {'PASS' if ok else 'FAIL'}")
+
+        def board():
+            return F.get_days(start, ndays)
+
+        print(f"Forecast cache benchmark, {ndays} days, stand-in delay {DELAY * 1000:.0f} ms")
+        step("cold", 1, board)
+        step("memory", 0, board)
+
+        def disk():
+            F._MEMORY.clear()
+            board()
+        step("disk", 0, disk)
+
+        def burst():
+            shutil.rmtree(F.CACHE_DIR, ignore_errors=True)
+            F._MEMORY.clear()
+            go = threading.Barrier(BURST)
+            errors = []
+
+            def one():
+                go.wait()
+                try:
+                    board()
+                except Exception as exc:              # noqa: BLE001
+                    errors.append(exc)
+            threads = [threading.Thread(target=one) for _ in range(BURST)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            if errors:
+                raise errors[0]
+        step("burst", 1, burst)
+
+        versions = {}
+
+        def stale():
+            _age(start, ndays, 1.5)
+            versions["stale"] = F.cache_version(start, ndays)
+            board()
+        step("stale", 1, stale,
+             check=lambda: versions["stale"] is not None
+             and F.cache_version(start, ndays) not in (None, versions["stale"]))
+
+        def failing():
+            _age(start, ndays, 1.5)
+            versions["failing"] = F.cache_version(start, ndays)
+            stub.fail = True
+            board()
+
+        def recover():
+            stub.fail = False
+            F._FAILED.clear()
+        # _get tries three times before giving up; the board never sees it.
+        step("failing", 3, failing, after=recover,
+             check=lambda: F.cache_version(start, ndays) == versions["failing"])
+
+        def expired():
+            _age(start, ndays, 3)
+            board()
+        step("expired", 1, expired)
+
+        snap = F.CACHE_DIR.parent / "snapshot.json"
+
+        def snapshot():
+            F.save_snapshot(snap)
+            shutil.rmtree(F.CACHE_DIR)
+            F._MEMORY.clear()
+            F.load_snapshot(snap)
+            board()
+        step("snapshot", 0, snapshot)
+
+    out = {"run_at": datetime.now().isoformat(timespec="seconds"), "days": ndays,
+           "burst": BURST, "stand_in_delay_ms": DELAY * 1000, "steps": rows,
+           "gate": "FAIL" if failed else "PASS"}
+    RESULTS.mkdir(exist_ok=True)
+    (RESULTS / "bench-cache.json").write_text(json.dumps(out, indent=1), encoding="utf-8")
+    print(f"\ngate {out['gate']}\nsaved -> results/bench-cache.json")
+    return out
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        F.CACHE_DIR = Path(tmp) / "cache"
+        out = run(*(int(a) for a in sys.argv[1:2]))
+    sys.exit(0 if out["gate"] == "PASS" else 1)
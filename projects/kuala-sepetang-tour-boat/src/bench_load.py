@@ -0,0 +1,168 @@
+"""
+Concurrent boards against the live server, offline.
+
+Starts the app under uvicorn in a child process, on a throwaway cache and
+with Open-Meteo replaced by the local stand-in, which holds every reply back
+by UPSTREAM_DELAY the way a busy afternoon at the real one does. Then it
+opens boards from many clients at once and reports what each phase served.
+
+    cold    a burst of boards with nothing cached, over a spread of start
+            dates and lengths, so the fetches overlap but do not coincide
+    warm    the same burst again, every board already built
+    mixed   cold boards for dates not yet fetched, and warm ones for dates
+            that are, together: what a visitor with a cached board waits
+            for while other visitors' fetches are out
+
+Each row gives boards a second, the median and 95th percentile latency, and
+the calls and connections that reached the stand-in. The rate limit is lifted
+for the run; everything else is the app as deployed, one worker.
+
+One core runs the server, the stand-in and the clients here, so the figures
+are for comparing two builds on the same machine, not for capacity planning.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+import synthetic as S
+
+CLIENTS = 64
+BOARDS = 192
+UPSTREAM_DELAY = 1.0
+RESULTS = Path(__file__).resolve().parent.parent / "results"
+
+# The server: the real app with its cache and upstream pointed elsewhere.
+SERVER = """
+import pathlib, sys
+import forecast as F
+F.CACHE_DIR = pathlib.Path(sys.argv[1])
+F.FORECAST_URL = sys.argv[2]
+import app, uvicorn
+app.RATE_PER_MINUTE = 10 ** 9
+uvicorn.run(app.app, host="127.0.0.1", port=int(sys.argv[3]), log_level="warning")
+"""
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_up(base: str, timeout: float = 30) -> None:
+    end = time.time() + timeout
+    while True:
+        try:
+            async with httpx.AsyncClient() as c:
+                (await c.get(f"{base}/api/health")).raise_for_status()
+            return
+        except httpx.HTTPError:
+            if time.time() > end:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def _burst(base: str, queries: list[dict], clients: int) -> list[float]:
+    """Every query once, `clients` at a time over a shared keep-alive pool.
+    Returns the latencies in ms, in the order of `queries`."""
+    pool = httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=clients,
+                                                              max_keepalive_connections=clients))
+    gate = asyncio.Semaphore(clients)
+    out = [0.0] * len(queries)
+
+    async def one(i: int, q: dict):
+        async with gate:
+            t0 = time.perf_counter()
+            board = (await pool.get(f"{base}/api/board", params=q)).raise_for_status().json()
+            out[i] = (time.perf_counter() - t0) * 1000
+            assert len(board["days"]) == q["days"], board
+
+    await asyncio.gather(*(one(i, q) for i, q in enumerate(queries)))
+    await pool.aclose()
+    return out
+
+
+def _row(name: str, ms: list[float], wall: float, stub: S.OpenMeteoStandIn,
+         before: tuple[int, int]) -> dict:
+    ms = sorted(ms)
+    row = {"phase": name, "boards": len(ms),
+           "boards_per_s": round(len(ms) / wall, 1),
+           "p50_ms": round(ms[len(ms) // 2], 1),
+           "p95_ms": round(ms[int(len(ms) * 0.95) - 1], 1),
+           "upstream_calls": len(stub.requests) - before[0],
+           "upstream_connections": len(stub.peers) - before[1]}
+    print(f"  {name:<7} {row['boards']:>6} {row['boards_per_s']:>9} {row['p50_ms']:>9} "
+          f"{row['p95_ms']:>9} {row['upstream_calls']:>6} {row['upstream_connections']:>6}")
+    return row
+
+
+def _boards(first: int, n: int, longest: int) -> list[dict]:
+    """n board queries starting `first` to `first` + 4 days out, one to
+    `longest` days long, cycling through every pairing."""
+    today = date.today()
+    return [{"start": (today + timedelta(days=first + i % 5)).isoformat(),
+             "days": 1 + i // 5 % longest} for i in range(n)]
+
+
+async def _phases(base: str, stub: S.OpenMeteoStandIn) -> list[dict]:
+    spread = _boards(0, BOARDS, 5)               # 25 boards over the next nine days
+    # Mixed: boards at 11 to 15 days out are not cached yet, the spread's are.
+    fresh = _boards(11, BOARDS // 2, 1)
+    mixed = [x for pair in zip(fresh, spread) for x in pair]
+
+    rows = []
+    print(f"  {'phase':<7} {'boards':>6} {'boards/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'calls':>6} {'conns':>6}")
+    for name, queries in (("cold", spread), ("warm", spread), ("mixed", mixed)):
+        before = (len(stub.requests), len(stub.peers))
+        t0 = time.perf_counter()
+        ms = await _burst(base, queries, CLIENTS)
+        rows.append(_row(name, ms, time.perf_counter() - t0, stub, before))
+
+    warm = sorted(ms[1::2])
+    rows[-1]["warm_p50_ms"] = round(warm[len(warm) // 2], 1)
+    rows[-1]["warm_p95_ms"] = round(warm[int(len(warm) * 0.95) - 1], 1)
+    print(f"          the warm half alone: p50 {rows[-1]['warm_p50_ms']} ms, "
+          f"p95 {rows[-1]['warm_p95_ms']} ms")
+    return rows
+
+
+def run() -> dict:
+    print(f"Load test, {BOARDS} boards a phase, {CLIENTS} clients, "
+          f"upstream delay {UPSTREAM_DELAY * 1000:.0f} ms")
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp, S.OpenMeteoStandIn(delay=UPSTREAM_DELAY) as stub:
+        server = subprocess.Popen([sys.executable, "-c", SERVER, tmp, stub.url, str(port)],
+                                  cwd=Path(__file__).resolve().parent)
+        try:
+            async def main():
+                await _wait_up(base)
+                return await _phases(base, stub)
+            rows = asyncio.run(main())
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    out = {"run_at": datetime.now().isoformat(timespec="seconds"), "boards": BOARDS,
+           "clients": CLIENTS, "upstream_delay_ms": UPSTREAM_DELAY * 1000, "phases": rows}
+    RESULTS.mkdir(exist_ok=True)
+    (RESULTS / "bench-load.json").write_text(json.dumps(out, indent=1), encoding="utf-8")
+    print("\nsaved -> results/bench-load.json")
+    return out
+
+
+if __name__ == "__main__":
+    run()
+    sys.exit(0)
@@ -0,0 +1,176 @@
+"""
+The rebooking solver against the greedy plan it replaced.
+
+Fifteen days of synthetic weather, the whole horizon the forecast reaches,
+and thousands of synthetic bookings at several sizes and loads. Both planners
+see the same board. For each run this reports what each one kept and
+refunded, what the kept passengers cost in day gaps and rating points, and
+how long it took.
+
+Every plan is checked against the relocation gate's rules as it goes, so a
+faster planner that breaks one of them shows up as a failure, not a win.
+
+    forward         every leg leaves after the departure it replaces
+    not departed    and not inside the notice period
+    capacity        no departure takes more than it had free
+    activity fits   every leg can carry what the party booked
+    seats reconcile every affected party appears once, and every split adds up
+
+Then a sweep of seeded windows, where the solver's whole-party rounding has
+kept a passenger fewer than the greedy plan. plan() falls back on the greedy
+plan when that happens, so the gate fails on any window where it still keeps
+fewer, and the sweep reports how often the fallback won.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import brain as B
+import config as C
+import forecast as F
+import rebooking as R
+import synthetic as S
+
+DAYS = 15
+# (parties, load): how many bookings, and how full they leave the window
+RUNS = ((500, 0.8), (1000, 0.8), (3000, 0.8), (6000, 0.8), (3000, 0.95), (3000, 1.0))
+# (parties, loads, seeds): 48 windows. The weather follows the date, so which
+# windows the rounding alone falls short in varies by day; on 2026-10-18 it was
+# seed 9 at 95% load and seed 6 at 100%.
+SWEEP = (2000, (0.8, 0.9, 0.95, 1.0), range(12))
+RESULTS = Path(__file__).resolve().parent.parent / "results"
+
+
+def _days(start: date, ndays: int) -> list[dict]:
+    raw = S.forecast_response(start, ndays)
+    targets = [start + timedelta(days=i) for i in range(ndays)]
+    split = F._split_range(raw, targets, source="forecast")
+    return [F.ForecastDay(split[t]) for t in targets]
+
+
+def _violations(p: dict, board: dict, now: datetime) -> list[str]:
+    out = []
+    used: dict[tuple, int] = {}
+    notice = now + timedelta(minutes=C.MIN_NOTICE_MINUTES)
+    for r in p["results"]:
+        src = R.departure_dt(r["from"]["date"], r["from"]["slot"])
+        if r["action"] == "move":
+            legs = [(r["move_to"]["date"], r["move_to"]["slot"], r["party"]["size"])]
+        elif r["action"] == "split":
+            legs = [(l["date"], l["slot"], l["take"]) for l in r["split"]]
+            if sum(t for _, _, t in legs) != r["party"]["size"]:
+                out.append(f"SPLIT: {r['party']['id']} legs do not add up")
+        else:
+            legs = []
+        for d, s, take in legs:
+            cell = board[(d, s)]
+            when = R.departure_dt(d, s)
+            if when <= src or when < notice:
+                out.append(f"REACH: {r['party']['id']} to {d} {s}")
+            if cell["rating"] == "poor":
+                out.append(f"POOR: {r['party']['id']} to {d} {s}")
+            if C.resolve_activity(r["party"]["activity"]) not in cell["fits"]:
+                out.append(f"FIT: {r['party']['id']} to {d} {s}")
+            used[(d, s)] = used.get((d, s), 0) + take
+    for key, n in used.items():
+        if n > board[key]["free"]:
+            out.append(f"CAPACITY: {key[0]} {key[1]} takes {n}, had {board[key]['free']} free")
+    ids = [r["party"]["id"] for r in p["results"]]
+    if len(ids) != len(set(ids)) or len(ids) != len(R.affected_parties(board)):
+        out.append("RECONCILE: affected parties and plan lines differ")
+    return out
+
+
+def _cost(p: dict) -> int:
+    """Day-gap and rating points spent, per passenger kept, as the solver counts them."""
+    total = 0
+    for r in p["results"]:
+        src_date = r["from"]["date"]
+        if r["action"] == "move":
+            legs = [(r["move_to"]["date"], r["move_to"]["rating"], r["party"]["size"])]
+        elif r["action"] == "split":
+            legs = [(l["date"], l["rating"], l["take"]) for l in r["split"]]
+        else:
+            continue
+        for d, rating, take in legs:
+            cost = R._day_gap(d, src_date) * 2 + B.RANK[rating] - (d == src_date)
+            total += cost * take
+    return total
+
+
+def _measure(planner, days, bookings, board) -> tuple[dict, float]:
+    t0 = time.perf_counter()
+    p = planner(days, bookings, board)
+    return p, (time.perf_counter() - t0) * 1000
+
+
+def _sweep(days: list[dict], start: date, ndays: int, sweep=SWEEP) -> dict:
+    n, loads, seeds = sweep
+    short, fallbacks, gained, bad = [], 0, 0, []
+    for load in loads:
+        for seed in seeds:
+            bookings = S.bookings(start, ndays, parties=n, load=load, seed=seed)
+            board = R.build_board(days, bookings)
+            now = datetime.now()
+            g = R.greedy_plan(days, bookings, board, now)
+            p = R.plan(days, bookings, board, now)
+            bad += _violations(p, board, now)[:1]
+            fallbacks += p["planner"] == "greedy"
+            gained += p["kept"] - g["kept"]
+            if p["kept"] < g["kept"]:
+                short.append({"load": load, "seed": seed, "greedy": g["kept"], "solver": p["kept"]})
+    windows = len(loads) * len(seeds)
+    print(f"\n  sweep: {windows} windows of {n} parties, solver kept {gained:+d} passengers "
+          f"over greedy, fell back on greedy in {fallbacks}, short in {len(short)}"
+          f"  {'PASS' if not short and not bad else 'FAIL'}")
+    for r in short:
+        print(f"    short  load {r['load']} seed {r['seed']}: {r['solver']} kept, greedy {r['greedy']}")
+    return {"parties": n, "windows": windows, "kept_over_greedy": gained,
+            "greedy_fallbacks": fallbacks, "short": short, "violations": bad[:5]}
+
+
+def run(runs=RUNS, ndays: int = DAYS) -> dict:
+    start = date.today()
+    days = _days(start, ndays)
+    rows = []
+    failed = False
+    print(f"Rebooking benchmark, {ndays} synthetic days")
+    print(f"  {'parties':>7} {'load':>4} {'affected':>8} {'planner':<7} {'kept':>6} {'refunded':>8} "
+          f"{'moved':>6} {'split':>5} {'cost':>7} {'ms':>9}  gate")
+    for n, load in runs:
+        bookings = S.bookings(start, ndays, parties=n, load=load)
+        board = R.build_board(days, bookings)
+        now = datetime.now()
+        row = {"parties": len(bookings["parties"]), "load": load,
+               "capacity": bookings["capacity"]}
+        for name, planner in (("greedy", R.greedy_plan), ("solver", R.plan)):
+            p, ms = _measure(planner, days, bookings, board)
+            bad = _violations(p, board, now)
+            failed |= bool(bad)
+            row[name] = {"kept": p["kept"], "refunded": p["refunded"], "moved": p["moved"],
+                         "split": p["split"], "cancelled": p["cancelled"],
+                         "cost": _cost(p), "ms": round(ms, 1), "violations": bad[:5]}
+            row["affected_parties"] = p["affected_parties"]
+            print(f"  {row['parties']:>7} {load:>4} {p['affected_parties']:>8} {name:<7} {p['kept']:>6} "
+                  f"{p['refunded']:>8} {p['moved']:>6} {p['split']:>5} {row[name]['cost']:>7} "
+                  f"{ms:>9.1f}  {'PASS' if not bad else 'FAIL ' + bad[0]}")
+        rows.append(row)
+
+    sweep = _sweep(days, start, ndays)
+    failed |= bool(sweep["short"] or sweep["violations"])
+
+    out = {"run_at": datetime.now().isoformat(timespec="seconds"), "days": ndays,
+           "runs": rows, "sweep": sweep, "gate": "FAIL" if failed else "PASS"}
+    RESULTS.mkdir(exist_ok=True)
+    (RESULTS / "bench-rebooking.json").write_text(json.dumps(out, indent=1), encoding="utf-8")
+    print("\nsaved -> results/bench-rebooking.json")
+    return out
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run()["gate"] == "PASS" else 1)
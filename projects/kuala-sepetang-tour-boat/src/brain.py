@@ -212,8 +212,14 @@ def _slot(slot_id: str) -> dict:
 
 
 def score_slot(day: dict, slot_id: str, exposure: str = "sheltered") -> dict:
+    day = F.as_day(day)
+    return dict(day.memo(("slot", slot_id, exposure),
+                         lambda: _score_slot(day, slot_id, exposure)))
+
+
+def _score_slot(day: F.ForecastDay, slot_id: str, exposure: str) -> dict:
     s = _slot(slot_id)
-    window = F.slice_window(day, s["start"], s["end"])
+    window = day.window(s["start"], s["end"])
 
     shape = classify_shape(window)
     hazard = assess_hazard(window)
@@ -238,8 +244,8 @@ def score_slot(day: dict, slot_id: str, exposure: str = "sheltered") -> dict:
 
     # What the hour before and after are doing. Rain at 08:00 means a choppy,
     # muddy river at 09:00; rain at 11:00 catches the boat coming in.
-    before = F.hour_value(day, _shift(s["start"], -1), "rain")
-    after = F.hour_value(day, s["end"], "rain")
+    before = day.hour_value(_shift(s["start"], -1), "rain")
+    after = day.hour_value(s["end"], "rain")
 
     conf = confidence_for(day.get("lead_days", 0))
     return {
@@ -295,6 +301,11 @@ def _edge_note(before, after) -> str:
 # ---------------------------------------------------------------------------
 
 def compare_slots(day: dict, exposure: str = "sheltered") -> dict:
+    day = F.as_day(day)
+    return dict(day.memo(("compare", exposure), lambda: _compare_slots(day, exposure)))
+
+
+def _compare_slots(day: F.ForecastDay, exposure: str) -> dict:
     scored = [score_slot(day, s["id"], exposure) for s in C.SLOTS]
 
     def key(v):
@@ -395,6 +406,11 @@ def activities_for_slot(day: dict, slot_id: str) -> list[dict]:
     Where a departure sells as one combined trip, that trip is returned instead
     of its parts, so the board cannot offer a product the operator retired.
     """
+    day = F.as_day(day)
+    return list(day.memo(("activities", slot_id), lambda: _activities_for_slot(day, slot_id)))
+
+
+def _activities_for_slot(day: F.ForecastDay, slot_id: str) -> list[dict]:
     tid, trip = _combined_for_slot(slot_id)
     if trip:
         r = CB.score_combined(day, tid)
@@ -414,7 +430,7 @@ def activities_for_slot(day: dict, slot_id: str) -> list[dict]:
     return _plain_activities_for_slot(day, slot_id)
 
 
-def _plain_activities_for_slot(day: dict, slot_id: str) -> list[dict]:
+def _plain_activities_for_slot(day: F.ForecastDay, slot_id: str) -> list[dict]:
     """The original per-activity match, for every departure without a combined trip."""
     s = _slot(slot_id)
     s_start, s_end = F._minutes(s["start"]), F._minutes(s["end"])
@@ -448,7 +464,7 @@ def _plain_activities_for_slot(day: dict, slot_id: str) -> list[dict]:
         rating, notes = verdict["rating"], []
         rules = C.ACTIVITY_RULES.get(a["id"], {})
 
-        cloud = [c for c in (F.slice_window(day, s["start"], s["end"]).get("h_cloud_cover") or []) if c is not None]
+        cloud = [c for c in (day.window(s["start"], s["end"]).get("h_cloud_cover") or []) if c is not None]
         avg_cloud = sum(cloud) / len(cloud) if cloud else None
 
         # Cloud and moon describe the view, not whether the boat can go out.
@@ -126,13 +126,14 @@ def _score_firefly(w: dict, t: dict, moon_pct: int) -> dict:
 
 def score_combined(day: dict, trip_id: str = "sunset_firefly") -> dict:
     trip = C.COMBINED_TRIPS[trip_id]
+    day = F.as_day(day)
     phases = phase_windows(day, trip)
     on = datetime.strptime(day["date"], "%Y-%m-%d").date()
     moon_pct = M.illumination_pct(on)
 
     scored = {}
     for ph in phases:
-        w = F.slice_window(day, ph["start"], ph["end"])
+        w = day.window(ph["start"], ph["end"])
         if ph["id"] == "sunset":
             r = _sunset_note(w, ph["thresholds"])
             r["rating"] = None            # a note has no rating, by design
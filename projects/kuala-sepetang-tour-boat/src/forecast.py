@@ -17,16 +17,25 @@ eight-hour offset would move every departure without looking broken.
 
 from __future__ import annotations
 
+import asyncio
 import json
+import os
+import random
+import threading
 import time
 import urllib.parse
 import urllib.request
+import weakref
+from bisect import bisect_left
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
-from config import LOCATION
+import httpx
+from config import LOCATION, SLOTS
 
-FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+# Overridable so the app can be pointed at a local stand-in (synthetic.serve).
+FORECAST_URL = os.environ.get("OPEN_METEO_FORECAST_URL",
+                              "https://api.open-meteo.com/v1/forecast")
 ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
 HISTORICAL_FORECAST_URL = "https://historical-forecast-api.open-meteo.com/v1/forecast"
 
@@ -52,6 +61,20 @@ class ForecastError(RuntimeError):
 # ---------------------------------------------------------------------------
 # Cache. TTL scales with lead time: tomorrow's forecast is worth refreshing
 # often, day twelve is not going to move in the next hour.
+#
+# Two tiers. The files under CACHE_DIR are the lasting one, one per kind and
+# date. Memory sits over them and keeps the day as a ForecastDay, so a warm
+# read is a dict lookup rather than a stat and a parse, and the windows and
+# verdicts memoised on the day outlive the request that scored them. A day is
+# stamped with the mtime of the file it was written to; the TTL and
+# cache_version both read that stamp.
+#
+# Past its TTL an entry is stale. For one more TTL it is still served, and one
+# background fetch replaces it, so a reload answers at cache speed and the one
+# after carries the new weather. Older than that, the caller waits for the
+# fetch. Either way a date is fetched by one thread at a time: whoever asks
+# for it while a fetch is out waits for that fetch rather than starting
+# another, so a burst of cold boards costs Open-Meteo one call.
 # ---------------------------------------------------------------------------
 
 def _ttl_seconds(target: date) -> int:
@@ -66,33 +89,339 @@ def _ttl_seconds(target: date) -> int:
 
 
 def _cache_path(kind: str, target: date) -> Path:
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     return CACHE_DIR / f"{kind}_{target.isoformat()}.json"
 
 
-def _read_cache(kind: str, target: date):
-    p = _cache_path(kind, target)
-    if not p.exists():
-        return None
+_MEMORY: dict[Path, tuple[ForecastDay, int]] = {}
+_MEMORY_MAX = 512
+_LOCK = threading.Lock()
+_FLIGHTS: dict[Path, _Flight] = {}
+_FAILED: dict[Path, float] = {}
+RETRY_AFTER = 60          # seconds a failed background refetch waits to be tried again
+
+
+class _Flight:
+    """One fetch in progress. Anyone else who needs its dates waits on it,
+    a thread on `done`, a coroutine through wait_async()."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error: Exception | None = None
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def finish(self, error: BaseException | None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # Cancelled or interrupted: the waiters did not ask for that.
+            error = ForecastError("The weather fetch was interrupted. Try again.")
+        with _LOCK:
+            self.error = error
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    async def wait_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with _LOCK:
+            if self.done.is_set():
+                return
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+        await fut
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _state(kind: str, target: date, stamp: int) -> str:
+    """fresh, stale or expired, for an entry fetched at `stamp` (ns)."""
     # The archive never changes, so it never expires.
-    if kind != "archive" and time.time() - p.stat().st_mtime > _ttl_seconds(target):
-        return None
+    if kind == "archive":
+        return "fresh"
+    age = time.time() - stamp / 1e9
+    ttl = _ttl_seconds(target)
+    return "fresh" if age <= ttl else "stale" if age <= 2 * ttl else "expired"
+
+
+def _lookup(kind: str, target: date) -> tuple[ForecastDay, int] | None:
+    """The cached day and its stamp, from memory or else from disk, whatever
+    its age. None if neither tier has it."""
+    p = _cache_path(kind, target)
+    hit = _MEMORY.get(p)
+    if hit:
+        return hit
     try:
-        return json.loads(p.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
+        stamp = p.stat().st_mtime_ns
+        day = ForecastDay(json.loads(p.read_text(encoding="utf-8")))
+    except (json.JSONDecodeError, OSError, KeyError, ValueError):
         return None
+    return _remember(p, day, stamp)
 
 
-def _write_cache(kind: str, target: date, payload: dict) -> None:
-    _cache_path(kind, target).write_text(
-        json.dumps(payload), encoding="utf-8"
-    )
+def _remember(p: Path, day: ForecastDay, stamp: int) -> tuple[ForecastDay, int]:
+    if len(_MEMORY) >= _MEMORY_MAX:
+        _MEMORY.clear()
+    _MEMORY[p] = (day, stamp)
+    return day, stamp
+
+
+def _write_atomic(p: Path, text: str, stamp: int | None = None) -> None:
+    """Write then rename, so another worker, the eval CLI or save_snapshot never
+    reads half a file and takes it for a miss. `stamp` sets the mtime first."""
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        if stamp is not None:
+            os.utime(tmp, ns=(stamp, stamp))
+        os.replace(tmp, p)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _write_cache(kind: str, target: date, payload: dict,
+                 stamp: int | None = None) -> ForecastDay:
+    p = _cache_path(kind, target)
+    _write_atomic(p, json.dumps(payload), stamp)
+    day = as_day(payload)
+    _remember(p, day, p.stat().st_mtime_ns if stamp is None else stamp)
+    return day
+
+
+def _claim(kind: str, targets: list[date]) -> tuple[list[date], _Flight | None, list[_Flight]]:
+    """Split `targets` into the dates this caller now fetches, under a new
+    flight, and the flights already fetching the rest."""
+    waits: list[_Flight] = []
+    mine: list[date] = []
+    flight = None
+    with _LOCK:
+        for t in targets:
+            f = _FLIGHTS.get(_cache_path(kind, t))
+            if f is None:
+                mine.append(t)
+            elif f not in waits:
+                waits.append(f)
+        if mine:
+            flight = _Flight()
+            for t in mine:
+                _FLIGHTS[_cache_path(kind, t)] = flight
+    return mine, flight, waits
+
+
+def _land(kind: str, mine: list[date], flight: _Flight, error: BaseException | None) -> None:
+    with _LOCK:
+        for t in mine:
+            _FLIGHTS.pop(_cache_path(kind, t), None)
+    flight.finish(error)
+
+
+def _refresh(kind: str, targets: list[date], fetch) -> None:
+    """
+    Fetch `targets` into the cache, once however many callers ask.
+
+    Dates another caller is already fetching are waited for. The rest are
+    claimed and fetched together by fetch(lo, hi), which returns payloads by
+    date. A failed fetch raises in the caller that ran it and in every caller
+    that was waiting on it.
+    """
+    mine, flight, waits = _claim(kind, targets)
+    if mine:
+        error = None
+        try:
+            for t, payload in fetch(min(mine), max(mine)).items():
+                _write_cache(kind, t, payload)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _land(kind, mine, flight, error)
+
+    for f in waits:
+        f.done.wait()
+        if f.error is not None:
+            raise f.error
+
+
+async def _arefresh(kind: str, targets: list[date], afetch) -> None:
+    """_refresh for a coroutine: the same flights, so a thread and a request
+    handler asking for the same date still cost one call."""
+    mine, flight, waits = _claim(kind, targets)
+    if mine:
+        error = None
+        try:
+            for t, payload in (await afetch(min(mine), max(mine))).items():
+                _write_cache(kind, t, payload)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _land(kind, mine, flight, error)
+
+    for f in waits:
+        await f.wait_async()
+        if f.error is not None:
+            raise f.error
+
+
+def _revalidate(kind: str, targets: list[date], fetch) -> None:
+    """Refetch stale dates off the request path. The stale entries stay in
+    service until the new ones land; if the fetch fails they stay a while
+    longer, and the dates are not tried again for RETRY_AFTER seconds."""
+    now = time.time()
+    with _LOCK:
+        due = [t for t in targets
+               if _cache_path(kind, t) not in _FLIGHTS
+               and now - _FAILED.get(_cache_path(kind, t), 0) > RETRY_AFTER]
+    if not due:
+        return
+
+    def run():
+        try:
+            _refresh(kind, due, fetch)
+        except Exception:                            # noqa: BLE001
+            with _LOCK:
+                for t in due:
+                    _FAILED[_cache_path(kind, t)] = time.time()
+
+    threading.Thread(target=run, name=f"revalidate-{kind}", daemon=True).start()
+
+
+def _serve(kind: str, targets: list[date], fetch) -> dict[date, tuple[ForecastDay, int]]:
+    """
+    The cached day and its stamp for each of `targets`, fetching only what has
+    to be.
+
+    Fresh and stale entries come straight back, the stale ones queued for a
+    background refetch. Missing and expired ones are fetched first, in one
+    call spanning the earliest to the latest of them. A date the fetch did not
+    carry is left out of the result.
+    """
+    found, due = _due(kind, targets)
+    if due:
+        _refresh(kind, due, fetch)
+        found, _ = _due(kind, targets)
+    return _served(kind, found, fetch)
+
+
+async def _aserve(kind: str, targets: list[date], afetch,
+                  fetch) -> dict[date, tuple[ForecastDay, int]]:
+    """_serve without blocking the event loop. The background refetch of stale
+    days still runs on a thread, with `fetch`, since nothing waits for it."""
+    found, due = _due(kind, targets)
+    if due:
+        await _arefresh(kind, due, afetch)
+        found, _ = _due(kind, targets)
+    return _served(kind, found, fetch)
+
+
+def _due(kind: str, targets: list[date]) -> tuple[dict, list[date]]:
+    """What the cache holds for `targets`, and the span to fetch if any of
+    them is missing or expired."""
+    found = {t: _lookup(kind, t) for t in targets}
+    due = [t for t, e in found.items() if e is None or _state(kind, t, e[1]) == "expired"]
+    if not due:
+        return found, []
+    lo, hi = min(due), max(due)
+    return found, _span(lo, hi)
+
+
+def _served(kind: str, found: dict, fetch) -> dict[date, tuple[ForecastDay, int]]:
+    states = {t: _state(kind, t, e[1]) for t, e in found.items() if e}
+    stale = [t for t, s in states.items() if s == "stale"]
+    if stale:
+        _revalidate(kind, stale, fetch)
+    return {t: found[t] for t, s in states.items() if s != "expired"}
+
+
+def cache_version(start: date, ndays: int) -> tuple | None:
+    """
+    Which fetch of the weather a run of dates would be read from: the cache
+    stamps, or None if get_days would have to fetch any of them. Two equal
+    versions mean two boards built from the same forecast. A stale date still
+    counts, because it is what get_days serves until its refetch lands, and
+    the landing changes the version.
+    """
+    stamps = []
+    for i in range(ndays):
+        target = start + timedelta(days=i)
+        hit = _lookup("forecast", target)
+        if hit is None or _state("forecast", target, hit[1]) == "expired":
+            return None
+        stamps.append(hit[1])
+    return tuple(stamps)
+
+
+# ---------------------------------------------------------------------------
+# Snapshot. The files under CACHE_DIR do not survive a Cloud Run instance
+# recycling, and with min-instances 0 every wake is a cold cache. A snapshot
+# is the cache in one file, written before a deploy and baked into the image
+# with the rest of data/. On start it is unpacked into the disk tier with each
+# day's original fetch time, so the TTLs run from when the weather was
+# fetched, not from when the image was built: a forecast gone stale in the
+# meantime is refetched as usual, and the archive, which never expires, is
+# free from the first request.
+# ---------------------------------------------------------------------------
+
+SNAPSHOT = Path(os.environ.get("FORECAST_SNAPSHOT")
+                or CACHE_DIR.parent / "forecast-snapshot.json")
+
+
+def save_snapshot(path: Path | None = None) -> int:
+    """Write every unexpired cache entry into one file. Returns how many."""
+    entries = []
+    for p in sorted(CACHE_DIR.glob("*.json")) if CACHE_DIR.exists() else []:
+        kind, _, iso = p.stem.partition("_")
+        try:
+            target = date.fromisoformat(iso)
+        except ValueError:
+            continue
+        hit = _lookup(kind, target)
+        if hit is None or _state(kind, target, hit[1]) == "expired":
+            continue
+        entries.append({"kind": kind, "date": iso, "stamp": hit[1], "payload": hit[0]})
+    _write_atomic(Path(path or SNAPSHOT),
+                  json.dumps({"saved_at": datetime.now().isoformat(timespec="seconds"),
+                              "entries": entries}))
+    return len(entries)
+
+
+def load_snapshot(path: Path | None = None) -> int:
+    """
+    Unpack a snapshot into the cache. Returns how many days it supplied.
+
+    A day already cached from a later fetch is left alone. No snapshot, or an
+    unreadable one, is not an error: the cache just starts cold.
+    """
+    try:
+        snap = json.loads(Path(path or SNAPSHOT).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return 0
+    n = 0
+    for e in snap.get("entries", []):
+        target = date.fromisoformat(e["date"])
+        hit = _lookup(e["kind"], target)
+        if hit is not None and hit[1] >= e["stamp"]:
+            continue
+        _write_cache(e["kind"], target, e["payload"], e["stamp"])
+        n += 1
+    return n
 
 
 # ---------------------------------------------------------------------------
-# HTTP
+# HTTP. Two ways in, one behaviour: _get blocks the calling thread, for the
+# tools and the evals; _aget awaits on the event loop over a keep-alive pool
+# (httpx), for the board endpoint. Both retry three times. The pauses
+# between tries are scattered by half either way, so a crowd of callers that
+# failed together at a busy moment does not come back together.
 # ---------------------------------------------------------------------------
 
+def _backoff(attempt: int) -> float:
+    return 1.5 * (attempt + 1) * random.uniform(0.5, 1.5)
+
+
 def _get(url: str, params: dict, retries: int = 3) -> dict:
     query = urllib.parse.urlencode(params, doseq=True)
     full = f"{url}?{query}"
@@ -104,8 +433,42 @@ def _get(url: str, params: dict, retries: int = 3) -> dict:
         except Exception as exc:                     # noqa: BLE001
             last = exc
             if attempt < retries - 1:
-                time.sleep(1.5 * (attempt + 1))
-    raise ForecastError(
+                time.sleep(_backoff(attempt))
+    raise _unreachable(retries, last)
+
+
+# Connections belong to the event loop that opened them, so one client per loop.
+_CLIENTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _client() -> httpx.AsyncClient:
+    """The keep-alive client for the running event loop, made on first use. It
+    reads HTTP(S)_PROXY and NO_PROXY from the environment as urllib does."""
+    loop = asyncio.get_running_loop()
+    c = _CLIENTS.get(loop)
+    if c is None:
+        c = _CLIENTS[loop] = httpx.AsyncClient(
+            timeout=25, limits=httpx.Limits(max_keepalive_connections=4),
+            follow_redirects=True)
+    return c
+
+
+async def _aget(url: str, params: dict, retries: int = 3) -> dict:
+    last = None
+    for attempt in range(retries):
+        try:
+            r = await _client().get(url, params=params)
+            r.raise_for_status()
+            return r.json()
+        except Exception as exc:                     # noqa: BLE001
+            last = exc
+            if attempt < retries - 1:
+                await asyncio.sleep(_backoff(attempt))
+    raise _unreachable(retries, last)
+
+
+def _unreachable(retries: int, last) -> ForecastError:
+    return ForecastError(
         f"Could not reach the weather service after {retries} tries: {last}. "
         f"Try again in a moment."
     )
@@ -172,6 +535,20 @@ def get_day(target: date, allow_past: bool = False) -> dict:
     got its arithmetic wrong and can correct itself if it is told what day it
     is. The measurement code passes allow_past=True and gets the old behaviour.
     """
+    kind = _day_kind(target, allow_past)
+    return _only(_serve(kind, [target], _FETCHERS[kind][0]), target)
+
+
+async def get_day_async(target: date, allow_past: bool = False) -> dict:
+    """get_day for a coroutine. The same cache and the same flights; a fetch
+    waits on the event loop rather than holding a thread."""
+    kind = _day_kind(target, allow_past)
+    fetch, afetch = _FETCHERS[kind]
+    return _only(await _aserve(kind, [target], afetch, fetch), target)
+
+
+def _day_kind(target: date, allow_past: bool) -> str:
+    """Which cache a date is read from, once it is known to be askable."""
     lead = lead_days(target)
 
     if lead > MAX_LEAD_DAYS:
@@ -194,43 +571,74 @@ def get_day(target: date, allow_past: bool = False) -> dict:
                 f"If you meant an upcoming date, call get_current_datetime and work "
                 f"it out from there rather than from memory."
             )
-        return _get_archive(target)
-    return _get_forecast(target)
+        return "archive"
+    return "forecast"
+
+
+def _only(served: dict, target: date) -> ForecastDay:
+    if target not in served:
+        raise ForecastError(
+            f"The weather service returned no hourly data for {target.isoformat()}."
+        )
+    return served[target][0]
 
 
-def _get_forecast(target: date) -> dict:
-    cached = _read_cache("forecast", target)
-    if cached:
-        return cached
+def _span(lo: date, hi: date) -> list[date]:
+    return [lo + timedelta(days=i) for i in range((hi - lo).days + 1)]
 
-    params = _base_params() | {
+
+def _forecast_params(lo: date, hi: date) -> dict:
+    return _base_params() | {
         "hourly": ",".join(HOURLY_VARS),
         "minutely_15": ",".join(MINUTELY_VARS),
         "daily": ",".join(DAILY_VARS),
-        "start_date": target.isoformat(),
-        "end_date": target.isoformat(),
+        "start_date": lo.isoformat(),
+        "end_date": hi.isoformat(),
     }
-    raw = _get(FORECAST_URL, params)
-    payload = _shape(raw, target, source="forecast")
-    _write_cache("forecast", target, payload)
-    return payload
 
 
-def _get_archive(target: date) -> dict:
-    cached = _read_cache("archive", target)
-    if cached:
-        return cached
-
-    params = _base_params() | {
+def _archive_params(lo: date, hi: date) -> dict:
+    # Only ever asked for one date; _shape raises if the reply is empty.
+    return _base_params() | {
         "hourly": ",".join(v for v in HOURLY_VARS if v != "precipitation_probability"),
         "daily": ",".join(DAILY_VARS),
+        "start_date": lo.isoformat(),
+        "end_date": hi.isoformat(),
+    }
+
+
+def _past_params(target: date) -> dict:
+    return _base_params() | {
+        "hourly": ",".join(v for v in HOURLY_VARS if v != "cape"),
         "start_date": target.isoformat(),
         "end_date": target.isoformat(),
     }
-    raw = _get(ARCHIVE_URL, params)
-    payload = _shape(raw, target, source="archive")
-    _write_cache("archive", target, payload)
-    return payload
+
+
+def _fetch_forecast(lo: date, hi: date) -> dict[date, dict]:
+    raw = _get(FORECAST_URL, _forecast_params(lo, hi))
+    return _split_range(raw, _span(lo, hi), source="forecast")
+
+
+async def _afetch_forecast(lo: date, hi: date) -> dict[date, dict]:
+    raw = await _aget(FORECAST_URL, _forecast_params(lo, hi))
+    return _split_range(raw, _span(lo, hi), source="forecast")
+
+
+def _fetch_archive(lo: date, hi: date) -> dict[date, dict]:
+    return {lo: _shape(_get(ARCHIVE_URL, _archive_params(lo, hi)), lo, source="archive")}
+
+
+async def _afetch_archive(lo: date, hi: date) -> dict[date, dict]:
+    raw = await _aget(ARCHIVE_URL, _archive_params(lo, hi))
+    return {lo: _shape(raw, lo, source="archive")}
+
+
+# kind -> (fetch, afetch): what fills each cache, on a thread and on the loop.
+_FETCHERS = {
+    "forecast": (_fetch_forecast, _afetch_forecast),
+    "archive": (_fetch_archive, _afetch_archive),
+}
 
 
 def get_past_forecast(target: date, issued_lead_days: int) -> dict:
@@ -239,15 +647,21 @@ def get_past_forecast(target: date, issued_lead_days: int) -> dict:
 
     Used only by the Stage B skill measurement. Not exposed as a chat tool.
     """
-    params = _base_params() | {
-        "hourly": ",".join(v for v in HOURLY_VARS if v != "cape"),
-        "start_date": target.isoformat(),
-        "end_date": target.isoformat(),
-    }
-    raw = _get(HISTORICAL_FORECAST_URL, params)
+    raw = _get(HISTORICAL_FORECAST_URL, _past_params(target))
+    return _past_day(raw, target, issued_lead_days)
+
+
+async def get_past_forecast_async(target: date, issued_lead_days: int) -> dict:
+    """get_past_forecast for a coroutine, so a measurement can have many
+    dates in flight over the same few connections."""
+    raw = await _aget(HISTORICAL_FORECAST_URL, _past_params(target))
+    return _past_day(raw, target, issued_lead_days)
+
+
+def _past_day(raw: dict, target: date, issued_lead_days: int) -> ForecastDay:
     payload = _shape(raw, target, source="historical_forecast")
     payload["issued_lead_days"] = issued_lead_days
-    return payload
+    return ForecastDay(payload)
 
 
 # ---------------------------------------------------------------------------
@@ -265,17 +679,28 @@ def get_past_forecast(target: date, issued_lead_days: int) -> dict:
 # cache, so get_day() for any of them is then free.
 # ---------------------------------------------------------------------------
 
-def _slice_block(block: dict, day_iso: str) -> dict:
+def _day_spans(times: list) -> dict[str, tuple[int, int]]:
+    """Row range of each date in a time column, in one pass. The API returns
+    rows in order, so every date is one contiguous run."""
+    spans: dict[str, tuple[int, int]] = {}
+    for i, t in enumerate(times):
+        iso = t[:10]
+        lo = spans[iso][0] if iso in spans else i
+        spans[iso] = (lo, i + 1)
+    return spans
+
+
+def _slice_block(block: dict, span: tuple[int, int] | None) -> dict:
     """The rows of an hourly or 15-minute block that belong to one date."""
-    times = block.get("time") or []
-    idx = [i for i, t in enumerate(times) if t[:10] == day_iso]
-    if not idx:
+    if not span:
         return {}
-    out = {"time": [times[i] for i in idx]}
+    lo, hi = span
+    out = {"time": block["time"][lo:hi]}
     for key, values in block.items():
         if key == "time" or not isinstance(values, list):
             continue
-        out[key] = [values[i] if i < len(values) else None for i in idx]
+        part = values[lo:hi]
+        out[key] = part + [None] * (hi - lo - len(part))
     return out
 
 
@@ -286,14 +711,16 @@ def _split_range(raw: dict, targets: list[date], source: str) -> dict[date, dict
     minutely = raw.get("minutely_15") or {}
     daily = raw.get("daily") or {}
     daily_times = daily.get("time") or []
+    h_spans = _day_spans(hourly.get("time") or [])
+    m_spans = _day_spans(minutely.get("time") or [])
 
     out = {}
     for target in targets:
         iso = target.isoformat()
-        h = _slice_block(hourly, iso)
+        h = _slice_block(hourly, h_spans.get(iso))
         if not h.get("time"):
             continue                      # the API did not carry that date
-        m = _slice_block(minutely, iso)
+        m = _slice_block(minutely, m_spans.get(iso))
 
         di = daily_times.index(iso) if iso in daily_times else None
 
@@ -327,10 +754,34 @@ def get_days(start: date, ndays: int) -> list[dict]:
     """
     Payloads for a run of consecutive dates, in order.
 
-    Whatever is already cached is used. Anything missing is fetched in a single
-    request spanning the gap, then cached, so a seven-day board costs one call
-    rather than seven.
+    Whatever is already cached is used, stale days included while their
+    refetch runs. Anything missing or expired is fetched in a single request
+    spanning the gap, then cached, so a seven-day board costs one call rather
+    than seven, and a dozen boards opened at once still cost one.
+    """
+    return get_days_versioned(start, ndays)[0]
+
+
+def get_days_versioned(start: date, ndays: int) -> tuple[list[dict], tuple]:
+    """
+    get_days, with the cache_version the days were read under.
+
+    Asking cache_version afterwards is not the same thing: a background
+    refetch can land in between, and a board built from the old weather would
+    then be filed under the new version and served as if it were current.
     """
+    targets = _board_targets(start, ndays)
+    return _in_order(targets, _serve("forecast", targets, _fetch_forecast))
+
+
+async def get_days_async(start: date, ndays: int) -> tuple[list[dict], tuple]:
+    """get_days_versioned for a coroutine: what the board endpoint awaits."""
+    targets = _board_targets(start, ndays)
+    return _in_order(targets, await _aserve("forecast", targets, _afetch_forecast,
+                                            _fetch_forecast))
+
+
+def _board_targets(start: date, ndays: int) -> list[date]:
     if ndays < 1:
         raise ForecastError("A board needs at least one day.")
     targets = [start + timedelta(days=i) for i in range(ndays)]
@@ -347,35 +798,20 @@ def get_days(start: date, ndays: int) -> list[dict]:
             f"{targets[0].isoformat()} is in the past. Today is "
             f"{date.today().isoformat()}. A board starts today or later."
         )
+    return targets
 
-    have = {t: _read_cache("forecast", t) for t in targets}
-    missing = [t for t, v in have.items() if not v]
-
-    if missing:
-        lo, hi = min(missing), max(missing)
-        params = _base_params() | {
-            "hourly": ",".join(HOURLY_VARS),
-            "minutely_15": ",".join(MINUTELY_VARS),
-            "daily": ",".join(DAILY_VARS),
-            "start_date": lo.isoformat(),
-            "end_date": hi.isoformat(),
-        }
-        fetched = _split_range(_get(FORECAST_URL, params),
-                              [lo + timedelta(days=i) for i in range((hi - lo).days + 1)],
-                              source="forecast")
-        for t, payload in fetched.items():
-            _write_cache("forecast", t, payload)
-            if t in have:
-                have[t] = payload
-
-    out = []
+
+def _in_order(targets: list[date], have: dict) -> tuple[list[dict], tuple]:
+    """The served days in date order, and their stamps as a cache_version."""
+    out, stamps = [], []
     for t in targets:
-        if not have[t]:
+        if t not in have:
             raise ForecastError(
                 f"The weather service returned no data for {t.isoformat()}."
             )
-        out.append(have[t])
-    return out
+        out.append(have[t][0])
+        stamps.append(have[t][1])
+    return out, tuple(stamps)
 
 
 def _shape(raw: dict, target: date, source: str) -> dict:
@@ -417,75 +853,174 @@ def _shape(raw: dict, target: date, source: str) -> dict:
 
 
 # ---------------------------------------------------------------------------
-# Slicing helpers used by the brain
+# Slicing helpers used by the brain.
+#
+# The brain reads one day many times over: six departures, a dozen activities
+# per departure, the hour either side of each. Every read used to parse "HH:MM"
+# out of every timestamp in the day and build index lists, so the same 120
+# strings were parsed a few hundred times per board.
+#
+# A ForecastDay parses them once. Each block becomes columns: a sorted
+# epoch-minute index and one list per variable. The row offsets of the six
+# departures are worked out up front, so a window is a pair of slices, and any
+# other window is located by bisection and remembered.
+#
+# Plain lists rather than arrays, on purpose: a window is eight buckets, the
+# readers go through them one value at a time, and a missing reading has to
+# stay None rather than become NaN, because `r or 0.0` treats the two
+# differently.
 # ---------------------------------------------------------------------------
 
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
 def _minutes(hhmm: str) -> int:
     h, m = hhmm.split(":")
     return int(h) * 60 + int(m)
 
 
-def slice_window(day: dict, start: str, end: str) -> dict:
+def _epoch_minute(stamp: str) -> int:
+    """Minutes since 1970-01-01 00:00 local time, from "YYYY-MM-DDTHH:MM"."""
+    day = date.fromisoformat(stamp[:10]).toordinal() - _EPOCH
+    return day * 1440 + int(stamp[11:13]) * 60 + int(stamp[14:16])
+
+
+class _Columns:
+    """One hourly or 15-minute block, as an epoch-minute index plus columns."""
+
+    __slots__ = ("index", "time", "values")
+
+    def __init__(self, block: dict):
+        times = block.get("time") or []
+        index = [_epoch_minute(t) for t in times]
+        rows = range(len(times))
+        if any(index[i] >= index[i + 1] for i in range(len(index) - 1)):
+            rows = sorted(rows, key=index.__getitem__)
+            index = [index[i] for i in rows]
+        self.index = index
+        self.time = [times[i] for i in rows]
+        self.values = {}
+        for key, values in block.items():
+            if key == "time":
+                continue
+            self.values[key] = [values[i] if i < len(values) else None for i in rows]
+
+    def span(self, lo: int, hi: int) -> tuple[int, int]:
+        """Row offsets of [lo, hi) in epoch minutes."""
+        return bisect_left(self.index, lo), bisect_left(self.index, hi)
+
+
+class ForecastDay(dict):
     """
-    Pull the buckets that fall inside a window.
+    A day payload in the shape get_day() has always returned, readable as the
+    same dict, that also carries its columns.
 
-    Returns the finest resolution available: 15-minute buckets where the API
-    carried them, hourly otherwise. `resolution` says which, so a caller can
-    tell an eight-bucket read from a two-bucket one.
+    Built once where a payload enters the program. JSON and the model only
+    ever see the dict; the columns are attributes and are never serialised.
     """
-    s, e = _minutes(start), _minutes(end)
-    if e <= s:
-        raise ForecastError(
-            f"The window {start} to {end} ends before it starts. "
-            f"A departure runs two hours, so 15:00 pairs with 17:00."
-        )
 
-    if day.get("has_minutely"):
-        block = day["minutely_15"]
-        resolution = "15min"
-    else:
-        block = day["hourly"]
-        resolution = "hourly"
+    def __init__(self, payload: dict):
+        super().__init__(payload)
+        self._base = (date.fromisoformat(self["date"]).toordinal() - _EPOCH) * 1440
+        self._hourly = _Columns(self.get("hourly") or {})
+        self._fine = _Columns(self["minutely_15"]) if self.get("has_minutely") else self._hourly
+        self._hour_row = {m: i for i, m in enumerate(self._hourly.index)}
+        self._windows: dict[tuple[int, int], dict] = {}
+        self._memo: dict[tuple, object] = {}
+        for s in SLOTS:
+            self._window(_minutes(s["start"]), _minutes(s["end"]))
+
+    def _window(self, s: int, e: int) -> dict | None:
+        key = (s, e)
+        if key not in self._windows:
+            self._windows[key] = self._build_window(s, e)
+        return self._windows[key]
+
+    def _build_window(self, s: int, e: int) -> dict | None:
+        lo, hi = self._fine.span(self._base + s, self._base + e)
+        if lo == hi:
+            return None
+        fine = self._fine
+        out = {"resolution": "15min" if fine is not self._hourly else "hourly",
+               "time": fine.time[lo:hi]}
+        for key, values in fine.values.items():
+            out[key] = values[lo:hi]
+
+        # Hourly variables the 15-minute block does not carry (probability,
+        # cloud, visibility, cape) are always taken from the hourly series.
+        hourly = self._hourly
+        h_lo, h_hi = hourly.span(self._base + s, self._base + e)
+        out["hourly_time"] = hourly.time[h_lo:h_hi]
+        for key, values in hourly.values.items():
+            if key in out:
+                continue
+            out[f"h_{key}"] = values[h_lo:h_hi]
+        return out
+
+    def window(self, start: str, end: str) -> dict:
+        s, e = _minutes(start), _minutes(end)
+        if e <= s:
+            raise ForecastError(
+                f"The window {start} to {end} ends before it starts. "
+                f"A departure runs two hours, so 15:00 pairs with 17:00."
+            )
+        w = self._window(s, e)
+        if w is None:
+            raise ForecastError(
+                f"No forecast data covers {start} to {end} on {self['date']}."
+            )
+        # A fresh dict per caller; the bucket lists are shared and read-only.
+        return dict(w)
+
+    def memo(self, key: tuple, build):
+        """
+        build(), once per key for the life of this day.
 
-    times = block["time"]
-    idx = [i for i, t in enumerate(times) if s <= _minutes(t[11:16]) < e]
+        The scorers keep their verdicts here. A board asks the same question of
+        the same departure from the plan, the seat board, the comparison and the
+        activity list; the first asker pays and the rest read the answer.
+        Whatever is kept is shared, so callers copy before they change it.
+        """
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
 
-    if not idx:
-        raise ForecastError(
-            f"No forecast data covers {start} to {end} on {day['date']}."
-        )
+    def hour_value(self, hhmm: str, var: str):
+        i = self._hour_row.get(self._base + _minutes(hhmm))
+        if i is None:
+            return None
+        series = self._hourly.values.get(var)
+        return series[i] if series is not None else None
 
-    out = {"resolution": resolution, "time": [times[i] for i in idx]}
-    for key, values in block.items():
-        if key == "time":
-            continue
-        out[key] = [values[i] for i in idx]
-
-    # Hourly variables the 15-minute block does not carry (probability, cloud,
-    # visibility, cape) are always taken from the hourly series.
-    hourly = day["hourly"]
-    h_idx = [i for i, t in enumerate(hourly["time"]) if s <= _minutes(t[11:16]) < e]
-    out["hourly_time"] = [hourly["time"][i] for i in h_idx]
-    for key, values in hourly.items():
-        if key == "time" or key in out:
-            continue
-        out[f"h_{key}"] = [values[i] for i in h_idx]
 
-    return out
+def as_day(day: dict) -> ForecastDay:
+    """The columnar form of a day payload. Free if it already is one."""
+    return day if isinstance(day, ForecastDay) else ForecastDay(day)
+
+
+def slice_window(day: dict, start: str, end: str) -> dict:
+    """
+    Pull the buckets that fall inside a window.
+
+    Returns the finest resolution available: 15-minute buckets where the API
+    carried them, hourly otherwise. `resolution` says which, so a caller can
+    tell an eight-bucket read from a two-bucket one.
+    """
+    return as_day(day).window(start, end)
 
 
 def hour_value(day: dict, hhmm: str, var: str):
     """One hourly value at one clock time, or None if the hour is not present."""
-    hourly = day["hourly"]
-    target = _minutes(hhmm)
-    for i, t in enumerate(hourly["time"]):
-        if _minutes(t[11:16]) == target:
-            series = hourly.get(var) or []
-            return series[i] if i < len(series) else None
-    return None
+    return as_day(day).hour_value(hhmm, var)
 
 
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["snapshot"]:
+        # Before a deploy: fill the cache for the whole horizon and bake it in.
+        get_days(date.today(), MAX_LEAD_DAYS + 1)
+        print(f"{save_snapshot()} days -> {SNAPSHOT}")
+        sys.exit(0)
     d = get_day(date.today())
     print("date:", d["date"], "| source:", d["source"], "| tz:", d["timezone"])
     print("minutely available:", d["has_minutely"])
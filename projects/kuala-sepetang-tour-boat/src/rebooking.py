@@ -17,9 +17,12 @@ Three hard rules, in this order:
      the sun decides that window. A mangrove cruise can move freely through
      the daylight slots.
 
-Order matters. The hardest party to place is allocated first, otherwise a small
-flexible group takes the last seats on the only slot a large locked-in group
-could have used. Parties are ranked by how few options they have, not by size.
+Order used to matter. The first planner placed the hardest party first, so a
+small flexible group did not take the last seats on the only slot a large
+locked-in group could have used, and it still got that wrong when two hard
+parties wanted the same seats. The plan is now one assignment over every party
+at once, as a min-cost flow: as many passengers kept as the seats allow, then
+the nearest dates and best ratings, then whole parties over splits.
 
 When nothing fits, the module says cancel and refund and gives the reason,
 rather than inventing a slot that does not work.
@@ -27,7 +30,10 @@ rather than inventing a slot that does not work.
 
 from __future__ import annotations
 
+import heapq
 import json
+import math
+from bisect import bisect_left, bisect_right
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
@@ -61,6 +67,11 @@ def load_bookings(anchor: date | None = None) -> dict:
     return {"capacity": raw["capacity"], "parties": parties, "anchor": a.isoformat()}
 
 
+def bookings_version() -> int:
+    """Changes whenever the bookings do."""
+    return (DATA / "bookings.json").stat().st_mtime_ns
+
+
 # ---------------------------------------------------------------------------
 # Board: every departure across the window, with who is on it and what is left
 # ---------------------------------------------------------------------------
@@ -152,7 +163,8 @@ def is_reachable(cand_date: str, cand_slot: str,
     return cand >= now + timedelta(minutes=C.MIN_NOTICE_MINUTES)
 
 
-def candidates_for(party: dict, board: dict, reserved: dict) -> list[dict]:
+def candidates_for(party: dict, board: dict, reserved: dict,
+                   now: datetime | None = None) -> list[dict]:
     """
     Every departure this party could move to without displacing anyone.
 
@@ -167,7 +179,7 @@ def candidates_for(party: dict, board: dict, reserved: dict) -> list[dict]:
             continue
         if cell["rating"] == "poor":
             continue
-        if not is_reachable(cell["date"], cell["slot"], src_date, src_slot):
+        if not is_reachable(cell["date"], cell["slot"], src_date, src_slot, now):
             continue                                   # already gone, or earlier than the one they are on
         if C.resolve_activity(party["activity"]) not in cell["fits"]:
             continue                                   # the sun, or the clock, says no
@@ -192,7 +204,8 @@ def candidates_for(party: dict, board: dict, reserved: dict) -> list[dict]:
     return sorted(out, key=lambda c: (c["score"], c["date"], c["slot"]))
 
 
-def split_options(party: dict, board: dict, reserved: dict) -> list[dict] | None:
+def split_options(party: dict, board: dict, reserved: dict,
+                  now: datetime | None = None) -> list[dict] | None:
     """
     If no single departure takes the whole party, can two carry it between them?
 
@@ -204,7 +217,7 @@ def split_options(party: dict, board: dict, reserved: dict) -> list[dict] | None
     for key, cell in board.items():
         if key == party["from_cell"] or cell["rating"] == "poor":
             continue
-        if not is_reachable(cell["date"], cell["slot"], src_date, src_slot):
+        if not is_reachable(cell["date"], cell["slot"], src_date, src_slot, now):
             continue
         if C.resolve_activity(party["activity"]) not in cell["fits"]:
             continue
@@ -226,11 +239,424 @@ def split_options(party: dict, board: dict, reserved: dict) -> list[dict] | None
 
 
 # ---------------------------------------------------------------------------
-# The plan
+# The plan: one assignment over every affected party at once
+#
+# Seats are a flow. Affected parties that sit on the same departure and booked
+# the same activity can go to exactly the same places at exactly the same cost,
+# so they form one class. Each class supplies its passengers, each workable
+# departure absorbs up to the seats it has free, and an edge joins a class to
+# every departure it can still reach. The cheapest maximum flow keeps as many
+# passengers as the board can hold, then spends the fewest day-gap and rating
+# points doing it, with no ordering of parties to get wrong. The greedy plan
+# below could not promise that: an early move could take the only seats a
+# later party fitted.
+#
+# A flow moves passengers, not parties, so it decides who can be kept. Where
+# they go is a flow per party size, in which each unit is a whole party and a
+# departure holds as many as its free seats divide into. Only a kept party no
+# single departure can take is split, over as few departures as carry it.
+#
+# Keeping whole parties out of a passenger flow is a heuristic; the exact
+# answer is an integer program. Now and then the rounding keeps a passenger or
+# two fewer than the flow had room for, and the greedy plan, which orders
+# parties differently, does better. So when the solver falls short of that
+# ceiling the greedy plan is run too, and whichever keeps more is the plan.
 # ---------------------------------------------------------------------------
 
-def plan(days: list[dict], bookings: dict) -> dict:
-    board = build_board(days, bookings)
+def _cost(cell: dict, src_date: str) -> int:
+    """Prefer the same day, then the nearest date, then the better rating."""
+    score = _day_gap(cell["date"], src_date) * 2 + B.RANK[cell["rating"]]
+    return score - 1 if cell["date"] == src_date else score
+
+
+def _seat_index(board: dict) -> dict[str, tuple[list[datetime], list[tuple]]]:
+    """Departures that can take anyone, per activity, in the order they leave."""
+    rows: dict[str, list] = {}
+    for key, cell in board.items():
+        if cell["rating"] == "poor" or cell["free"] <= 0:
+            continue
+        when = departure_dt(cell["date"], cell["slot"])
+        for activity in cell["fits"]:
+            rows.setdefault(activity, []).append((when, key))
+    index = {}
+    for activity, found in rows.items():
+        found.sort()
+        index[activity] = ([w for w, _ in found], [k for _, k in found])
+    return index
+
+
+def _reachable(index: dict, activity: str, src: tuple, now: datetime) -> list[tuple]:
+    """Keys of the departures a party on src could move to, as is_reachable has it."""
+    times, keys = index.get(activity, ([], []))
+    leaves = departure_dt(*src)
+    lo = max(bisect_right(times, leaves),
+             bisect_left(times, now + timedelta(minutes=C.MIN_NOTICE_MINUTES)))
+    return keys[lo:]
+
+
+def _min_cost_flow(n: int, edges: list[tuple], source: int, sink: int) -> list[int]:
+    """
+    Cheapest maximum flow, by successive shortest paths with potentials.
+
+    edges are (u, v, capacity, cost) with cost >= 0. Returns the flow on each
+    edge, in the order given.
+    """
+    graph: list[list[list]] = [[] for _ in range(n)]
+    handles = []
+    for u, v, cap, cost in edges:
+        graph[u].append([v, cap, cost, len(graph[v])])
+        graph[v].append([u, 0, -cost, len(graph[u]) - 1])
+        handles.append((u, len(graph[u]) - 1, cap))
+
+    potential = [0] * n
+    while True:
+        dist: list[float] = [math.inf] * n
+        dist[source] = 0
+        prev: list[tuple | None] = [None] * n
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            pu = potential[u]
+            for i, (v, cap, cost, _) in enumerate(graph[u]):
+                if cap and d + cost + pu - potential[v] < dist[v]:
+                    dist[v] = d + cost + pu - potential[v]
+                    prev[v] = (u, i)
+                    heapq.heappush(heap, (dist[v], v))
+        if dist[sink] == math.inf:
+            break
+        for v in range(n):
+            if dist[v] < math.inf:
+                potential[v] += dist[v]
+
+        push, v = math.inf, sink
+        while v != source:
+            u, i = prev[v]
+            push = min(push, graph[u][i][1])
+            v = u
+        v = sink
+        while v != source:
+            u, i = prev[v]
+            edge = graph[u][i]
+            edge[1] -= push
+            graph[v][edge[3]][1] += push
+            v = u
+
+    return [cap - graph[u][i][1] for u, i, cap in handles]
+
+
+def _route(supply: dict, room: dict, reach: dict, costs: dict,
+           bound: dict | None = None) -> dict:
+    """
+    The cheapest maximum flow from classes to departures: supply is what each
+    class needs placed, room what each departure can take, in the same units,
+    and bound, if given, caps what one class may send to one departure.
+    Returns {class: {departure: units}}.
+    """
+    order = [c for c in supply if supply[c] > 0]
+    cells = sorted({k for c in order for k in reach[c] if room.get(k, 0) > 0})
+    node = {k: len(order) + 1 + i for i, k in enumerate(cells)}
+    sink = len(order) + len(cells) + 1
+    edges, links = [], []
+    for ci, c in enumerate(order, start=1):
+        edges.append((0, ci, supply[c], 0))
+        for k in reach[c]:
+            if k in node:
+                links.append((c, k, len(edges)))
+                # Every path crosses exactly one class-to-departure edge, so
+                # shifting their costs by one keeps them non-negative without
+                # changing which flow is cheapest.
+                cap = room[k] if bound is None else min(room[k], bound[c][k])
+                edges.append((ci, node[k], cap, costs[c][k] + 1))
+    for k in cells:
+        edges.append((node[k], sink, room[k], 0))
+    flow = _min_cost_flow(sink + 1, edges, 0, sink) if order else []
+
+    out: dict = {c: {} for c in supply}
+    for c, k, e in links:
+        if flow[e]:
+            out[c][k] = flow[e]
+    return out
+
+
+def _keepable(sizes: list[int], seats: int) -> set[int]:
+    """Which parties to keep when a class won fewer seats than it needs: the
+    most passengers that fit, by subset sum over party sizes."""
+    reach = {0: None}
+    for i, size in enumerate(sizes):
+        for total in sorted(reach, reverse=True):
+            if total + size <= seats and total + size not in reach:
+                reach[total + size] = (total, i)
+    keep, total = set(), max(reach)
+    while reach[total] is not None:
+        total, i = reach[total]
+        keep.add(i)
+    return keep
+
+
+def _release(won: dict, key: tuple, seats: int) -> None:
+    """Seats a class has filled stop counting as held for it."""
+    won[key] = won.get(key, 0) - seats
+    if won[key] <= 0:
+        won.pop(key)
+
+
+def _still_fits(routed: dict, size: int, keep: dict, placed: dict,
+                reach: dict, costs: dict, free: dict) -> bool:
+    """Whether every kept passenger not in this round of whole moves could still
+    be seated, as passengers, once those moves are made."""
+    left = dict(free)
+    for c in routed:
+        for k, n in routed[c].items():
+            left[k] -= n * size
+    need = {}
+    for c, ps in keep.items():
+        moving = sum(routed[c].values())
+        rest = [p for p in ps if p["id"] not in placed]
+        need[c] = sum(p["size"] for p in rest) - moving * size
+    flow = _route(need, left, reach, costs)
+    return all(sum(flow[c].values()) == need[c] for c in need)
+
+
+def _seat(waiting: dict, reach: dict, costs: dict, free: dict, placed: dict) -> int:
+    """One round of placing whoever is still waiting. Returns how many were placed."""
+    # Who can be kept at all: passengers as a flow, then the parties that fit
+    # in what each class won. Seats a class won but no set of its parties adds
+    # up to are handed back, and the flow rerun, until every class can use
+    # exactly what it wins.
+    supply = {c: sum(p["size"] for p in ps) for c, ps in waiting.items()}
+    while True:
+        won = _route(supply, free, reach, costs)
+        keep = {}
+        for c, ps in waiting.items():
+            ps = sorted(ps, key=lambda p: -p["size"])
+            chosen = _keepable([p["size"] for p in ps], sum(won[c].values()))
+            keep[c] = [p for i, p in enumerate(ps) if i in chosen]
+        usable = {c: sum(p["size"] for p in ps) for c, ps in keep.items()}
+        if all(usable[c] == sum(won[c].values()) for c in supply):
+            break
+        supply = {c: min(supply[c], usable[c]) if usable[c] < sum(won[c].values())
+                  else supply[c] for c in supply}
+
+    # Whole moves: for each party size, largest first, the parties are the
+    # units and a departure holds as many as its free seats divide into. The
+    # flow is integral, so nothing here is cut in pieces.
+    count = 0
+    for size in sorted({p["size"] for ps in keep.values() for p in ps}, reverse=True):
+        group = {c: [p for p in ps if p["size"] == size and p["id"] not in placed]
+                 for c, ps in keep.items()}
+        supply = {c: len(ps) for c, ps in group.items()}
+        routed = _route(supply, {k: n // size for k, n in free.items()}, reach, costs)
+        if not _still_fits(routed, size, keep, placed, reach, costs, free):
+            # The cheapest whole moves took seats that kept someone else's
+            # passengers. Hold each class to the seats its own flow won, plus
+            # whatever no class was given, and route again.
+            claimed: dict = {}
+            for c in won:
+                for k, n in won[c].items():
+                    claimed[k] = claimed.get(k, 0) + n
+            slack = {k: max(0, n - claimed.get(k, 0)) for k, n in free.items()}
+            room = dict(slack)
+            for c, ps in group.items():
+                if ps:
+                    for k, n in won[c].items():
+                        room[k] += n
+            bound = {c: {k: (won[c].get(k, 0) + slack[k]) // size for k in reach[c]}
+                     for c in group}
+            routed = _route(supply, {k: min(n, free[k]) // size for k, n in room.items()},
+                            reach, costs, bound)
+        for c, ps in group.items():
+            queue = iter(ps)
+            for k, n in sorted(routed[c].items(), key=lambda kv: (costs[c][kv[0]], kv[0])):
+                for _ in range(n):
+                    placed[next(queue)["id"]] = [(k, size)]
+                    free[k] -= size
+                    count += 1
+                    _release(won[c], k, size)
+
+    # Splits, for the kept parties no single departure could take: passengers
+    # as a flow again, each party then spread over as few departures as carry it.
+    rest = {c: [p for p in ps if p["id"] not in placed] for c, ps in keep.items()}
+    won = _route({c: sum(p["size"] for p in ps) for c, ps in rest.items()}, free, reach, costs)
+    for c, ps in rest.items():
+        left = dict(won[c])
+        for party in ps:
+            if sum(left.values()) < party["size"]:
+                continue                        # waits for the next round
+            size, legs = party["size"], []
+            for k in sorted(left, key=lambda k: (-left[k], costs[c][k], k)):
+                take = min(left[k], size)
+                if take:
+                    legs.append((k, take))
+                    size -= take
+                if not size:
+                    break
+            for k, take in legs:
+                left[k] -= take
+                free[k] -= take
+            placed[party["id"]] = legs
+            count += 1
+    return count
+
+
+def _settle(party: dict, reach: list[tuple], costs: dict, free: dict, placed: dict) -> None:
+    """Once everyone is seated, take a cheaper whole seat if refunds left one,
+    and a whole seat at any price over a split."""
+    legs = placed[party["id"]]
+    held = dict(legs)
+    current = costs[legs[0][0]] if len(legs) == 1 else math.inf
+    for k in sorted(reach, key=lambda k: (costs[k], k)):
+        if costs[k] >= current:
+            return
+        if free[k] + held.get(k, 0) >= party["size"]:
+            for key, take in legs:
+                free[key] += take
+            free[k] -= party["size"]
+            placed[party["id"]] = [(k, party["size"])]
+            return
+
+
+def plan(days: list[dict], bookings: dict, board: dict | None = None,
+         now: datetime | None = None) -> dict:
+    """
+    board: from build_board() over the same days and bookings, when the caller
+    already has one. The plan only reads it, so the page and the plan can share.
+    The result's "planner" says which plan it is: "solver", or "greedy" where
+    that one kept more passengers.
+    """
+    board = board if board is not None else build_board(days, bookings)
+    now = now or datetime.now()
+    affected = affected_parties(board)
+    index = _seat_index(board)
+    free = {key: cell["free"] for key, cell in board.items()}
+
+    classes: dict[tuple, list[dict]] = {}
+    for p in affected:
+        classes.setdefault((p["from_cell"], C.resolve_activity(p["activity"])), []).append(p)
+    reach = {c: _reachable(index, c[1], c[0], now) for c in classes}
+    costs = {c: {k: _cost(board[k], c[0][0]) for k in reach[c]} for c in classes}
+    # The most passengers any plan could keep: every affected one as a flow.
+    flow = _route({c: sum(p["size"] for p in ps) for c, ps in classes.items()},
+                  free, reach, costs)
+    ceiling = sum(n for c in flow for n in flow[c].values())
+
+    # Rounds, because seats a class won but could not fill with whole parties
+    # may fit someone else's. Each round places someone or stops.
+    placed: dict[str, list[tuple]] = {}
+    waiting = classes
+    while waiting and _seat(waiting, reach, costs, free, placed):
+        waiting = {c: [p for p in ps if p["id"] not in placed] for c, ps in waiting.items()}
+        waiting = {c: ps for c, ps in waiting.items() if ps}
+
+    for c, ps in classes.items():
+        for p in sorted(ps, key=lambda p: -p["size"]):
+            if p["id"] in placed:
+                _settle(p, reach[c], costs[c], free, placed)
+
+    results = []
+    for c, ps in classes.items():
+        for party in ps:
+            results.append(_solved_entry(party, placed.get(party["id"]), reach[c],
+                                         costs[c], board, free))
+    solved = _report(days, results)
+    solved["planner"] = "solver"
+    if solved["kept"] < ceiling:
+        # A tie stays with the solver, which spends fewer points on the same
+        # passengers.
+        greedy = greedy_plan(days, bookings, board, now)
+        if greedy["kept"] > solved["kept"]:
+            greedy["planner"] = "greedy"
+            return greedy
+    return solved
+
+
+def _solved_entry(party: dict, legs: list | None, reach: list, costs: dict,
+                  board: dict, free: dict) -> dict:
+    """One party's line of the plan, in the shape the greedy plan has always given."""
+    src_date = party["from_cell"][0]
+    held = dict(legs or [])
+
+    def candidate(k):
+        cell = board[k]
+        before = free[k] + held.get(k, 0)
+        return {
+            "date": cell["date"], "slot": cell["slot"], "label": cell["label"],
+            "rating": cell["rating"], "shape": cell["shape"],
+            "free_after": before - party["size"], "free_before": before,
+            "same_day": cell["date"] == src_date,
+            "day_gap": _day_gap(cell["date"], src_date), "score": costs[k],
+            "activity_rating": cell["fits"][C.resolve_activity(party["activity"])],
+        }
+
+    opts = [candidate(k) for k in sorted(reach, key=lambda k: (costs[k], k))
+            if free[k] + held.get(k, 0) >= party["size"]]
+    if legs and len(legs) == 1:
+        chosen = legs[0][0]
+        opts.sort(key=lambda o: (o["date"], o["slot"]) != chosen)
+    entry = _entry(party, opts)
+
+    if legs and len(legs) == 1:
+        entry["action"] = "move"
+        entry["move_to"] = opts[0]
+        entry["says"] = _move_sentence(party, opts[0])
+    elif legs:
+        sp = []
+        for k, take in legs:
+            cell = board[k]
+            sp.append({"date": cell["date"], "slot": cell["slot"], "label": cell["label"],
+                       "rating": cell["rating"], "free": free[k] + take,
+                       "score": costs[k], "take": take})
+        entry["action"] = "split"
+        entry["split"] = sp
+        entry["says"] = _split_sentence(party, sp)
+    else:
+        entry["action"] = "cancel"
+        entry["says"] = _cancel_sentence(party)
+    return entry
+
+
+def _entry(party: dict, opts: list[dict]) -> dict:
+    return {
+        "party": {k: party[k] for k in ("id", "name", "size", "activity")},
+        "from": {"date": party["from_cell"][0], "slot": party["from_cell"][1],
+                 "label": party["from_label"], "reason": party["reason"],
+                 "hazard": party["hazard"]},
+        "locked": party["activity"] in SUN_LOCKED,
+        "options": opts[:4],
+    }
+
+
+def _report(days: list[dict], results: list[dict]) -> dict:
+    # Report in schedule order so the operator reads it like a day.
+    results.sort(key=lambda r: (r["from"]["date"], r["from"]["slot"]))
+
+    moved = sum(1 for r in results if r["action"] == "move")
+    split = sum(1 for r in results if r["action"] == "split")
+    cancel = sum(1 for r in results if r["action"] == "cancel")
+    heads = sum(r["party"]["size"] for r in results)
+    saved = sum(r["party"]["size"] for r in results if r["action"] in ("move", "split"))
+
+    return {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "window": [days[0]["date"], days[-1]["date"]],
+        "affected_parties": len(results),
+        "affected_passengers": heads,
+        "kept": saved, "refunded": heads - saved,
+        "moved": moved, "split": split, "cancelled": cancel,
+        "no_one_displaced": True,
+        "results": results,
+        "disclaimer": C.DISCLAIMER,
+    }
+
+
+# ---------------------------------------------------------------------------
+# The greedy plan, kept as the yardstick for the solver (bench_rebooking.py)
+# ---------------------------------------------------------------------------
+
+def greedy_plan(days: list[dict], bookings: dict, board: dict | None = None,
+                now: datetime | None = None) -> dict:
+    board = board if board is not None else build_board(days, bookings)
     affected = affected_parties(board)
 
     # Hardest first. A party is hard when it has few places to go, so rank by
@@ -239,21 +665,14 @@ def plan(days: list[dict], bookings: dict) -> dict:
     reserved: dict = {}
     scored = []
     for p in affected:
-        opts = candidates_for(p, board, reserved)
+        opts = candidates_for(p, board, reserved, now)
         scored.append((len(opts), -p["size"], p, opts))
     scored.sort(key=lambda t: (t[0], t[1]))
 
     results = []
     for _, _, party, _ in scored:
-        opts = candidates_for(party, board, reserved)     # recompute, seats moved
-        entry = {
-            "party": {k: party[k] for k in ("id", "name", "size", "activity")},
-            "from": {"date": party["from_cell"][0], "slot": party["from_cell"][1],
-                     "label": party["from_label"], "reason": party["reason"],
-                     "hazard": party["hazard"]},
-            "locked": party["activity"] in SUN_LOCKED,
-            "options": opts[:4],
-        }
+        opts = candidates_for(party, board, reserved, now)     # recompute, seats moved
+        entry = _entry(party, opts)
 
         if opts:
             best = opts[0]
@@ -263,7 +682,7 @@ def plan(days: list[dict], bookings: dict) -> dict:
             entry["move_to"] = best
             entry["says"] = _move_sentence(party, best)
         else:
-            sp = split_options(party, board, reserved)
+            sp = split_options(party, board, reserved, now)
             if sp:
                 for leg in sp:
                     k = (leg["date"], leg["slot"])
@@ -277,26 +696,7 @@ def plan(days: list[dict], bookings: dict) -> dict:
 
         results.append(entry)
 
-    # Report in schedule order so the operator reads it like a day.
-    results.sort(key=lambda r: (r["from"]["date"], r["from"]["slot"]))
-
-    moved = sum(1 for r in results if r["action"] == "move")
-    split = sum(1 for r in results if r["action"] == "split")
-    cancel = sum(1 for r in results if r["action"] == "cancel")
-    heads = sum(r["party"]["size"] for r in results)
-    saved = sum(r["party"]["size"] for r in results if r["action"] in ("move", "split"))
-
-    return {
-        "generated": datetime.now().isoformat(timespec="seconds"),
-        "window": [days[0]["date"], days[-1]["date"]],
-        "affected_parties": len(results),
-        "affected_passengers": heads,
-        "kept": saved, "refunded": heads - saved,
-        "moved": moved, "split": split, "cancelled": cancel,
-        "no_one_displaced": True,
-        "results": results,
-        "disclaimer": C.DISCLAIMER,
-    }
+    return _report(days, results)
 
 
 def _dow(iso: str) -> str:
@@ -0,0 +1,250 @@
+"""
+Synthetic Open-Meteo weather, for measuring the engine offline.
+
+A reply shaped exactly like /v1/forecast for the hourly, 15-minute and daily
+variables forecast.py asks for, over any run of dates. Seeded, so two runs
+score the same weather.
+
+The weather is plausible rather than real: dry mornings, afternoon and
+evening convection, the odd thunderstorm and squall. A week of it puts every
+rating, shape and hazard the brain knows somewhere on the board, which a
+benchmark on one calm fixture day would not.
+
+Nothing here is ever served as a forecast. It exists for timing and for
+properties that must hold whatever the weather does. serve() puts the same
+weather behind a local /v1/forecast, so the cache and the fetch path can be
+exercised with no network: point OPEN_METEO_FORECAST_URL, or
+forecast.FORECAST_URL, at it.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+import urllib.parse
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import LOCATION
+
+
+def _day(rng: random.Random, on: date) -> dict:
+    """One date: 96 fifteen-minute buckets, the 24 hours built from them."""
+    storm = rng.random() < 0.6
+    s_start = rng.randint(12 * 4, 20 * 4) if storm else -1
+    s_len = rng.randint(2, 12)
+    peak = rng.uniform(0.3, 6.0)
+    thunder = storm and rng.random() < 0.2
+    squall = storm and rng.random() < 0.1
+    calm = rng.uniform(6, 22)
+
+    fine = {"rain": [], "wind_gusts_10m": [], "weather_code": []}
+    for q in range(96):
+        in_storm = s_start <= q < s_start + s_len
+        drizzle = not in_storm and rng.random() < 0.04
+        rain = (round(rng.uniform(0.2, 1.0) * peak, 1) if in_storm
+                else round(rng.uniform(0.1, 0.3), 1) if drizzle else 0.0)
+        gust = calm + rng.uniform(-4, 6) + (rng.uniform(10, 25) if in_storm else 0)
+        if in_storm and squall:
+            gust += 25
+        code = (95 if in_storm and thunder and rain >= 1.0
+                else 63 if rain >= 2.5 else 61 if rain >= 0.5 else 51 if rain > 0
+                else rng.choice((1, 2, 3)))
+        fine["rain"].append(rain)
+        fine["wind_gusts_10m"].append(round(max(gust, 0), 1))
+        fine["weather_code"].append(code)
+
+    hourly = {k: [] for k in ("precipitation_probability", "precipitation", "rain",
+                              "wind_speed_10m", "wind_gusts_10m", "cloud_cover",
+                              "visibility", "weather_code", "is_day",
+                              "temperature_2m", "cape")}
+    for h in range(24):
+        q = slice(h * 4, h * 4 + 4)
+        rain = round(sum(fine["rain"][q]), 1)
+        near = storm and s_start - 8 <= h * 4 < s_start + s_len + 4
+        hourly["precipitation_probability"].append(
+            min(100, int(rng.uniform(50, 95))) if near else int(rng.uniform(0, 45)))
+        hourly["precipitation"].append(rain)
+        hourly["rain"].append(rain)
+        gust = max(fine["wind_gusts_10m"][q])
+        hourly["wind_speed_10m"].append(round(gust * 0.55, 1))
+        hourly["wind_gusts_10m"].append(gust)
+        hourly["cloud_cover"].append(int(rng.uniform(70, 100)) if near else int(rng.uniform(5, 80)))
+        hourly["visibility"].append(int(rng.uniform(1000, 6000)) if rain >= 4 else int(rng.uniform(12000, 24000)))
+        hourly["weather_code"].append(max(fine["weather_code"][q]))
+        hourly["is_day"].append(1 if 7 <= h < 19 else 0)
+        hourly["temperature_2m"].append(round(25 + 7 * max(0, 1 - abs(h - 14) / 8) - (2 if rain else 0), 1))
+        hourly["cape"].append(int(rng.uniform(1500, 3200)) if near else int(rng.uniform(100, 1500)))
+
+    iso = on.isoformat()
+    return {
+        "hourly_time": [f"{iso}T{h:02d}:00" for h in range(24)],
+        "hourly": hourly,
+        "fine_time": [f"{iso}T{q // 4:02d}:{q % 4 * 15:02d}" for q in range(96)],
+        "fine": {"precipitation": list(fine["rain"]), **fine},
+        "daily": {
+            "sunrise": f"{iso}T07:{rng.randint(5, 20):02d}",
+            "sunset": f"{iso}T19:{rng.randint(15, 30):02d}",
+            "precipitation_sum": round(sum(fine["rain"]), 1),
+            "wind_gusts_10m_max": max(fine["wind_gusts_10m"]),
+        },
+    }
+
+
+def forecast_response(start: date, ndays: int, seed: int = 0) -> dict:
+    """
+    A /v1/forecast reply for `ndays` dates from `start`.
+
+    Each date's weather depends only on the seed and the date, so a week and
+    the fortnight containing it agree on the days they share.
+    """
+    hourly: dict = {"time": []}
+    fine: dict = {"time": []}
+    daily: dict = {"time": [], "sunrise": [], "sunset": [],
+                   "precipitation_sum": [], "wind_gusts_10m_max": []}
+    for i in range(ndays):
+        on = start + timedelta(days=i)
+        d = _day(random.Random(seed * 1_000_003 + on.toordinal()), on)
+        hourly["time"] += d["hourly_time"]
+        for k, v in d["hourly"].items():
+            hourly.setdefault(k, []).extend(v)
+        fine["time"] += d["fine_time"]
+        for k, v in d["fine"].items():
+            fine.setdefault(k, []).extend(v)
+        daily["time"].append(on.isoformat())
+        for k, v in d["daily"].items():
+            daily[k].append(v)
+    return {
+        "latitude": LOCATION["latitude"], "longitude": LOCATION["longitude"],
+        "timezone": LOCATION["timezone"], "utc_offset_seconds": 8 * 3600,
+        "elevation": 2.0,
+        "hourly": hourly, "minutely_15": fine, "daily": daily,
+    }
+
+
+# Which bookings each departure takes, as the sample bookings and the activity
+# windows have them. The 19:00 still sells under every name it ever had.
+_BOOKABLE = {
+    "0900": ["dolphin", "bird_watching", "fishing_trip", "mangrove_cruise",
+             "fishing_village", "kuala_sangga"],
+    "1100": ["mangrove_cruise", "mangrove_ecology", "fish_farm", "fishing_trip",
+             "fishing_village", "kuala_sangga"],
+    "1300": ["mangrove_cruise", "mangrove_ecology", "fish_farm", "kuala_sangga"],
+    "1500": ["mangrove_cruise", "eagle_watching", "fishing_village"],
+    "1700": ["eagle_watching", "sunset_cruise"],
+    "1900": ["sunset_firefly", "firefly", "sunset_cruise", "stargazing"],
+}
+
+
+def bookings(start: date, ndays: int, parties: int = 3000, load: float = 0.8,
+             seed: int = 0) -> dict:
+    """
+    Bookings in the shape rebooking.load_bookings() returns, `parties` of them
+    over `ndays` dates from `start`.
+
+    Thousands of parties do not fit twelve seats a departure, so each departure
+    here is a fleet: capacity is set so the window runs at about `load` full,
+    and no departure is booked past it. Sizes lean small, like the walk-ins
+    and families in the sample, with the odd school group of twelve.
+    """
+    rng = random.Random(seed)
+    sizes = [rng.choice((1, 2, 2, 2, 3, 4, 4, 5, 6, 8, 10, 12)) for _ in range(parties)]
+    cells = [(start + timedelta(days=i), slot) for i in range(ndays) for slot in _BOOKABLE]
+    capacity = max(12, round(sum(sizes) / len(cells) / load))
+
+    taken = {c: 0 for c in cells}
+    out = []
+    for i, size in enumerate(sizes):
+        on, slot = rng.choice(cells)
+        if taken[(on, slot)] + size > capacity:
+            continue
+        taken[(on, slot)] += size
+        out.append({"id": f"S{i:05d}", "slot": slot, "name": f"Party {i}",
+                    "size": size, "activity": rng.choice(_BOOKABLE[slot]),
+                    "date": on.isoformat()})
+    return {"capacity": capacity, "parties": out, "anchor": start.isoformat()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"          # keep-alive, as the real one does
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urllib.parse.urlparse(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        try:
+            lo = date.fromisoformat(q["start_date"][0])
+            hi = date.fromisoformat(q["end_date"][0])
+        except (KeyError, ValueError):
+            return self._reply(400, {"error": True, "reason": "start_date and end_date are required"})
+        with stub.lock:
+            stub.requests.append((lo, hi))
+            stub.peers.add(self.client_address)
+        if stub.delay:
+            time.sleep(stub.delay)
+        if stub.fail:
+            return self._reply(503, {"error": True, "reason": "stand-in told to fail"})
+        self._reply(200, forecast_response(lo, (hi - lo).days + 1, seed=stub.seed))
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenMeteoStandIn:
+    """
+    A local /v1/forecast serving forecast_response() for whatever dates are
+    asked for.
+
+    `requests` records the (start, end) of every call, which is what a cache
+    test counts, and `peers` the connections they came over. `delay` holds each reply back, so concurrent callers really
+    do overlap; `fail` answers 503, the way the real service does when it is
+    down. Use it as a context manager, or call close().
+    """
+
+    def __init__(self, port: int = 0, seed: int = 0, delay: float = 0.0):
+        self.seed, self.delay, self.fail = seed, delay, False
+        self.requests: list[tuple[date, date]] = []
+        self.peers: set[tuple] = set()
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}/v1/forecast"
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name="open-meteo-stand-in").start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def serve(port: int = 8765, seed: int = 0, delay: float = 0.0) -> OpenMeteoStandIn:
+    """Start the stand-in and return it. It runs until close() or exit."""
+    return OpenMeteoStandIn(port, seed, delay)
+
+
+if __name__ == "__main__":
+    import sys
+    stub = serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
+    print(f"Open-Meteo stand-in on {stub.url}")
+    print(f"  OPEN_METEO_FORECAST_URL={stub.url} uvicorn app:app")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.close()
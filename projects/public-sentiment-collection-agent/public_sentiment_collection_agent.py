@@ -54,12 +54,20 @@ You will learn how to:
 # Imports
 # =========================
 
+import hashlib
 import json
 import os
+import random
 import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from collections import Counter
-from urllib.parse import urlparse
+from collections import Counter, deque
+from urllib.parse import parse_qsl, urlencode, urlparse
 
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -91,6 +99,56 @@ model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
 print("✅ APIs configured successfully")
 
+# =========================
+# Shared API Rate Limits
+# =========================
+
+# Searches and sentiment batches run concurrently, so every Gemini and Tavily
+# call goes through one limiter per API, shared by all threads. Set these to
+# your plan's quota.
+LLM_RPM = int(os.environ.get('LLM_RPM', 10))
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 8))
+SEARCH_RPM = int(os.environ.get('SEARCH_RPM', 60))
+SEARCH_MAX_IN_FLIGHT = int(os.environ.get('SEARCH_MAX_IN_FLIGHT', 4))
+
+
+# The stock analysis notebook carries the same class. Each notebook runs standalone
+# in Colab, so the two copies are kept identical rather than shared.
+class RateLimiter:
+    """At most `per_minute` calls in any rolling minute, and `max_in_flight` at once, across all threads."""
+
+    def __init__(self, name: str, per_minute: int, max_in_flight: int):
+        self.name = name
+        self.per_minute = per_minute
+        self.calls = 0
+        self.waited_s = 0.0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def __enter__(self):
+        self._slots.acquire()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) < self.per_minute:
+                    self._recent.append(now)
+                    self.calls += 1
+                    return self
+                wait_s = 60 - (now - self._recent[0])
+                self.waited_s += wait_s
+            time.sleep(wait_s)
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+LLM_LIMIT = RateLimiter('gemini', LLM_RPM, LLM_MAX_IN_FLIGHT)
+SEARCH_LIMIT = RateLimiter('tavily', SEARCH_RPM, SEARCH_MAX_IN_FLIGHT)
+
 """## 3. Utility Functions"""
 
 # =========================
@@ -153,8 +211,167 @@ print("✅ Utility functions loaded")
 ### 4.1. Geographic Web Search Tool
 
 This enhanced version supports **location-based filtering**.
+
+- **Response cache.** Each search is kept on disk under `.search_cache/`, keyed by query, location, `days_back` and `max_results`, and served while younger than `SEARCH_CACHE_TTL_SECONDS`.
+- **Recorded responses.** `RecordedSearchClient` stands in for the Tavily client, replaying responses saved as JSON. Give it the real client as `record_from` to record missing ones. `write_synthetic_recordings` writes a set with deliberate cross-location duplicates, so the whole collection stage runs offline.
 """
 
+# =========================
+# Search Response Cache and Recorded Search Client
+# =========================
+
+SEARCH_CACHE_DIR = os.environ.get('SEARCH_CACHE_DIR', '.search_cache')
+SEARCH_CACHE_TTL_SECONDS = int(os.environ.get('SEARCH_CACHE_TTL_SECONDS', 24 * 3600))
+
+
+def _request_key(**params) -> str:
+    raw = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _write_json(path: str, payload: dict, **dump_kwargs):
+    """Write then rename, so a reader never sees half a file."""
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, **dump_kwargs)
+    os.replace(tmp, path)
+
+
+class SearchCache:
+    """
+    On-disk search results, one JSON file per (query, location, days_back, max_results),
+    served while younger than `ttl` seconds. Failed searches are never cached.
+    """
+
+    def __init__(self, folder: str = SEARCH_CACHE_DIR, ttl: int = SEARCH_CACHE_TTL_SECONDS):
+        self.folder = folder
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key: str):
+        result = None
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                stored = json.load(f)
+            if time.time() - stored['fetched_at'] < self.ttl:
+                result = stored['result']
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict):
+        _write_json(self._path(key), {'fetched_at': time.time(), 'result': result}, ensure_ascii=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+class RecordedSearchClient:
+    """
+    Stand-in for TavilyClient that replays recorded responses, one JSON file per request.
+
+    With `record_from` set to a real client, missing requests are fetched from it and
+    recorded; without it, a missing request raises LookupError.
+    """
+
+    def __init__(self, folder: str, record_from=None, latency: float = 0.0):
+        self.folder = folder
+        self.record_from = record_from
+        self.latency = latency
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, params: dict) -> str:
+        return os.path.join(self.folder, f"{_request_key(**params)}.json")
+
+    def record(self, response: dict, **params):
+        with open(self._path(params), 'w', encoding='utf-8') as f:
+            json.dump({'request': params, 'response': response}, f, ensure_ascii=False, indent=2)
+
+    def search(self, **params) -> dict:
+        try:
+            with open(self._path(params), encoding='utf-8') as f:
+                stored = json.load(f)
+            time.sleep(self.latency)
+            return stored['response']
+        except OSError:
+            if self.record_from is None:
+                raise LookupError(f"No recorded response for {params.get('query')!r}")
+        response = self.record_from.search(**params)
+        self.record(response, **params)
+        return response
+
+
+SEARCH_CACHE = SearchCache()
+
+
+def use_search_client(client, cache: SearchCache = None):
+    """Switch searches to another client, e.g. RecordedSearchClient for offline runs."""
+    global tavily_client, SEARCH_CACHE
+    tavily_client = client
+    SEARCH_CACHE = cache or SEARCH_CACHE
+
+
+def write_synthetic_recordings(folder: str, query: str, locations: list, per_location: int = 15,
+                               max_results: int = 15, days_back: int = 365,
+                               shared: float = 0.3, seed: int = 0) -> RecordedSearchClient:
+    """
+    Record plausible responses for `query` in each location, for offline runs.
+
+    About `shared` of each location's results are articles that also come back for
+    other locations, some verbatim and some lightly edited (new URL, a word changed),
+    the way syndicated news does.
+
+    Returns:
+        RecordedSearchClient: Replaying the recordings
+    """
+    rng = random.Random(seed)
+    words = ("ban safety tradition noise pollution festival culture injuries law "
+             "celebration children animals air quality police fine permit public "
+             "opinion survey residents support oppose health risk smoke").split()
+    domains = ['news.example.com', 'dailytimes.example.com', 'reddit.com', 'health.gov',
+               'blog.example.org', 'medium.com', 'thepost.example.com', 'forum.example.net']
+
+    def article(n):
+        return {
+            'title': f"{query} article {n}",
+            'content': ' '.join(rng.choice(words) for _ in range(rng.randint(40, 90))),
+            'url': f"https://{rng.choice(domains)}/story/{n}?utm_source=feed",
+            'score': round(rng.random(), 3),
+        }
+
+    pool = [article(f"shared-{i}") for i in range(max(1, int(per_location * shared * 2)))]
+    client = RecordedSearchClient(folder)
+    for loc_index, location in enumerate(locations):
+        results = []
+        for i in range(per_location):
+            if rng.random() < shared:
+                item = dict(rng.choice(pool))
+                if rng.random() < 0.5:
+                    # Syndicated copy: another URL, one word changed
+                    item['url'] = item['url'].replace('/story/', f'/{location.lower()}/story/')
+                    tokens = item['content'].split()
+                    tokens[rng.randrange(len(tokens))] = rng.choice(words)
+                    item['content'] = ' '.join(tokens)
+                results.append(item)
+            else:
+                results.append(article(f"{loc_index}-{i}"))
+        search_query = query if location.lower() == 'global' else f"{query} {location}"
+        client.record({'results': results}, query=search_query, max_results=max_results,
+                      search_depth="advanced", days=days_back)
+    return client
+
 # =========================
 # Tool: Geographic Web Search
 # =========================
@@ -182,13 +399,20 @@ def tavily_search_geographic(
     if location and location.lower() != "global":
         search_query = f"{query} {location}"
 
+    key = _request_key(query=query, location=location or "global", days_back=days_back,
+                       max_results=max_results)
+    cached = SEARCH_CACHE.get(key)
+    if cached is not None:
+        return cached
+
     try:
-        response = tavily_client.search(
-            query=search_query,
-            max_results=max_results,
-            search_depth="advanced",
-            days=days_back
-        )
+        with SEARCH_LIMIT:
+            response = tavily_client.search(
+                query=search_query,
+                max_results=max_results,
+                search_depth="advanced",
+                days=days_back
+            )
 
         results = []
         for item in response.get('results', []):
@@ -204,12 +428,14 @@ def tavily_search_geographic(
                 'score': item.get('score', 0)
             })
 
-        return {
+        result = {
             'results': results,
             'query': search_query,
             'location': location or "global",
             'count': len(results)
         }
+        SEARCH_CACHE.put(key, result)
+        return result
     except Exception as e:
         return {'error': str(e), 'results': []}
 
@@ -277,17 +503,26 @@ def analyze_source_diversity(results: list) -> dict:
 
 print("✅ Source diversity analyzer loaded")
 
-"""### 4.3. Sentiment Analysis with Geographic Detection"""
+"""### 4.3. Sentiment Analysis with Geographic Detection
+
+Snippets are classified by a **batched sentiment engine**, so no snippet is dropped however many a location returns:
+
+- **Token-budgeted batches.** Snippets are packed into batches of at most `SENTIMENT_BATCH_TOKENS` estimated input tokens and `SENTIMENT_BATCH_SIZE` snippets, which keeps every response well inside the model's output limit.
+- **Concurrent under a rate limit.** Batches from every location run at once on `SENTIMENT_MAX_WORKERS` threads, all sharing `LLM_LIMIT`.
+- **Merged by snippet id.** Each snippet's id is a hash of its text, and the model echoes ids back, so results are matched by id rather than position. The same snippet found in two locations is classified once.
+- **Only failures are retried.** A batch that errors, or that leaves some ids out of its answer, is resubmitted with just the missing snippets, up to `SENTIMENT_MAX_ATTEMPTS` times.
+"""
 
 # =========================
-# Tool: Enhanced Sentiment Analysis
+# Tool: Batched Sentiment Engine
 # =========================
 
-def analyze_sentiment_with_context(texts: list, issue: str) -> list:
-    """
-    Analyze sentiment with cultural/geographic context awareness.
-    """
-    prompt = f"""
+SENTIMENT_BATCH_TOKENS = int(os.environ.get('SENTIMENT_BATCH_TOKENS', 3000))
+SENTIMENT_BATCH_SIZE = int(os.environ.get('SENTIMENT_BATCH_SIZE', 20))
+SENTIMENT_MAX_WORKERS = int(os.environ.get('SENTIMENT_MAX_WORKERS', 8))
+SENTIMENT_MAX_ATTEMPTS = int(os.environ.get('SENTIMENT_MAX_ATTEMPTS', 3))
+
+SENTIMENT_PROMPT = """
 You are a cross-cultural sentiment analysis expert analyzing: "{issue}"
 
 For each text snippet, provide:
@@ -297,14 +532,14 @@ For each text snippet, provide:
 4. Sentiment intensity: low, medium, high
 5. Detected cultural/geographic context (if any): e.g., "Western", "Middle Eastern", "Asian", "Global"
 
-Text snippets:
-{json.dumps(texts[:20], indent=2)}
+Text snippets, each with an id:
+{snippets}
 
-Respond ONLY with valid JSON:
+Respond ONLY with valid JSON, with one analysis per snippet, copying each snippet's id exactly:
 {{
   "analyses": [
     {{
-      "text_index": 0,
+      "id": "<snippet id>",
       "sentiment": "positive/negative/neutral",
       "emotion": "fear/anger/hope/joy/sadness/skepticism/curiosity",
       "themes": ["theme1", "theme2"],
@@ -315,20 +550,611 @@ Respond ONLY with valid JSON:
 }}
 """
 
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            result = json.loads(json_match.group(0))
-            return result.get('analyses', [])
-        else:
-            return [{"error": "No JSON in response"}]
-    except Exception as e:
-        return [{"error": str(e)}]
+
+def snippet_id(text: str) -> str:
+    """Stable id for a snippet: the same text always gets the same id."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about 4 characters per token, plus the id and JSON framing."""
+    return len(text) // 4 + 12
+
+
+def plan_sentiment_batches(snippets: dict, max_tokens: int = None, max_size: int = None) -> list:
+    """
+    Pack snippets into batches under a token budget and a size cap.
+
+    Args:
+        snippets (dict): snippet id -> text
+        max_tokens (int): Estimated input tokens per batch
+        max_size (int): Snippets per batch
+
+    Returns:
+        list: Lists of snippet ids. A snippet bigger than the budget gets a batch of its own.
+    """
+    max_tokens = max_tokens or SENTIMENT_BATCH_TOKENS
+    max_size = max_size or SENTIMENT_BATCH_SIZE
+    batches, current, used = [], [], 0
+    for sid, text in snippets.items():
+        cost = estimate_tokens(text)
+        if current and (used + cost > max_tokens or len(current) >= max_size):
+            batches.append(current)
+            current, used = [], 0
+        current.append(sid)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _gemini_generate(prompt: str) -> str:
+    with LLM_LIMIT:
+        return model.generate_content(prompt).text
+
+
+def _classify_batch(ids: list, snippets: dict, issue: str, generate, attempt: int) -> dict:
+    """Classify one batch. Returns id -> analysis for the ids the model answered."""
+    if attempt > 1:
+        time.sleep(2 ** (attempt - 2))
+    payload = [{'id': sid, 'text': snippets[sid]} for sid in ids]
+    prompt = SENTIMENT_PROMPT.format(issue=issue, snippets=json.dumps(payload, indent=2, ensure_ascii=False))
+    text = generate(prompt).strip()
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not json_match:
+        raise ValueError("No JSON in response")
+    wanted = set(ids)
+    answered = {}
+    for analysis in json.loads(json_match.group(0)).get('analyses', []):
+        sid = str(analysis.get('id', ''))
+        if sid in wanted and isinstance(analysis.get('sentiment'), str):
+            analysis['sentiment'] = analysis['sentiment'].strip().lower()
+            answered[sid] = analysis
+    return answered
+
+
+def classify_snippets(snippets: dict, issue: str, generate=None, max_workers: int = None,
+                      max_attempts: int = None) -> dict:
+    """
+    Classify any number of snippets in concurrent, token-budgeted batches.
+
+    Args:
+        snippets (dict): snippet id -> text
+        issue (str): Topic the snippets are about
+        generate (callable): prompt -> response text. Defaults to Gemini under LLM_LIMIT.
+        max_workers (int): Batches in flight at once
+        max_attempts (int): Tries per snippet before giving up on it
+
+    Returns:
+        dict: snippet id -> analysis, or {'error': ...} for snippets that failed every attempt
+    """
+    generate = generate or _gemini_generate
+    max_workers = max_workers or SENTIMENT_MAX_WORKERS
+    max_attempts = max_attempts or SENTIMENT_MAX_ATTEMPTS
+    results = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(_classify_batch, ids, snippets, issue, generate, 1): (ids, 1)
+            for ids in plan_sentiment_batches(snippets)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ids, attempt = pending.pop(future)
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    for sid in ids:
+                        errors[sid] = str(e)
+                missing = [sid for sid in ids if sid not in results]
+                for sid in missing:
+                    errors.setdefault(sid, "Missing from model response")
+                # Resubmit only what is still unanswered, as soon as its batch returns
+                if missing and attempt < max_attempts:
+                    retry = pool.submit(_classify_batch, missing, snippets, issue, generate, attempt + 1)
+                    pending[retry] = (missing, attempt + 1)
+
+    for sid in snippets:
+        if sid not in results:
+            results[sid] = {'id': sid, 'error': errors.get(sid, 'Not classified')}
+    return results
+
+
+def analyze_sentiment_with_context(texts: list, issue: str) -> list:
+    """
+    Analyze sentiment with cultural/geographic context awareness.
+
+    Every text is classified, in batches. Returns one analysis per text, in order,
+    each with its text_index; texts that could not be classified carry an 'error'.
+    """
+    ids = [snippet_id(text) for text in texts]
+    results = classify_snippets(dict(zip(ids, texts)), issue)
+    return [{**results[sid], 'text_index': i} for i, sid in enumerate(ids)]
+
+
+def benchmark_sentiment_engine(locations: int = 20, per_location: int = 50,
+                               latency: float = 0.5, failure_rate: float = 0.1) -> dict:
+    """
+    Run the engine offline against a simulated model that takes `latency` seconds per
+    call and fails `failure_rate` of its calls, with no rate limit.
+
+    Returns:
+        dict: Batches, calls, wall time, slowest single call, and whether every snippet was covered
+    """
+    import random
+    rng = random.Random(0)
+    snippets = {}
+    for loc in range(locations):
+        for n in range(per_location):
+            text = f"Location {loc} snippet {n}: " + "opinion text " * rng.randint(10, 60)
+            snippets[snippet_id(text)] = text
+
+    lock = threading.Lock()
+    calls = []
+
+    def simulated(prompt):
+        start = time.perf_counter()
+        payload = json.loads(prompt[prompt.index('['):prompt.index('Respond ONLY')].strip())
+        time.sleep(latency * rng.uniform(0.8, 1.2))
+        with lock:
+            fail = rng.random() < failure_rate
+            calls.append(time.perf_counter() - start)
+        if fail:
+            raise TimeoutError("simulated timeout")
+        return json.dumps({'analyses': [{'id': p['id'], 'sentiment': 'neutral', 'emotion': 'curiosity',
+                                         'themes': [], 'intensity': 'low',
+                                         'cultural_context': 'Global'} for p in payload]})
+
+    batches = plan_sentiment_batches(snippets)
+    start = time.perf_counter()
+    results = classify_snippets(snippets, 'benchmark', generate=simulated,
+                                max_workers=len(batches))
+    elapsed = time.perf_counter() - start
+    covered = sum('error' not in r for r in results.values())
+
+    print(f"\n⏱️ Sentiment engine: {len(snippets)} snippets from {locations} locations")
+    print("="*70)
+    print(f"Batches planned:   {len(batches)}")
+    print(f"Model calls:       {len(calls)} (including retries)")
+    print(f"Slowest call:      {max(calls):.2f}s")
+    print(f"Wall time:         {elapsed:.2f}s")
+    print(f"Snippets covered:  {covered}/{len(snippets)} {'✅' if covered == len(snippets) else '❌'}")
+
+    return {'snippets': len(snippets), 'batches': len(batches), 'calls': len(calls),
+            'slowest_call_s': max(calls), 'wall_s': elapsed, 'covered': covered}
 
 print("✅ Enhanced sentiment analysis tool loaded")
 
+"""### 4.4. Cross-Location Deduplication
+
+The same article often comes back for several locations, sometimes verbatim and sometimes as a syndicated copy under another URL with a word or two changed. `DedupIndex` spots both:
+
+- **Exact:** URLs are normalised (no scheme, `www.`, fragment, tracking parameters or trailing slash) and matched directly.
+- **Near-duplicate:** each article's content gets a MinHash signature over 3-word shingles. Two articles whose estimated Jaccard similarity is at least `NEAR_DUPLICATE_JACCARD` are the same article. Signatures are split into bands and indexed by band, so a lookup only compares against articles that share a band.
+"""
+
+# =========================
+# Tool: Dedup Index (URL + MinHash)
+# =========================
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+NEAR_DUPLICATE_JACCARD = 0.8
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'ref', 'cmpid')
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_perm_rng = random.Random(42)
+_MINHASH_PERMS = [(_perm_rng.randrange(1, _MERSENNE_PRIME), _perm_rng.randrange(_MERSENNE_PRIME))
+                  for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def normalize_url(url: str) -> str:
+    """Reduce a URL to what identifies the page: host without www, path, and non-tracking query."""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if not k.lower().startswith(TRACKING_PARAMS)]
+    path = parsed.path.rstrip('/')
+    return f"{host}{path}" + (f"?{urlencode(sorted(query))}" if query else '')
+
+
+def minhash(text: str) -> tuple:
+    """MinHash signature over 3-word shingles. The share of equal slots estimates Jaccard similarity."""
+    tokens = re.findall(r'\w+', text.lower())
+    shingles = {' '.join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+    hashes = [int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest(), 'big')
+              for sh in shingles]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _MINHASH_PERMS)
+
+
+def estimated_jaccard(sig_a: tuple, sig_b: tuple) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class DedupIndex:
+    """Articles collected so far, across all locations. Each is added once; later copies map to it."""
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_JACCARD, bands: int = MINHASH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        self.entries = []
+        self._urls = {}
+        self._buckets = {}
+
+    def _band_keys(self, signature: tuple) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def match(self, url: str, content: str, signature: tuple = None):
+        """Entry id of an earlier copy of this article, or None."""
+        if url and normalize_url(url) in self._urls:
+            return self._urls[normalize_url(url)]
+        signature = signature or minhash(content)
+        candidates = {entry for key in self._band_keys(signature) for entry in self._buckets.get(key, ())}
+        for entry in sorted(candidates):
+            if estimated_jaccard(self.entries[entry]['signature'], signature) >= self.threshold:
+                return entry
+        return None
+
+    def add(self, url: str, content: str, location: str, signature: tuple = None) -> tuple:
+        """
+        Returns:
+            tuple: (entry id, True if the article is new)
+        """
+        signature = signature or minhash(content)
+        entry = self.match(url, content, signature)
+        if entry is not None:
+            if location is not None:
+                self.entries[entry]['locations'].add(location)
+            if url:
+                self._urls.setdefault(normalize_url(url), entry)
+            return entry, False
+        return self._insert({'url': url, 'content': content, 'signature': signature,
+                             'locations': set() if location is None else {location}}), True
+
+    def _insert(self, article: dict) -> int:
+        entry = len(self.entries)
+        self.entries.append(article)
+        if article['url']:
+            self._urls.setdefault(normalize_url(article['url']), entry)
+        for key in self._band_keys(article['signature']):
+            self._buckets.setdefault(key, []).append(entry)
+        return entry
+
+    def band_hashes(self, signature: tuple) -> list:
+        """The band keys of a signature as short strings, for storing and looking up in SQLite."""
+        return [f"{band}:{hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).hexdigest()}"
+                for band, rows in self._band_keys(signature)]
+
+
+class StoredDedupIndex(DedupIndex):
+    """
+    A DedupIndex that also knows every article stored for an issue, without loading them.
+
+    A lookup that misses in memory asks the store for articles with the same URL or a
+    shared MinHash band, and pulls in only those. Stored articles are older than anything
+    found this run, so they are tried first, as they would be if all were loaded up front.
+    Entries read from the store are marked 'stored'; new_entries() is what is left to save.
+    """
+
+    def __init__(self, store, issue: str, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.issue = issue
+        self._stored = {}
+
+    def match(self, url: str, content: str, signature: tuple = None):
+        signature = signature or minhash(content)
+        url_key = normalize_url(url) if url else None
+        if url_key in self._urls:
+            return self._urls[url_key]
+        for article_id, stored_url, stored_content, stored_signature in self.store.candidates(
+                self.issue, url_key, self.band_hashes(signature)):
+            if (url_key and normalize_url(stored_url or '') == url_key) or \
+                    estimated_jaccard(stored_signature, signature) >= self.threshold:
+                return self._load(article_id, stored_url, stored_content, stored_signature)
+        return super().match(url, content, signature)
+
+    def _load(self, article_id: str, url: str, content: str, signature: tuple) -> int:
+        if article_id not in self._stored:
+            self._stored[article_id] = self._insert({'url': url, 'content': content, 'signature': signature,
+                                                     'locations': set(), 'stored': True})
+        return self._stored[article_id]
+
+    def new_entries(self) -> list:
+        return [e for e in self.entries if not e.get('stored')]
+
+print("✅ Dedup index loaded")
+
+"""### 4.5. Sentiment Tracking Store
+
+Repeated runs on the same issue build on each other through a local SQLite store, `sentiment_store.db`:
+
+- **Articles** are kept per issue with their MinHash signatures, band keys and normalised URLs. The next run's `StoredDedupIndex` looks up only the stored articles that share a URL or a band with what it finds, so an article seen last week, or a syndicated copy of it, is recognised and not treated as new, and a run costs in proportion to what it collects rather than to the whole history.
+- **Analyses** are kept per issue and article, so only new articles are sent to Gemini.
+- **Daily aggregates** per issue, location and day are updated as new sightings are analysed, never recomputed. `sentiment_windows` sums the last 1, 7 or 30 days from those rows, so a daily tracking job costs in proportion to new content.
+- **Runs** remember the charts, CSVs and report built from each set of results. When a run finds nothing new, those files are reused instead of rebuilt.
+"""
+
+# =========================
+# Sentiment Tracking Store (SQLite)
+# =========================
+
+SENTIMENT_STORE_PATH = os.environ.get('SENTIMENT_STORE', 'sentiment_store.db')
+SENTIMENT_WINDOWS = (1, 7, 30)
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    issue       TEXT NOT NULL,
+    article_id  TEXT NOT NULL,
+    url         TEXT,
+    content     TEXT NOT NULL,
+    signature   TEXT NOT NULL,
+    first_seen  TEXT NOT NULL,
+    PRIMARY KEY (issue, article_id)
+);
+CREATE TABLE IF NOT EXISTS sightings (
+    issue       TEXT NOT NULL,
+    location    TEXT NOT NULL,
+    article_id  TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    aggregated  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (issue, location, article_id)
+);
+CREATE INDEX IF NOT EXISTS sightings_pending ON sightings (issue, aggregated);
+CREATE TABLE IF NOT EXISTS article_urls (
+    issue       TEXT NOT NULL,
+    url_key     TEXT NOT NULL,
+    article_id  TEXT NOT NULL,
+    PRIMARY KEY (issue, url_key)
+);
+CREATE TABLE IF NOT EXISTS article_bands (
+    issue       TEXT NOT NULL,
+    band_key    TEXT NOT NULL,
+    article_id  TEXT NOT NULL,
+    PRIMARY KEY (issue, band_key, article_id)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    issue       TEXT NOT NULL,
+    article_id  TEXT NOT NULL,
+    analysis    TEXT NOT NULL,
+    analysed_at TEXT NOT NULL,
+    PRIMARY KEY (issue, article_id)
+);
+CREATE TABLE IF NOT EXISTS daily_sentiment (
+    issue       TEXT NOT NULL,
+    location    TEXT NOT NULL,
+    day         TEXT NOT NULL,
+    positive    INTEGER NOT NULL DEFAULT 0,
+    negative    INTEGER NOT NULL DEFAULT 0,
+    neutral     INTEGER NOT NULL DEFAULT 0,
+    emotions    TEXT NOT NULL DEFAULT '{}',
+    themes      TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (issue, location, day)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    issue       TEXT NOT NULL,
+    inputs_key  TEXT NOT NULL,
+    run_at      TEXT NOT NULL,
+    outputs     TEXT NOT NULL,
+    PRIMARY KEY (issue, inputs_key)
+);
+"""
+
+
+def _issue_key(issue: str) -> str:
+    return ' '.join(issue.lower().split())
+
+
+class SentimentStore:
+    """Articles, analyses and daily sentiment aggregates per issue and location, in SQLite."""
+
+    def __init__(self, path: str = SENTIMENT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(STORE_SCHEMA)
+        self._index_stored_articles()
+
+    def _index_stored_articles(self):
+        # Stores written before the URL and band tables existed get them built once
+        if self._db.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+        rows = self._db.execute("SELECT issue, article_id, url, signature FROM articles").fetchall()
+        with self._db:
+            self._index_articles([(issue, sid, url, tuple(json.loads(sig))) for issue, sid, url, sig in rows])
+            self._db.execute("PRAGMA user_version = 1")
+
+    def _index_articles(self, articles: list):
+        bands = DedupIndex()
+        self._db.executemany(
+            "INSERT OR IGNORE INTO article_urls (issue, url_key, article_id) VALUES (?,?,?)",
+            [(issue, normalize_url(url), sid) for issue, sid, url, _ in articles if url])
+        self._db.executemany(
+            "INSERT OR IGNORE INTO article_bands (issue, band_key, article_id) VALUES (?,?,?)",
+            [(issue, key, sid) for issue, sid, _, sig in articles for key in bands.band_hashes(sig)])
+
+    def dedup_index(self, issue: str) -> StoredDedupIndex:
+        """A DedupIndex that finds this issue's stored articles by URL or MinHash band as it needs them."""
+        return StoredDedupIndex(self, issue)
+
+    def candidates(self, issue: str, url_key: str, band_keys: list) -> list:
+        """Stored articles with this normalised URL or any of these band keys, oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT article_id, url, content, signature FROM articles WHERE issue=? AND article_id IN ("
+                f"SELECT article_id FROM article_urls WHERE issue=? AND url_key=? UNION "
+                f"SELECT article_id FROM article_bands WHERE issue=? AND band_key IN "
+                f"({','.join('?' * len(band_keys))})) ORDER BY first_seen, rowid",
+                [_issue_key(issue), _issue_key(issue), url_key or '', _issue_key(issue), *band_keys]).fetchall()
+        return [(sid, url, content, tuple(json.loads(sig))) for sid, url, content, sig in rows]
+
+    def add_articles(self, issue: str, entries: list, day: str):
+        """Store new DedupIndex entries, keyed by snippet_id of their content, with their URL and band keys."""
+        articles = [(_issue_key(issue), snippet_id(e['content']), e['url'], tuple(e['signature']))
+                    for e in entries]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO articles (issue, article_id, url, content, signature, first_seen) "
+                "VALUES (?,?,?,?,?,?)",
+                [(issue, sid, e['url'], e['content'], json.dumps(e['signature']), day)
+                 for (issue, sid, _, _), e in zip(articles, entries)])
+            self._index_articles(articles)
+
+    def close(self):
+        self._db.close()
+
+    def record_sightings(self, issue: str, location: str, article_ids: list, day: str) -> int:
+        """Note that a location's search returned these articles. Returns how many it had not returned before."""
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO sightings (issue, location, article_id, day) VALUES (?,?,?,?)",
+                [(_issue_key(issue), location, sid, day) for sid in article_ids])
+            return self._db.total_changes - before
+
+    def analyses(self, issue: str, article_ids: list) -> dict:
+        """Stored analyses for whichever of these articles have one."""
+        found = {}
+        ids = list(article_ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT article_id, analysis FROM analyses WHERE issue=? "
+                    f"AND article_id IN ({','.join('?' * len(chunk))})",
+                    [_issue_key(issue)] + chunk).fetchall()
+                found.update((sid, json.loads(analysis)) for sid, analysis in rows)
+        return found
+
+    def save_analyses(self, issue: str, analyses: dict):
+        """Store new analyses (errors are skipped) and fold their sightings into the daily aggregates."""
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(_issue_key(issue), sid, json.dumps(a, ensure_ascii=False), now)
+                for sid, a in analyses.items() if 'error' not in a]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO analyses (issue, article_id, analysis, analysed_at) VALUES (?,?,?,?)",
+                rows)
+            self._fold_sightings(_issue_key(issue))
+
+    def _fold_sightings(self, issue: str):
+        # Only sightings not yet counted are read, so the work grows with new content alone
+        pending = self._db.execute(
+            "SELECT s.location, s.day, s.article_id, a.analysis FROM sightings s "
+            "JOIN analyses a ON a.issue = s.issue AND a.article_id = s.article_id "
+            "WHERE s.issue=? AND s.aggregated=0", (issue,)).fetchall()
+        buckets = {}
+        for location, day, _, analysis in pending:
+            a = json.loads(analysis)
+            bucket = buckets.setdefault((location, day), {'sentiment': Counter(), 'emotions': Counter(),
+                                                          'themes': Counter()})
+            bucket['sentiment'][a.get('sentiment', 'neutral')] += 1
+            bucket['emotions'][a.get('emotion', 'neutral')] += 1
+            bucket['themes'].update(a.get('themes', []))
+        for (location, day), bucket in buckets.items():
+            row = self._db.execute(
+                "SELECT emotions, themes FROM daily_sentiment WHERE issue=? AND location=? AND day=?",
+                (issue, location, day)).fetchone()
+            emotions = Counter(json.loads(row[0])) + bucket['emotions'] if row else bucket['emotions']
+            themes = Counter(json.loads(row[1])) + bucket['themes'] if row else bucket['themes']
+            self._db.execute(
+                "INSERT INTO daily_sentiment (issue, location, day) VALUES (?,?,?) "
+                "ON CONFLICT (issue, location, day) DO NOTHING", (issue, location, day))
+            self._db.execute(
+                "UPDATE daily_sentiment SET positive=positive+?, negative=negative+?, neutral=neutral+?, "
+                "emotions=?, themes=? WHERE issue=? AND location=? AND day=?",
+                (bucket['sentiment']['positive'], bucket['sentiment']['negative'],
+                 bucket['sentiment']['neutral'], json.dumps(dict(emotions)), json.dumps(dict(themes)),
+                 issue, location, day))
+        self._db.executemany(
+            "UPDATE sightings SET aggregated=1 WHERE issue=? AND location=? AND article_id=?",
+            [(issue, location, sid) for location, _, sid, _ in pending])
+
+    def sentiment_windows(self, issue: str, windows: tuple = SENTIMENT_WINDOWS, today: str = None) -> pd.DataFrame:
+        """
+        Sentiment per location over the last N days, for each N in `windows`, from the daily aggregates.
+
+        Returns:
+            pd.DataFrame: location, window_days, sample_size, positive/negative/neutral %, top_emotion
+        """
+        today = datetime.strptime(today, '%Y-%m-%d') if today else datetime.now()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT location, day, positive, negative, neutral, emotions FROM daily_sentiment "
+                "WHERE issue=? AND day>=?",
+                (_issue_key(issue), (today - timedelta(days=max(windows) - 1)).strftime('%Y-%m-%d'))).fetchall()
+        records = []
+        for days in windows:
+            cutoff = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+            totals = {}
+            for location, day, pos, neg, neu, emotions in rows:
+                if day < cutoff:
+                    continue
+                t = totals.setdefault(location, {'positive': 0, 'negative': 0, 'neutral': 0,
+                                                 'emotions': Counter()})
+                t['positive'] += pos
+                t['negative'] += neg
+                t['neutral'] += neu
+                t['emotions'].update(json.loads(emotions))
+            for location, t in sorted(totals.items()):
+                n = t['positive'] + t['negative'] + t['neutral']
+                records.append({
+                    'location': location,
+                    'window_days': days,
+                    'sample_size': n,
+                    'positive_pct': round(t['positive'] / max(1, n) * 100, 1),
+                    'negative_pct': round(t['negative'] / max(1, n) * 100, 1),
+                    'neutral_pct': round(t['neutral'] / max(1, n) * 100, 1),
+                    'top_emotion': t['emotions'].most_common(1)[0][0] if t['emotions'] else None,
+                })
+        return pd.DataFrame(records, columns=['location', 'window_days', 'sample_size', 'positive_pct',
+                                              'negative_pct', 'neutral_pct', 'top_emotion'])
+
+    def reusable_outputs(self, issue: str, inputs_key: str):
+        """Outputs of an earlier run built from the same inputs, if all its files still exist."""
+        with self._lock:
+            row = self._db.execute("SELECT run_at, outputs FROM runs WHERE issue=? AND inputs_key=?",
+                                   (_issue_key(issue), inputs_key)).fetchone()
+        if row is None:
+            return None
+        outputs = json.loads(row[1])
+        paths = [outputs['report_path'], *outputs['chart_files'].values(), *outputs['csv_files'].values()]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return {**outputs, 'run_at': row[0]}
+
+    def record_run(self, issue: str, inputs_key: str, outputs: dict):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs (issue, inputs_key, run_at, outputs) VALUES (?,?,?,?)",
+                (_issue_key(issue), inputs_key, datetime.now().isoformat(timespec='seconds'),
+                 json.dumps(outputs)))
+
+    def stats(self, issue: str) -> dict:
+        with self._lock:
+            articles, analysed, sightings = self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM articles WHERE issue=?), "
+                "(SELECT COUNT(*) FROM analyses WHERE issue=?), "
+                "(SELECT COUNT(*) FROM sightings WHERE issue=?)",
+                (_issue_key(issue),) * 3).fetchone()
+        return {'articles': articles, 'analyses': analysed, 'sightings': sightings}
+
+
+SENTIMENT_STORE = SentimentStore()
+
+
+def use_sentiment_store(store: SentimentStore):
+    """Switch every agent to another store, e.g. a temporary one for a dry run."""
+    global SENTIMENT_STORE
+    SENTIMENT_STORE = store
+
+print("✅ Sentiment tracking store loaded")
+
 """## 5. Enhanced Agent Definitions
 
 ### 5.1. Geographic Social Listening Agent
@@ -338,34 +1164,58 @@ print("✅ Enhanced sentiment analysis tool loaded")
 # Agent 1: Geographic Social Listening
 # =========================
 
+COLLECT_MAX_WORKERS = int(os.environ.get('COLLECT_MAX_WORKERS', 8))
+
+
 def geographic_listening_agent(
     issue_keyword: str,
     locations: list = ["global"],
-    num_sources_per_location: int = 15
+    num_sources_per_location: int = 15,
+    max_workers: int = None
 ) -> dict:
     """
     Collect data with geographic segmentation.
 
+    Every location is searched at once, and articles found in several locations are
+    deduplicated: each location still lists them, but under the text of the first
+    copy found, so sentiment analysis classifies each article once. Articles already
+    in SENTIMENT_STORE from earlier runs on this issue are recognised the same way.
+
     Args:
         issue_keyword (str): Topic to research
         locations (list): List of countries/regions (e.g., ["USA", "Germany", "Saudi Arabia"])
         num_sources_per_location (int): Sources per location
+        max_workers (int): Searches in flight at once
 
     Returns:
         dict: Data organized by location
     """
     log_agent_title_html("Geographic Social Listening Agent", "🌍")
 
-    location_data = {}
-
+    max_workers = max_workers or COLLECT_MAX_WORKERS
     for location in locations:
         log_tool_call_html("tavily_search_geographic", f"location={location}")
 
-        search_result = tavily_search_geographic(
-            query=issue_keyword,
-            location=location,
-            max_results=num_sources_per_location
-        )
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(locations)))) as pool:
+        searches = {
+            location: pool.submit(
+                tavily_search_geographic,
+                query=issue_keyword,
+                location=location,
+                max_results=num_sources_per_location
+            )
+            for location in locations
+        }
+
+    # Processed in `locations` order, so the first location to find an article owns it
+    index = SENTIMENT_STORE.dedup_index(issue_keyword)
+    today = datetime.now().strftime('%Y-%m-%d')
+    location_data = {}
+    found = set()
+    dropped = 0
+
+    for location in locations:
+        search_result = searches[location].result()
 
         if 'error' not in search_result:
             results = search_result['results']
@@ -373,14 +1223,37 @@ def geographic_listening_agent(
             # Analyze source diversity
             diversity = analyze_source_diversity(results)
 
+            snippets, seen_here, shared = [], set(), 0
+            for r in results:
+                if not r.get('content'):
+                    continue
+                entry, is_new = index.add(r.get('url', ''), r['content'], location)
+                if entry in seen_here:
+                    # Same article twice in one location would count its sentiment twice
+                    dropped += 1
+                    continue
+                seen_here.add(entry)
+                # Counts as shared only if another location returned it this run, not in an earlier one
+                shared += bool(index.entries[entry]['locations'] - {location})
+                snippets.append(index.entries[entry]['content'])
+            found |= seen_here
+
+            new_sightings = SENTIMENT_STORE.record_sightings(
+                issue_keyword, location, [snippet_id(text) for text in snippets], today)
+
             location_data[location] = {
-                'snippets': [r['content'] for r in results if r.get('content')],
+                'snippets': snippets,
                 'sources': [{'title': r['title'], 'url': r['url'], 'domain': r['domain']}
                            for r in results],
-                'diversity': diversity
+                'diversity': diversity,
+                'shared_articles': shared,
+                'new_articles': new_sightings
             }
 
-            log_tool_result_html(f"{location}: Found {len(results)} sources, diversity score: {diversity['diversity_score']}")
+            log_tool_result_html(
+                f"{location}: Found {len(results)} sources, {new_sightings} new, {shared} also found elsewhere, "
+                f"diversity score: {diversity['diversity_score']}"
+            )
 
             # Show warnings
             if diversity['warnings']:
@@ -389,9 +1262,18 @@ def geographic_listening_agent(
         else:
             log_warning_html(f"Failed to collect data for {location}: {search_result.get('error')}")
 
+    new_entries = index.new_entries()
+    SENTIMENT_STORE.add_articles(issue_keyword, new_entries, today)
+
+    collected = sum(len(data['snippets']) for data in location_data.values())
+    cache_stats = SEARCH_CACHE.stats()
     summary = f"""
 Collected data for {len(location_data)} location(s):
-{chr(10).join([f"- {loc}: {len(data['snippets'])} snippets" for loc, data in location_data.items()])}
+{chr(10).join([f"- {loc}: {len(data['snippets'])} snippets ({data['new_articles']} new)" for loc, data in location_data.items()])}
+
+Unique articles: {len(found)} of {collected} snippets ({dropped} repeats within a location dropped)
+New to the tracking store: {len(new_entries)} articles
+Search cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses
 """
 
     log_final_summary_html(summary)
@@ -399,9 +1281,68 @@ Collected data for {len(location_data)} location(s):
     return {
         'issue': issue_keyword,
         'location_data': location_data,
+        'unique_articles': len(found),
+        'new_articles': len(new_entries),
         'collection_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
 
+
+def benchmark_collection(locations: list = None, per_location: int = 15, latency: float = 0.5) -> dict:
+    """
+    Collect offline from synthetic recordings that answer after `latency` seconds: the old
+    one-location-at-a-time loop, the concurrent agent cold, and again from the search cache.
+    Searches, cache and tracking store are all temporary; SENTIMENT_STORE is left untouched.
+
+    Returns:
+        dict: Wall times, snippets collected and unique articles
+    """
+    locations = locations or ["Malaysia", "Germany", "USA", "India", "Japan", "Brazil",
+                              "Nigeria", "France", "Indonesia", "Mexico"]
+    query = "Should firecrackers and fireworks be banned?"
+    previous = (tavily_client, SEARCH_CACHE)
+    previous_store = SENTIMENT_STORE
+    workdir = tempfile.mkdtemp(prefix='collect_bench_')
+    # Synthetic articles go to a throwaway store, never into the real one's history
+    bench_store = SentimentStore(os.path.join(workdir, 'store.db'))
+    use_sentiment_store(bench_store)
+    try:
+        client = write_synthetic_recordings(os.path.join(workdir, 'recordings'), query, locations,
+                                            per_location=per_location, max_results=per_location)
+        client.latency = latency
+
+        start = time.perf_counter()
+        raw = 0
+        for location in locations:
+            raw += len(client.search(query=f"{query} {location}", max_results=per_location,
+                                     search_depth="advanced", days=365)['results'])
+        serial_s = time.perf_counter() - start
+
+        use_search_client(client, SearchCache(os.path.join(workdir, 'cache')))
+        start = time.perf_counter()
+        data = geographic_listening_agent(query, locations, per_location)
+        cold_s = time.perf_counter() - start
+        start = time.perf_counter()
+        geographic_listening_agent(query, locations, per_location)
+        warm_s = time.perf_counter() - start
+    finally:
+        use_search_client(*previous)
+        use_sentiment_store(previous_store)
+        bench_store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    texts = {text for loc in data['location_data'].values() for text in loc['snippets']}
+    print(f"\n⏱️ Collection benchmark: {len(locations)} locations x {per_location} results, {latency}s per search")
+    print("="*70)
+    print(f"One location at a time:   {serial_s:6.2f}s")
+    print(f"Concurrent, cold cache:   {cold_s:6.2f}s")
+    print(f"Concurrent, warm cache:   {warm_s:6.2f}s")
+    print(f"Snippets collected:       {raw}")
+    print(f"Unique articles:          {data['unique_articles']}")
+    print(f"Texts sent to sentiment:  {len(texts)}")
+
+    return {'serial_s': serial_s, 'cold_s': cold_s, 'warm_s': warm_s, 'snippets': raw,
+            'unique_articles': data['unique_articles'], 'texts_to_classify': len(texts)}
+
 print("✅ Geographic Listening Agent defined")
 
 """### 5.2. Comparative Sentiment Analysis Agent"""
@@ -421,6 +1362,27 @@ def comparative_sentiment_agent(listening_data: dict) -> dict:
 
     location_sentiments = {}
 
+    # Classify every location's snippets in one run, so all batches share the worker pool
+    all_snippets = {
+        snippet_id(text): text
+        for data in location_data.values() for text in data['snippets']
+    }
+    # Articles analysed in an earlier run come from the tracking store
+    stored = SENTIMENT_STORE.analyses(issue, all_snippets)
+    new_snippets = {sid: text for sid, text in all_snippets.items() if sid not in stored}
+    log_tool_call_html("classify_snippets", f"locations={len(location_data)}, samples={len(new_snippets)}")
+    start = time.perf_counter()
+    fresh = classify_snippets(new_snippets, issue)
+    SENTIMENT_STORE.save_analyses(issue, fresh)
+    classified = {**stored, **fresh}
+    failed = sum('error' in a for a in fresh.values())
+    log_tool_result_html(
+        f"Reused {len(stored)} stored analyses, classified {len(new_snippets) - failed}/{len(new_snippets)} "
+        f"new snippets in {len(plan_sentiment_batches(new_snippets))} batches, {time.perf_counter() - start:.1f}s"
+    )
+    if failed:
+        log_warning_html(f"{failed} snippet(s) could not be classified after {SENTIMENT_MAX_ATTEMPTS} attempts")
+
     for location, data in location_data.items():
         snippets = data['snippets']
 
@@ -428,9 +1390,7 @@ def comparative_sentiment_agent(listening_data: dict) -> dict:
             log_warning_html(f"No data for {location}, skipping...")
             continue
 
-        log_tool_call_html("analyze_sentiment_with_context", f"location={location}, samples={len(snippets)}")
-
-        analyses = analyze_sentiment_with_context(snippets, issue)
+        analyses = [classified[snippet_id(text)] for text in snippets]
 
         # Calculate statistics
         sentiments = [a.get('sentiment', 'neutral') for a in analyses if 'error' not in a]
@@ -485,7 +1445,8 @@ Regional Comparison:
 
     return {
         'issue': issue,
-        'location_sentiments': location_sentiments
+        'location_sentiments': location_sentiments,
+        'trend': SENTIMENT_STORE.sentiment_windows(issue)
     }
 
 print("✅ Comparative Sentiment Agent defined")
@@ -871,7 +1832,8 @@ Write 3-4 sentences highlighting:
 """
 
     try:
-        response = model.generate_content(prompt)
+        with LLM_LIMIT:
+            response = model.generate_content(prompt)
         executive_summary = response.text.strip()
     except:
         executive_summary = "Regional sentiment analysis reveals significant geographic variation in public opinion."
@@ -1159,24 +2121,49 @@ def run_enhanced_sentiment_pipeline(
     sentiment_data = comparative_sentiment_agent(listening_data)
     print("\n✅ Stage 2/5 Complete: Comparative Sentiment Analysis\n")
 
-    # Stage 3: Comparative Visualization (with theme frequency chart)
-    visualization_data = comparative_visualization_agent(sentiment_data, listening_data, output_dir)
-    print("\n✅ Stage 3/5 Complete: Comparative Visualization\n")
-
-    # Stage 4: Data Export (CSV files and tables)
-    export_data = data_export_agent(listening_data, sentiment_data, output_dir)
-    print("\n✅ Stage 4/5 Complete: Data Export\n")
-
-    # Stage 5: Enhanced Packaging (with all tables)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    report_path = enhanced_packaging_agent(
-        listening_data,
-        sentiment_data,
-        visualization_data,
-        export_data,
-        output_path=f"{output_dir}/comparative_report_{timestamp}.md"
+    # Charts, CSVs and report depend only on these, so an unchanged result reuses last run's files
+    inputs_key = _request_key(
+        output_dir=output_dir,
+        sentiments=sentiment_data['location_sentiments'],
+        sources={loc: data['sources'] for loc, data in listening_data['location_data'].items()}
     )
-    print("\n✅ Stage 5/5 Complete: Enhanced Packaging\n")
+    previous = SENTIMENT_STORE.reusable_outputs(issue_keyword, inputs_key)
+
+    if previous:
+        visualization_data = {'chart_files': previous['chart_files'], 'issue': issue_keyword}
+        export_data = {
+            'csv_files': previous['csv_files'],
+            'tables': {name: pd.read_csv(path) for name, path in previous['csv_files'].items()},
+            'export_date': previous['run_at']
+        }
+        report_path = previous['report_path']
+        print(f"\n♻️ Nothing new since {previous['run_at']}: reusing its charts, CSV files and report")
+        print("\n✅ Stages 3-5/5 Complete: Reused\n")
+    else:
+        # Stage 3: Comparative Visualization (with theme frequency chart)
+        visualization_data = comparative_visualization_agent(sentiment_data, listening_data, output_dir)
+        print("\n✅ Stage 3/5 Complete: Comparative Visualization\n")
+
+        # Stage 4: Data Export (CSV files and tables)
+        export_data = data_export_agent(listening_data, sentiment_data, output_dir)
+        print("\n✅ Stage 4/5 Complete: Data Export\n")
+
+        # Stage 5: Enhanced Packaging (with all tables)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_path = enhanced_packaging_agent(
+            listening_data,
+            sentiment_data,
+            visualization_data,
+            export_data,
+            output_path=f"{output_dir}/comparative_report_{timestamp}.md"
+        )
+        print("\n✅ Stage 5/5 Complete: Enhanced Packaging\n")
+
+        SENTIMENT_STORE.record_run(issue_keyword, inputs_key, {
+            'chart_files': visualization_data['chart_files'],
+            'csv_files': export_data['csv_files'],
+            'report_path': report_path
+        })
 
     print("\n" + "="*70)
     print("🎉 ENHANCED PIPELINE COMPLETE!")
@@ -1184,7 +2171,13 @@ def run_enhanced_sentiment_pipeline(
     print(f"\n📄 Report: {report_path}")
     print(f"📊 Charts: {len(visualization_data['chart_files'])} PNG files")
     print(f"💾 CSV Exports: {len(export_data['csv_files'])} files")
-    print(f"🌍 Locations analyzed: {len(locations)}\n")
+    print(f"🌍 Locations analyzed: {len(locations)}")
+    print(f"🆕 New articles this run: {listening_data['new_articles']}\n")
+
+    trend = sentiment_data['trend']
+    if not trend.empty:
+        print("📈 Sentiment over time (tracking store):")
+        print(trend.to_string(index=False) + "\n")
 
     return {
         'listening_data': listening_data,
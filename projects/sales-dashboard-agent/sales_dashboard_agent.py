@@ -12,17 +12,22 @@ Original file is located at
 
 # Import libraries
 from __future__ import annotations
+import hashlib
 import json
 import os
 import pandas as pd
 import re
 import io
 import sys
+import time
 import traceback
+import numpy as np
+from itertools import islice
 from typing import Any, Dict, Optional
 from tinydb import TinyDB, Query, where
+from tinydb.storages import MemoryStorage
 from datetime import datetime
-from IPython.display import HTML, display
+from IPython.display import HTML, Image, display
 import google.generativeai as genai
 
 print("✅ All libraries imported successfully!")
@@ -129,7 +134,8 @@ def build_schema_block(orders_tbl) -> str:
     """
     Generate a human-readable schema description with sample data.
     """
-    sample_records = orders_tbl.all()[:3]
+    # islice reads three records, where orders_tbl.all() would copy the whole table
+    sample_records = list(islice(orders_tbl, 3))
 
     schema = f"""
 === ORDERS TABLE (orders_tbl) ===
@@ -168,6 +174,9 @@ Execution Environment (already imported/provided):
 - Variables: db, orders_tbl  # TinyDB objects
 - Libraries: Query (from tinydb), datetime, re
 - Natural language: user_request: str  # the original user question
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['year'], params['region'], ... instead of hard-coding them, so the program can be reused
+  with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings; n is a count such as "top 10".
 
 PLANNING RULES (critical):
 - Derive ALL filters/parameters from user_request (date ranges, regions, categories, products, customers)
@@ -235,14 +244,20 @@ def generate_llm_code(
     orders_tbl,
     model: str = "gemini-2.0-flash-exp",
     temperature: float = 0.3,
+    params: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
     Ask Gemini to produce a plan-with-code response.
     Returns the FULL assistant content (including surrounding text and tags).
     """
-    schema_block = build_schema_block(orders_tbl)
-    full_prompt = SALES_AGENT_PROMPT.format(schema_block=schema_block, question=prompt)
+    schema_block = schema_context(orders_tbl=orders_tbl)["schema_block"]
+    full_prompt = SALES_AGENT_PROMPT.format(
+        schema_block=schema_block, question=prompt, params=json.dumps(params or {})
+    )
+    return _call_gemini(full_prompt, model=model, temperature=temperature)
+
 
+def _call_gemini(full_prompt: str, *, model: str, temperature: float) -> str:
     # Configure Gemini model
     generation_config = {
         "temperature": temperature,
@@ -263,6 +278,431 @@ def generate_llm_code(
 
 print("✅ Code generation function loaded!")
 
+"""## Sandboxed Executor
+
+Generated code used to run with `exec` inside the notebook process. That swapped `sys.stdout` for everyone, copied the whole DataFrame on every call, and had no limits: one runaway loop froze the notebook. `SandboxExecutor` runs it in a pool of worker processes instead:
+
+*   **Shared, read-only data.** The columnar store's numeric, date and categorical columns are copied once into shared memory and every worker reads the same pages. Other columns keep their dtype and are inherited by the forked workers. TinyDB tables are Python dicts that cannot live in shared memory, so workers inherit them when forked instead. Each task gets a copy-on-write view, so it can add or overwrite columns without touching the shared data or the next task's view.
+*   **Pre-warmed workers.** Workers are forked once, with pandas, numpy, matplotlib and the TinyDB tables already loaded. Forking from the kernel, which runs threads of its own, can leave a worker stuck on a lock another thread held; the timeout catches it and the worker is replaced.
+*   **Limits per task.** Each task has CPU seconds, a memory budget and a wall-clock timeout. A task that overruns its time has its worker killed and replaced.
+*   **Own stdout per task.** Several questions can execute at once without mixing their logs. Charts come back as PNGs.
+"""
+
+# =========================
+# Sandboxed Executor: Worker Pool, Shared Memory, Limits
+# =========================
+
+import contextlib
+import copy
+import multiprocessing as mp
+import pickle
+import queue
+import signal
+import threading
+import warnings
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "60"))  # wall-clock seconds per task
+SANDBOX_CPU_SECONDS = float(os.environ.get("SANDBOX_CPU_SECONDS", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "2048"))  # on top of what a worker starts with
+
+# Variables generated code may set, returned from every task
+ANSWER_NAMES = ("answer_text", "answer_data")
+
+
+class CpuLimitExceeded(BaseException):
+    """A BaseException, so `except Exception` in generated code cannot swallow it."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _publish_frame(df: pd.DataFrame, blocks: list) -> pd.DataFrame:
+    """
+    Copy df into shared memory, one block per column, and return a read-only
+    DataFrame over the blocks. Numeric, boolean and datetime columns share
+    their values and categorical columns their codes. Every other column
+    keeps its dtype and is left out of shared memory: turning text into
+    categoricals would change what generated code sees (`.str`, assigning
+    new labels), so workers inherit those columns when forked instead.
+    """
+    data = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufcmM":
+            values, categories = column.to_numpy(), None
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            values, categories = column.cat.codes.to_numpy(), column.dtype
+        else:
+            data[name] = column
+            continue
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        blocks.append(block)
+        shared = np.ndarray(values.shape, values.dtype, buffer=block.buf)
+        shared[:] = values
+        shared.flags.writeable = False
+        data[name] = shared if categories is None else pd.Categorical.from_codes(shared, dtype=categories, validate=False)
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def _fresh(value, deep: bool = False):
+    """A copy per task, so one task's new columns never leak into the next."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=deep)
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        return {k: v.copy(deep=deep) for k, v in value.items()}
+    return value
+
+
+def _release(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:  # a frame over it is still referenced somewhere
+            pass
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Cap this process's private memory at what it uses now plus memory_mb."""
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/status") as f:
+            used = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmData:"))
+    except (OSError, StopIteration):
+        return
+    limit = used + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def _drain_figures() -> list:
+    """PNG bytes of every open figure, then close them all."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    figures = []
+    for num in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+        figures.append(buffer.getvalue())
+    plt.close("all")
+    return figures
+
+
+def _picklable(values: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for name, value in values.items():
+        try:
+            pickle.dumps(value)
+            out[name] = value
+        except Exception:
+            out[name] = repr(value)
+    return out
+
+
+def _failure(message: str, limit: Optional[str] = None) -> Dict[str, Any]:
+    return {"stdout": "", "stderr": "", "error": message, "limit": limit, "outputs": {},
+            "figures": [], "cpu_seconds": None, "seconds": None}
+
+
+class SandboxExecutor:
+    """
+    Runs generated code in a pool of pre-warmed worker processes.
+
+    frames (name -> DataFrame, or name -> dict of DataFrames) are published
+    to shared memory once. namespace holds the libraries, helpers and other
+    objects tasks may use. Workers are forked, so they inherit it, and every
+    module already imported, as it was when they started. setup(namespace)
+    runs before each task and sees the task's inputs.
+
+    Without fork (Windows), tasks run inline, one at a time and unlimited.
+
+    Workers are forked from the kernel, which has threads of its own, and
+    replacements are forked from this pool's dispatch threads. Only the
+    forking thread exists in the child, so a lock another thread held at
+    that moment (logging, the allocator, a BLAS pool) stays held there.
+    A worker that deadlocks on one is caught by the wall-clock timeout and
+    replaced, at the cost of that task. forkserver or spawn would avoid
+    this, but workers could no longer inherit the namespace and data,
+    which is what makes them pre-warmed.
+    """
+
+    def __init__(
+        self,
+        frames: Optional[Dict[str, Any]] = None,
+        namespace: Optional[Dict[str, Any]] = None,
+        *,
+        setup=None,
+        workers: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT,
+        cpu_seconds: float = SANDBOX_CPU_SECONDS,
+        memory_mb: int = SANDBOX_MEMORY_MB,
+    ):
+        try:
+            self._context = mp.get_context("fork")
+        except ValueError:
+            self._context = None
+        self.workers = workers if self._context else 0
+        self._blocks = []
+        self._finalizer = weakref.finalize(self, _release, self._blocks)
+        self.frames = {}
+        for name, value in (frames or {}).items():
+            if not self.workers:  # inline tasks get deep copies instead
+                self.frames[name] = value
+            elif isinstance(value, pd.DataFrame):
+                self.frames[name] = _publish_frame(value, self._blocks)
+            else:
+                self.frames[name] = {k: _publish_frame(v, self._blocks) for k, v in value.items()}
+        self.namespace = dict(namespace or {})
+        self.setup = setup
+        self.timeout, self.cpu_seconds, self.memory_mb = timeout, cpu_seconds, memory_mb
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="sandbox")
+
+    # ---- worker side ----
+
+    def _spawn(self) -> tuple:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=self._serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _serve(self, conn) -> None:
+        # The notebook's stdout/stderr belong to the kernel; never write to them from here
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+        warnings.filterwarnings("ignore", message=".*non-interactive.*")
+        if int(pd.__version__.split(".")[0]) < 3:
+            # Writes to a task's shallow copy then copy the column instead of hitting read-only memory
+            pd.set_option("mode.copy_on_write", True)
+        import matplotlib
+        matplotlib.use("Agg", force=True)
+        _limit_memory(self.memory_mb)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            conn.send(self._run(task, limits=True))
+
+    def _run(self, task: tuple, limits: bool = False) -> Dict[str, Any]:
+        code, inputs = task
+        namespace = {name: _fresh(value) for name, value in self.namespace.items()}
+        namespace.update({name: _fresh(frame, deep=not self.workers) for name, frame in self.frames.items()})
+        namespace.update(inputs)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        error = limit = None
+        start_cpu, start = time.process_time(), time.perf_counter()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if limits:
+                signal.setitimer(signal.ITIMER_PROF, self.cpu_seconds)
+            try:
+                if self.setup:
+                    self.setup(namespace)
+                exec(code, namespace)
+            except CpuLimitExceeded:
+                limit, error = "cpu", f"CPU limit exceeded: the code used more than {self.cpu_seconds:g} CPU seconds"
+            except MemoryError:
+                limit, error = "memory", f"Memory limit exceeded: the code needed more than {self.memory_mb} MB"
+            except BaseException:  # SystemExit too: a task never ends its worker
+                error = traceback.format_exc()
+            finally:
+                if limits:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            outputs = {name: namespace[name] for name in ANSWER_NAMES if name in namespace}
+            figures = _drain_figures()
+        return {
+            "stdout": stdout.getvalue().strip(),
+            "stderr": stderr.getvalue().strip(),
+            "error": error,
+            "limit": limit,
+            "outputs": _picklable(outputs),
+            "figures": figures,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "seconds": time.perf_counter() - start,
+        }
+
+    # ---- notebook side ----
+
+    def submit(self, code: str, **inputs) -> Future:
+        """Queue code for the next free worker. inputs are added to its namespace."""
+        return self._dispatch.submit(self._execute, (code, inputs))
+
+    def run(self, code: str, **inputs) -> Dict[str, Any]:
+        """
+        Execute code and wait for it.
+
+        Returns:
+            dict: stdout, stderr, error (traceback or limit message), limit
+            ('cpu', 'memory', 'timeout' or None), outputs (answer variables
+            the code set), figures (PNG bytes), cpu_seconds and seconds
+        """
+        return self.submit(code, **inputs).result()
+
+    def _execute(self, task: tuple) -> Dict[str, Any]:
+        if not self.workers:
+            return self._run(task)
+        process, conn = self._idle.get()
+        try:
+            conn.send(task)
+        except BaseException:  # e.g. unpicklable inputs; nothing reached the worker
+            self._idle.put((process, conn))
+            raise
+        try:
+            if conn.poll(self.timeout):
+                result = conn.recv()
+                if result["limit"] != "memory":
+                    self._idle.put((process, conn))
+                    return result
+            else:
+                result = _failure(f"Timed out: the code ran for more than {self.timeout:g} seconds", "timeout")
+        except (EOFError, OSError):
+            process.join(1)
+            result = _failure(f"The worker exited unexpectedly (exit code {process.exitcode})")
+        # Stuck, dead or near its memory cap: replace the worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._idle.put(self._spawn())
+        return result
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._dispatch.shutdown(wait=True)
+        for _ in range(self.workers):
+            process, conn = self._idle.get()
+            process.kill()
+            process.join()
+            conn.close()
+        self.workers = 0
+        self.frames = {}
+        self._finalizer()
+
+print("✅ Sandboxed executor ready!")
+
+
+# One live pool per backend, rebuilt when its data changes
+_SANDBOXES: Dict[str, tuple] = {}
+
+# In a worker: the tables it was forked with, left untouched, and the copy in service
+_PRISTINE: Dict[tuple, tuple] = {}
+
+
+def _sandbox(backend: str, key: Any, build, refresh: bool = False) -> SandboxExecutor:
+    current = _SANDBOXES.get(backend)
+    if current and current[0] == key and not refresh:
+        return current[1]
+    if current:
+        current[1].close()
+    executor = build()
+    _SANDBOXES[backend] = (key, executor)
+    return executor
+
+
+def table_version(tbl) -> tuple:
+    """
+    A version of the table's data, cheap to compare. TinyDB swaps in a new
+    dict for a table on every insert, update or removal, so the dict's id
+    changes with the data; its contents may not, as an update edits the
+    records in place. The dict rides along so its id is not reused while
+    the version is held.
+    """
+    data = (tbl.storage.read() or {}).get(tbl.name)
+    return id(data), data
+
+
+def _restore_tables(db, names) -> None:
+    """
+    Put the named tables back as the worker was forked with them, if the last
+    task wrote to them. The forked data stays untouched and a copy serves the
+    tasks; a write replaces the copy's dict, and the next task gets a new one.
+    """
+    tables = db.storage.read() or {}
+    for name in names:
+        key = (id(db), name)
+        pristine, live = _PRISTINE.get(key) or (tables.get(name) or {}, None)
+        if live is None or tables.get(name) is not live:
+            live = copy.deepcopy(pristine)
+            _PRISTINE[key] = (pristine, live)
+            tables[name] = live
+            db.table(name).clear_cache()
+    db.storage.write(tables)
+
+
+def _read_only_tables(db, namespace: Dict[str, Any]) -> None:
+    """
+    Hold the orders read-only for each task. A forked worker restores its
+    inherited copy if a previous task wrote to it. Inline, db is the
+    notebook's own, so the task gets a scratch in-memory copy instead.
+    """
+    name = namespace["orders_tbl"].name
+    if mp.parent_process() is None:
+        scratch = TinyDB(storage=MemoryStorage)
+        scratch.storage.write(copy.deepcopy(db.storage.read() or {}))
+        namespace.update(db=scratch, orders_tbl=scratch.table(name))
+    else:
+        _restore_tables(db, (name,))
+
+
+def tinydb_sandbox(db, orders_tbl, refresh: bool = False) -> SandboxExecutor:
+    """
+    The executor for the TinyDB backend. Workers inherit db and orders_tbl when
+    forked, and the pool is rebuilt when the table is written to. Pass
+    refresh=True after an edit TinyDB did not make, such as a record changed
+    in place in the storage.
+    """
+    key = (id(db), table_version(orders_tbl))
+    return _sandbox("tinydb", key, lambda: SandboxExecutor(setup=lambda namespace: _read_only_tables(db, namespace), namespace={
+        "Query": Query,
+        "datetime": datetime,
+        "re": re,
+        "sum": sum,
+        "len": len,
+        "max": max,
+        "min": min,
+        "sorted": sorted,
+        "defaultdict": __import__('collections').defaultdict,
+        "plt": __import__('matplotlib.pyplot', fromlist=['pyplot']),
+        "sns": __import__('seaborn'),
+        "pd": pd,
+        "db": db,
+        "orders_tbl": orders_tbl,
+    }), refresh)
+
+
+def _answer(run: Dict[str, Any], code: str) -> Dict[str, Any]:
+    """The executor's result in the shape the agent expects."""
+    return {
+        "code": code,
+        "stdout": run["stdout"],
+        "error": run["error"],
+        "answer": (
+            run["outputs"].get("answer_text")
+            or run["outputs"].get("answer_data")
+            or "No answer generated"
+        ),
+    }
+
+
 def _extract_execute_block(text: str) -> str:
     """
     Returns the Python code inside <execute_python>...</execute_python>.
@@ -295,107 +735,365 @@ def execute_generated_code(
     db,
     orders_tbl,
     user_request: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
-    Execute code in a controlled namespace.
+    Execute code in the sandboxed worker pool.
     Accepts either raw Python code OR full content with <execute_python> tags.
     Returns execution results: stdout, error, and extracted answer.
+    refresh=True restarts the workers on the table as it is now.
     """
     # Extract code
     code = _extract_execute_block(code_or_content)
 
-    # Safe globals (only allow safe operations)
-    SAFE_GLOBALS = {
-        "Query": Query,
-        "datetime": datetime,
-        "user_request": user_request or "",
-        "re": re,
-        "sum": sum,
-        "len": len,
-        "max": max,
-        "min": min,
-        "sorted": sorted,
-        "defaultdict": __import__('collections').defaultdict,
-    }
+    run = tinydb_sandbox(db, orders_tbl, refresh).run(
+        code,
+        user_request=user_request or "",
+        params=dict(params or {}),
+    )
+    return _answer(run, code)
 
-    SAFE_LOCALS = {
-        "db": db,
-        "orders_tbl": orders_tbl,
-    }
+print("✅ Code execution function loaded!")
 
-    # Capture stdout
-    _stdout_buf, _old_stdout = io.StringIO(), sys.stdout
-    sys.stdout = _stdout_buf
-    err_text = None
+"""## Generated-Code Cache
 
-    try:
-        exec(code, SAFE_GLOBALS, SAFE_LOCALS)
-    except Exception:
-        err_text = traceback.format_exc()
-    finally:
-        sys.stdout = _old_stdout
-
-    printed = _stdout_buf.getvalue().strip()
-
-    # Extract answer variables
-    answer = (
-        SAFE_LOCALS.get("answer_text")
-        or SAFE_LOCALS.get("answer_data")
-        or "No answer generated"
+Dashboard questions repeat, or come back with only a month, region or count changed. Instead of a Gemini round trip each time:
+
+*   **Memoised schema.** `schema_context` builds each backend's schema block once per version of the data. TinyDB is fingerprinted by its size and sample records, the columnar store by `data_fingerprint`.
+*   **Question shapes.** `normalize_question` turns *"Top 5 products in the West in 2024"* into the shape `top <n> products in the <region> in <year>` plus `params = {'n': 5, 'region': 'West', 'year': 2024}`.
+*   **Validated programs.** A program that ran cleanly and set an answer is stored on disk under the exact question. If it reads every value from `params` instead of hard-coding it, it is also stored under the shape alone and answers every question of that shape.
+
+A repeat question, or a parameter-only variation of a stored template, is answered without any LLM call.
+"""
+
+CODE_CACHE_DIR = os.environ.get("CODE_CACHE_DIR", ".code_cache")
+
+# Above this many versions of the data, the schema memo starts over
+SCHEMA_MEMO_SIZE = 8
+
+_SCHEMA_MEMO: Dict[str, Dict[str, Any]] = {}
+
+
+def data_fingerprint(df: pd.DataFrame, sample_rows: int = 1024) -> str:
+    """
+    Fingerprint df from its shape, dtypes, numeric column sums and an evenly
+    spaced sample of rows. Takes milliseconds, where hashing every row costs
+    more than building the schema block itself.
+    """
+    digest = hashlib.sha256(repr((df.shape, list(df.columns), df.dtypes.astype(str).tolist())).encode("utf-8"))
+    digest.update(repr(df.select_dtypes("number").sum().round(6).tolist()).encode("utf-8"))
+    step = max(1, len(df) // sample_rows)
+    digest.update(pd.util.hash_pandas_object(df.iloc[::step]).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def table_fingerprint(orders_tbl) -> str:
+    """
+    Fingerprint a TinyDB table from its size and the sample records the schema
+    block shows, read without copying the table.
+    """
+    raw = json.dumps([len(orders_tbl), list(islice(orders_tbl, 3))], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def schema_context(
+    *,
+    orders_tbl=None,
+    orders_df: Optional[pd.DataFrame] = None,
+    rollups: Optional[Dict[str, pd.DataFrame]] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """
+    Schema block, filter vocabulary and record fields for either backend,
+    rebuilt only when the data changes.
+
+    Pass orders_tbl for TinyDB, or orders_df and rollups for the columnar
+    backend. Pass refresh=True after an edit the fingerprint cannot see, such
+    as an update to a record past the first three.
+    """
+    columnar = orders_df is not None
+    key = f"columnar:{data_fingerprint(orders_df)}" if columnar else f"tinydb:{table_fingerprint(orders_tbl)}"
+    context = None if refresh else _SCHEMA_MEMO.get(key)
+    if context is None:
+        if len(_SCHEMA_MEMO) >= SCHEMA_MEMO_SIZE:
+            _SCHEMA_MEMO.clear()
+        if columnar:
+            context = {
+                "backend": "columnar",
+                "schema_block": build_columnar_schema_block(orders_df, rollups),
+                "vocab": {
+                    "region": [str(v) for v in orders_df["Region"].dropna().unique()],
+                    "category": [str(v) for v in orders_df["Category"].dropna().unique()],
+                },
+                "fields": {col: str(dtype) for col, dtype in orders_df.dtypes.items()},
+            }
+        else:
+            # One pass over the table, once per version of the data
+            regions, categories = set(), set()
+            for order in orders_tbl:
+                regions.add(order.get("Region"))
+                categories.add(order.get("Category"))
+            first = next(iter(orders_tbl), {})
+            context = {
+                "backend": "tinydb",
+                "schema_block": build_schema_block(orders_tbl),
+                "vocab": {
+                    "region": sorted(str(v) for v in regions if v),
+                    "category": sorted(str(v) for v in categories if v),
+                },
+                "fields": sorted(first),
+            }
+        _SCHEMA_MEMO[key] = context
+    return context
+
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_QUOTED = re.compile(r"(?<!\w)['\"]([^'\"]+)['\"](?!\w)")
+_MONTH_YEAR = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?\s+((?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+_QUARTER = re.compile(r"\bq([1-4])\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+_AMOUNT = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)(k\b)?", re.IGNORECASE)
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+_NUMBER = re.compile(r"\b(\d+)\b")
+
+
+def _amount(match: re.Match) -> float:
+    value = float(match.group(1).replace(",", "")) * (1000 if match.group(2) else 1)
+    return int(value) if value.is_integer() else value
+
+
+def normalize_question(question: str, vocab: Optional[Dict[str, list]] = None) -> tuple:
+    """
+    Split a question into its shape and its parameters.
+
+    Quoted names, months, quarters, dollar amounts, years, known filter values
+    (vocab, e.g. {'region': ['East', ...]}) and other numbers become
+    placeholders, then case and punctuation are dropped:
+
+        "Top 5 products in the West in 2024?"
+        -> ("top <n> products in the <region> in <year>",
+            {'n': 5, 'region': 'West', 'year': 2024})
+
+    Returns:
+        tuple: (shape, params)
+    """
+    params: Dict[str, Any] = {}
+
+    def take(kind: str, value) -> str:
+        name, i = kind, 2
+        while name in params:
+            name, i = f"{kind}_{i}", i + 1
+        params[name] = value
+        return f" <{name}> "
+
+    text = _QUOTED.sub(lambda m: take("name", m.group(1)), question)
+    text = _MONTH_YEAR.sub(
+        lambda m: take("month", f"{m.group(2)}-{MONTHS.index(m.group(1)[:3].lower()) + 1:02d}"), text
     )
+    text = _QUARTER.sub(lambda m: take("quarter", f"{m.group(2)}Q{m.group(1)}"), text)
+    text = _AMOUNT.sub(lambda m: take("amount", _amount(m)), text)
+    text = _YEAR.sub(lambda m: take("year", int(m.group(1))), text)
+    for kind, values in (vocab or {}).items():
+        # Longest first, so 'Home & Furniture' is not taken as 'Home'
+        for value in sorted(values, key=len, reverse=True):
+            pattern = re.compile(rf"(?<![\w<]){re.escape(value)}(?![\w>])", re.IGNORECASE)
+            text = pattern.sub(lambda m, k=kind, v=value: take(k, v), text)
+    text = _NUMBER.sub(lambda m: take("n", int(m.group(1))), text)
 
-    return {
-        "code": code,
-        "stdout": printed,
-        "error": err_text,
-        "answer": answer,
-    }
+    shape = " ".join(re.sub(r"[^\w<>]+", " ", text.lower()).split())
+    return shape, params
 
-print("✅ Code execution function loaded!")
+
+def uses_params(code: str, params: Dict[str, Any]) -> bool:
+    """
+    True when code reads every parameter from params and writes none of their
+    values as a literal, so it answers any question of the same shape.
+    """
+    for name, value in params.items():
+        if not re.search(rf"params\s*(?:\[|\.get\()\s*['\"]{re.escape(name)}['\"]", code):
+            return False
+        if re.search(rf"(?<![\w.]){re.escape(str(value))}(?![\w.])", code, re.IGNORECASE):
+            return False
+    return True
+
+
+def program_scope(context: Dict[str, Any], model: str, prompt: str) -> str:
+    """Programs are reusable while the backend, fields, prompt and model stay the same."""
+    raw = json.dumps([context.get("backend"), context["fields"], prompt, model], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CodeCache:
+    """
+    Validated generated programs on disk, one JSON file per key.
+
+    Looked up by exact question (shape plus parameter values) first, then by
+    shape alone. Only parameterised programs are stored by shape, so a
+    variation never reuses a hard-coded answer.
+    """
+
+    def __init__(self, folder: str = CODE_CACHE_DIR):
+        self.folder = folder
+        self.counts = {"exact": 0, "template": 0, "miss": 0}
+
+    def _path(self, scope: str, shape: str, params: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps([scope, shape, params], sort_keys=True, default=str)
+        return os.path.join(self.folder, f"{hashlib.sha256(raw.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, scope: str, shape: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry plus 'match' ('exact' or 'template'), or None."""
+        for match, path in (("exact", self._path(scope, shape, params)), ("template", self._path(scope, shape))):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.counts[match] += 1
+            return {**entry, "match": match}
+        self.counts["miss"] += 1
+        return None
+
+    def put(self, scope: str, shape: str, params: Dict[str, Any], question: str, content: str, code: str) -> Dict[str, Any]:
+        entry = {
+            "created_at": time.time(),
+            "question": question,
+            "params": params,
+            "parameterised": uses_params(code, params),
+            "content": content,
+        }
+        paths = [self._path(scope, shape, params)]
+        if params and entry["parameterised"]:
+            paths.append(self._path(scope, shape))
+        os.makedirs(self.folder, exist_ok=True)
+        for path in paths:
+            # Write then rename, so a reader never sees half a file
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        return entry
+
+    def discard(self, scope: str, shape: str, params: Dict[str, Any]) -> None:
+        """Forget the programs stored for a question, e.g. after one failed on reuse."""
+        for path in (self._path(scope, shape, params), self._path(scope, shape)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def summary(self) -> str:
+        c = self.counts
+        saved = c["exact"] + c["template"]
+        return f"Code cache: {c['exact']} exact + {c['template']} template hits, {c['miss']} misses ({saved} LLM calls saved)"
+
+
+CODE_CACHE = CodeCache()
+
+print("✅ Generated-code cache loaded!")
 
 def sales_dashboard_agent(
     question: str,
     *,
-    db,
-    orders_tbl,
+    db=None,
+    orders_tbl=None,
+    orders_df: Optional[pd.DataFrame] = None,
+    rollups: Optional[Dict[str, pd.DataFrame]] = None,
     model: str = "gemini-2.0-flash-exp",
     temperature: float = 0.3,
     verbose: bool = True,
+    use_cache: bool = True,
 ) -> dict:
     """
     End-to-end sales dashboard agent:
-      1) Generate plan-as-code from question
+      1) Reuse a stored program, or generate plan-as-code from question
       2) Execute in controlled namespace
       3) Return results with full transparency
 
+    Pass db/orders_tbl for the TinyDB backend, or orders_df/rollups
+    (from create_columnar_store) for the columnar backend. A repeat question,
+    or one that changes only its parameters, makes no LLM call unless
+    use_cache is False.
+
     Returns:
       {
         "question": user question,
         "full_content": raw LLM response,
+        "cached": None, "exact" or "template",
         "exec": {code, stdout, error, answer}
       }
     """
     if verbose:
         print_html(question, "💬 User Question")
 
-    # Generate plan-as-code
-    full_content = generate_llm_code(
-        question,
-        orders_tbl=orders_tbl,
-        model=model,
-        temperature=temperature,
-    )
+    columnar = orders_df is not None
+
+    context = schema_context(orders_tbl=orders_tbl, orders_df=orders_df, rollups=rollups)
+    shape, params = normalize_question(question, context["vocab"])
+    prompt = COLUMNAR_AGENT_PROMPT if columnar else SALES_AGENT_PROMPT
+    scope = program_scope(context, model, prompt)
+
+    def execute(content: str) -> Dict[str, Any]:
+        if columnar:
+            return execute_columnar_code(
+                content,
+                orders_df=orders_df,
+                rollups=rollups,
+                user_request=question,
+                params=params,
+            )
+        return execute_generated_code(
+            content,
+            db=db,
+            orders_tbl=orders_tbl,
+            user_request=question,
+            params=params,
+        )
+
+    # Reuse a stored program if it still runs cleanly
+    cached = CODE_CACHE.get(scope, shape, params) if use_cache else None
+    if cached:
+        full_content = cached["content"]
+        exec_res = execute(full_content)
+        if exec_res["error"] or exec_res["answer"] == "No answer generated":
+            cached = None
+
+    if not cached:
+        # Generate plan-as-code
+        if columnar:
+            full_content = generate_columnar_code(
+                question,
+                orders_df=orders_df,
+                rollups=rollups,
+                model=model,
+                temperature=temperature,
+                params=params,
+            )
+        else:
+            full_content = generate_llm_code(
+                question,
+                orders_tbl=orders_tbl,
+                model=model,
+                temperature=temperature,
+                params=params,
+            )
+
+        # Execute the plan
+        exec_res = execute(full_content)
+
+        # Keep programs that ran cleanly for the next time this is asked
+        if use_cache and not exec_res["error"] and exec_res["answer"] != "No answer generated":
+            CODE_CACHE.put(scope, shape, params, question, full_content, exec_res["code"])
 
     if verbose:
-        print_html(full_content, "🤖 Generated Plan (with Code)")
-
-    # Execute the plan
-    exec_res = execute_generated_code(
-        full_content,
-        db=db,
-        orders_tbl=orders_tbl,
-        user_request=question,
-    )
+        if cached:
+            print_html(full_content, f"♻️ Stored Plan ({cached['match']} match, no LLM call)")
+        else:
+            print_html(full_content, "🤖 Generated Plan (with Code)")
 
     # Show results
     if verbose:
@@ -409,6 +1107,7 @@ def sales_dashboard_agent(
     return {
         "question": question,
         "full_content": full_content,
+        "cached": cached["match"] if cached else None,
         "exec": exec_res,
     }
 
@@ -548,6 +1247,9 @@ Execution Environment (already imported/provided):
 - Variables: db, orders_tbl  # TinyDB objects
 - Libraries: Query (from tinydb), datetime, re
 - Natural language: user_request: str  # the original user question
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['year'], params['region'], ... instead of hard-coding them, so the program can be reused
+  with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings; n is a count such as "top 10".
 
 PLANNING RULES (critical):
 - Derive ALL filters/parameters from user_request (date ranges, regions, categories, products, customers)
@@ -682,70 +1384,29 @@ def execute_generated_code(
     db,
     orders_tbl,
     user_request: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
-    Execute code in a controlled namespace.
+    Execute code in the sandboxed worker pool.
     Accepts either raw Python code OR full content with <execute_python> tags.
     Returns execution results: stdout, error, and extracted answer.
+    refresh=True restarts the workers on the table as it is now.
     """
     # Extract code
     code = _extract_execute_block(code_or_content)
 
-    # Safe globals (only allow safe operations)
-    SAFE_GLOBALS = {
-        "Query": Query,
-        "datetime": datetime,
-        "user_request": user_request or "",
-        "re": re,
-        "sum": sum,
-        "len": len,
-        "max": max,
-        "min": min,
-        "sorted": sorted,
-        "defaultdict": __import__('collections').defaultdict,
-        "plt": __import__('matplotlib.pyplot'),
-        "sns": __import__('seaborn'),
-        "pd": pd # Add pandas for potential DataFrame operations in plotting
-    }
-
-    SAFE_LOCALS = {
-        "db": db,
-        "orders_tbl": orders_tbl,
-    }
-
-    # Capture stdout
-    _stdout_buf, _old_stdout = io.StringIO(), sys.stdout
-    sys.stdout = _stdout_buf
-    err_text = None
-
-    try:
-        # Execute the code
-        exec(code, SAFE_GLOBALS, SAFE_LOCALS)
-
-        # Ensure plots are displayed if generated
-        if 'plt' in SAFE_GLOBALS and SAFE_GLOBALS['plt'].get_fignums():
-             SAFE_GLOBALS['plt'].show()
-
-    except Exception:
-        err_text = traceback.format_exc()
-    finally:
-        sys.stdout = _old_stdout
-
-    printed = _stdout_buf.getvalue().strip()
-
-    # Extract answer variables
-    answer = (
-        SAFE_LOCALS.get("answer_text")
-        or SAFE_LOCALS.get("answer_data")
-        or "No answer generated"
+    run = tinydb_sandbox(db, orders_tbl, refresh).run(
+        code,
+        user_request=user_request or "",
+        params=dict(params or {}),
     )
 
-    return {
-        "code": code,
-        "stdout": printed,
-        "error": err_text,
-        "answer": answer,
-    }
+    # Ensure plots are displayed if generated; they were drawn in the worker
+    for png in run["figures"]:
+        display(Image(data=png))
+
+    return _answer(run, code)
 
 print("✅ Code execution function updated with visualization libraries!")
 
@@ -779,6 +1440,9 @@ Execution Environment (already imported/provided):
 - Variables: db, orders_tbl  # TinyDB objects
 - Libraries: Query (from tinydb), datetime, re, matplotlib.pyplot as plt, seaborn as sns, pandas as pd
 - Natural language: user_request: str  # the original user question
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['year'], params['region'], ... instead of hard-coding them, so the program can be reused
+  with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings; n is a count such as "top 10".
 
 PLANNING RULES (critical):
 - Derive ALL filters/parameters from user_request (date ranges, regions, categories, products, customers)
@@ -873,6 +1537,9 @@ Execution Environment (already imported/provided):
 - Variables: db, orders_tbl  # TinyDB objects
 - Libraries: Query (from tinydb), datetime, re, matplotlib.pyplot as plt, seaborn as sns, pandas as pd
 - Natural language: user_request: str  # the original user question
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['year'], params['region'], ... instead of hard-coding them, so the program can be reused
+  with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings; n is a count such as "top 10".
 
 PLANNING RULES (critical):
 - Derive ALL filters/parameters from user_request (date ranges, regions, categories, products, customers)
@@ -955,3 +1622,434 @@ print("✅ Agent prompt template refined with visualization best practices!")
 *   Further testing with various visualization types (e.g., line charts, scatter plots) and data aggregations is needed to ensure the agent's robustness in generating correct plotting code in different scenarios.
 
 """
+
+"""# Columnar Query Backend
+
+TinyDB keeps every order as a Python dict, so every question is a full scan in Python: `orders_tbl.all()` followed by `sum(...)` loops. The columnar backend answers the same questions from typed pandas columns:
+
+*   **Typed columns.** `Order_Date` is datetime64, `Month` is a `YYYY-MM` category, and the text columns are categoricals, so filters and group-bys are vectorised.
+*   **Precomputed rollups.** Revenue, profit, quantity, order count, margin and average order value by region, category and month (and each pair of them) are computed once at load, so most dashboard questions become a lookup.
+*   **Same contract.** Generated code still sets `answer_text`, and optionally `answer_data`. Pass `orders_df` and `rollups` to `sales_dashboard_agent` instead of `db` and `orders_tbl`.
+
+## Build the columnar store
+"""
+
+CATEGORICAL_COLUMNS = ['Customer_Name', 'City', 'State', 'Region', 'Country',
+                       'Category', 'Sub_Category', 'Product_Name']
+
+ROLLUP_KEYS = {
+    'region': ['Region'],
+    'category': ['Category'],
+    'month': ['Month'],
+    'region_month': ['Region', 'Month'],
+    'category_month': ['Category', 'Month'],
+    'region_category': ['Region', 'Category'],
+}
+
+
+def create_columnar_store(df: pd.DataFrame) -> tuple:
+    """
+    Convert DataFrame to typed columns and precompute group-by rollups.
+    Returns (orders_df, rollups), rollups being a dict of DataFrames keyed as in ROLLUP_KEYS.
+    """
+    orders_df = df.copy()
+    orders_df['Order_Date'] = pd.to_datetime(orders_df['Order_Date'], errors='coerce')
+    # Formatting a period per distinct month, not a string per row, keeps this fast at 1M rows
+    months = orders_df['Order_Date'].dt.to_period('M').astype('category')
+    orders_df['Month'] = months.cat.rename_categories([str(p) for p in months.cat.categories])
+    for col in CATEGORICAL_COLUMNS:
+        if col in orders_df.columns:
+            orders_df[col] = orders_df[col].astype('category')
+    for col in ['Unit_Price', 'Revenue', 'Profit', 'Quantity']:
+        orders_df[col] = pd.to_numeric(orders_df[col], errors='coerce')
+
+    rollups = {}
+    for name, keys in ROLLUP_KEYS.items():
+        table = orders_df.groupby(keys, observed=True).agg(
+            Revenue=('Revenue', 'sum'),
+            Profit=('Profit', 'sum'),
+            Quantity=('Quantity', 'sum'),
+            Orders=('Order_ID', 'count'),
+        ).reset_index()
+        table['Margin_Pct'] = table['Profit'] / table['Revenue'] * 100
+        table['Avg_Order_Value'] = table['Revenue'] / table['Orders']
+        rollups[name] = table
+
+    return orders_df, rollups
+
+# Create columnar store
+orders_df, rollups = create_columnar_store(df)
+
+print(f"✅ Columnar store created with {len(orders_df)} orders and {len(rollups)} rollups")
+
+
+def build_columnar_schema_block(orders_df: pd.DataFrame, rollups: Dict[str, pd.DataFrame]) -> str:
+    """
+    Generate a human-readable schema description of the columnar backend with sample data.
+    """
+    sample_records = orders_df.head(3).to_dict('records')
+    rollup_lines = "\n".join(
+        f"- rollups['{name}']: one row per {' + '.join(keys)} ({len(rollups[name])} rows)"
+        for name, keys in ROLLUP_KEYS.items()
+    )
+
+    schema = f"""
+=== ORDERS DATAFRAME (orders_df) ===
+Total Records: {len(orders_df)}
+Date Range: {orders_df['Order_Date'].min():%Y-%m-%d} to {orders_df['Order_Date'].max():%Y-%m-%d}
+
+Columns:
+- Order_ID (int): Unique order identifier
+- Order_Date (datetime64): Order date
+- Month (category): Order month as 'YYYY-MM'
+- Customer_Name, City, State, Country (category)
+- Region (category): Geographic region ({', '.join(map(str, orders_df['Region'].cat.categories))})
+- Category (category): Main product category ({', '.join(map(str, orders_df['Category'].cat.categories))})
+- Sub_Category, Product_Name (category)
+- Quantity (int): Number of units ordered
+- Unit_Price (float): Price per unit in USD
+- Revenue (float): Total revenue (Quantity × Unit_Price)
+- Profit (float): Profit from this order
+
+=== PRECOMPUTED ROLLUPS (rollups) ===
+Each has the key columns plus Revenue, Profit, Quantity, Orders, Margin_Pct, Avg_Order_Value:
+{rollup_lines}
+
+Sample Records:
+{json.dumps(sample_records, indent=2, default=str)}
+"""
+    return schema
+
+print_html(build_columnar_schema_block(orders_df, rollups), "Columnar Schema")
+
+"""## Columnar agent prompt"""
+
+COLUMNAR_AGENT_PROMPT = """You are a senior sales data analyst. PLAN BY WRITING PYTHON CODE USING PANDAS.
+
+Data Schema & Samples (read-only):
+{schema_block}
+
+Execution Environment (already imported/provided):
+- Variables: orders_df (pandas DataFrame, one row per order), rollups (dict of pandas DataFrames)
+- Libraries: pd, np, datetime, re, matplotlib.pyplot as plt, seaborn as sns
+- Natural language: user_request: str  # the original user question
+- Parameters: params: dict = {params}  # values extracted from user_request
+  Read them as params['year'], params['region'], ... instead of hard-coding them, so the program can be reused
+  with other values. Months are 'YYYY-MM' strings and quarters 'YYYYQn' strings; n is a count such as "top 10".
+
+PLANNING RULES (critical):
+- Derive ALL filters/parameters from user_request (date ranges, regions, categories, products, customers)
+- Prefer a rollup when the question is about region, category or month totals: it is already aggregated
+- Otherwise use vectorised pandas on orders_df: boolean masks, groupby(..., observed=True), nlargest
+- NEVER loop over rows (no iterrows, itertuples, apply with axis=1, or Python for-loops over orders)
+- For date filtering: compare Order_Date with date strings, or Month with 'YYYY-MM' strings
+- Be conservative: this is READ-ONLY analytics (do not modify orders_df or rollups)
+- IF the user requests a visualization (e.g., "show in bar chart", "visualize", "plot"), GENERATE PYTHON CODE to create a plot using Matplotlib or Seaborn. Ensure the plot is displayed using `plt.show()`.
+- When generating visualizations, ensure the plot has a clear title, appropriate axis labels (including units like currency or quantity), and consider adjusting the figure size for readability if there are many items.
+
+HUMAN RESPONSE REQUIREMENT (hard):
+- You MUST set a variable named `answer_text` (type str) with a concise, business-friendly answer (2-3 sentences max)
+- Include relevant numbers, comparisons, and insights
+- If no data matches, suggest alternative queries
+- Format currency as "$X,XXX.XX" and percentages as "XX.X%"
+
+OUTPUT CONTRACT:
+- Return ONLY executable Python between these tags (no extra text):
+  <execute_python>
+  # your python code here
+  </execute_python>
+
+CODE CHECKLIST:
+1) Parse the user_request to understand what's being asked
+2) Pick a rollup, or filter orders_df with vectorised masks
+3) Perform calculations (sums, averages, counts, etc.)
+4) ALWAYS set `answer_text` with a human-friendly response
+5) Optional: set `answer_data` (list/dict) for structured results
+6) Print a brief log to stdout for debugging
+7) IF a visualization is requested, include Matplotlib/Seaborn code to generate and display the plot, making sure the plot is well-labeled and readable.
+
+EXAMPLE PATTERNS:
+
+# Total revenue by region (rollup lookup)
+by_region = rollups['region']
+west_revenue = by_region.loc[by_region['Region'] == 'West', 'Revenue'].sum()
+answer_text = f"West region generated ${{west_revenue:,.2f}} in total revenue."
+
+# Top 5 products by profit (vectorised group-by)
+top_5 = orders_df.groupby('Product_Name', observed=True)['Profit'].sum().nlargest(5)
+answer_text = f"Top product: {{top_5.index[0]}} with ${{top_5.iloc[0]:,.2f}} profit."
+
+# Date filtering
+nov = rollups['month'].loc[rollups['month']['Month'] == '2024-11']
+answer_text = f"November 2024 revenue: ${{nov['Revenue'].sum():,.2f}} from {{int(nov['Orders'].sum())}} orders."
+
+Constraints:
+- Use rollups or vectorised pandas operations
+- Keep code clear and commented
+- Always provide meaningful insights, not just raw numbers
+
+User request:
+{question}
+"""
+
+print("✅ Columnar agent prompt template loaded!")
+
+"""## Columnar code generation and execution"""
+
+def generate_columnar_code(
+    prompt: str,
+    *,
+    orders_df: pd.DataFrame,
+    rollups: Dict[str, pd.DataFrame],
+    model: str = "gemini-2.0-flash-exp",
+    temperature: float = 0.3,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Ask Gemini to produce a plan-with-code response against the columnar backend.
+    Returns the FULL assistant content (including surrounding text and tags).
+    """
+    schema_block = schema_context(orders_df=orders_df, rollups=rollups)["schema_block"]
+    full_prompt = COLUMNAR_AGENT_PROMPT.format(
+        schema_block=schema_block, question=prompt, params=json.dumps(params or {})
+    )
+    return _call_gemini(full_prompt, model=model, temperature=temperature)
+
+
+def columnar_sandbox(orders_df: pd.DataFrame, rollups: Dict[str, pd.DataFrame]) -> SandboxExecutor:
+    """The executor with orders_df and rollups published to shared memory."""
+    return _sandbox("columnar", (data_fingerprint(orders_df), tuple(rollups)), lambda: SandboxExecutor(
+        {"orders_df": orders_df, "rollups": rollups},
+        namespace={
+            "datetime": datetime,
+            "re": re,
+            "pd": pd,
+            "np": np,
+            "plt": __import__('matplotlib.pyplot', fromlist=['pyplot']),
+            "sns": __import__('seaborn'),
+            "defaultdict": __import__('collections').defaultdict,
+        },
+    ))
+
+
+def execute_columnar_code(
+    code_or_content: str,
+    *,
+    orders_df: pd.DataFrame,
+    rollups: Dict[str, pd.DataFrame],
+    user_request: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Execute code against the columnar backend in the sandboxed worker pool.
+    Accepts either raw Python code OR full content with <execute_python> tags.
+    Returns execution results: stdout, error, and extracted answer.
+    """
+    # Extract code
+    code = _extract_execute_block(code_or_content)
+
+    # Each task sees its own copy-on-write view of the shared frames, so added
+    # or reassigned columns never reach them or the next task
+    run = columnar_sandbox(orders_df, rollups).run(
+        code,
+        user_request=user_request or "",
+        params=dict(params or {}),
+    )
+
+    # Ensure plots are displayed if generated
+    for png in run["figures"]:
+        display(Image(data=png))
+
+    return _answer(run, code)
+
+print("✅ Columnar code generation and execution functions loaded!")
+
+result = sales_dashboard_agent(
+    "Which region generated the most profit last year?",
+    orders_df=orders_df,
+    rollups=rollups,
+)
+
+"""## Benchmark: TinyDB vs columnar
+
+The same questions are answered by hand-written programs for each backend, in the shapes the two prompts ask for, run through each backend's executor on synthetic orders. No LLM call is involved: this measures only the question's execution latency. Both backends must produce the same `answer_text`.
+
+Loading a million orders into TinyDB alone takes about 25 s, so the benchmark does not run with the notebook. Set `RUN_BENCHMARKS=1` or call `benchmark_backends()` yourself.
+"""
+
+def make_synthetic_orders(n_rows: int = 1_000_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate orders with the dataset's schema, dated 2023-01-01 to 2024-12-31.
+    """
+    rng = np.random.default_rng(seed)
+    categories = {
+        'Electronics': ['Phones', 'Laptops', 'Audio'],
+        'Clothing & Apparel': ['Shirts', 'Shoes', 'Jackets'],
+        'Accessories': ['Bags', 'Watches', 'Jewelry'],
+        'Home & Furniture': ['Chairs', 'Tables', 'Lighting'],
+    }
+    products = pd.DataFrame(
+        [(cat, sub, f"{sub} Model {i}") for cat, subs in categories.items() for sub in subs for i in range(15)],
+        columns=['Category', 'Sub_Category', 'Product_Name'],
+    )
+    products['price'] = rng.uniform(5, 1500, len(products)).round(2)
+    products['margin'] = rng.uniform(0.02, 0.45, len(products))
+    regions = {'East': ['New York', 'Boston'], 'West': ['Seattle', 'Los Angeles'],
+               'Centre': ['Chicago', 'Denver'], 'South': ['Houston', 'Atlanta']}
+    region_rows = [(region, city) for region, cities in regions.items() for city in cities]
+
+    product_idx = rng.integers(0, len(products), n_rows)
+    region_idx = rng.integers(0, len(region_rows), n_rows)
+    quantity = rng.integers(1, 11, n_rows)
+    unit_price = products['price'].to_numpy()[product_idx]
+    revenue = (quantity * unit_price).round(2)
+    profit = (revenue * (products['margin'].to_numpy()[product_idx] + rng.normal(0, 0.05, n_rows))).round(2)
+
+    return pd.DataFrame({
+        'Order_ID': np.arange(1, n_rows + 1),
+        'Order_Date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 731, n_rows), unit='D'),
+        'Customer_Name': pd.Series([f"Customer {i}" for i in range(5000)]).to_numpy()[rng.integers(0, 5000, n_rows)],
+        'City': np.array([city for _, city in region_rows])[region_idx],
+        'State': np.array([city[:2].upper() for _, city in region_rows])[region_idx],
+        'Region': np.array([region for region, _ in region_rows])[region_idx],
+        'Country': 'United States',
+        'Category': products['Category'].to_numpy()[product_idx],
+        'Sub_Category': products['Sub_Category'].to_numpy()[product_idx],
+        'Product_Name': products['Product_Name'].to_numpy()[product_idx],
+        'Quantity': quantity,
+        'Unit_Price': unit_price,
+        'Revenue': revenue,
+        'Profit': profit,
+    })
+
+
+# question -> (TinyDB program, columnar program)
+BENCHMARK_QUESTIONS = {
+    "What were our total sales in November 2024?": ("""
+Item = Query()
+nov_orders = orders_tbl.search((Item.Order_Date >= '2024-11-01') & (Item.Order_Date <= '2024-11-30'))
+nov_revenue = sum(o['Revenue'] for o in nov_orders)
+answer_text = f"November 2024 revenue: ${nov_revenue:,.2f} from {len(nov_orders)} orders."
+""", """
+nov = rollups['month'].loc[rollups['month']['Month'] == '2024-11']
+answer_text = f"November 2024 revenue: ${nov['Revenue'].sum():,.2f} from {int(nov['Orders'].sum())} orders."
+"""),
+    "Which region generated the most profit in 2024?": ("""
+region_profit = defaultdict(float)
+for o in orders_tbl.all():
+    if o['Order_Date'].startswith('2024'):
+        region_profit[o['Region']] += o['Profit']
+best = max(region_profit.items(), key=lambda x: x[1])
+answer_text = f"{best[0]} led 2024 with ${best[1]:,.2f} profit."
+""", """
+rm = rollups['region_month']
+profit = rm[rm['Month'].astype(str).str.startswith('2024')].groupby('Region', observed=True)['Profit'].sum()
+answer_text = f"{profit.idxmax()} led 2024 with ${profit.max():,.2f} profit."
+"""),
+    "Top 5 products by revenue": ("""
+product_revenue = defaultdict(float)
+for o in orders_tbl.all():
+    product_revenue[o['Product_Name']] += o['Revenue']
+top_5 = sorted(product_revenue.items(), key=lambda x: x[1], reverse=True)[:5]
+answer_text = "; ".join(f"{name}: ${value:,.2f}" for name, value in top_5)
+""", """
+top_5 = orders_df.groupby('Product_Name', observed=True)['Revenue'].sum().nlargest(5)
+answer_text = "; ".join(f"{name}: ${value:,.2f}" for name, value in top_5.items())
+"""),
+    "Average order value per category": ("""
+totals, counts = defaultdict(float), defaultdict(int)
+for o in orders_tbl.all():
+    totals[o['Category']] += o['Revenue']
+    counts[o['Category']] += 1
+aov = []
+for c in totals:
+    aov.append((c, totals[c] / counts[c]))
+aov.sort(key=lambda x: x[1], reverse=True)
+answer_text = "; ".join(f"{c}: ${v:,.2f}" for c, v in aov)
+""", """
+aov = rollups['category'].sort_values('Avg_Order_Value', ascending=False)
+answer_text = "; ".join(f"{c}: ${v:,.2f}" for c, v in zip(aov['Category'], aov['Avg_Order_Value']))
+"""),
+    "Which month had the highest revenue?": ("""
+month_revenue = defaultdict(float)
+for o in orders_tbl.all():
+    month_revenue[o['Order_Date'][:7]] += o['Revenue']
+best = max(month_revenue.items(), key=lambda x: x[1])
+answer_text = f"{best[0]} was the best month with ${best[1]:,.2f} revenue."
+""", """
+m = rollups['month'].set_index('Month')['Revenue']
+answer_text = f"{m.idxmax()} was the best month with ${m.max():,.2f} revenue."
+"""),
+    "Which customer has spent the most money in Electronics?": ("""
+Item = Query()
+spend = defaultdict(float)
+for o in orders_tbl.search(Item.Category == 'Electronics'):
+    spend[o['Customer_Name']] += o['Revenue']
+best = max(spend.items(), key=lambda x: x[1])
+answer_text = f"{best[0]} spent the most on Electronics: ${best[1]:,.2f}."
+""", """
+spend = orders_df.loc[orders_df['Category'] == 'Electronics'].groupby('Customer_Name', observed=True)['Revenue'].sum()
+answer_text = f"{spend.idxmax()} spent the most on Electronics: ${spend.max():,.2f}."
+"""),
+}
+
+
+def benchmark_backends(n_rows: int = 1_000_000, repeats: int = 3) -> pd.DataFrame:
+    """
+    Time every BENCHMARK_QUESTIONS program on both backends over `n_rows` synthetic orders.
+    Returns one row per question: best-of-`repeats` milliseconds per backend, speedup, and whether the answers match.
+    """
+    orders = make_synthetic_orders(n_rows)
+
+    start = time.perf_counter()
+    bench_db, bench_tbl = create_sales_database(orders)
+    tinydb_load = time.perf_counter() - start
+    start = time.perf_counter()
+    bench_df, bench_rollups = create_columnar_store(orders)
+    columnar_load = time.perf_counter() - start
+
+    rows = []
+    for question, (tinydb_code, columnar_code) in BENCHMARK_QUESTIONS.items():
+        timings = {}
+        answers = {}
+        for backend, run in [
+            ('tinydb', lambda: execute_generated_code(tinydb_code, db=bench_db, orders_tbl=bench_tbl, user_request=question)),
+            ('columnar', lambda: execute_columnar_code(columnar_code, orders_df=bench_df, rollups=bench_rollups, user_request=question)),
+        ]:
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                res = run()
+                best = min(best, time.perf_counter() - start)
+            if res['error']:
+                raise RuntimeError(f"{backend} program failed for {question!r}:\n{res['error']}")
+            timings[backend] = best * 1000
+            answers[backend] = res['answer']
+        rows.append({
+            'question': question,
+            'tinydb_ms': round(timings['tinydb'], 1),
+            'columnar_ms': round(timings['columnar'], 1),
+            'speedup': round(timings['tinydb'] / timings['columnar'], 1),
+            'same_answer': answers['tinydb'] == answers['columnar'],
+        })
+
+    results = pd.DataFrame(rows)
+    print(f"⏱️ {n_rows:,} orders. Load: TinyDB {tinydb_load:.1f}s, columnar {columnar_load:.1f}s")
+    print(results.to_string(index=False))
+    return results
+
+if os.environ.get("RUN_BENCHMARKS") == "1":
+    benchmark_results = benchmark_backends()
+
+"""## Reusing generated programs
+
+Asking a question again, or with only its parameters changed, runs the stored program without an LLM call:
+"""
+
+result = sales_dashboard_agent(
+    "Which region generated the most profit last year?",
+    orders_df=orders_df,
+    rollups=rollups,
+)
+
+print(CODE_CACHE.summary())
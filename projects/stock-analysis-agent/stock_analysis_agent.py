@@ -73,18 +73,29 @@ After screening, stocks are evaluated against a comprehensive scoring system:
 """
 
 # Install required packages for Google Colab
-!pip install -q google-generativeai yfinance pandas matplotlib seaborn tavily-python
+!pip install -q google-generativeai yfinance pandas pyarrow matplotlib seaborn tavily-python
 
 # =========================
 # Imports
 # =========================
 
+import abc
+import hashlib
 import json
 import os
+import random
 import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Any
 
+import numpy as np
 import yfinance as yf
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -111,10 +122,165 @@ except:
 
 genai.configure(api_key=GOOGLE_API_KEY)
 tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
 
 print("✅ APIs configured successfully")
 
+# =========================
+# Shared API Rate Limits
+# =========================
+
+# Agents run concurrently (several analysts per stock, several stocks at once),
+# so every Gemini and Tavily call goes through one limiter per API, shared by
+# all threads. Set these to your plan's quota.
+LLM_RPM = int(os.environ.get('LLM_RPM', 10))
+LLM_MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 4))
+SEARCH_RPM = int(os.environ.get('SEARCH_RPM', 60))
+SEARCH_MAX_IN_FLIGHT = int(os.environ.get('SEARCH_MAX_IN_FLIGHT', 4))
+
+
+# The public sentiment collection notebook carries the same class. Each notebook runs standalone
+# in Colab, so the two copies are kept identical rather than shared.
+class RateLimiter:
+    """At most `per_minute` calls in any rolling minute, and `max_in_flight` at once, across all threads."""
+
+    def __init__(self, name: str, per_minute: int, max_in_flight: int):
+        self.name = name
+        self.per_minute = per_minute
+        self.calls = 0
+        self.waited_s = 0.0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def __enter__(self):
+        self._slots.acquire()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) < self.per_minute:
+                    self._recent.append(now)
+                    self.calls += 1
+                    return self
+                wait_s = 60 - (now - self._recent[0])
+                self.waited_s += wait_s
+            time.sleep(wait_s)
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+LLM_LIMIT = RateLimiter('gemini', LLM_RPM, LLM_MAX_IN_FLIGHT)
+SEARCH_LIMIT = RateLimiter('tavily', SEARCH_RPM, SEARCH_MAX_IN_FLIGHT)
+
+# =========================
+# Agent Response Cache
+# =========================
+
+# A daily watchlist re-run mostly asks the same questions about the same
+# numbers. Each agent's answer is kept on disk, keyed by the agent, its prompt
+# version, the model and the stock_data fields its prompt actually reads, so
+# only tickers whose inputs moved pay for a Gemini call.
+AGENT_CACHE_DIR = os.environ.get('AGENT_CACHE_DIR', '.agent_cache')
+
+# Bump an agent's version whenever its prompt changes, retiring its old answers
+PROMPT_VERSIONS = {
+    'fundamental_analyst_agent': 1,
+    'business_moat_analyst_agent': 1,
+    'dividend_cashflow_analyst_agent': 1,
+    'tavily_search': 1,
+}
+
+# Moat answers rest on web search results, which go stale; the other agents
+# are a function of their inputs alone and are kept until the inputs change
+AGENT_CACHE_MAX_AGE = {
+    'business_moat_analyst_agent': 7 * 24 * 3600,
+    'tavily_search': 7 * 24 * 3600,
+}
+
+
+def _fingerprint(value):
+    """Round floats to 3 significant figures, so a PE of 12.31 vs 12.34 is not a new question."""
+    if isinstance(value, float):
+        return float(f"{value:.3g}") if value == value else None
+    return value
+
+
+def _write_json(path: str, payload: dict, **dump_kwargs):
+    """Write then rename, so a reader never sees half a file."""
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, **dump_kwargs)
+    os.replace(tmp, path)
+
+
+class AgentCache:
+    """
+    On-disk agent responses, one JSON file per key, grouped by agent.
+
+    Error results are never stored, so a failed call is retried next run.
+    """
+
+    def __init__(self, folder: str = AGENT_CACHE_DIR, model_name: str = MODEL_NAME):
+        self.folder = folder
+        self.model_name = model_name
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def key(self, agent: str, inputs: dict) -> str:
+        raw = json.dumps({
+            'agent': agent,
+            'prompt_version': PROMPT_VERSIONS[agent],
+            'model': self.model_name,
+            'inputs': {k: _fingerprint(v) for k, v in inputs.items()},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, agent: str, inputs: dict) -> str:
+        return os.path.join(self.folder, agent, f"{self.key(agent, inputs)}.json")
+
+    def get(self, agent: str, inputs: dict):
+        result = None
+        try:
+            with open(self._path(agent, inputs), encoding='utf-8') as f:
+                stored = json.load(f)
+            max_age = AGENT_CACHE_MAX_AGE.get(agent)
+            if max_age is None or time.time() - stored['created_at'] < max_age:
+                result = stored['result']
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock:
+            counts = self.counts.setdefault(agent, {'hits': 0, 'misses': 0})
+            counts['misses' if result is None else 'hits'] += 1
+        return result
+
+    def put(self, agent: str, inputs: dict, result):
+        if isinstance(result, dict) and 'error' in result:
+            return
+        path = self._path(agent, inputs)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_json(path, {'created_at': time.time(), 'result': result}, default=str)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {agent: dict(counts) for agent, counts in self.counts.items()}
+
+    def summary(self) -> str:
+        stats = self.stats()
+        hits = sum(c['hits'] for c in stats.values())
+        misses = sum(c['misses'] for c in stats.values())
+        lines = [f"Agent cache: {hits} hits, {misses} misses ({hits} API calls saved)"]
+        for agent, c in sorted(stats.items()):
+            lines.append(f"     {agent:<32} {c['hits']:>4} hits {c['misses']:>4} misses")
+        return "\n".join(lines)
+
+
+AGENT_CACHE = AgentCache()
+
 """## 3. Utility Functions"""
 
 # =========================
@@ -164,7 +330,390 @@ print("✅ Utility functions loaded")
 
 """## 4. Tool Definitions - Real Data Sources
 
-### 4.1. Stock Data Tool (yfinance)
+### 4.1. Market Data Layer
+
+Every tool below reads stock data through this layer rather than calling Yahoo Finance directly:
+
+- **Data sources** are pluggable. `YahooFinanceSource` is the live provider; `FixtureSource` reads JSON files from a folder, so screening can run offline and in benchmarks.
+- **Snapshots are cached on disk** for `SNAPSHOT_TTL_SECONDS` (6 hours by default). Batch screening and the full analysis pipeline share the same snapshots, so a stock that was just screened is not fetched again when it is analysed.
+- **Fetching is parallel.** A batch downloads one month of history for all tickers in a single call, then fetches company info on a bounded thread pool.
+"""
+
+# =========================
+# Market Data Layer: Sources, Snapshot Cache, Parallel Fetch
+# =========================
+
+MARKET_CACHE_DIR = os.environ.get('MARKET_CACHE_DIR', '.market_cache')
+SNAPSHOT_TTL_SECONDS = int(os.environ.get('SNAPSHOT_TTL_SECONDS', 6 * 3600))
+FETCH_MAX_WORKERS = 8  # Concurrent info requests; Yahoo throttles well above this
+
+
+class MarketDataSource(abc.ABC):
+    """
+    Where stock data comes from. Subclass to plug in another provider; one
+    that leaves a method out fails when it is created, not midway through a
+    screen.
+    """
+
+    name = 'base'
+
+    @abc.abstractmethod
+    def info(self, ticker: str) -> dict:
+        """Company profile and fundamentals, in yfinance `.info` field names."""
+
+    @abc.abstractmethod
+    def history(self, tickers: List[str], period: str = '1mo') -> Dict[str, pd.DataFrame]:
+        """Daily price and volume history for many tickers in one request."""
+
+    @abc.abstractmethod
+    def dividends(self, ticker: str) -> pd.Series:
+        """Dividend payments indexed by date."""
+
+
+class YahooFinanceSource(MarketDataSource):
+    """Live data from Yahoo Finance."""
+
+    name = 'yahoo'
+
+    def info(self, ticker: str) -> dict:
+        return yf.Ticker(ticker).info
+
+    def history(self, tickers: List[str], period: str = '1mo') -> Dict[str, pd.DataFrame]:
+        if not tickers:
+            return {}
+        raw = yf.download(tickers, period=period, group_by='ticker',
+                          threads=True, progress=False, auto_adjust=False)
+        frames = {}
+        for ticker in tickers:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker not in raw.columns.get_level_values(0):
+                    continue
+                frame = raw[ticker]
+            else:
+                frame = raw
+            frames[ticker] = frame.dropna(how='all')
+        return frames
+
+    def dividends(self, ticker: str) -> pd.Series:
+        return yf.Ticker(ticker).dividends
+
+
+class FixtureSource(MarketDataSource):
+    """
+    Offline data from a folder of JSON files, one per ticker.
+
+    Each file holds {"info": {...}, "history": {"Volume": [...]}, "dividends": {"YYYY-MM-DD": amount}}.
+    `latency` sleeps that many seconds per request, to stand in for a network round trip.
+    """
+
+    name = 'fixture'
+
+    def __init__(self, folder: str, latency: float = 0.0):
+        self.folder = folder
+        self.latency = latency
+
+    def _load(self, ticker: str) -> dict:
+        path = os.path.join(self.folder, f"{ticker}.json")
+        if not os.path.exists(path):
+            raise ValueError(f"No fixture for {ticker} in {self.folder}")
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def info(self, ticker: str) -> dict:
+        time.sleep(self.latency)
+        return self._load(ticker)['info']
+
+    def history(self, tickers: List[str], period: str = '1mo') -> Dict[str, pd.DataFrame]:
+        time.sleep(self.latency)  # One request for the whole batch
+        frames = {}
+        for ticker in tickers:
+            try:
+                frames[ticker] = pd.DataFrame(self._load(ticker)['history'])
+            except ValueError:
+                continue
+        return frames
+
+    def dividends(self, ticker: str) -> pd.Series:
+        time.sleep(self.latency)
+        paid = self._load(ticker).get('dividends', {})
+        return pd.Series(list(paid.values()), index=pd.to_datetime(list(paid.keys())), dtype=float)
+
+
+def write_synthetic_fixtures(folder: str, n: int = 500, seed: int = 7) -> list:
+    """
+    Write `n` made-up Bursa-style counters as fixtures, for offline screening and benchmarks.
+
+    Returns:
+        list: The generated tickers
+    """
+    rng = random.Random(seed)
+    sectors = ['Financial Services', 'Industrials', 'Consumer Defensive', 'Technology',
+               'Real Estate', 'Energy', 'Utilities', 'Basic Materials', 'Healthcare']
+    os.makedirs(folder, exist_ok=True)
+    tickers = []
+    for i in range(n):
+        ticker = f"{i:04d}.KL"
+        price = round(rng.lognormvariate(-0.2, 1.0), 3)
+        eps = round(rng.gauss(0.05, 0.08), 4)
+        book = round(abs(rng.gauss(0.8, 0.6)) + 0.05, 3)
+        dividend_yield = round(max(0.0, rng.gauss(0.025, 0.02)), 4)
+        info = {
+            'longName': f"Synthetic Berhad {i:04d}",
+            'currentPrice': price,
+            'currency': 'MYR',
+            'trailingPE': round(price / eps, 2) if eps > 0 else None,
+            'priceToBook': round(price / book, 2),
+            'priceToSalesTrailing12Months': round(abs(rng.gauss(1.5, 1.0)), 2),
+            'returnOnEquity': round(rng.gauss(0.08, 0.07), 4),
+            'trailingEps': eps,
+            'profitMargins': round(rng.gauss(0.08, 0.06), 4),
+            'operatingMargins': round(rng.gauss(0.11, 0.07), 4),
+            'debtToEquity': round(abs(rng.gauss(45, 35)), 1),
+            'currentRatio': round(abs(rng.gauss(1.6, 0.7)), 2),
+            'bookValue': book,
+            'dividendYield': dividend_yield or None,
+            'payoutRatio': round(rng.uniform(0.1, 0.9), 2) if dividend_yield else None,
+            'dividendRate': round(price * dividend_yield, 4) if dividend_yield else None,
+            'marketCap': int(rng.lognormvariate(19.5, 1.5)),
+            'volume': int(rng.lognormvariate(11.5, 1.5)),
+            'sector': rng.choice(sectors),
+            'industry': 'Synthetic',
+            'longBusinessSummary': f"Synthetic counter {i:04d} for offline screening.",
+        }
+        base_volume = rng.lognormvariate(11.5, 1.5)
+        history = {'Volume': [int(base_volume * rng.uniform(0.5, 1.5)) for _ in range(21)]}
+        dividends = {f"{year}-06-30": round(price * dividend_yield, 4)
+                     for year in range(2019, 2025)} if dividend_yield else {}
+        with open(os.path.join(folder, f"{ticker}.json"), 'w', encoding='utf-8') as f:
+            json.dump({'info': info, 'history': history, 'dividends': dividends}, f)
+        tickers.append(ticker)
+    return tickers
+
+
+class SnapshotCache:
+    """
+    On-disk stock data snapshots, one JSON file per ticker, served while younger than `ttl` seconds.
+
+    Snapshots are kept per data source, so fixture data never answers for live data.
+    Failed fetches are never cached.
+    """
+
+    def __init__(self, folder: str = MARKET_CACHE_DIR, ttl: int = SNAPSHOT_TTL_SECONDS,
+                 source_name: str = 'yahoo'):
+        self.folder = os.path.join(folder, source_name)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.folder, f"{ticker}.json")
+
+    def get(self, ticker: str):
+        snapshot = None
+        try:
+            with open(self._path(ticker), encoding='utf-8') as f:
+                stored = json.load(f)
+            if time.time() - stored['fetched_at'] < self.ttl:
+                snapshot = stored['data']
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock:
+            if snapshot is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return snapshot
+
+    def put(self, ticker: str, data: dict):
+        _write_json(self._path(ticker), {'fetched_at': time.time(), 'data': data}, default=str)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+DATA_SOURCE = YahooFinanceSource()
+SNAPSHOT_CACHE = SnapshotCache(source_name=DATA_SOURCE.name)
+
+
+def use_data_source(source: MarketDataSource, cache: SnapshotCache = None):
+    """Switch every tool to another data source, e.g. FixtureSource for offline runs."""
+    global DATA_SOURCE, SNAPSHOT_CACHE
+    DATA_SOURCE = source
+    SNAPSHOT_CACHE = cache or SnapshotCache(source_name=source.name)
+
+
+def _stock_data_from(ticker: str, info: dict, avg_volume: float) -> dict:
+    """Build the stock data dict every agent reads from a provider's info and average volume."""
+    if pd.isna(avg_volume):
+        avg_volume = 0
+
+    # Extract key metrics
+    data = {
+        'ticker': ticker,
+        'name': info.get('longName', 'N/A'),
+        'price': info.get('currentPrice', info.get('regularMarketPrice', 0)),
+        'currency': info.get('currency', 'MYR'),
+
+        # Valuation metrics
+        'pe_ratio': info.get('trailingPE', info.get('forwardPE', None)),
+        'price_to_book': info.get('priceToBook', None),
+        'price_to_sales': info.get('priceToSalesTrailing12Months', None),
+
+        # Profitability
+        'roe': info.get('returnOnEquity', None),
+        'eps': info.get('trailingEps', None),
+        'profit_margin': info.get('profitMargins', None),
+        'operating_margin': info.get('operatingMargins', None),
+
+        # Financial health
+        'debt_to_equity': info.get('debtToEquity', None),
+        'current_ratio': info.get('currentRatio', None),
+        'book_value': info.get('bookValue', None),
+
+        # Dividends
+        'dividend_yield': info.get('dividendYield', None),
+        'payout_ratio': info.get('payoutRatio', None),
+        'dividend_rate': info.get('dividendRate', None),
+
+        # Market data
+        'market_cap': info.get('marketCap', None),
+        'avg_volume': int(avg_volume),
+        'volume': info.get('volume', None),
+
+        # Business info
+        'sector': info.get('sector', 'N/A'),
+        'industry': info.get('industry', 'N/A'),
+        'summary': info.get('longBusinessSummary', 'N/A')
+    }
+
+    # Convert percentages to readable format
+    if data['roe']:
+        data['roe_pct'] = data['roe'] * 100
+    if data['dividend_yield']:
+        data['dividend_yield_pct'] = data['dividend_yield'] * 100
+
+    return data
+
+
+def fetch_stock_data(
+    tickers: list,
+    source: MarketDataSource = None,
+    cache: SnapshotCache = None,
+    max_workers: int = FETCH_MAX_WORKERS,
+    refresh: bool = False
+) -> Dict[str, dict]:
+    """
+    Fetch stock data for many tickers: cached snapshots first, then one bulk
+    history download and parallel info requests for the rest.
+
+    Args:
+        tickers (list): Stock tickers
+        source (MarketDataSource): Data provider (defaults to DATA_SOURCE)
+        cache (SnapshotCache): Snapshot cache (defaults to SNAPSHOT_CACHE)
+        max_workers (int): Maximum concurrent info requests
+        refresh (bool): Ignore cached snapshots and fetch everything
+
+    Returns:
+        dict: ticker -> stock data dict, or {'error', 'ticker'} if that ticker failed
+    """
+    source = source or DATA_SOURCE
+    cache = cache or SNAPSHOT_CACHE
+    tickers = list(dict.fromkeys(tickers))
+
+    results = {}
+    missing = []
+    for ticker in tickers:
+        snapshot = None if refresh else cache.get(ticker)
+        if snapshot is None:
+            missing.append(ticker)
+        else:
+            results[ticker] = snapshot
+
+    if missing:
+        # One history request covers the whole batch instead of one per ticker
+        try:
+            histories = source.history(missing, period='1mo')
+        except Exception:
+            histories = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as pool:
+            futures = {pool.submit(source.info, ticker): ticker for ticker in missing}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    info = future.result()
+                    hist = histories.get(ticker)
+                    avg_volume = hist['Volume'].mean() if hist is not None and not hist.empty else 0
+                    data = _stock_data_from(ticker, info, avg_volume)
+                except Exception as e:
+                    results[ticker] = {'error': str(e), 'ticker': ticker}
+                    continue
+                cache.put(ticker, data)
+                results[ticker] = data
+
+    return {ticker: results[ticker] for ticker in tickers}
+
+
+def benchmark_fetch_layer(n: int = 300, latency: float = 0.05, max_workers: int = FETCH_MAX_WORKERS) -> dict:
+    """
+    Compare the old per-ticker fetch (one info and one history request each, in sequence)
+    with the fetch layer, cold and warm, on synthetic fixtures. Runs offline.
+
+    Args:
+        n (int): Number of synthetic tickers
+        latency (float): Simulated seconds per request
+        max_workers (int): Fetch layer concurrency
+
+    Returns:
+        dict: Wall times in seconds and whether both paths returned the same data
+    """
+    workdir = tempfile.mkdtemp(prefix='stock_bench_')
+    try:
+        tickers = write_synthetic_fixtures(os.path.join(workdir, 'fixtures'), n=n)
+        source = FixtureSource(os.path.join(workdir, 'fixtures'), latency=latency)
+        cache = SnapshotCache(os.path.join(workdir, 'cache'), source_name=source.name)
+
+        start = time.perf_counter()
+        serial = {}
+        for ticker in tickers:
+            hist = source.history([ticker])[ticker]
+            serial[ticker] = _stock_data_from(ticker, source.info(ticker), hist['Volume'].mean())
+        serial_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cold = fetch_stock_data(tickers, source=source, cache=cache, max_workers=max_workers)
+        cold_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm = fetch_stock_data(tickers, source=source, cache=cache, max_workers=max_workers)
+        warm_s = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'tickers': n,
+        'latency_s': latency,
+        'serial_s': serial_s,
+        'parallel_cold_s': cold_s,
+        'parallel_warm_s': warm_s,
+        'identical': serial == cold == warm,
+    }
+
+    print(f"\n⏱️ Fetch benchmark: {n} tickers, {latency * 1000:.0f} ms per request, {max_workers} workers")
+    print("="*70)
+    print(f"Serial (info + history per ticker): {serial_s:8.2f}s")
+    print(f"Fetch layer, cold cache:            {cold_s:8.2f}s  ({serial_s / max(cold_s, 1e-9):.0f}x faster)")
+    print(f"Fetch layer, warm cache:            {warm_s:8.2f}s  ({serial_s / max(warm_s, 1e-9):.0f}x faster)")
+    print(f"Same data from every path: {'✅' if result['identical'] else '❌'}")
+
+    return result
+
+print("✅ Market data layer loaded")
+
+"""### 4.2. Stock Data Tool (yfinance)
 
 This tool fetches real financial data from Yahoo Finance for Malaysian stocks (`.KL` suffix).
 """
@@ -177,73 +726,20 @@ def get_stock_data(ticker: str) -> dict:
     """
     Fetch comprehensive stock data from Yahoo Finance.
 
+    Served from the snapshot cache when the ticker was fetched within
+    SNAPSHOT_TTL_SECONDS, e.g. by batch screening.
+
     Args:
         ticker (str): Stock ticker (e.g., '1818.KL' for Bursa Malaysia)
 
     Returns:
         dict: Financial metrics including price, PE, ROE, dividend yield, etc.
     """
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-
-        # Get historical data for volume calculation
-        hist = stock.history(period='1mo')
-        avg_volume = hist['Volume'].mean() if not hist.empty else 0
-
-        # Extract key metrics
-        data = {
-            'ticker': ticker,
-            'name': info.get('longName', 'N/A'),
-            'price': info.get('currentPrice', info.get('regularMarketPrice', 0)),
-            'currency': info.get('currency', 'MYR'),
-
-            # Valuation metrics
-            'pe_ratio': info.get('trailingPE', info.get('forwardPE', None)),
-            'price_to_book': info.get('priceToBook', None),
-            'price_to_sales': info.get('priceToSalesTrailing12Months', None),
-
-            # Profitability
-            'roe': info.get('returnOnEquity', None),
-            'eps': info.get('trailingEps', None),
-            'profit_margin': info.get('profitMargins', None),
-            'operating_margin': info.get('operatingMargins', None),
-
-            # Financial health
-            'debt_to_equity': info.get('debtToEquity', None),
-            'current_ratio': info.get('currentRatio', None),
-            'book_value': info.get('bookValue', None),
-
-            # Dividends
-            'dividend_yield': info.get('dividendYield', None),
-            'payout_ratio': info.get('payoutRatio', None),
-            'dividend_rate': info.get('dividendRate', None),
-
-            # Market data
-            'market_cap': info.get('marketCap', None),
-            'avg_volume': int(avg_volume),
-            'volume': info.get('volume', None),
-
-            # Business info
-            'sector': info.get('sector', 'N/A'),
-            'industry': info.get('industry', 'N/A'),
-            'summary': info.get('longBusinessSummary', 'N/A')
-        }
-
-        # Convert percentages to readable format
-        if data['roe']:
-            data['roe_pct'] = data['roe'] * 100
-        if data['dividend_yield']:
-            data['dividend_yield_pct'] = data['dividend_yield'] * 100
-
-        return data
-
-    except Exception as e:
-        return {'error': str(e), 'ticker': ticker}
+    return fetch_stock_data([ticker])[ticker]
 
 print("✅ Stock data tool loaded")
 
-"""### 4.2. Web Search Tool (Tavily)
+"""### 4.3. Web Search Tool (Tavily)
 
 This tool performs web searches to research business moats, competitive advantages, and company news.
 """
@@ -263,12 +759,18 @@ def search_company_info(query: str, max_results: int = 5) -> list:
     Returns:
         list: Search results with titles, content, URLs
     """
+    inputs = {'query': query, 'max_results': max_results}
+    cached = AGENT_CACHE.get('tavily_search', inputs)
+    if cached is not None:
+        return cached
+
     try:
-        response = tavily_client.search(
-            query=query,
-            max_results=max_results,
-            search_depth="advanced"
-        )
+        with SEARCH_LIMIT:
+            response = tavily_client.search(
+                query=query,
+                max_results=max_results,
+                search_depth="advanced"
+            )
 
         results = []
         for item in response.get('results', []):
@@ -278,6 +780,7 @@ def search_company_info(query: str, max_results: int = 5) -> list:
                 'url': item.get('url', '')
             })
 
+        AGENT_CACHE.put('tavily_search', inputs, results)
         return results
     except Exception as e:
         return [{'error': str(e)}]
@@ -380,6 +883,319 @@ def get_malaysian_stock_list(use_klci_components: bool = True) -> list:
 
     return fallback_stocks
 
+"""### 4.4. Vectorised Screening Engine
+
+Screening runs over a **columnar fundamentals table**, one row per ticker, stored as Parquet. Each criterion is a vectorised boolean mask over a whole column, so screening 1,000 counters against a dozen criteria sets takes milliseconds:
+
+- **Criteria are composable.** `Criterion('max_pe', 'pe_ratio', '<=', 15) & Criterion(...)` builds a `CriteriaSet`; `criteria_from_dict` turns the familiar `{'max_price': ..., 'min_pe': ...}` dicts into one.
+- **Failure reasons are columns.** Every criterion adds a `fail_<name>` column, and `fail_reasons` lists them, so you can see *why* a stock failed, not just that it did.
+- **Ranking happens in the same pass.** `attractiveness_score` is computed for every row and passing stocks come out sorted by it.
+- **Many criteria sets at once.** `screen_many(table, SAVED_CRITERIA)` returns one row per ticker with a pass column per saved set; a rule shared by several sets is evaluated once.
+"""
+
+# =========================
+# Screening Engine: Columnar Table, Criteria Expressions, Ranking
+# =========================
+
+FUNDAMENTALS_TABLE = os.environ.get('FUNDAMENTALS_TABLE', 'fundamentals.parquet')
+
+FUNDAMENTAL_COLUMNS = [
+    'price', 'pe_ratio', 'price_to_book', 'price_to_sales', 'roe_pct', 'eps',
+    'profit_margin', 'debt_to_equity', 'current_ratio', 'book_value',
+    'dividend_yield_pct', 'payout_ratio', 'market_cap', 'avg_volume',
+]
+
+# Criteria dict keys (min_/max_ + name) -> table column
+CRITERIA_COLUMNS = {
+    'price': 'price',
+    'pe': 'pe_ratio',
+    'roe': 'roe_pct',
+    'eps': 'eps',
+    'dividend_yield': 'dividend_yield_pct',
+    'market_cap': 'market_cap',
+    'volume': 'avg_volume',
+    'nta': 'book_value',
+    'ptbv': 'price_to_book',
+    'psr': 'price_to_sales',
+    'debt_to_equity': 'debt_to_equity',
+    'payout_ratio': 'payout_ratio',
+}
+
+DEFAULT_CRITERIA = {
+    'max_price': 0.26,  # RM35 budget / 100 units = RM0.35, use 0.26 for safety margin
+    'min_pe': 4,
+    'max_pe': 15,
+    'min_roe': 5,
+    'min_eps': 0.01,
+    'min_dividend_yield': 1,
+    'min_market_cap': 50_000_000,
+    'min_volume': 50_000
+}
+
+# Saved criteria sets, screened together by screen_many()
+SAVED_CRITERIA = {
+    'rm35_budget': DEFAULT_CRITERIA,
+    'under_rm1': {**DEFAULT_CRITERIA, 'max_price': 1.00},
+    'dividend_income': {'min_dividend_yield': 4, 'min_eps': 0.01, 'max_payout_ratio': 0.9,
+                        'min_market_cap': 500_000_000, 'min_volume': 100_000},
+    'deep_value': {'min_pe': 2, 'max_pe': 8, 'max_ptbv': 0.8, 'min_nta': 0.20,
+                   'min_market_cap': 50_000_000},
+    'quality': {'min_roe': 15, 'max_debt_to_equity': 50, 'min_eps': 0.01,
+                'min_market_cap': 1_000_000_000},
+    'quality_filters': {**DEFAULT_CRITERIA, 'max_price': 1.00, 'min_nta': 0.20,
+                        'max_ptbv': 1.5, 'max_psr': 2.0},
+}
+
+
+class Criterion:
+    """One screening rule over one column. A missing value always fails."""
+
+    def __init__(self, name: str, column: str, op: str, threshold: float):
+        if op not in ('<=', '>='):
+            raise ValueError(f"Unsupported operator {op!r}, use '<=' or '>='")
+        self.name = name
+        self.column = column
+        self.op = op
+        self.threshold = threshold
+
+    @property
+    def key(self) -> tuple:
+        return (self.column, self.op, self.threshold)
+
+    def mask(self, values: np.ndarray) -> np.ndarray:
+        """True where the value passes. NaN compares False, so missing data fails."""
+        return values <= self.threshold if self.op == '<=' else values >= self.threshold
+
+    def __and__(self, other) -> 'CriteriaSet':
+        return CriteriaSet([self]) & other
+
+    def __repr__(self):
+        return f"{self.name}: {self.column} {self.op} {self.threshold}"
+
+
+class CriteriaSet:
+    """All of several criteria. Combine with `&`."""
+
+    def __init__(self, criteria: list):
+        self.criteria = list(criteria)
+
+    def __and__(self, other) -> 'CriteriaSet':
+        extra = other.criteria if isinstance(other, CriteriaSet) else [other]
+        return CriteriaSet(self.criteria + extra)
+
+    def __iter__(self):
+        return iter(self.criteria)
+
+    def __len__(self):
+        return len(self.criteria)
+
+    def __repr__(self):
+        return ' & '.join(repr(c) for c in self.criteria)
+
+
+def criteria_from_dict(criteria: dict) -> CriteriaSet:
+    """Turn {'max_price': 0.26, 'min_pe': 4, ...} into a CriteriaSet."""
+    rules = []
+    for key, threshold in criteria.items():
+        bound, _, field = key.partition('_')
+        if bound not in ('min', 'max') or field not in CRITERIA_COLUMNS:
+            raise ValueError(f"Unknown criterion {key!r}")
+        rules.append(Criterion(key, CRITERIA_COLUMNS[field], '>=' if bound == 'min' else '<=', threshold))
+    return CriteriaSet(rules)
+
+
+def _as_criteria(criteria) -> CriteriaSet:
+    if criteria is None:
+        criteria = DEFAULT_CRITERIA
+    if isinstance(criteria, dict):
+        return criteria_from_dict(criteria)
+    if isinstance(criteria, Criterion):
+        return CriteriaSet([criteria])
+    return criteria
+
+
+def fundamentals_table(snapshots: Dict[str, dict]) -> pd.DataFrame:
+    """
+    Build the columnar fundamentals table from fetched stock data.
+
+    Tickers whose fetch failed are left out. Missing values become NaN, so
+    every metric column is float64 and every criterion is a plain comparison.
+    """
+    rows = [data for data in snapshots.values() if 'error' not in data]
+    table = pd.DataFrame(rows, columns=['ticker', 'name', 'sector'] + FUNDAMENTAL_COLUMNS)
+    for column in FUNDAMENTAL_COLUMNS:
+        table[column] = pd.to_numeric(table[column], errors='coerce').astype('float64')
+    return table.reset_index(drop=True)
+
+
+def build_fundamentals_table(tickers: list, path: str = FUNDAMENTALS_TABLE) -> pd.DataFrame:
+    """Fetch `tickers` through the market data layer and save their fundamentals as Parquet."""
+    table = fundamentals_table(fetch_stock_data(tickers))
+    table.to_parquet(path, index=False)
+    return table
+
+
+def load_fundamentals_table(path: str = FUNDAMENTALS_TABLE) -> pd.DataFrame:
+    return pd.read_parquet(path)
+
+
+def attractiveness_scores(columns: dict) -> np.ndarray:
+    """Higher ROE, lower PE, higher dividend yield = better."""
+    return (
+        np.nan_to_num(columns['roe_pct'], nan=0) * 0.4 +
+        (20 - np.nan_to_num(columns['pe_ratio'], nan=20)) * 0.3 +
+        np.nan_to_num(columns['dividend_yield_pct'], nan=0) * 0.3
+    )
+
+
+class _Screener:
+    """The table's columns as NumPy arrays, with each distinct rule's mask computed once."""
+
+    def __init__(self, table: pd.DataFrame):
+        self.columns = {c: table[c].to_numpy(dtype='float64') for c in FUNDAMENTAL_COLUMNS}
+        self.score = attractiveness_scores(self.columns)
+        self._masks = {}
+
+    def mask(self, criterion: Criterion) -> np.ndarray:
+        if criterion.key not in self._masks:
+            self._masks[criterion.key] = criterion.mask(self.columns[criterion.column])
+        return self._masks[criterion.key]
+
+    def evaluate(self, criteria: CriteriaSet):
+        """Fail matrix (rows x criteria), passed flags and fail reason strings."""
+        n = len(self.score)
+        fails = np.zeros((n, len(criteria)), dtype=bool)
+        for i, c in enumerate(criteria):
+            fails[:, i] = ~self.mask(c)
+        passed = ~fails.any(axis=1)
+        # Each row's failures as a bit pattern; only the distinct patterns are
+        # turned into text, and the reasons column is categorical over them
+        codes = fails.astype(np.int64) @ (np.int64(1) << np.arange(len(criteria), dtype=np.int64))
+        patterns, inverse = np.unique(codes, return_inverse=True)
+        names = tuple(c.name for c in criteria)
+        text = [_reason_text(names, int(p)) for p in patterns]
+        return fails, passed, pd.Categorical.from_codes(inverse.reshape(-1), text)
+
+
+@lru_cache(maxsize=4096)
+def _reason_text(names: tuple, pattern: int) -> str:
+    return ', '.join(name for bit, name in enumerate(names) if pattern >> bit & 1)
+
+
+def screen_table(table: pd.DataFrame, criteria=None) -> pd.DataFrame:
+    """
+    Screen every row of a fundamentals table in one vectorised pass.
+
+    Args:
+        table (pd.DataFrame): From fundamentals_table() or load_fundamentals_table()
+        criteria (dict | Criterion | CriteriaSet): Defaults to DEFAULT_CRITERIA
+
+    Returns:
+        pd.DataFrame: The table plus fail_<criterion> columns, fail_reasons,
+        passed and attractiveness_score, passing stocks first, best first
+    """
+    criteria = _as_criteria(criteria)
+    screener = _Screener(table)
+    fails, passed, reasons = screener.evaluate(criteria)
+    result = table.assign(
+        **{f"fail_{c.name}": fails[:, i] for i, c in enumerate(criteria)},
+        passed=passed,
+        fail_reasons=reasons,
+        attractiveness_score=screener.score,
+    )
+    return result.iloc[np.lexsort((-screener.score, ~passed))]
+
+
+def screen_many(table: pd.DataFrame, criteria_sets: dict = None) -> pd.DataFrame:
+    """
+    Screen one table against many saved criteria sets at once.
+
+    A rule shared by several sets (the same column, operator and threshold) is
+    evaluated once and its mask reused.
+
+    Returns:
+        pd.DataFrame: One row per ticker, ranked by attractiveness_score, with a
+        passed column and a fail-reasons column per set, named after the set
+    """
+    criteria_sets = criteria_sets or SAVED_CRITERIA
+    screener = _Screener(table)
+    columns = {'ticker': table['ticker'].to_numpy(), 'attractiveness_score': screener.score}
+    for name, criteria in criteria_sets.items():
+        _, passed, reasons = screener.evaluate(_as_criteria(criteria))
+        columns[name] = passed
+        columns[f"{name}_fail_reasons"] = reasons
+    order = np.argsort(-screener.score, kind='stable')
+    return pd.DataFrame(columns).iloc[order].reset_index(drop=True)
+
+
+def benchmark_screening(n: int = 1000, repeats: int = 20) -> dict:
+    """
+    Screen `n` synthetic counters against every saved criteria set: the per-ticker
+    `if` chain batch_screen_stocks used to run, against screen_many(). Runs offline.
+
+    Returns:
+        dict: Milliseconds per full screen for each path, and whether they agree
+    """
+    workdir = tempfile.mkdtemp(prefix='screen_bench_')
+    try:
+        tickers = write_synthetic_fixtures(os.path.join(workdir, 'fixtures'), n=n)
+        source = FixtureSource(os.path.join(workdir, 'fixtures'))
+        cache = SnapshotCache(os.path.join(workdir, 'cache'), source_name=source.name)
+        snapshots = fetch_stock_data(tickers, source=source, cache=cache)
+        path = os.path.join(workdir, 'fundamentals.parquet')
+        fundamentals_table(snapshots).to_parquet(path, index=False)
+        start = time.perf_counter()
+        table = load_fundamentals_table(path)
+        load_ms = (time.perf_counter() - start) * 1000
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    sets = {name: criteria_from_dict(c) for name, c in SAVED_CRITERIA.items()}
+
+    def if_chain():
+        # What batch_screen_stocks did per set: an if chain per ticker, rows
+        # appended one by one, then a DataFrame built from them
+        passed = {}
+        for name, criteria in sets.items():
+            rows = []
+            for data in snapshots.values():
+                ok = True
+                for c in criteria:
+                    value = data.get(c.column)
+                    if value is None or (value > c.threshold if c.op == '<=' else value < c.threshold):
+                        ok = False
+                rows.append({'ticker': data['ticker'], 'name': data['name'], 'passed': ok})
+            df = pd.DataFrame(rows)
+            passed[name] = set(df.loc[df['passed'], 'ticker'])
+        return passed
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        loop_passed = if_chain()
+    loop_ms = (time.perf_counter() - start) / repeats * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        screened = screen_many(table, sets)
+    vector_ms = (time.perf_counter() - start) / repeats * 1000
+
+    agree = all(set(screened.loc[screened[name], 'ticker']) == loop_passed[name] for name in sets)
+
+    print(f"\n⏱️ Screening benchmark: {len(table)} counters x {len(sets)} criteria sets")
+    print("="*70)
+    print(f"Load Parquet table:         {load_ms:8.2f} ms")
+    print(f"Per-ticker if chains:       {loop_ms:8.2f} ms")
+    print(f"Vectorised screen_many():   {vector_ms:8.2f} ms  ({loop_ms / max(vector_ms, 1e-9):.0f}x faster)")
+    print(f"Same passing stocks: {'✅' if agree else '❌'}")
+    for name in sets:
+        print(f"  {name:<18} {int(screened[name].sum()):>5} passed")
+
+    return {'counters': len(table), 'criteria_sets': len(sets), 'load_ms': load_ms,
+            'if_chain_ms': loop_ms, 'vectorised_ms': vector_ms, 'agree': agree}
+
+print("✅ Screening engine loaded")
+
+
 def batch_screen_stocks(
     ticker_list: list,
     criteria: dict = None,
@@ -391,107 +1207,38 @@ def batch_screen_stocks(
 
     Args:
         ticker_list (list): List of stock tickers to screen
-        criteria (dict): Screening criteria
+        criteria (dict | CriteriaSet): Screening criteria (DEFAULT_CRITERIA if None)
         max_stocks_to_screen (int): Maximum number of stocks to process
         verbose (bool): Print progress
 
     Returns:
-        pd.DataFrame: Screening results with pass/fail status
+        pd.DataFrame: Screening results with pass/fail status and fail reasons,
+        passing stocks first, ranked by attractiveness_score
     """
-    print(f"\n🔍 Batch Screening {len(ticker_list[:max_stocks_to_screen])} stocks...")
+    tickers = ticker_list[:max_stocks_to_screen]
+    print(f"\n🔍 Batch Screening {len(tickers)} stocks...")
     print("="*70 + "\n")
 
-    results = []
-    passed_count = 0
-    failed_count = 0
-    error_count = 0
-
-    for i, ticker in enumerate(ticker_list[:max_stocks_to_screen], 1):
-        if verbose:
-            print(f"[{i}/{min(len(ticker_list), max_stocks_to_screen)}] Screening {ticker}...", end=" ")
-
-        try:
-            # Get stock data without running full screening agent
-            stock_data = get_stock_data(ticker)
-
-            if 'error' in stock_data:
-                if verbose:
-                    print(f"❌ Error")
-                error_count += 1
-                continue
-
-            # Default criteria
-            if criteria is None:
-                criteria = {
-                    'max_price': 0.26,  # RM35 budget / 100 units = RM0.35, use 0.26 for safety margin
-                    'min_pe': 4,
-                    'max_pe': 15,
-                    'min_roe': 5,
-                    'min_eps': 0.01,
-                    'min_dividend_yield': 1,
-                    'min_market_cap': 50_000_000,
-                    'min_volume': 50_000
-                }
-
-            # Check criteria
-            passed = True
-            checks = {
-                'price': stock_data.get('price', float('inf')),
-                'pe_ratio': stock_data.get('pe_ratio'),
-                'roe_pct': stock_data.get('roe_pct'),
-                'eps': stock_data.get('eps'),
-                'dividend_yield_pct': stock_data.get('dividend_yield_pct'),
-                'market_cap': stock_data.get('market_cap', 0),
-                'avg_volume': stock_data.get('avg_volume', 0)
-            }
-
-            # Evaluate each criterion
-            if checks['price'] > criteria['max_price']:
-                passed = False
-            if checks['pe_ratio'] is None or checks['pe_ratio'] < criteria['min_pe'] or checks['pe_ratio'] > criteria['max_pe']:
-                passed = False
-            if checks['roe_pct'] is None or checks['roe_pct'] < criteria['min_roe']:
-                passed = False
-            if checks['eps'] is None or checks['eps'] < criteria['min_eps']:
-                passed = False
-            if checks['dividend_yield_pct'] is None or checks['dividend_yield_pct'] < criteria['min_dividend_yield']:
-                passed = False
-            if checks['market_cap'] < criteria['min_market_cap']:
-                passed = False
-            if checks['avg_volume'] < criteria['min_volume']:
-                passed = False
-
-            # Store results
-            results.append({
-                'ticker': ticker,
-                'name': stock_data.get('name', 'N/A'),
-                'price': checks['price'],
-                'pe_ratio': checks['pe_ratio'],
-                'roe_pct': checks['roe_pct'],
-                'eps': checks['eps'],
-                'dividend_yield_pct': checks['dividend_yield_pct'],
-                'market_cap': checks['market_cap'],
-                'avg_volume': checks['avg_volume'],
-                'sector': stock_data.get('sector', 'N/A'),
-                'passed': passed
-            })
-
-            if passed:
-                if verbose:
-                    print("✅ PASSED")
-                passed_count += 1
+    # Fetch the whole batch up front: cached snapshots, one bulk history
+    # download and parallel info requests, instead of two requests per ticker
+    snapshots = fetch_stock_data(tickers)
+    error_count = sum('error' in data for data in snapshots.values())
+
+    # Screen every ticker in one vectorised pass over the fundamentals table
+    df = screen_table(fundamentals_table(snapshots), criteria)
+    passed_count = int(df['passed'].sum())
+    failed_count = len(df) - passed_count
+
+    if verbose:
+        outcome = df.set_index('ticker')
+        for i, ticker in enumerate(tickers, 1):
+            print(f"[{i}/{len(tickers)}] Screening {ticker}...", end=" ")
+            if ticker not in outcome.index:
+                print(f"❌ Error: {snapshots[ticker]['error']}")
+            elif outcome.at[ticker, 'passed']:
+                print("✅ PASSED")
             else:
-                if verbose:
-                    print("❌ Failed")
-                failed_count += 1
-
-        except Exception as e:
-            if verbose:
-                print(f"❌ Error: {str(e)}")
-            error_count += 1
-            continue
-
-    df = pd.DataFrame(results)
+                print(f"❌ Failed ({outcome.at[ticker, 'fail_reasons']})")
 
     print("\n" + "="*70)
     print("📊 BATCH SCREENING COMPLETE")
@@ -499,11 +1246,11 @@ def batch_screen_stocks(
     print(f"✅ Passed: {passed_count}")
     print(f"❌ Failed: {failed_count}")
     print(f"⚠️ Errors: {error_count}")
-    print(f"Total Processed: {len(results)}\n")
+    print(f"Total Processed: {len(df)}\n")
 
     return df
 
-"""### 4.3. Test the Tools
+"""### 4.5. Test the Tools
 
 Let's test the tools with a real Malaysian stock.
 """
@@ -645,6 +1392,15 @@ def fundamental_analyst_agent(stock_data: dict) -> dict:
     """
     log_agent_title_html("Fundamental Analyst Agent", "📈")
 
+    inputs = {k: stock_data.get(k) for k in (
+        'roe_pct', 'eps', 'profit_margin', 'operating_margin', 'debt_to_equity', 'current_ratio',
+        'book_value', 'pe_ratio', 'price_to_book', 'price_to_sales', 'name', 'sector', 'industry')}
+    cached = AGENT_CACHE.get('fundamental_analyst_agent', inputs)
+    if cached is not None:
+        log_tool_result_html(f"Inputs unchanged, cached Fundamental Score: {cached.get('total_score', 0)}/55")
+        log_final_summary_html(cached.get('overall_assessment', 'Analysis complete'))
+        return cached
+
     prompt = f"""
 You are a fundamental stock analyst. Analyze the following stock data and score it on these categories:
 
@@ -684,7 +1440,8 @@ Respond ONLY with valid JSON in this format:
     log_tool_call_html("gemini_analysis", "fundamental analysis")
 
     try:
-        response = model.generate_content(prompt)
+        with LLM_LIMIT:
+            response = model.generate_content(prompt)
         text = response.text.strip()
 
         # Extract JSON
@@ -693,6 +1450,7 @@ Respond ONLY with valid JSON in this format:
             result = json.loads(json_match.group(0))
             log_tool_result_html(f"Fundamental Score: {result.get('total_score', 0)}/55")
             log_final_summary_html(result.get('overall_assessment', 'Analysis complete'))
+            AGENT_CACHE.put('fundamental_analyst_agent', inputs, result)
             return result
         else:
             return {"error": "No JSON in response", "raw": text}
@@ -725,6 +1483,14 @@ def business_moat_analyst_agent(stock_data: dict) -> dict:
     company_name = stock_data.get('name', '')
     ticker = stock_data.get('ticker', '')
 
+    # A cached answer skips the web search too
+    inputs = {k: stock_data.get(k) for k in ('ticker', 'name', 'sector', 'industry', 'summary')}
+    cached = AGENT_CACHE.get('business_moat_analyst_agent', inputs)
+    if cached is not None:
+        log_tool_result_html(f"Inputs unchanged, cached Moat Score: {cached.get('moat_score', 0)}/15")
+        log_final_summary_html(f"Moat Type: {cached.get('moat_type', 'N/A')}\n\n{cached.get('analysis', '')}")
+        return cached
+
     # Search for business moat information
     search_query = f"{company_name} competitive advantage business moat Malaysia"
     log_tool_call_html("search_company_info", search_query)
@@ -772,7 +1538,8 @@ Respond ONLY with valid JSON:
     log_tool_call_html("gemini_analysis", "moat analysis")
 
     try:
-        response = model.generate_content(prompt)
+        with LLM_LIMIT:
+            response = model.generate_content(prompt)
         text = response.text.strip()
 
         json_match = re.search(r'\{.*\}', text, re.DOTALL)
@@ -780,6 +1547,7 @@ Respond ONLY with valid JSON:
             result = json.loads(json_match.group(0))
             log_tool_result_html(f"Moat Score: {result.get('moat_score', 0)}/15")
             log_final_summary_html(f"Moat Type: {result.get('moat_type', 'N/A')}\n\n{result.get('analysis', '')}")
+            AGENT_CACHE.put('business_moat_analyst_agent', inputs, result)
             return result
         else:
             return {"error": "No JSON in response", "raw": text}
@@ -815,8 +1583,7 @@ def dividend_cashflow_analyst_agent(stock_data: dict) -> dict:
     log_tool_call_html("get_dividend_history", ticker)
 
     try:
-        stock = yf.Ticker(ticker)
-        dividends = stock.dividends
+        dividends = DATA_SOURCE.dividends(ticker)
 
         if not dividends.empty:
             recent_dividends = dividends.tail(10).to_dict()
@@ -831,6 +1598,15 @@ def dividend_cashflow_analyst_agent(stock_data: dict) -> dict:
         recent_dividends = {}
         dividend_info = f"Error fetching dividends: {str(e)}"
 
+    inputs = {k: stock_data.get(k) for k in (
+        'name', 'dividend_yield_pct', 'payout_ratio', 'dividend_rate', 'eps', 'profit_margin')}
+    inputs['dividend_info'] = dividend_info
+    cached = AGENT_CACHE.get('dividend_cashflow_analyst_agent', inputs)
+    if cached is not None:
+        log_tool_result_html(f"Inputs unchanged, cached Dividend Score: {cached.get('dividend_score', 0)}/15")
+        log_final_summary_html(f"Sustainability: {cached.get('dividend_sustainability', 'N/A')}\n\n{cached.get('analysis', '')}")
+        return cached
+
     prompt = f"""
 You are a dividend and cash flow analyst.
 
@@ -866,7 +1642,8 @@ Respond ONLY with valid JSON:
     log_tool_call_html("gemini_analysis", "dividend analysis")
 
     try:
-        response = model.generate_content(prompt)
+        with LLM_LIMIT:
+            response = model.generate_content(prompt)
         text = response.text.strip()
 
         json_match = re.search(r'\{.*\}', text, re.DOTALL)
@@ -874,6 +1651,7 @@ Respond ONLY with valid JSON:
             result = json.loads(json_match.group(0))
             log_tool_result_html(f"Dividend Score: {result.get('dividend_score', 0)}/15")
             log_final_summary_html(f"Sustainability: {result.get('dividend_sustainability', 'N/A')}\n\n{result.get('analysis', '')}")
+            AGENT_CACHE.put('dividend_cashflow_analyst_agent', inputs, result)
             return result
         else:
             return {"error": "No JSON in response", "raw": text}
@@ -1132,8 +1910,68 @@ print("✅ Visualization functions loaded")
 """## 7. Full Pipeline Function
 
 This function orchestrates all agents to analyze a stock end-to-end.
+
+The three analyst agents each need only the screened `stock_data`, so they run **concurrently** as a small dependency graph (DAG): screening → fundamental, moat and dividend analysts in parallel → report and chart. Every stage's wall time is reported at the end. All API calls still pass through the shared `LLM_LIMIT` and `SEARCH_LIMIT`, so running several stocks at once never exceeds your quota.
 """
 
+# =========================
+# DAG Executor
+# =========================
+
+ANALYST_MAX_WORKERS = 4     # Stages of one stock running at once
+ANALYSIS_MAX_PARALLEL = 5   # Stocks analysed at once by analyze_tickers()
+
+# pyplot keeps global state, so charts are drawn one at a time
+_PLOT_LOCK = threading.Lock()
+
+
+def _timed_stage(fn, kwargs: dict, origin: float) -> tuple:
+    start = time.perf_counter() - origin
+    result = fn(**kwargs)
+    return result, (start, time.perf_counter() - origin)
+
+
+def run_dag(stages: dict, max_workers: int = ANALYST_MAX_WORKERS) -> tuple:
+    """
+    Run stages as soon as the stages they depend on have finished.
+
+    Args:
+        stages (dict): name -> (function, [dependency names]). Each function is
+            called with its dependencies' results as keyword arguments.
+        max_workers (int): Maximum stages running at once
+
+    Returns:
+        tuple: (results by stage name, (start_s, end_s) by stage name, measured from the start of the run)
+    """
+    pending = dict(stages)
+    results, timings, running = {}, {}, {}
+    origin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [name for name, (_, deps) in pending.items() if all(d in results for d in deps)]
+            for name in ready:
+                fn, deps = pending.pop(name)
+                kwargs = {d: results[d] for d in deps}
+                running[pool.submit(_timed_stage, fn, kwargs, origin)] = name
+            if not running:
+                raise ValueError(f"Stages with unmet dependencies: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+    return results, timings
+
+
+def print_stage_timings(ticker: str, timings: dict):
+    """Per-stage wall time, and how much the concurrent stages saved."""
+    wall = max(end for _, end in timings.values())
+    busy = sum(end - start for start, end in timings.values())
+    print(f"\n⏱️ Stage timings for {ticker}")
+    for name, (start, end) in sorted(timings.items(), key=lambda kv: kv[1]):
+        print(f"  {name:<22} {start:6.1f}s → {end:6.1f}s  ({end - start:5.1f}s)")
+    print(f"  {'wall time':<22} {wall:6.1f}s  (stages add up to {busy:.1f}s)")
+
+
 # =========================
 # Full Stock Analysis Pipeline
 # =========================
@@ -1146,12 +1984,14 @@ def run_stock_analysis_pipeline(ticker: str) -> dict:
         ticker (str): Stock ticker (e.g., '1818.KL')
 
     Returns:
-        dict: Complete analysis results
+        dict: Complete analysis results, including per-stage 'timings'
     """
     print("\n" + "="*70)
-    print("🚀 STOCK ANALYSIS PIPELINE")
+    print(f"🚀 STOCK ANALYSIS PIPELINE: {ticker}")
     print("="*70 + "\n")
 
+    origin = time.perf_counter()
+
     # Stage 1: Screening
     screening_results = stock_screener_agent(ticker)
 
@@ -1159,56 +1999,104 @@ def run_stock_analysis_pipeline(ticker: str) -> dict:
         print(f"\n❌ Error: {screening_results['error']}")
         return screening_results
 
-    print("\n✅ Stage 1/5 Complete: Stock Screening\n")
+    screened_s = time.perf_counter() - origin
+    print(f"\n✅ Stage Complete: Stock Screening ({ticker})\n")
 
     stock_data = screening_results['stock_data']
 
-    # Stage 2: Fundamental Analysis
-    fundamental_analysis = fundamental_analyst_agent(stock_data)
-    print("\n✅ Stage 2/5 Complete: Fundamental Analysis\n")
-
-    # Stage 3: Business Moat
-    moat_analysis = business_moat_analyst_agent(stock_data)
-    print("\n✅ Stage 3/5 Complete: Business Moat Analysis\n")
-
-    # Stage 4: Dividend & Cash Flow
-    dividend_analysis = dividend_cashflow_analyst_agent(stock_data)
-    print("\n✅ Stage 4/5 Complete: Dividend & Cash Flow Analysis\n")
-
-    # Stage 5: Generate Report
-    report_path = investment_report_agent(
-        stock_data=stock_data,
-        screening_results=screening_results,
-        fundamental_analysis=fundamental_analysis,
-        moat_analysis=moat_analysis,
-        dividend_analysis=dividend_analysis
-    )
-    print("\n✅ Stage 5/5 Complete: Investment Report Generated\n")
-
-    # Create visualization
-    chart_path = create_yardstick_visualization(
-        fundamental_analysis=fundamental_analysis,
-        moat_analysis=moat_analysis,
-        dividend_analysis=dividend_analysis,
-        stock_data=stock_data
-    )
+    def announce(stage: str, fn):
+        def run(**kwargs):
+            result = fn(**kwargs)
+            print(f"\n✅ Stage Complete: {stage} ({ticker})\n")
+            return result
+        return run
+
+    def report(fundamental_analysis, moat_analysis, dividend_analysis):
+        return investment_report_agent(
+            stock_data=stock_data,
+            screening_results=screening_results,
+            fundamental_analysis=fundamental_analysis,
+            moat_analysis=moat_analysis,
+            dividend_analysis=dividend_analysis
+        )
+
+    def chart(fundamental_analysis, moat_analysis, dividend_analysis):
+        with _PLOT_LOCK:
+            return create_yardstick_visualization(
+                fundamental_analysis=fundamental_analysis,
+                moat_analysis=moat_analysis,
+                dividend_analysis=dividend_analysis,
+                stock_data=stock_data
+            )
+
+    analyses = ['fundamental_analysis', 'moat_analysis', 'dividend_analysis']
+
+    # Stages 2-4 depend only on stock_data and run concurrently; the report
+    # and chart each wait for all three
+    results, timings = run_dag({
+        'fundamental_analysis': (announce("Fundamental Analysis", lambda: fundamental_analyst_agent(stock_data)), []),
+        'moat_analysis': (announce("Business Moat Analysis", lambda: business_moat_analyst_agent(stock_data)), []),
+        'dividend_analysis': (announce("Dividend & Cash Flow Analysis", lambda: dividend_cashflow_analyst_agent(stock_data)), []),
+        'report_path': (announce("Investment Report Generated", report), analyses),
+        'chart_path': (chart, analyses),
+    })
+
+    timings = {name: (start + screened_s, end + screened_s) for name, (start, end) in timings.items()}
+    timings['screening'] = (0.0, screened_s)
 
     print("\n" + "="*70)
-    print("🎉 ANALYSIS COMPLETE!")
+    print(f"🎉 ANALYSIS COMPLETE: {ticker}")
     print("="*70)
-    print(f"\n📄 Report: {report_path}")
-    print(f"📊 Chart: {chart_path}\n")
+    print(f"\n📄 Report: {results['report_path']}")
+    print(f"📊 Chart: {results['chart_path']}")
+    print_stage_timings(ticker, timings)
 
     return {
         'ticker': ticker,
         'screening_results': screening_results,
-        'fundamental_analysis': fundamental_analysis,
-        'moat_analysis': moat_analysis,
-        'dividend_analysis': dividend_analysis,
-        'report_path': report_path,
-        'chart_path': chart_path
+        'fundamental_analysis': results['fundamental_analysis'],
+        'moat_analysis': results['moat_analysis'],
+        'dividend_analysis': results['dividend_analysis'],
+        'report_path': results['report_path'],
+        'chart_path': results['chart_path'],
+        'timings': timings
     }
 
+
+def analyze_tickers(tickers: list, max_parallel: int = ANALYSIS_MAX_PARALLEL) -> list:
+    """
+    Run the full pipeline on several stocks at once.
+
+    Stocks run in parallel, each with its own concurrent analyst stages; the
+    shared rate limiters keep the combined API usage within quota.
+
+    Args:
+        tickers (list): Stock tickers
+        max_parallel (int): Maximum stocks in flight
+
+    Returns:
+        list: Pipeline results in ticker order (an error dict for a stock that
+        failed screening); stocks that raised are left out
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(tickers)))) as pool:
+        futures = [pool.submit(run_stock_analysis_pipeline, ticker) for ticker in tickers]
+    results = []
+    for ticker, future in zip(tickers, futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"Error analyzing {ticker}: {str(e)}")
+
+    elapsed = time.perf_counter() - start
+    analysed = sum('error' not in r for r in results)
+    print(f"\n⏱️ Analysed {analysed}/{len(tickers)} stocks in {elapsed:.1f}s "
+          f"({max_parallel} at a time)")
+    print(f"   Gemini: {LLM_LIMIT.calls} calls, {LLM_LIMIT.waited_s:.1f}s waiting on the rate limit")
+    print(f"   Tavily: {SEARCH_LIMIT.calls} calls, {SEARCH_LIMIT.waited_s:.1f}s waiting on the rate limit")
+    print(f"   {AGENT_CACHE.summary()}")
+    return results
+
 print("✅ Stock analysis pipeline function defined")
 
 # =========================
@@ -1261,38 +2149,21 @@ def discover_stocks(
             'analyzed_stocks': []
         }
 
-    # Sort by investment attractiveness (simple heuristic)
-    # Higher ROE, lower PE, higher dividend yield = better
-    passing_stocks['attractiveness_score'] = (
-        passing_stocks['roe_pct'].fillna(0) * 0.4 +
-        (20 - passing_stocks['pe_ratio'].fillna(20)) * 0.3 +
-        passing_stocks['dividend_yield_pct'].fillna(0) * 0.3
-    )
-
+    # Already ranked by attractiveness_score during screening
     passing_stocks = passing_stocks.sort_values('attractiveness_score', ascending=False)
 
     print(f"\n✅ {len(passing_stocks)} stocks passed screening!\n")
     print("Top candidates:")
     print(passing_stocks[['ticker', 'name', 'price', 'pe_ratio', 'roe_pct', 'dividend_yield_pct']].head(10).to_string())
 
-    # Step 4: Full analysis of top N stocks
+    # Step 4: Full analysis of top N stocks, several at once
     top_stocks = passing_stocks.head(analyze_top_n)
-    analyzed_results = []
 
     print(f"\n\n📈 Step 3: Running full analysis on top {analyze_top_n} stocks...\n")
-
     for idx, row in top_stocks.iterrows():
-        ticker = row['ticker']
-        print(f"\n{'='*70}")
-        print(f"Analyzing {ticker} - {row['name']}")
-        print(f"{'='*70}\n")
+        print(f"  {row['ticker']} - {row['name']}")
 
-        try:
-            result = run_stock_analysis_pipeline(ticker)
-            analyzed_results.append(result)
-        except Exception as e:
-            print(f"Error analyzing {ticker}: {str(e)}")
-            continue
+    analyzed_results = analyze_tickers(list(top_stocks['ticker']))
 
     print("\n" + "="*70)
     print("🎉 STOCK DISCOVERY COMPLETE!")
@@ -1366,19 +2237,8 @@ tickers_to_analyze = [
     # Add more tickers here
 ]
 
-all_results = []
-
-for ticker in tickers_to_analyze:
-    print(f"\n{'='*70}")
-    print(f"Analyzing {ticker}...")
-    print(f"{'='*70}\n")
-
-    try:
-        result = run_stock_analysis_pipeline(ticker)
-        all_results.append(result)
-    except Exception as e:
-        print(f"Error analyzing {ticker}: {str(e)}")
-        continue
+# All stocks run in parallel under the shared API rate limits
+all_results = analyze_tickers(tickers_to_analyze)
 
 """## 10. Summary
 
@@ -14,10 +14,12 @@ print("✅ Dependencies installed successfully!")
 
 # ==== Imports ====
 from __future__ import annotations
+import hashlib
 import json
 import re
 import io
 import sys
+import time
 import traceback
 from typing import Any, Dict, Optional
 from datetime import datetime, timedelta
@@ -41,7 +43,7 @@ from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
 # For Google Colab
 from google.colab import userdata
-from IPython.display import HTML, display
+from IPython.display import HTML, Image, display
 
 print("✅ All imports successful!")
 
@@ -208,6 +210,10 @@ PROMPT = """You are a senior data analyst specializing in time series analysis.
     * calculate_profit_margin(df) -> Series
     * get_top_n(df, column, metric, n) -> DataFrame
     * detect_outliers(series, threshold) -> Series (boolean mask)
+  - Parameters: params (dict) = {params}
+    Values extracted from user_request. Read them from params (e.g. params['year']) instead of writing
+    them into the code, so the same program answers the question with other values. Months are 'YYYY-MM'
+    strings and quarters 'YYYYQn' strings (pd.Period accepts both); n is a count such as "top 10".
 
   PLANNING RULES (critical):
   - Derive ALL filters/parameters from user_request. Do NOT hard-code values unless specified.
@@ -341,16 +347,19 @@ def generate_llm_code(
     df: pd.DataFrame,
     model_name: str = "gemini-2.0-flash-exp",
     temperature: float = 0.2,
+    params: Optional[Dict[str, Any]] = None,
 ) -> str:
     """
     Ask Gemini to produce a plan-with-code response.
     Returns the FULL assistant content (including <execute_python> tags).
     """
-    # Build schema
-    schema_block = build_schema_block(df)
+    # Schema is memoised, rebuilt only when df changes
+    schema_block = schema_context(df)["schema_block"]
 
     # Format prompt
-    formatted_prompt = PROMPT.format(schema_block=schema_block, question=question)
+    formatted_prompt = PROMPT.format(
+        schema_block=schema_block, question=question, params=json.dumps(params or {})
+    )
 
     # Log prompt length for debugging
     print(f"📏 Prompt length: {len(formatted_prompt):,} characters")
@@ -424,6 +433,331 @@ print('LOG: Error: {str(e).replace("'", "")}')
 
 print("✅ Code generator function ready!")
 
+"""### Sandboxed Executor
+
+Generated code used to run with `exec` inside the notebook process. That swapped `sys.stdout` for everyone, copied the whole DataFrame on every call, and had no limits: one runaway loop froze the notebook. `SandboxExecutor` runs it in a pool of worker processes instead:
+
+- **Shared, read-only data.** Numeric, date and categorical columns are copied once into shared memory and every worker reads the same pages. Text columns keep their dtype and are inherited by the forked workers. Each task gets a copy-on-write view, so it can add or overwrite columns without touching the shared data or the next task's view.
+- **Pre-warmed workers.** Workers are forked once, with pandas, numpy, matplotlib and the notebook's helpers already imported. Forking from the kernel, which runs threads of its own, can leave a worker stuck on a lock another thread held; the timeout catches it and the worker is replaced.
+- **Limits per task.** Each task has CPU seconds, a memory budget and a wall-clock timeout. A task that overruns its time has its worker killed and replaced.
+- **Own stdout per task.** Several questions can execute at once without mixing their logs. Charts come back as PNGs.
+"""
+
+# =========================
+# Sandboxed Executor: Worker Pool, Shared Memory, Limits
+# =========================
+
+import contextlib
+import multiprocessing as mp
+import pickle
+import queue
+import signal
+import threading
+import warnings
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "60"))  # wall-clock seconds per task
+SANDBOX_CPU_SECONDS = float(os.environ.get("SANDBOX_CPU_SECONDS", "30"))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "2048"))  # on top of what a worker starts with
+
+# Variables generated code may set, returned from every task
+ANSWER_NAMES = ("STATUS", "answer_text", "answer_json", "answer_df")
+
+
+class CpuLimitExceeded(BaseException):
+    """A BaseException, so `except Exception` in generated code cannot swallow it."""
+
+
+def _on_cpu_limit(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _publish_frame(df: pd.DataFrame, blocks: list) -> pd.DataFrame:
+    """
+    Copy df into shared memory, one block per column, and return a read-only
+    DataFrame over the blocks. Numeric, boolean and datetime columns share
+    their values and categorical columns their codes. Every other column
+    keeps its dtype and is left out of shared memory: turning text into
+    categoricals would change what generated code sees (`.str`, assigning
+    new labels), so workers inherit those columns when forked instead.
+    """
+    data = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biufcmM":
+            values, categories = column.to_numpy(), None
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            values, categories = column.cat.codes.to_numpy(), column.dtype
+        else:
+            data[name] = column
+            continue
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        blocks.append(block)
+        shared = np.ndarray(values.shape, values.dtype, buffer=block.buf)
+        shared[:] = values
+        shared.flags.writeable = False
+        data[name] = shared if categories is None else pd.Categorical.from_codes(shared, dtype=categories, validate=False)
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def _fresh(value, deep: bool = False):
+    """A copy per task, so one task's new columns never leak into the next."""
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=deep)
+    return value
+
+
+def _release(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:  # a frame over it is still referenced somewhere
+            pass
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Cap this process's private memory at what it uses now plus memory_mb."""
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open("/proc/self/status") as f:
+            used = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmData:"))
+    except (OSError, StopIteration):
+        return
+    limit = used + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def _drain_figures() -> list:
+    """PNG bytes of every open figure, then close them all."""
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    figures = []
+    for num in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+        figures.append(buffer.getvalue())
+    plt.close("all")
+    return figures
+
+
+def _picklable(values: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for name, value in values.items():
+        try:
+            pickle.dumps(value)
+            out[name] = value
+        except Exception:
+            out[name] = repr(value)
+    return out
+
+
+def _failure(message: str, limit: Optional[str] = None) -> Dict[str, Any]:
+    return {"stdout": "", "stderr": "", "error": message, "limit": limit, "outputs": {},
+            "figures": [], "cpu_seconds": None, "seconds": None}
+
+
+class SandboxExecutor:
+    """
+    Runs generated code in a pool of pre-warmed worker processes.
+
+    frames (name -> DataFrame) are published
+    to shared memory once. namespace holds the libraries, helpers and other
+    objects tasks may use. Workers are forked, so they inherit it, and every
+    module already imported, as it was when they started.
+
+    Without fork (Windows), tasks run inline, one at a time and unlimited.
+
+    Workers are forked from the kernel, which has threads of its own, and
+    replacements are forked from this pool's dispatch threads. Only the
+    forking thread exists in the child, so a lock another thread held at
+    that moment (logging, the allocator, a BLAS pool) stays held there.
+    A worker that deadlocks on one is caught by the wall-clock timeout and
+    replaced, at the cost of that task. forkserver or spawn would avoid
+    this, but workers could no longer inherit the namespace and data,
+    which is what makes them pre-warmed.
+    """
+
+    def __init__(
+        self,
+        frames: Optional[Dict[str, Any]] = None,
+        namespace: Optional[Dict[str, Any]] = None,
+        *,
+        workers: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT,
+        cpu_seconds: float = SANDBOX_CPU_SECONDS,
+        memory_mb: int = SANDBOX_MEMORY_MB,
+    ):
+        try:
+            self._context = mp.get_context("fork")
+        except ValueError:
+            self._context = None
+        self.workers = workers if self._context else 0
+        self._blocks = []
+        self._finalizer = weakref.finalize(self, _release, self._blocks)
+        self.frames = {}
+        for name, value in (frames or {}).items():
+            if not self.workers:  # inline tasks get deep copies instead
+                self.frames[name] = value
+            else:
+                self.frames[name] = _publish_frame(value, self._blocks)
+        self.namespace = dict(namespace or {})
+        self.timeout, self.cpu_seconds, self.memory_mb = timeout, cpu_seconds, memory_mb
+        self.counts = {"tasks": 0, "timeouts": 0, "restarts": 0}
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        self._dispatch = ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="sandbox")
+
+    # ---- worker side ----
+
+    def _spawn(self) -> tuple:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=self._serve, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _serve(self, conn) -> None:
+        # The notebook's stdout/stderr belong to the kernel; never write to them from here
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+        warnings.filterwarnings("ignore", message=".*non-interactive.*")
+        if int(pd.__version__.split(".")[0]) < 3:
+            # Writes to a task's shallow copy then copy the column instead of hitting read-only memory
+            pd.set_option("mode.copy_on_write", True)
+        import matplotlib
+        matplotlib.use("Agg", force=True)
+        _limit_memory(self.memory_mb)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            conn.send(self._run(task, limits=True))
+
+    def _run(self, task: tuple, limits: bool = False) -> Dict[str, Any]:
+        code, inputs = task
+        namespace = {name: _fresh(value) for name, value in self.namespace.items()}
+        namespace.update({name: _fresh(frame, deep=not self.workers) for name, frame in self.frames.items()})
+        namespace.update(inputs)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        error = limit = None
+        start_cpu, start = time.process_time(), time.perf_counter()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            if limits:
+                signal.setitimer(signal.ITIMER_PROF, self.cpu_seconds)
+            try:
+                exec(code, namespace)
+            except CpuLimitExceeded:
+                limit, error = "cpu", f"CPU limit exceeded: the code used more than {self.cpu_seconds:g} CPU seconds"
+            except MemoryError:
+                limit, error = "memory", f"Memory limit exceeded: the code needed more than {self.memory_mb} MB"
+            except BaseException:  # SystemExit too: a task never ends its worker
+                error = traceback.format_exc()
+            finally:
+                if limits:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            outputs = {name: namespace[name] for name in ANSWER_NAMES if name in namespace}
+            figures = _drain_figures()
+        return {
+            "stdout": stdout.getvalue().strip(),
+            "stderr": stderr.getvalue().strip(),
+            "error": error,
+            "limit": limit,
+            "outputs": _picklable(outputs),
+            "figures": figures,
+            "cpu_seconds": time.process_time() - start_cpu,
+            "seconds": time.perf_counter() - start,
+        }
+
+    # ---- notebook side ----
+
+    def submit(self, code: str, **inputs) -> Future:
+        """Queue code for the next free worker. inputs are added to its namespace."""
+        return self._dispatch.submit(self._execute, (code, inputs))
+
+    def run(self, code: str, **inputs) -> Dict[str, Any]:
+        """
+        Execute code and wait for it.
+
+        Returns:
+            dict: stdout, stderr, error (traceback or limit message), limit
+            ('cpu', 'memory', 'timeout' or None), outputs (answer variables
+            the code set), figures (PNG bytes), cpu_seconds and seconds
+        """
+        return self.submit(code, **inputs).result()
+
+    def _execute(self, task: tuple) -> Dict[str, Any]:
+        with self._lock:
+            self.counts["tasks"] += 1
+        if not self.workers:
+            return self._run(task)
+        process, conn = self._idle.get()
+        try:
+            conn.send(task)
+        except BaseException:  # e.g. unpicklable inputs; nothing reached the worker
+            self._idle.put((process, conn))
+            raise
+        try:
+            if conn.poll(self.timeout):
+                result = conn.recv()
+                if result["limit"] != "memory":
+                    self._idle.put((process, conn))
+                    return result
+            else:
+                result = _failure(f"Timed out: the code ran for more than {self.timeout:g} seconds", "timeout")
+                with self._lock:
+                    self.counts["timeouts"] += 1
+        except (EOFError, OSError):
+            process.join(1)
+            result = _failure(f"The worker exited unexpectedly (exit code {process.exitcode})")
+        # Stuck, dead or near its memory cap: replace the worker
+        process.kill()
+        process.join()
+        conn.close()
+        with self._lock:
+            self.counts["restarts"] += 1
+        self._idle.put(self._spawn())
+        return result
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        self._dispatch.shutdown(wait=True)
+        for _ in range(self.workers):
+            process, conn = self._idle.get()
+            process.kill()
+            process.join()
+            conn.close()
+        self.workers = 0
+        self.frames = {}
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+print("✅ Sandboxed executor ready!")
+
 def _extract_execute_block(text: str) -> str:
     """
     Extract Python code from various formats.
@@ -487,79 +821,286 @@ print(f"LOG: Response preview: {safe_text[:200]}")
     return fallback_code
 
 
+# One live pool per notebook, rebuilt when df changes: each holds its own shared copy of the data
+_SANDBOXES: Dict[str, SandboxExecutor] = {}
+
+
+def sandbox_for(df: pd.DataFrame) -> SandboxExecutor:
+    """The executor with df published to shared memory, started on first use."""
+    key = data_fingerprint(df)
+    if key not in _SANDBOXES:
+        for executor in _SANDBOXES.values():
+            executor.close()
+        _SANDBOXES.clear()
+        _SANDBOXES[key] = SandboxExecutor(
+            {"df": df},
+            namespace={
+                "pd": pd,
+                "np": np,
+                "datetime": datetime,
+                "timedelta": timedelta,
+                "plt": plt,
+                "sns": sns,
+                "get_date_range": get_date_range,
+                "get_quarter_data": get_quarter_data,
+                "calculate_profit_margin": calculate_profit_margin,
+                "get_top_n": get_top_n,
+                "detect_outliers": detect_outliers,
+            },
+        )
+    return _SANDBOXES[key]
+
+
 def execute_generated_code(
     code_or_content: str,
     df: pd.DataFrame,
     user_request: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
-    Execute LLM-generated code in a controlled namespace.
+    Execute LLM-generated code in the sandboxed worker pool.
     Returns execution results including stdout, errors, and answer variables.
     Never raises exceptions - always returns a result dictionary.
     """
     # Extract code (now guaranteed to return something)
     code = _extract_execute_block(code_or_content)
 
-    # Prepare safe execution namespace
-    SAFE_GLOBALS = {
-        "pd": pd,
-        "np": np,
-        "datetime": datetime,
-        "timedelta": timedelta,
-        "plt": plt,
-        "sns": sns,
-        "get_date_range": get_date_range,
-        "get_quarter_data": get_quarter_data,
-        "calculate_profit_margin": calculate_profit_margin,
-        "get_top_n": get_top_n,
-        "detect_outliers": detect_outliers,
-        "len": len,  # Add built-in len
-        "str": str,  # Add built-in str
-    }
-
-    SAFE_LOCALS = {
-        "df": df.copy(),  # Work on a copy to prevent mutations
-        "user_request": user_request or "",
-        "text": code_or_content,  # Make original response available
-    }
-
-    # Capture stdout
-    stdout_buffer = io.StringIO()
-    old_stdout = sys.stdout
-    sys.stdout = stdout_buffer
-
-    error_text = None
-
-    try:
-        exec(code, SAFE_GLOBALS, SAFE_LOCALS)
-    except Exception as e:
-        error_text = traceback.format_exc()
+    run = sandbox_for(df).run(
+        code,
+        user_request=user_request or "",
+        text=code_or_content,  # Make original response available
+        params=dict(params or {}),  # Parameters extracted from user_request
+    )
+    outputs = run["outputs"]
+    status = outputs.get("STATUS", "unknown")
+    answer_text = outputs.get("answer_text")
+    if run["error"]:
         # Set default error values if execution failed
-        SAFE_LOCALS["STATUS"] = "error"
-        SAFE_LOCALS["answer_text"] = f"Code execution failed: {str(e)}"
-    finally:
-        sys.stdout = old_stdout
+        status = "error"
+        answer_text = f"Code execution failed: {run['error'].strip().splitlines()[-1]}"
 
-    printed_output = stdout_buffer.getvalue().strip()
-
-    # Extract answer variables set by generated code
-    answer_text = SAFE_LOCALS.get("answer_text")
-    answer_json = SAFE_LOCALS.get("answer_json")
-    answer_df = SAFE_LOCALS.get("answer_df")
-    status = SAFE_LOCALS.get("STATUS", "unknown")
+    # Charts were drawn in the worker; show them here
+    for png in run["figures"]:
+        display(Image(data=png))
 
     return {
         "code": code,
-        "stdout": printed_output,
-        "error": error_text,
+        "stdout": run["stdout"],
+        "error": run["error"],
         "answer_text": answer_text,
-        "answer_json": answer_json,
-        "answer_df": answer_df,
+        "answer_json": outputs.get("answer_json"),
+        "answer_df": outputs.get("answer_df"),
         "status": status,
+        "limit": run["limit"],
     }
 
 print("✅ Code executor function ready!")
 
+"""### Generated-Code Cache
+
+Most questions are asked more than once, or again with only a year, region or count changed. Instead of paying a Gemini round trip every time:
+
+- **Memoised schema.** `schema_context(df)` builds the schema block (which scans the whole frame) once per version of the data, detected by a cheap `data_fingerprint`.
+- **Question shapes.** `normalize_question` turns *"Top 5 products in the West in 2024"* into the shape `top <n> products in the <region> in <year>` plus `params = {'n': 5, 'region': 'West', 'year': 2024}`.
+- **Validated programs.** A program that ran with `STATUS = 'success'` is stored on disk under the exact question. If it reads every value from `params` instead of hard-coding it, it is also stored under the shape alone and answers every question of that shape.
+
+A repeat question, or a parameter-only variation of a stored template, is answered without any LLM call.
+"""
+
+CODE_CACHE_DIR = os.environ.get("CODE_CACHE_DIR", ".code_cache")
+
+# Above this many versions of the data, the schema memo starts over
+SCHEMA_MEMO_SIZE = 8
+
+_SCHEMA_MEMO: Dict[str, Dict[str, Any]] = {}
+
+
+def data_fingerprint(df: pd.DataFrame, sample_rows: int = 1024) -> str:
+    """
+    Fingerprint df from its shape, dtypes, numeric column sums and an evenly
+    spaced sample of rows. Takes milliseconds, where hashing every row costs
+    more than building the schema block itself.
+    """
+    digest = hashlib.sha256(repr((df.shape, list(df.columns), df.dtypes.astype(str).tolist())).encode("utf-8"))
+    digest.update(repr(df.select_dtypes("number").sum().round(6).tolist()).encode("utf-8"))
+    step = max(1, len(df) // sample_rows)
+    digest.update(pd.util.hash_pandas_object(df.iloc[::step]).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def schema_context(df: pd.DataFrame, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Schema block, filter vocabulary and column types for df, rebuilt only when
+    the data changes.
+
+    The fingerprint can miss an in-place edit of a text column between sampled
+    rows; pass refresh=True after one.
+    """
+    key = data_fingerprint(df)
+    context = None if refresh else _SCHEMA_MEMO.get(key)
+    if context is None:
+        if len(_SCHEMA_MEMO) >= SCHEMA_MEMO_SIZE:
+            _SCHEMA_MEMO.clear()
+        context = {
+            "schema_block": build_schema_block(df),
+            "vocab": {
+                "region": [str(v) for v in df["Region"].dropna().unique()],
+                "category": [str(v) for v in df["Category"].dropna().unique()],
+            },
+            "fields": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        }
+        _SCHEMA_MEMO[key] = context
+    return context
+
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_QUOTED = re.compile(r"(?<!\w)['\"]([^'\"]+)['\"](?!\w)")
+_MONTH_YEAR = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?\s+((?:19|20)\d{2})\b",
+    re.IGNORECASE,
+)
+_QUARTER = re.compile(r"\bq([1-4])\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+_AMOUNT = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)(k\b)?", re.IGNORECASE)
+_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+_NUMBER = re.compile(r"\b(\d+)\b")
+
+
+def _amount(match: re.Match) -> float:
+    value = float(match.group(1).replace(",", "")) * (1000 if match.group(2) else 1)
+    return int(value) if value.is_integer() else value
+
+
+def normalize_question(question: str, vocab: Optional[Dict[str, list]] = None) -> tuple:
+    """
+    Split a question into its shape and its parameters.
+
+    Quoted names, months, quarters, dollar amounts, years, known filter values
+    (vocab, e.g. {'region': ['East', ...]}) and other numbers become
+    placeholders, then case and punctuation are dropped:
+
+        "Top 5 products in the West in 2024?"
+        -> ("top <n> products in the <region> in <year>",
+            {'n': 5, 'region': 'West', 'year': 2024})
+
+    Returns:
+        tuple: (shape, params)
+    """
+    params: Dict[str, Any] = {}
+
+    def take(kind: str, value) -> str:
+        name, i = kind, 2
+        while name in params:
+            name, i = f"{kind}_{i}", i + 1
+        params[name] = value
+        return f" <{name}> "
+
+    text = _QUOTED.sub(lambda m: take("name", m.group(1)), question)
+    text = _MONTH_YEAR.sub(
+        lambda m: take("month", f"{m.group(2)}-{MONTHS.index(m.group(1)[:3].lower()) + 1:02d}"), text
+    )
+    text = _QUARTER.sub(lambda m: take("quarter", f"{m.group(2)}Q{m.group(1)}"), text)
+    text = _AMOUNT.sub(lambda m: take("amount", _amount(m)), text)
+    text = _YEAR.sub(lambda m: take("year", int(m.group(1))), text)
+    for kind, values in (vocab or {}).items():
+        # Longest first, so 'Home & Furniture' is not taken as 'Home'
+        for value in sorted(values, key=len, reverse=True):
+            pattern = re.compile(rf"(?<![\w<]){re.escape(value)}(?![\w>])", re.IGNORECASE)
+            text = pattern.sub(lambda m, k=kind, v=value: take(k, v), text)
+    text = _NUMBER.sub(lambda m: take("n", int(m.group(1))), text)
+
+    shape = " ".join(re.sub(r"[^\w<>]+", " ", text.lower()).split())
+    return shape, params
+
+
+def uses_params(code: str, params: Dict[str, Any]) -> bool:
+    """
+    True when code reads every parameter from params and writes none of their
+    values as a literal, so it answers any question of the same shape.
+    """
+    for name, value in params.items():
+        if not re.search(rf"params\s*(?:\[|\.get\()\s*['\"]{re.escape(name)}['\"]", code):
+            return False
+        if re.search(rf"(?<![\w.]){re.escape(str(value))}(?![\w.])", code, re.IGNORECASE):
+            return False
+    return True
+
+
+def program_scope(context: Dict[str, Any], model: str, prompt: str) -> str:
+    """Programs are reusable while the backend, fields, prompt and model stay the same."""
+    raw = json.dumps([context.get("backend"), context["fields"], prompt, model], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CodeCache:
+    """
+    Validated generated programs on disk, one JSON file per key.
+
+    Looked up by exact question (shape plus parameter values) first, then by
+    shape alone. Only parameterised programs are stored by shape, so a
+    variation never reuses a hard-coded answer.
+    """
+
+    def __init__(self, folder: str = CODE_CACHE_DIR):
+        self.folder = folder
+        self.counts = {"exact": 0, "template": 0, "miss": 0}
+
+    def _path(self, scope: str, shape: str, params: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps([scope, shape, params], sort_keys=True, default=str)
+        return os.path.join(self.folder, f"{hashlib.sha256(raw.encode('utf-8')).hexdigest()}.json")
+
+    def get(self, scope: str, shape: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry plus 'match' ('exact' or 'template'), or None."""
+        for match, path in (("exact", self._path(scope, shape, params)), ("template", self._path(scope, shape))):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.counts[match] += 1
+            return {**entry, "match": match}
+        self.counts["miss"] += 1
+        return None
+
+    def put(self, scope: str, shape: str, params: Dict[str, Any], question: str, content: str, code: str) -> Dict[str, Any]:
+        entry = {
+            "created_at": time.time(),
+            "question": question,
+            "params": params,
+            "parameterised": uses_params(code, params),
+            "content": content,
+        }
+        paths = [self._path(scope, shape, params)]
+        if params and entry["parameterised"]:
+            paths.append(self._path(scope, shape))
+        os.makedirs(self.folder, exist_ok=True)
+        for path in paths:
+            # Write then rename, so a reader never sees half a file
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        return entry
+
+    def discard(self, scope: str, shape: str, params: Dict[str, Any]) -> None:
+        """Forget the programs stored for a question, e.g. after one failed on reuse."""
+        for path in (self._path(scope, shape, params), self._path(scope, shape)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def summary(self) -> str:
+        c = self.counts
+        saved = c["exact"] + c["template"]
+        return f"Code cache: {c['exact']} exact + {c['template']} template hits, {c['miss']} misses ({saved} LLM calls saved)"
+
+
+CODE_CACHE = CodeCache()
+
+print("✅ Generated-code cache ready!")
+
 def time_series_agent(
     question: str,
     df: pd.DataFrame,
@@ -567,6 +1108,7 @@ def time_series_agent(
     temperature: float = 0.2,
     show_code: bool = True,
     show_logs: bool = True,
+    use_cache: bool = True,
 ) -> Dict[str, Any]:
     """
     End-to-end time series analysis agent.
@@ -578,6 +1120,7 @@ def time_series_agent(
         temperature: LLM temperature (0.0-1.0)
         show_code: Display generated code
         show_logs: Display execution logs
+        use_cache: Reuse a stored program for a repeat or parameter-only variation
 
     Returns:
         Dictionary with generated code, answer, and metadata
@@ -585,60 +1128,88 @@ def time_series_agent(
     # Display question
     print_html(question, title="📋 User Question")
 
-    # Generate code
-    print("\n🤖 Generating analysis plan...")
-    try:
-        full_content = generate_llm_code(
-            question=question,
+    context = schema_context(df)
+    shape, params = normalize_question(question, context["vocab"])
+    scope = program_scope(context, model_name, PROMPT)
+
+    # Reuse a stored program if it still runs cleanly
+    cached = CODE_CACHE.get(scope, shape, params) if use_cache else None
+    if cached:
+        print(f"\n♻️ Reusing stored program ({cached['match']} match), no LLM call")
+        full_content = cached["content"]
+        exec_result = execute_generated_code(
+            code_or_content=full_content,
             df=df,
-            model_name=model_name,
-            temperature=temperature,
+            user_request=question,
+            params=params,
         )
-    except Exception as e:
-        print(f"❌ Error during code generation: {e}")
-        return {
-            "question": question,
-            "full_response": "",
-            "execution": {
-                "code": "",
-                "stdout": "",
-                "error": str(e),
-                "answer_text": f"Failed to generate code: {e}",
-                "answer_json": None,
-                "answer_df": None,
-                "status": "error",
+        if exec_result["error"] or exec_result["status"] != "success":
+            print("⚠️ Stored program failed, generating a new one")
+            cached = None
+
+    if not cached:
+        # Generate code
+        print("\n🤖 Generating analysis plan...")
+        try:
+            full_content = generate_llm_code(
+                question=question,
+                df=df,
+                model_name=model_name,
+                temperature=temperature,
+                params=params,
+            )
+        except Exception as e:
+            print(f"❌ Error during code generation: {e}")
+            return {
+                "question": question,
+                "full_response": "",
+                "cached": None,
+                "execution": {
+                    "code": "",
+                    "stdout": "",
+                    "error": str(e),
+                    "answer_text": f"Failed to generate code: {e}",
+                    "answer_json": None,
+                    "answer_df": None,
+                    "status": "error",
+                }
             }
-        }
 
-    # Check if response is empty
-    if not full_content or not full_content.strip():
-        print("⚠️ Warning: LLM returned empty response")
-        return {
-            "question": question,
-            "full_response": "",
-            "execution": {
-                "code": "",
-                "stdout": "",
-                "error": "Empty LLM response",
-                "answer_text": "The LLM returned an empty response. Please try again.",
-                "answer_json": None,
-                "answer_df": None,
-                "status": "error",
+        # Check if response is empty
+        if not full_content or not full_content.strip():
+            print("⚠️ Warning: LLM returned empty response")
+            return {
+                "question": question,
+                "full_response": "",
+                "cached": None,
+                "execution": {
+                    "code": "",
+                    "stdout": "",
+                    "error": "Empty LLM response",
+                    "answer_text": "The LLM returned an empty response. Please try again.",
+                    "answer_json": None,
+                    "answer_df": None,
+                    "status": "error",
+                }
             }
-        }
+
+        # Execute code
+        print("\n⚙️ Executing analysis...")
+        exec_result = execute_generated_code(
+            code_or_content=full_content,
+            df=df,
+            user_request=question,
+            params=params,
+        )
+
+        # Keep programs that ran cleanly for the next time this is asked
+        if use_cache and not exec_result["error"] and exec_result["status"] == "success":
+            CODE_CACHE.put(scope, shape, params, question, full_content, exec_result["code"])
 
     # Display full response (optional)
     if show_code:
         print_html(full_content, title="💻 Generated Plan & Code")
 
-    # Execute code
-    print("\n⚙️ Executing analysis...")
-    exec_result = execute_generated_code(
-        code_or_content=full_content,
-        df=df,
-        user_request=question,
-    )
-
     # Display logs
     if show_logs and exec_result["stdout"]:
         print_html(exec_result["stdout"], title="📊 Execution Logs")
@@ -675,6 +1246,7 @@ def time_series_agent(
     return {
         "question": question,
         "full_response": full_content,
+        "cached": cached["match"] if cached else None,
         "execution": exec_result,
     }
 
@@ -840,4 +1412,104 @@ result3 = time_series_agent(
     question="can you list down top 5 most frequently purchased customers during dataset period? include product they bought most often, how many they bought, and how much they spend on these items in the table",
     df=df,
     temperature=0.3,
-)
\ No newline at end of file
+)
+"""A repeat question, or one that changes only its parameters, is answered by a stored program:"""
+
+result4 = time_series_agent(
+    question="Show me the monthly revenue trend for Home & Furniture category in 2023",
+    df=df,
+    temperature=0.3,
+)
+
+print(CODE_CACHE.summary())
+
+"""### Sandbox Benchmark
+
+Runs a handful of typical analysis programs the old way (in the notebook process on a `df.copy()`) and through the sandbox, one at a time and all at once, then shows that runaway code is stopped by each limit while the notebook stays responsive.
+"""
+
+# =========================
+# Sandbox Benchmark
+# =========================
+
+BENCHMARK_PROGRAMS = [
+    "m = df.set_index('Order_Date').resample('ME')['Revenue'].sum()\nanswer_text = f\"{len(m)} months\"\nSTATUS = 'success'",
+    "answer_df = df.groupby('Category', observed=True)[['Revenue', 'Profit']].sum()\nSTATUS = 'success'",
+    "answer_df = get_top_n(df, 'Product_Name', 'Profit', 10)\nSTATUS = 'success'",
+    "q = get_quarter_data(df, int(df['Order_Date'].dt.year.max()), 4)\nanswer_text = f\"{q['Revenue'].sum():,.2f}\"\nSTATUS = 'success'",
+    "df['Margin'] = calculate_profit_margin(df)\nanswer_df = df.groupby('Region', observed=True)['Margin'].mean()\nSTATUS = 'success'",
+    "s = df.set_index('Order_Date')['Revenue'].resample('D').sum()\nanswer_text = f\"{int(detect_outliers(s).sum())} outlier days\"\nSTATUS = 'success'",
+]
+
+RUNAWAY_PROGRAMS = {
+    "cpu": "while True:\n    pass",
+    "memory": "blocks = []\nwhile True:\n    blocks.append(bytearray(100_000_000))",
+    "timeout": "import time\ntime.sleep(3600)",
+}
+
+
+def benchmark_sandbox(df: pd.DataFrame, repeats: int = 2) -> Dict[str, Any]:
+    """
+    Time BENCHMARK_PROGRAMS in-process against the sandbox, then run RUNAWAY_PROGRAMS
+    in a small throwaway pool with tight limits.
+
+    Returns:
+        dict: Seconds per path, whether the answers agree, and how each runaway ended
+    """
+    programs = BENCHMARK_PROGRAMS * repeats
+    sandbox = sandbox_for(df)
+    namespace = dict(sandbox.namespace)
+
+    start = time.perf_counter()
+    inline = []
+    for code in programs:
+        scope = {**namespace, "df": df.copy()}
+        exec(code, scope)
+        inline.append(scope.get("answer_text") or scope.get("answer_df"))
+    inline_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    serial = [sandbox.run(code) for code in programs]
+    serial_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    futures = [sandbox.submit(code) for code in programs]
+    parallel = [future.result() for future in futures]
+    parallel_s = time.perf_counter() - start
+
+    def answer(run):
+        return run["outputs"].get("answer_text") or run["outputs"].get("answer_df")
+
+    def same(a, b):
+        # Compare labels and values only, not dtypes or frame metadata
+        if isinstance(a, (pd.DataFrame, pd.Series)):
+            return list(a.index) == list(b.index) and a.to_numpy().tolist() == b.to_numpy().tolist()
+        return a == b
+
+    agree = all(same(a, answer(r)) for a, r in zip(inline, serial)) and \
+        all(same(answer(a), answer(b)) for a, b in zip(serial, parallel))
+
+    print(f"\n⏱️ Sandbox benchmark: {len(programs)} programs over {len(df):,} rows, {sandbox.workers} workers")
+    print("="*70)
+    print(f"In-process exec on df.copy(): {inline_s:8.2f} s")
+    print(f"Sandbox, one at a time:       {serial_s:8.2f} s")
+    print(f"Sandbox, all submitted:       {parallel_s:8.2f} s")
+    print(f"Same answers: {'✅' if agree else '❌'}")
+
+    runaways = {}
+    start = time.perf_counter()
+    with SandboxExecutor({"df": df}, workers=1, timeout=5, cpu_seconds=2, memory_mb=256) as strict:
+        startup_s = time.perf_counter() - start
+        print(f"Pool startup (publish df, fork): {startup_s:5.2f} s")
+        for name, code in RUNAWAY_PROGRAMS.items():
+            start = time.perf_counter()
+            run = strict.run(code)
+            runaways[name] = {"limit": run["limit"], "seconds": time.perf_counter() - start}
+            print(f"Runaway {name:<8} stopped by {run['limit'] or 'nothing'!s:<8} after {runaways[name]['seconds']:.1f} s")
+        print(f"Worker restarts: {strict.counts['restarts']}")
+
+    return {"programs": len(programs), "rows": len(df), "inline_s": inline_s, "startup_s": startup_s,
+            "serial_s": serial_s, "parallel_s": parallel_s, "agree": agree, "runaways": runaways}
+
+
+benchmark = benchmark_sandbox(df)